@@ -1,7 +1,7 @@
 from django.contrib import admin
 from .models import (
     BusinessProfile, ESGInput, ESGSnapshot, ESGScore,
-    ESGRecommendation, ESGRoadmap, ChatSession, ChatMessage
+    ESGRecommendation, ESGRoadmap, ChatSession, ChatMessage, AIJob
 )
 
 admin.site.register(BusinessProfile)
@@ -12,4 +12,4 @@ admin.site.register(ESGRecommendation)
 admin.site.register(ESGRoadmap)
 admin.site.register(ChatSession)
 admin.site.register(ChatMessage)
-
+admin.site.register(AIJob)
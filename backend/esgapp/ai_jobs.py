@@ -0,0 +1,229 @@
+"""
+Background jobs for long-running AI operations
+
+Endpoints called with ?async=1 validate the request, queue an AIJob and answer
+202 with its id. The run_ai_worker command claims queued jobs, runs the same
+code path as the synchronous endpoint and stores its JSON response as the
+job result, which clients poll at GET /api/jobs/<id>/.
+
+While a job runs, its worker refreshes heartbeat_at; only a job whose
+heartbeat stopped is requeued. Progress and the final result are written
+only while the job is still claimed by the worker running it.
+"""
+import logging
+import os
+import socket
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F, Q
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import AIJob, ESGInput, ESGSnapshot
+from .single_flight import flight_key, input_hash, single_flight
+
+logger = logging.getLogger(__name__)
+
+# operation name -> callable(job) returning the JSON result
+OPERATIONS = {}
+
+
+def job_operation(name):
+    """Register a function as the runner of an AIJob operation"""
+    def decorator(fn):
+        OPERATIONS[name] = fn
+        return fn
+    return decorator
+
+
+def wants_async(request) -> bool:
+    """True when the client asked for a background job (?async=1)"""
+    return request.query_params.get('async', '').lower() in ('1', 'true', 'yes')
+
+
+def enqueue_job(user, operation: str, params: dict) -> AIJob:
+    """Queue an operation for the worker"""
+    if operation not in OPERATIONS:
+        raise ValueError(f"Unknown AI job operation: {operation}")
+    job = AIJob.objects.create(user=user, operation=operation, params=params)
+    logger.info(f"Queued AI job {job.id} ({operation})")
+    return job
+
+
+def accepted_response(request, job: AIJob):
+    """202 response pointing the client at the job status endpoint"""
+    status_url = request.build_absolute_uri(reverse('job_status', args=[job.id]))
+    return Response({
+        'job_id': str(job.id),
+        'status': job.status,
+        'status_url': status_url,
+    }, status=status.HTTP_202_ACCEPTED, headers={'Location': status_url})
+
+
+def _claimed(job: AIJob):
+    """The job's row while it is still running under the worker that claimed it"""
+    return AIJob.objects.filter(id=job.id, status='running', worker=job.worker)
+
+
+def set_progress(job: AIJob, progress: int, message: str = ''):
+    """Record progress (and a heartbeat) of a running job without touching its other fields"""
+    job.progress = progress
+    job.progress_message = message
+    _claimed(job).update(progress=progress, progress_message=message, heartbeat_at=timezone.now())
+
+
+def heartbeat(workers) -> int:
+    """Mark the jobs these workers are running as alive"""
+    return AIJob.objects.filter(status='running', worker__in=list(workers)).update(heartbeat_at=timezone.now())
+
+
+def worker_name() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+
+
+def claim_next_job(worker: str):
+    """Atomically move the oldest queued job to running; None when the queue is empty"""
+    candidates = AIJob.objects.filter(status='queued').order_by('created_at').values_list('id', flat=True)[:10]
+    for job_id in candidates:
+        # Conditional update: only one worker can flip a given job out of 'queued'
+        now = timezone.now()
+        claimed = AIJob.objects.filter(id=job_id, status='queued').update(
+            status='running',
+            worker=worker,
+            started_at=now,
+            heartbeat_at=now,
+            attempts=F('attempts') + 1,
+            progress=0,
+            progress_message='Started',
+        )
+        if claimed:
+            return AIJob.objects.select_related('user').get(id=job_id)
+    return None
+
+
+def run_job(job: AIJob):
+    """Run a claimed job and store its result or error"""
+    operation = OPERATIONS.get(job.operation)
+    try:
+        if operation is None:
+            raise ValueError(f"Unknown AI job operation: {job.operation}")
+        result = operation(job)
+    except Exception as e:
+        logger.exception(f"AI job {job.id} ({job.operation}) failed: {e}")
+        finished = _claimed(job).update(
+            status='failed', error=str(e) or e.__class__.__name__, finished_at=timezone.now()
+        )
+    else:
+        finished = _claimed(job).update(
+            status='succeeded', result=result, progress=100, progress_message='Completed', finished_at=timezone.now()
+        )
+        if finished:
+            logger.info(f"AI job {job.id} ({job.operation}) succeeded")
+    if not finished:
+        # Requeued as stale meanwhile: the new claim owns the job now
+        logger.warning(f"AI job {job.id} ({job.operation}) was reclaimed by another worker; result discarded")
+
+
+def requeue_stale_jobs() -> int:
+    """Return jobs whose worker stopped sending heartbeats to the queue, failing those out of attempts"""
+    cutoff = timezone.now() - timedelta(seconds=settings.AI_JOB_STALE_AFTER)
+    stale = AIJob.objects.filter(status='running').filter(
+        Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at__isnull=True, started_at__lt=cutoff)
+    )
+    failed = stale.filter(attempts__gte=settings.AI_JOB_MAX_ATTEMPTS).update(
+        status='failed', error='Worker stopped before the job finished', finished_at=timezone.now()
+    )
+    requeued = stale.update(status='queued', worker='', progress=0, progress_message='')
+    if failed or requeued:
+        logger.warning(f"AI jobs: requeued {requeued} and failed {failed} stale jobs")
+    return requeued + failed
+
+
+def purge_finished_jobs() -> int:
+    """Delete finished jobs older than AI_JOB_RETENTION_DAYS"""
+    cutoff = timezone.now() - timedelta(days=settings.AI_JOB_RETENTION_DAYS)
+    deleted, _ = AIJob.objects.filter(status__in=['succeeded', 'failed'], finished_at__lt=cutoff).delete()
+    return deleted
+
+
+@job_operation('process')
+def _run_process(job):
+    from .views import _process_esg_input
+
+    esg_input = ESGInput.objects.select_related('business_profile').get(
+        id=job.params['esg_input_id'], business_profile__user=job.user
+    )
+    engine = job.params.get('engine', 'ai')
+    set_progress(job, 10, 'Scoring ESG input with AI' if engine == 'ai' else f"Scoring ESG input with '{engine}'")
+    return _process_esg_input(esg_input, job.params.get('force', False), engine)
+
+
+@job_operation('batch_process')
+def _run_batch_process(job):
+    from .views import _process_esg_inputs_batch
+
+    esg_inputs = list(ESGInput.objects.select_related('business_profile').filter(
+        id__in=job.params['esg_input_ids'], business_profile__user=job.user
+    ).order_by('pk'))
+    set_progress(job, 5, f'Scoring {len(esg_inputs)} ESG inputs')
+
+    def progress(done, total):
+        set_progress(job, 5 + int(90 * done / total), f'Scored {done} of {total} changed inputs')
+
+    return _process_esg_inputs_batch(
+        esg_inputs, job.params.get('force', False), progress, job.params.get('engine', 'ai')
+    )
+
+
+@job_operation('full_assessment')
+def _run_full_assessment(job):
+    from .assessment_pipeline import run_full_assessment
+
+    esg_input = ESGInput.objects.select_related('business_profile').get(
+        id=job.params['esg_input_id'], business_profile__user=job.user
+    )
+    set_progress(job, 10, 'Running full assessment')
+    return run_full_assessment(esg_input, job.params['timeframe'])
+
+
+@job_operation('comprehensive_analysis')
+def _run_comprehensive_analysis(job):
+    from .ai_views import _analyze_and_save
+
+    esg_input = ESGInput.objects.select_related('business_profile').get(
+        id=job.params['esg_input_id'], business_profile__user=job.user
+    )
+    set_progress(job, 10, 'Generating comprehensive analysis')
+    key = flight_key('comprehensive_analysis', esg_input.pk, input_hash(esg_input))
+    result = single_flight.do(key, lambda: _analyze_and_save(esg_input))
+    return {
+        'snapshot': result['snapshot'],
+        'comprehensive_analysis': result['comprehensive_analysis'],
+        'message': 'AI-powered comprehensive ESG analysis completed successfully'
+    }
+
+
+@job_operation('roadmap')
+def _run_roadmap(job):
+    from .views import _regenerate_roadmap
+
+    snapshot = ESGSnapshot.objects.select_related('business_profile', 'esg_input').get(
+        id=job.params['snapshot_id'], business_profile__user=job.user
+    )
+    set_progress(job, 10, 'Generating roadmap')
+    return _regenerate_roadmap(snapshot, job.params['timeframe'])
+
+
+@job_operation('report')
+def _run_report(job):
+    from .ai_views import _build_ai_report
+
+    snapshot = ESGSnapshot.objects.select_related('business_profile', 'esg_input').get(
+        id=job.params['snapshot_id'], business_profile__user=job.user
+    )
+    set_progress(job, 10, 'Generating report')
+    return _build_ai_report(snapshot)
@@ -1,30 +1,22 @@
 """
 AI-powered Recommendation Service for ESG improvements
 """
-from openai import OpenAI
 from django.conf import settings
 from .models import ESGSnapshot, ESGRecommendation
-import json
+from . import llm_metrics
+from .json_extraction import extract_json
+from .llm_gateway import chat_completion
+from .llm_router import llm_router
+from .prompt_context import encode_snapshot, use_compact
 
 
 class AIRecommendationService:
     """Generates ESG recommendations using AI API"""
     
     def __init__(self):
-        if settings.GROQ_API_KEY:
-            try:
-                self.client = OpenAI(
-                    api_key=settings.GROQ_API_KEY,
-                    base_url=settings.AI_BASE_URL
-                )
-                self.model = settings.AI_MODEL
-            except Exception as e:
-                print(f"Failed to initialize OpenAI client: {e}")
-                self.client = None
-                self.model = None
-        else:
-            self.client = None
-            self.model = None
+        # Pooled client of the best provider (Groq preferred), None when none can take calls
+        self.client = llm_router.get_client('groq')
+        self.model = settings.AI_MODEL if self.client else None
     
     def generate_recommendations(self, snapshot: ESGSnapshot) -> list[ESGRecommendation]:
         """Generate AI-powered recommendations for a snapshot"""
@@ -32,22 +24,8 @@ class AIRecommendationService:
             return self._fallback_recommendations(snapshot)
         
         try:
-            # Prepare context for AI
-            context = self._prepare_context(snapshot)
-            
             # Call AI API
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {
-                        "role": "system", 
-                        "content": "You are an ESG consultant. Generate 5-8 actionable recommendations in JSON format with fields: title, description, category (E/S/G), priority (high/medium/low), cost_level (low/medium/high), expected_impact."
-                    },
-                    {"role": "user", "content": context}
-                ],
-                temperature=0.7,
-                max_tokens=1000
-            )
+            response = chat_completion(self.client, **self._recommendations_request(snapshot))
             
             # Parse AI response
             ai_content = response.choices[0].message.content
@@ -59,12 +37,31 @@ class AIRecommendationService:
             print(f"AI recommendation error: {e}")
             return self._fallback_recommendations(snapshot)
     
+    def _recommendations_request(self, snapshot: ESGSnapshot) -> dict:
+        """Completion parameters for a snapshot's recommendations"""
+        return dict(
+            prompt_type='recommendations',
+            provider='groq',
+            model=settings.AI_MODEL,
+            messages=[
+                {
+                    "role": "system", 
+                    "content": "You are an ESG consultant. Generate 5-8 actionable recommendations in JSON format with fields: title, description, category (E/S/G), priority (high/medium/low), cost_level (low/medium/high), expected_impact."
+                },
+                {"role": "user", "content": self._prepare_context(snapshot)}
+            ],
+            temperature=0.7,
+            max_tokens=1000
+        )
+    
     def _prepare_context(self, snapshot: ESGSnapshot) -> str:
         """Prepare context for AI API"""
         esg_input = snapshot.esg_input
         
-        context = f"""
-Business Profile:
+        if use_compact():
+            header = encode_snapshot(snapshot)
+        else:
+            header = f"""Business Profile:
 - Name: {snapshot.business_profile.business_name}
 - Industry: {snapshot.business_profile.industry}
 - Employees: {snapshot.business_profile.employee_count}
@@ -73,7 +70,10 @@ Current ESG Scores:
 - Environmental: {snapshot.environmental_score}/100
 - Social: {snapshot.social_score}/100  
 - Governance: {snapshot.governance_score}/100
-- Overall: {snapshot.overall_esg_score}/100
+- Overall: {snapshot.overall_esg_score}/100"""
+        
+        context = f"""
+{header}
 
 Key Business Data:
 - Energy: {esg_input.electricity_kwh or 'Not provided'} kWh
@@ -92,12 +92,9 @@ Generate specific, actionable ESG improvement recommendations for this SME.
         recommendations = []
         
         try:
-            # Try to extract JSON from response
-            import re
-            json_match = re.search(r'\[.*\]', ai_content, re.DOTALL)
-            if json_match:
-                items = json.loads(json_match.group())
-            else:
+            # Extract the first valid recommendations array from the response
+            items = extract_json(ai_content, 'recommendations')
+            if items is None:
                 # Fallback parsing
                 items = self._simple_parse(ai_content)
             
@@ -106,7 +103,7 @@ Generate specific, actionable ESG improvement recommendations for this SME.
                     snapshot=snapshot,
                     title=item.get('title', 'ESG Improvement'),
                     description=item.get('description', ''),
-                    category=item.get('category', 'E'),
+                    category=str(item.get('category', 'E'))[:1].upper(),  # 'Environmental' -> 'E'
                     priority=item.get('priority', 'medium').lower(),
                     cost_level=item.get('cost_level', 'medium').lower(),
                     expected_impact=item.get('expected_impact', 'Improve ESG performance')
@@ -150,6 +147,7 @@ Generate specific, actionable ESG improvement recommendations for this SME.
     
     def _fallback_recommendations(self, snapshot: ESGSnapshot) -> list[ESGRecommendation]:
         """Fallback recommendations when AI is unavailable"""
+        llm_metrics.record_fallback('recommendations')
         recommendations = []
         
         # Basic recommendations based on scores
@@ -1,32 +1,45 @@
 """
 AI-based ESG Scoring Service using Groq API
 """
-from openai import OpenAI
 from django.conf import settings
 from .models import ESGInput, ESGSnapshot
-import json
-import re
+from .llm_gateway import achat_completion, chat_completion
+from . import llm_metrics
+from .json_extraction import SCHEMAS, extract_json, validate
+from .llm_router import llm_router
+from .prompt_context import business_context, encode_business_context, encode_snapshot, use_compact
+from .scoring_engines import get_engine
 
 
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Shared by the single and batched scoring prompts
+SCORING_GUIDELINES = """SCORING GUIDELINES:
+- Evaluate both data provided AND practices implemented
+- If good data is provided (energy usage, water usage, employee info, etc.), give appropriate scores (30-60 range)
+- If practices are implemented (solar panels, waste recycling, safety training, policies, etc.), add significant points (20-40 points per category)
+- If both data AND practices are provided, scores should be higher (50-80 range)
+- If excellent practices across all categories, scores can reach 70-90
+- Only give very low scores (0-20) if truly minimal or no data AND no practices
+- Data completeness should reflect percentage of fields filled (0-100%)
+- Reward positive practices: solar energy, waste management, employee benefits, governance policies, etc.
+
+Examples:
+- Business with energy data + solar panels + waste recycling = Environmental score 50-70
+- Business with employee data + safety training + health insurance = Social score 50-70  
+- Business with multiple governance policies = Governance score 60-80
+- Business with comprehensive data AND practices = Overall score 60-85
+"""
+
+
 class AIScoringService:
     """AI-powered ESG scoring using Llama model via Groq"""
     
     def __init__(self):
-        if settings.GROQ_API_KEY:
-            try:
-                self.client = OpenAI(
-                    api_key=settings.GROQ_API_KEY,
-                    base_url=settings.AI_BASE_URL
-                )
-            except Exception as e:
-                logger.error(f"Failed to initialize OpenAI client: {e}")
-                self.client = None
-        else:
-            self.client = None
+        # Pooled client of the best provider (Groq preferred), None when none can take calls
+        self.client = llm_router.get_client('groq')
     
     def generate_esg_scores(self, esg_input: ESGInput) -> dict:
         """Generate comprehensive ESG scores using AI"""
@@ -35,8 +48,130 @@ class AIScoringService:
             logger.warning("Groq API key not configured, using fallback scoring")
             return self._fallback_scoring(esg_input)
         
+        request = self._esg_scores_request(esg_input)
+        try:
+            logger.info(f"Calling AI for ESG scoring with model: {settings.AI_MODEL}")
+            response = chat_completion(self.client, **request)
+            return self._handle_esg_scores_response(response, esg_input)
+        except Exception as e:
+            return self._esg_scores_error_fallback(e, esg_input)
+    
+    async def agenerate_esg_scores(self, esg_input: ESGInput) -> dict:
+        """Async variant of generate_esg_scores (esg_input must have business_profile loaded)"""
+        client = llm_router.get_async_client('groq')
+        if not client:
+            logger.warning("Groq API key not configured, using fallback scoring")
+            return self._fallback_scoring(esg_input)
+        
+        request = self._esg_scores_request(esg_input)
+        try:
+            logger.info(f"Calling AI for ESG scoring with model: {settings.AI_MODEL}")
+            response = await achat_completion(client, **request)
+            return self._handle_esg_scores_response(response, esg_input)
+        except Exception as e:
+            return self._esg_scores_error_fallback(e, esg_input)
+    
+    def generate_esg_scores_batch(self, esg_inputs: list) -> dict:
+        """
+        Score many inputs with one prompt per AI_SCORING_BATCH_SIZE businesses.
+        Returns {esg_input.pk: scores}; entries missing from a batch answer or
+        failing validation are scored one by one with generate_esg_scores.
+        """
+        if not self.client:
+            logger.warning("Groq API key not configured, using fallback scoring")
+            return self._fallback_scoring_batch(esg_inputs)
+        
+        results = {}
+        size = max(1, settings.AI_SCORING_BATCH_SIZE)
+        for start in range(0, len(esg_inputs), size):
+            results.update(self._score_batch(esg_inputs[start:start + size]))
+        return results
+    
+    def _score_batch(self, esg_inputs: list) -> dict:
+        """Scores for one batch, with single-item scoring for whatever the batch answer lacks"""
+        valid = {}
+        if self.client and len(esg_inputs) > 1:
+            try:
+                logger.info(f"Calling AI for batched ESG scoring of {len(esg_inputs)} inputs")
+                response = chat_completion(self.client, **self._esg_scores_batch_request(esg_inputs))
+                items = extract_json(response.choices[0].message.content, 'esg_scores_batch') or []
+                valid = {str(item.get('id')): item for item in items if self._valid_batch_item(item)}
+            except Exception as e:
+                logger.error(f"Batched ESG scoring failed: {e}")
+        
+        results = {}
+        retry = []
+        for esg_input in esg_inputs:
+            parsed = valid.get(str(esg_input.pk))
+            if parsed is None:
+                retry.append(esg_input)
+            else:
+                results[esg_input.pk] = self._scores_from_parsed(parsed)
+        if retry and len(esg_inputs) > 1:
+            logger.warning(f"Batched ESG scoring: {len(retry)} of {len(esg_inputs)} inputs need single scoring")
+        for esg_input in retry:
+            results[esg_input.pk] = self.generate_esg_scores(esg_input)
+        return results
+    
+    def _valid_batch_item(self, item) -> bool:
+        """A batch entry that conforms to the single-scoring schema with scores in 0-100"""
+        if not isinstance(item, dict) or item.get('id') is None or validate(item, SCHEMAS['esg_scores']):
+            return False
+        for field in ('environmental_score', 'social_score', 'governance_score'):
+            if not 0 <= float(str(item[field]).strip().rstrip('%')) <= 100:
+                return False
+        return True
+    
+    def _esg_scores_batch_request(self, esg_inputs: list) -> dict:
+        """Completion parameters scoring several businesses, given as compact contexts keyed by input id"""
+        businesses = "\n\n".join(
+            f"## id={esg_input.pk}\n{encode_business_context(esg_input)}" for esg_input in esg_inputs
+        )
+        
+        prompt = f"""
+Score each of the following {len(esg_inputs)} businesses. Each one starts with a line "## id=<id>".
+
+{businesses}
+
+Return a JSON array with one object per business, in the same order, each with this structure:
+{{
+    "id": <id>,
+    "environmental_score": 0-100,
+    "social_score": 0-100,
+    "governance_score": 0-100,
+    "overall_esg_score": 0-100,
+    "confidence_level": "high/medium/low",
+    "data_completeness": 0-100,
+    "detailed_analysis": {{
+        "environmental": {{"strengths": ["up to 2"], "weaknesses": ["up to 2"]}},
+        "social": {{"strengths": ["up to 2"], "weaknesses": ["up to 2"]}},
+        "governance": {{"strengths": ["up to 2"], "weaknesses": ["up to 2"]}}
+    }},
+    "improvement_priorities": ["top 3 priorities"]
+}}
+
+Score every business independently; do not compare them with each other.
+
+{SCORING_GUIDELINES}
+Return ONLY the JSON array without markdown formatting.
+"""
+        
+        return dict(
+            prompt_type='esg_scores_batch',
+            provider='groq',
+            model=settings.AI_MODEL,
+            messages=[
+                {"role": "system", "content": "You are an expert ESG analyst. Score every business listed, returning ONLY a valid JSON array without markdown code blocks. Be generous with scores when data and practices are provided - reward businesses for their ESG efforts."},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.3,
+            max_tokens=settings.AI_SCORING_BATCH_ITEM_TOKENS * len(esg_inputs)
+        )
+    
+    def _esg_scores_request(self, esg_input: ESGInput) -> dict:
+        """Completion parameters for ESG scoring"""
         # Prepare detailed business context
-        context = self._prepare_business_context(esg_input)
+        context = business_context(esg_input, self._prepare_business_context)
         
         prompt = f"""
 You are an expert ESG analyst. Analyze the following business data and provide detailed ESG scores.
@@ -87,54 +222,42 @@ Provide a JSON response with the following structure:
 
 Consider industry standards, company size, and regional context. Be thorough and analytical.
 
-SCORING GUIDELINES:
-- Evaluate both data provided AND practices implemented
-- If good data is provided (energy usage, water usage, employee info, etc.), give appropriate scores (30-60 range)
-- If practices are implemented (solar panels, waste recycling, safety training, policies, etc.), add significant points (20-40 points per category)
-- If both data AND practices are provided, scores should be higher (50-80 range)
-- If excellent practices across all categories, scores can reach 70-90
-- Only give very low scores (0-20) if truly minimal or no data AND no practices
-- Data completeness should reflect percentage of fields filled (0-100%)
-- Reward positive practices: solar energy, waste management, employee benefits, governance policies, etc.
-
-Examples:
-- Business with energy data + solar panels + waste recycling = Environmental score 50-70
-- Business with employee data + safety training + health insurance = Social score 50-70  
-- Business with multiple governance policies = Governance score 60-80
-- Business with comprehensive data AND practices = Overall score 60-85
-
+{SCORING_GUIDELINES}
 Return ONLY valid JSON without markdown formatting.
 """
         
-        try:
-            logger.info(f"Calling AI for ESG scoring with model: {settings.AI_MODEL}")
-            response = self.client.chat.completions.create(
-                model=settings.AI_MODEL,
-                messages=[
-                    {"role": "system", "content": "You are an expert ESG analyst. Provide detailed, accurate ESG assessments in valid JSON format. Return ONLY valid JSON without markdown code blocks. Be generous with scores when data and practices are provided - reward businesses for their ESG efforts."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.3,
-                max_tokens=2000
-            )
-            
-            content = response.choices[0].message.content
-            logger.info(f"AI response received, length: {len(content)}")
-            parsed_result = self._parse_ai_response(content, esg_input)
-            
-            # Log the scores for debugging
-            logger.info(f"AI Scores - Environmental: {parsed_result.get('environmental_score')}, Social: {parsed_result.get('social_score')}, Governance: {parsed_result.get('governance_score')}, Overall: {parsed_result.get('overall_esg_score')}")
-            
-            return parsed_result
-            
-        except Exception as e:
-            logger.error(f"AI scoring error: {e}")
-            import traceback
-            logger.error(traceback.format_exc())
-            logger.info("Falling back to rule-based scoring")
-            fallback_result = self._fallback_scoring(esg_input)
-            logger.info(f"Fallback Scores - Environmental: {fallback_result.get('environmental_score')}, Social: {fallback_result.get('social_score')}, Governance: {fallback_result.get('governance_score')}, Overall: {fallback_result.get('overall_esg_score')}")
-            return fallback_result
+        return dict(
+            prompt_type='esg_scores',
+            provider='groq',
+            model=settings.AI_MODEL,
+            messages=[
+                {"role": "system", "content": "You are an expert ESG analyst. Provide detailed, accurate ESG assessments in valid JSON format. Return ONLY valid JSON without markdown code blocks. Be generous with scores when data and practices are provided - reward businesses for their ESG efforts."},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.3,
+            max_tokens=2000
+        )
+    
+    def _handle_esg_scores_response(self, response, esg_input: ESGInput) -> dict:
+        """Parse an ESG scoring completion"""
+        content = response.choices[0].message.content
+        logger.info(f"AI response received, length: {len(content)}")
+        parsed_result = self._parse_ai_response(content, esg_input)
+        
+        # Log the scores for debugging
+        logger.info(f"AI Scores - Environmental: {parsed_result.get('environmental_score')}, Social: {parsed_result.get('social_score')}, Governance: {parsed_result.get('governance_score')}, Overall: {parsed_result.get('overall_esg_score')}")
+        
+        return parsed_result
+    
+    def _esg_scores_error_fallback(self, error, esg_input: ESGInput) -> dict:
+        """Rule-based scores after a failed AI scoring call"""
+        logger.error(f"AI scoring error: {error}")
+        import traceback
+        logger.error(traceback.format_exc())
+        logger.info("Falling back to rule-based scoring")
+        fallback_result = self._fallback_scoring(esg_input)
+        logger.info(f"Fallback Scores - Environmental: {fallback_result.get('environmental_score')}, Social: {fallback_result.get('social_score')}, Governance: {fallback_result.get('governance_score')}, Overall: {fallback_result.get('overall_esg_score')}")
+        return fallback_result
     
     def _prepare_business_context(self, esg_input: ESGInput) -> str:
         """Prepare comprehensive business context for AI analysis"""
@@ -212,83 +335,31 @@ Governance Data:
     
     def _parse_ai_response(self, content: str, esg_input: ESGInput) -> dict:
         """Parse AI response and extract JSON data"""
-        try:
-            # Try to extract JSON from response - handle both single JSON and markdown-wrapped JSON
-            json_match = re.search(r'\{[\s\S]*\}', content, re.DOTALL)
-            if json_match:
-                json_str = json_match.group()
-                # Clean up markdown code blocks if present
-                json_str = re.sub(r'```json\s*', '', json_str)
-                json_str = re.sub(r'```\s*$', '', json_str, flags=re.MULTILINE)
-                parsed = json.loads(json_str)
-                
-                # Ensure all required fields are present and extract insights
-                result = {
-                    "environmental_score": parsed.get("environmental_score") or 50,
-                    "social_score": parsed.get("social_score") or 50,
-                    "governance_score": parsed.get("governance_score") or 50,
-                    "overall_esg_score": parsed.get("overall_esg_score") or 50,
-                    "confidence_level": parsed.get("confidence_level") or "medium",
-                    "data_completeness": parsed.get("data_completeness") or 30,
-                    "detailed_analysis": parsed.get("detailed_analysis") or {},
-                    "risk_assessment": parsed.get("risk_assessment") or {},
-                    "improvement_priorities": parsed.get("improvement_priorities") or [],
-                    "estimated_costs": parsed.get("estimated_costs") or {},
-                    "insights": parsed.get("detailed_analysis") or {},
-                    "strengths": self._extract_strengths(parsed),
-                    "weaknesses": self._extract_weaknesses(parsed)
-                }
-                return result
-        except Exception as e:
-            logger.error(f"Error parsing AI response: {e}")
-            logger.error(f"Content: {content[:500]}")
-        
-        # If parsing fails, validate scores and fall back if needed
-        # Check if parsed data exists and is valid, otherwise use fallback
-        try:
-            # Try one more time with simpler regex
-            # Remove markdown if present
-            content_clean = content.replace('```json', '').replace('```', '').strip()
-            parsed = json.loads(content_clean)
-            
-            # Validate scores - if they seem too high for no data, use fallback
-            env_score = float(parsed.get("environmental_score") or 0)
-            social_score = float(parsed.get("social_score") or 0)
-            gov_score = float(parsed.get("governance_score") or 0)
-            
-            # If scores are suspiciously high (>20) but no meaningful data provided, use fallback
-            has_data = (
-                esg_input.electricity_kwh or esg_input.has_solar or esg_input.waste_recycling or
-                esg_input.safety_training_provided or esg_input.health_insurance or
-                esg_input.code_of_conduct or esg_input.anti_corruption_policy
-            )
-            
-            if not has_data and (env_score > 20 or social_score > 20 or gov_score > 20):
-                logger.warning("AI returned suspiciously high scores for empty data, using fallback")
-                return self._fallback_scoring(esg_input)
-            
-            # Return parsed data if valid
-            result = {
-                "environmental_score": env_score,
-                "social_score": social_score,
-                "governance_score": gov_score,
-                "overall_esg_score": float(parsed.get("overall_esg_score", 0)),
-                "confidence_level": parsed.get("confidence_level", "low"),
-                "data_completeness": float(parsed.get("data_completeness", 0)),
-                "detailed_analysis": parsed.get("detailed_analysis", {}),
-                "risk_assessment": parsed.get("risk_assessment", {}),
-                "improvement_priorities": parsed.get("improvement_priorities", []),
-                "estimated_costs": parsed.get("estimated_costs", {}),
-                "insights": parsed.get("detailed_analysis", {}),
-                "strengths": self._extract_strengths(parsed),
-                "weaknesses": self._extract_weaknesses(parsed)
-            }
-            return result
-        except:
-            pass
-        
-        # Fallback parsing - use fallback scoring which checks actual data
-        return self._fallback_scoring(esg_input)
+        parsed = extract_json(content, 'esg_scores')
+        if parsed is None:
+            logger.error(f"No valid ESG scores JSON in AI response: {content[:500]}")
+            # Fallback parsing - use fallback scoring which checks actual data
+            return self._fallback_scoring(esg_input)
+        return self._scores_from_parsed(parsed)
+    
+    def _scores_from_parsed(self, parsed: dict) -> dict:
+        """Scores dict from a validated scoring answer, with defaults for missing fields"""
+        # Ensure all required fields are present and extract insights
+        return {
+            "environmental_score": parsed.get("environmental_score") or 50,
+            "social_score": parsed.get("social_score") or 50,
+            "governance_score": parsed.get("governance_score") or 50,
+            "overall_esg_score": parsed.get("overall_esg_score") or 50,
+            "confidence_level": parsed.get("confidence_level") or "medium",
+            "data_completeness": parsed.get("data_completeness") or 30,
+            "detailed_analysis": parsed.get("detailed_analysis") or {},
+            "risk_assessment": parsed.get("risk_assessment") or {},
+            "improvement_priorities": parsed.get("improvement_priorities") or [],
+            "estimated_costs": parsed.get("estimated_costs") or {},
+            "insights": parsed.get("detailed_analysis") or {},
+            "strengths": self._extract_strengths(parsed),
+            "weaknesses": self._extract_weaknesses(parsed)
+        }
     
     def _extract_strengths(self, parsed_data: dict) -> list:
         """Extract strengths from parsed AI response"""
@@ -318,207 +389,46 @@ Governance Data:
     
     def _fallback_scoring(self, esg_input: ESGInput) -> dict:
         """Fallback scoring if AI fails - calculates scores based on actual data provided"""
-        # Count how much data is provided
-        data_points = 0
-        max_data_points = 0
-        
-        # Environmental data
-        env_data = 0
-        env_max = 12
-        if esg_input.electricity_kwh is not None: env_data += 1
-        if esg_input.electricity_bill_amount is not None: env_data += 1
-        if esg_input.generator_usage_liters is not None: env_data += 1
-        if esg_input.generator_usage_hours is not None: env_data += 1
-        if esg_input.has_solar: env_data += 1
-        if esg_input.solar_capacity_kw is not None: env_data += 1
-        if esg_input.water_usage_liters is not None: env_data += 1
-        if esg_input.waste_recycling: env_data += 1
-        if esg_input.waste_segregation: env_data += 1
-        if esg_input.carbon_footprint_tracking: env_data += 1
-        if esg_input.renewable_energy_percentage is not None: env_data += 1
-        if esg_input.hazardous_waste_management: env_data += 1
-        
-        # Social data
-        social_data = 0
-        social_max = 10
-        if esg_input.safety_training_provided: social_data += 1
-        if esg_input.safety_training_frequency: social_data += 1
-        if esg_input.health_insurance: social_data += 1
-        if esg_input.diversity_policy: social_data += 1
-        if esg_input.female_employees_percentage is not None: social_data += 1
-        if esg_input.workplace_accidents_last_year is not None: social_data += 1
-        if esg_input.mental_health_support: social_data += 1
-        if esg_input.employee_training_hours is not None: social_data += 1
-        if esg_input.employee_satisfaction_survey: social_data += 1
-        if esg_input.flexible_work_arrangements: social_data += 1
-        
-        # Governance data
-        gov_data = 0
-        gov_max = 13
-        if esg_input.code_of_conduct: gov_data += 1
-        if esg_input.anti_corruption_policy: gov_data += 1
-        if esg_input.data_privacy_policy: gov_data += 1
-        if esg_input.whistleblower_policy: gov_data += 1
-        if esg_input.board_oversight: gov_data += 1
-        if esg_input.risk_management_policy: gov_data += 1
-        if esg_input.cybersecurity_measures: gov_data += 1
-        if esg_input.regulatory_compliance_tracking: gov_data += 1
-        if esg_input.sustainability_reporting: gov_data += 1
-        if esg_input.stakeholder_engagement: gov_data += 1
-        if esg_input.esg_goals_set: gov_data += 1
-        if esg_input.third_party_audits: gov_data += 1
-        if esg_input.public_esg_commitments: gov_data += 1
-        
-        # Calculate scores based on data completeness AND practices
-        # Reward both data provision and actual ESG practices
-        env_score = 0.0
-        
-        # Base score from data completeness (max 40 points)
-        if env_data > 0:
-            env_score = min((env_data / env_max) * 40, 40)
-        
-        # Additional points for positive practices (max 60 points)
-        positive_practices = sum([
-            esg_input.has_solar,
-            esg_input.waste_recycling,
-            esg_input.waste_segregation,
-            esg_input.carbon_footprint_tracking,
-            esg_input.hazardous_waste_management,
-            esg_input.paper_reduction_initiatives,
-            esg_input.business_travel_policy,
-            esg_input.remote_work_policy,
-            esg_input.sustainable_procurement
-        ])
-        env_score += min(positive_practices * 6.67, 60)  # Max 60 points for practices
-        
-        # Bonus for renewable energy percentage if provided
-        if esg_input.renewable_energy_percentage and esg_input.renewable_energy_percentage > 0:
-            env_score += min(esg_input.renewable_energy_percentage * 0.2, 10)  # Up to 10 bonus points
-        
-        # Ensure score doesn't exceed 100
-        env_score = min(env_score, 100)
-        
-        social_score = 0.0
-        
-        # Base score from data completeness (max 40 points)
-        if social_data > 0:
-            social_score = min((social_data / social_max) * 40, 40)
-        elif esg_input.total_employees and esg_input.total_employees > 0:
-            # Minimal score for just providing employee count
-            social_score = 5.0
-        
-        # Additional points for positive practices (max 60 points)
-        positive_practices = sum([
-            esg_input.safety_training_provided,
-            esg_input.health_insurance,
-            esg_input.diversity_policy,
-            esg_input.mental_health_support,
-            esg_input.employee_satisfaction_survey,
-            esg_input.flexible_work_arrangements,
-            esg_input.community_engagement,
-            esg_input.local_hiring_preference,
-            esg_input.charitable_contributions
-        ])
-        social_score += min(positive_practices * 6.67, 60)  # Max 60 points for practices
-        
-        # Bonus for training hours if provided
-        if esg_input.employee_training_hours and esg_input.employee_training_hours > 0:
-            social_score += min(esg_input.employee_training_hours * 0.5, 10)  # Up to 10 bonus points
-        
-        # Bonus for good female employee percentage (diversity)
-        if esg_input.female_employees_percentage and esg_input.female_employees_percentage >= 30:
-            social_score += 5  # Bonus for diversity
-        
-        # Ensure score doesn't exceed 100
-        social_score = min(social_score, 100)
-        
-        gov_score = 0.0
-        
-        # Base score from data completeness (max 30 points)
-        if gov_data > 0:
-            gov_score = min((gov_data / gov_max) * 30, 30)
-        
-        # Additional points for core policies (max 50 points)
-        core_policies = sum([
-            esg_input.code_of_conduct,
-            esg_input.anti_corruption_policy,
-            esg_input.data_privacy_policy,
-            esg_input.whistleblower_policy,
-            esg_input.board_oversight,
-            esg_input.risk_management_policy
-        ])
-        gov_score += min(core_policies * 8.33, 50)  # Max 50 points for core policies
-        
-        # Additional points for advanced governance (max 20 points)
-        advanced_governance = sum([
-            esg_input.cybersecurity_measures,
-            esg_input.regulatory_compliance_tracking,
-            esg_input.sustainability_reporting,
-            esg_input.stakeholder_engagement,
-            esg_input.esg_goals_set,
-            esg_input.third_party_audits,
-            esg_input.public_esg_commitments
-        ])
-        gov_score += min(advanced_governance * 2.86, 20)  # Max 20 points for advanced governance
-        
-        # Ensure score doesn't exceed 100
-        gov_score = min(gov_score, 100)
-        
-        # Calculate data completeness
-        total_data = env_data + social_data + gov_data
-        total_max = env_max + social_max + gov_max
-        data_completeness = (total_data / total_max * 100) if total_max > 0 else 0
-        
-        # Calculate overall score (weighted average, but ensure minimum if data provided)
-        if total_data == 0 and (not esg_input.total_employees or esg_input.total_employees == 0):
-            # No data at all - return 0 scores
-            overall_score = 0.0
-            env_score = 0.0
-            social_score = 0.0
-            gov_score = 0.0
-            data_completeness = 0.0
-        else:
-            # Calculate average, but ensure minimum scores if data is provided
-            overall_score = (env_score + social_score + gov_score) / 3
-            
-            # If data is provided but scores are still very low, boost them slightly
-            # This ensures that providing data gets recognized
-            if total_data > 0 and overall_score < 20:
-                # Minimum score boost for providing data
-                overall_score = max(overall_score, 15.0)
-                # Adjust individual scores proportionally
-                if env_score < 15 and env_data > 0:
-                    env_score = max(env_score, 15.0)
-                if social_score < 15 and (social_data > 0 or esg_input.total_employees):
-                    social_score = max(social_score, 15.0)
-                if gov_score < 15 and gov_data > 0:
-                    gov_score = max(gov_score, 15.0)
-                # Recalculate overall
-                overall_score = (env_score + social_score + gov_score) / 3
-        
+        llm_metrics.record_fallback('esg_scores')
+        return self._rule_based_result(esg_input, get_engine('fallback').score(esg_input))
+    
+    def _fallback_scoring_batch(self, esg_inputs: list) -> dict:
+        """{esg_input.pk: fallback scores} for many inputs from one matrix evaluation"""
+        engine = get_engine('fallback')
+        scores = engine.score_batch(esg_inputs)
+        rows = {pk: row for row, pk in enumerate(scores['id'].tolist())}
+        results = {}
+        for esg_input in esg_inputs:
+            llm_metrics.record_fallback('esg_scores')
+            results[esg_input.pk] = self._rule_based_result(esg_input, engine.row(scores, rows[esg_input.pk]))
+        return results
+    
+    def _rule_based_result(self, esg_input: ESGInput, scores: dict) -> dict:
+        """Scoring response for rule-based scores (one row of fallback_scoring.score_matrix)"""
+        data_completeness = float(scores['data_completeness'])
         return {
-            "environmental_score": round(env_score, 2),
-            "social_score": round(social_score, 2),
-            "governance_score": round(gov_score, 2),
-            "overall_esg_score": round(overall_score, 2),
+            "environmental_score": round(float(scores['environmental_score']), 2),
+            "social_score": round(float(scores['social_score']), 2),
+            "governance_score": round(float(scores['governance_score']), 2),
+            "overall_esg_score": round(float(scores['overall_esg_score']), 2),
             "confidence_level": "low" if data_completeness < 30 else "medium" if data_completeness < 70 else "high",
             "data_completeness": round(data_completeness, 2),
             "detailed_analysis": {
                 "environmental": {
                     "strengths": ["Waste segregation"] if esg_input.waste_segregation else [],
-                    "weaknesses": ["Limited environmental data provided"] if env_data < 5 else [],
+                    "weaknesses": ["Limited environmental data provided"] if scores['environmental_data'] < 5 else [],
                     "key_metrics": {},
                     "industry_benchmark": "Insufficient data for comparison"
                 },
                 "social": {
                     "strengths": ["Employee benefits"] if esg_input.health_insurance else [],
-                    "weaknesses": ["Limited social data provided"] if social_data < 5 else [],
+                    "weaknesses": ["Limited social data provided"] if scores['social_data'] < 5 else [],
                     "key_metrics": {},
                     "industry_benchmark": "Insufficient data for comparison"
                 },
                 "governance": {
-                    "strengths": ["Governance policies"] if gov_data > 5 else [],
-                    "weaknesses": ["Limited governance data provided"] if gov_data < 5 else [],
+                    "strengths": ["Governance policies"] if scores['governance_data'] > 5 else [],
+                    "weaknesses": ["Limited governance data provided"] if scores['governance_data'] < 5 else [],
                     "key_metrics": {},
                     "industry_benchmark": "Insufficient data for comparison"
                 }
@@ -532,7 +442,9 @@ Governance Data:
             "estimated_costs": {"low_cost": [], "medium_cost": [], "high_cost": []},
             "insights": {},
             "strengths": [],
-            "weaknesses": []
+            "weaknesses": [],
+            "scoring_source": "rule_based",
+            "scoring_engine": "fallback"
         }
     
     def generate_timeframe_roadmap(self, snapshot: ESGSnapshot, timeframe: int) -> dict:
@@ -542,7 +454,35 @@ Governance Data:
             print("Groq API key not configured, using fallback roadmap")
             return self._fallback_timeframe_roadmap(timeframe)
         
-        context = f"""
+        try:
+            response = chat_completion(self.client, **self._timeframe_roadmap_request(snapshot, timeframe))
+            return self._parse_timeframe_roadmap(response.choices[0].message.content, timeframe)
+        except Exception as e:
+            print(f"Timeframe roadmap generation error: {e}")
+        
+        return self._fallback_timeframe_roadmap(timeframe)
+    
+    async def agenerate_timeframe_roadmap(self, snapshot: ESGSnapshot, timeframe: int) -> dict:
+        """Async variant of generate_timeframe_roadmap (snapshot relations must be loaded)"""
+        client = llm_router.get_async_client('groq')
+        if not client:
+            print("Groq API key not configured, using fallback roadmap")
+            return self._fallback_timeframe_roadmap(timeframe)
+        
+        try:
+            response = await achat_completion(client, **self._timeframe_roadmap_request(snapshot, timeframe))
+            return self._parse_timeframe_roadmap(response.choices[0].message.content, timeframe)
+        except Exception as e:
+            print(f"Timeframe roadmap generation error: {e}")
+        
+        return self._fallback_timeframe_roadmap(timeframe)
+    
+    def _timeframe_roadmap_request(self, snapshot: ESGSnapshot, timeframe: int) -> dict:
+        """Completion parameters for a 30/60/90-day roadmap"""
+        if use_compact():
+            context = encode_snapshot(snapshot)
+        else:
+            context = f"""
 Business: {snapshot.business_profile.business_name}
 Industry: {snapshot.business_profile.industry}
 Employees: {snapshot.esg_input.total_employees}
@@ -675,33 +615,36 @@ Provide JSON response with detailed actions:
 Each action MUST include a detailed description (at least 50 words). Return ONLY valid JSON without markdown formatting.
 """
         
-        try:
-            response = self.client.chat.completions.create(
-                model=settings.AI_MODEL,
-                messages=[
-                    {"role": "system", "content": "You are an ESG implementation expert. Create practical, cost-effective roadmaps."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.4,
-                max_tokens=1500
-            )
-            
-            content = response.choices[0].message.content
-            json_match = re.search(r'\{.*\}', content, re.DOTALL)
-            if json_match:
-                return json.loads(json_match.group())
-                
-        except Exception as e:
-            print(f"Timeframe roadmap generation error: {e}")
-        
+        return dict(
+            prompt_type='roadmap',
+            provider='groq',
+            model=settings.AI_MODEL,
+            messages=[
+                {"role": "system", "content": "You are an ESG implementation expert. Create practical, cost-effective roadmaps."},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.4,
+            max_tokens=1500
+        )
+    
+    def _parse_timeframe_roadmap(self, content: str, timeframe: int) -> dict:
+        """Extract the roadmap JSON from a completion, falling back to the template"""
+        roadmap = extract_json(content, 'roadmap')
+        if roadmap is not None:
+            return roadmap
         return self._fallback_timeframe_roadmap(timeframe)
     
     def calculate_esg_scores(self, esg_input: ESGInput) -> dict:
         """Main method to calculate ESG scores using AI"""
         return self.generate_esg_scores(esg_input)
     
+    def calculate_esg_scores_batch(self, esg_inputs: list) -> dict:
+        """Scores for many inputs at once, keyed by input id"""
+        return self.generate_esg_scores_batch(esg_inputs)
+    
     def _fallback_timeframe_roadmap(self, timeframe: int) -> dict:
         """Fallback roadmap for specific timeframe if AI fails"""
+        llm_metrics.record_fallback('roadmap')
         base_roadmap = {
             "30_day_plan": {
                 "title": "Quick Wins",
@@ -1,18 +1,31 @@
 """
 Enhanced API endpoints for free AI-powered ESG analysis
 """
-from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.decorators import api_view, permission_classes, renderer_classes
+from rest_framework.permissions import IsAuthenticated, IsAdminUser, AllowAny
 from rest_framework.response import Response
+from rest_framework.renderers import JSONRenderer
 from rest_framework import status
 from django.shortcuts import get_object_or_404
 from django.conf import settings
+from django.http import HttpResponse
 import json
 import uuid
 
 from .models import ESGInput, ESGSnapshot, ChatSession, ChatMessage
+from .scoring_engines import save_breakdowns
 from .free_ai_service import FreeAIService
+from . import llm_metrics, token_budget
+from .answer_cache import answer_cache, response_fields
+from .llm_router import llm_router
+from .provider_health import provider_health
+from .rate_limiter import rate_limiter
 from .serializers import ESGSnapshotSerializer
+from .sse import EventStreamRenderer, sse_event, sse_response
+from .single_flight import flight_key, input_hash, single_flight
+from .ai_jobs import wants_async, enqueue_job, accepted_response
+from .models import AIJob
+from .serializers import AIJobSerializer
 
 
 @api_view(['POST'])
@@ -30,67 +43,17 @@ def ai_comprehensive_analysis(request):
             business_profile__user=request.user
         )
         
-        # Initialize free AI service
-        ai_service = FreeAIService()
-        
-        # Generate comprehensive analysis
-        analysis_data = ai_service.generate_comprehensive_esg_analysis(esg_input)
-        
-        # Extract scores from analysis
-        overall_assessment = analysis_data.get('overall_assessment', {})
-        
-        # Create or update ESG snapshot
-        snapshot, created = ESGSnapshot.objects.get_or_create(
-            esg_input=esg_input,
-            defaults={
-                'business_profile': esg_input.business_profile,
-                'environmental_score': overall_assessment.get('environmental_score', 45),
-                'social_score': overall_assessment.get('social_score', 45),
-                'governance_score': overall_assessment.get('governance_score', 45),
-                'overall_esg_score': overall_assessment.get('overall_esg_score', 45),
-                'confidence_level': overall_assessment.get('confidence_level', 'medium'),
-                'data_completeness': overall_assessment.get('data_completeness', 50)
-            }
-        )
-        
-        if not created:
-            # Update existing snapshot
-            snapshot.environmental_score = overall_assessment.get('environmental_score', snapshot.environmental_score)
-            snapshot.social_score = overall_assessment.get('social_score', snapshot.social_score)
-            snapshot.governance_score = overall_assessment.get('governance_score', snapshot.governance_score)
-            snapshot.overall_esg_score = overall_assessment.get('overall_esg_score', snapshot.overall_esg_score)
-            snapshot.confidence_level = overall_assessment.get('confidence_level', snapshot.confidence_level)
-            snapshot.data_completeness = overall_assessment.get('data_completeness', snapshot.data_completeness)
-            snapshot.save()
-        
-        # Store detailed analysis data (you might want to add a JSONField to ESGSnapshot model)
-        # For now, we'll return it in the response
+        if wants_async(request):
+            job = enqueue_job(request.user, 'comprehensive_analysis', {'esg_input_id': esg_input.pk})
+            return accepted_response(request, job)
         
-        # Create enhanced recommendations from AI analysis
-        recommendations_data = analysis_data.get('actionable_recommendations', [])
-        
-        # Clear existing recommendations and create new ones
-        snapshot.recommendations.all().delete()
-        
-        from .models import ESGRecommendation
-        for rec_data in recommendations_data[:10]:  # Limit to top 10
-            ESGRecommendation.objects.create(
-                snapshot=snapshot,
-                title=rec_data.get('title', 'ESG Improvement'),
-                description=rec_data.get('expected_impact', 'Improve ESG performance'),
-                category=rec_data.get('category', 'E'),
-                priority=rec_data.get('priority', 'medium'),
-                cost_level=rec_data.get('cost_estimate', 'medium').split(' ')[0].replace('$', '').lower() if '$' in rec_data.get('cost_estimate', '') else 'medium',
-                expected_impact=rec_data.get('expected_impact', 'Positive ESG impact'),
-                esg_impact_points=rec_data.get('esg_score_improvement', '+2-4 points'),
-                business_benefit='; '.join(rec_data.get('business_benefits', ['Improved ESG performance'])),
-                why_matters=f"Implementation time: {rec_data.get('implementation_time', 'TBD')}. Cost: {rec_data.get('cost_estimate', 'TBD')}",
-                risk_reduction='high' if rec_data.get('priority') == 'high' else 'medium'
-            )
+        # Concurrent requests for the same unchanged input share one AI call and one snapshot write
+        key = flight_key('comprehensive_analysis', esg_input.pk, input_hash(esg_input))
+        result = single_flight.do(key, lambda: _analyze_and_save(esg_input))
         
         return Response({
-            'snapshot': ESGSnapshotSerializer(snapshot).data,
-            'comprehensive_analysis': analysis_data,
+            'snapshot': result['snapshot'],
+            'comprehensive_analysis': result['comprehensive_analysis'],
             'message': 'AI-powered comprehensive ESG analysis completed successfully'
         }, status=status.HTTP_200_OK)
         
@@ -106,70 +69,176 @@ def ai_comprehensive_analysis(request):
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+def _analyze_and_save(esg_input):
+    """Run the comprehensive analysis, persist it and return the serialized result"""
+    # Initialize free AI service
+    ai_service = FreeAIService()
+    
+    # Generate comprehensive analysis
+    analysis_data = ai_service.generate_comprehensive_esg_analysis(esg_input)
+    
+    snapshot = _save_comprehensive_analysis(esg_input, analysis_data)
+    return {
+        'snapshot': ESGSnapshotSerializer(snapshot).data,
+        'comprehensive_analysis': analysis_data,
+    }
+
+
+def _save_comprehensive_analysis(esg_input, analysis_data):
+    """Create or update the snapshot and recommendations from a comprehensive analysis"""
+    # Extract scores from analysis
+    overall_assessment = analysis_data.get('overall_assessment', {})
+    
+    # Create or update ESG snapshot
+    snapshot, created = ESGSnapshot.objects.get_or_create(
+        esg_input=esg_input,
+        defaults={
+            'business_profile': esg_input.business_profile,
+            'environmental_score': overall_assessment.get('environmental_score', 45),
+            'social_score': overall_assessment.get('social_score', 45),
+            'governance_score': overall_assessment.get('governance_score', 45),
+            'overall_esg_score': overall_assessment.get('overall_esg_score', 45),
+            'confidence_level': overall_assessment.get('confidence_level', 'medium'),
+            'data_completeness': overall_assessment.get('data_completeness', 50),
+            'scoring_engine': 'ai'
+        }
+    )
+    
+    if not created:
+        # Update existing snapshot
+        snapshot.environmental_score = overall_assessment.get('environmental_score', snapshot.environmental_score)
+        snapshot.social_score = overall_assessment.get('social_score', snapshot.social_score)
+        snapshot.governance_score = overall_assessment.get('governance_score', snapshot.governance_score)
+        snapshot.overall_esg_score = overall_assessment.get('overall_esg_score', snapshot.overall_esg_score)
+        snapshot.confidence_level = overall_assessment.get('confidence_level', snapshot.confidence_level)
+        snapshot.data_completeness = overall_assessment.get('data_completeness', snapshot.data_completeness)
+        # Scores no longer come from process; let it re-score this input
+        snapshot.input_hash = ''
+        snapshot.scoring_engine = 'ai'
+        snapshot.save()
+    
+    # Store detailed analysis data (you might want to add a JSONField to ESGSnapshot model)
+    # For now, we'll return it in the response
+    
+    # Create enhanced recommendations from AI analysis
+    recommendations_data = analysis_data.get('actionable_recommendations', [])
+    
+    save_breakdowns([(snapshot, esg_input)])
+    
+    # Clear existing recommendations and create new ones
+    snapshot.recommendations.all().delete()
+    
+    from .models import ESGRecommendation
+    for rec_data in recommendations_data[:10]:  # Limit to top 10
+        ESGRecommendation.objects.create(
+            snapshot=snapshot,
+            title=rec_data.get('title', 'ESG Improvement'),
+            description=rec_data.get('expected_impact', 'Improve ESG performance'),
+            category=rec_data.get('category', 'E'),
+            priority=rec_data.get('priority', 'medium'),
+            cost_level=rec_data.get('cost_estimate', 'medium').split(' ')[0].replace('$', '').lower() if '$' in rec_data.get('cost_estimate', '') else 'medium',
+            expected_impact=rec_data.get('expected_impact', 'Positive ESG impact'),
+            esg_impact_points=rec_data.get('esg_score_improvement', '+2-4 points'),
+            business_benefit='; '.join(rec_data.get('business_benefits', ['Improved ESG performance'])),
+            why_matters=f"Implementation time: {rec_data.get('implementation_time', 'TBD')}. Cost: {rec_data.get('cost_estimate', 'TBD')}",
+            risk_reduction='high' if rec_data.get('priority') == 'high' else 'medium'
+        )
+    
+    return snapshot
+
+
+def _chatbot_context(snapshot):
+    """Business and score context the chatbot prompt is built from"""
+    return {
+        'business_name': snapshot.business_profile.business_name,
+        'industry': snapshot.business_profile.industry,
+        'environmental_score': snapshot.environmental_score,
+        'social_score': snapshot.social_score,
+        'governance_score': snapshot.governance_score,
+        'overall_score': snapshot.overall_esg_score,
+        'data_completeness': snapshot.data_completeness,
+        'confidence_level': snapshot.confidence_level
+    }
+
+
+def _prepare_chatbot_turn(request):
+    """Validate a chatbot request, save the user message and build the AI context"""
+    snapshot_id = request.data.get('snapshot_id')
+    query = request.data.get('query')
+    session_id = request.data.get('session_id')
+    
+    if not query:
+        return None, Response({'error': 'Query is required'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    if not snapshot_id:
+        return None, Response({'error': 'snapshot_id is required'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    snapshot = get_object_or_404(
+        ESGSnapshot,
+        id=snapshot_id,
+        business_profile__user=request.user
+    )
+    
+    # Get or create chat session
+    if session_id:
+        chat_session = ChatSession.objects.filter(session_id=session_id, snapshot=snapshot).first()
+        if not chat_session:
+            session_id = str(uuid.uuid4())
+            chat_session = ChatSession.objects.create(snapshot=snapshot, session_id=session_id)
+    else:
+        session_id = str(uuid.uuid4())
+        chat_session = ChatSession.objects.create(snapshot=snapshot, session_id=session_id)
+    
+    # Save user message
+    ChatMessage.objects.create(session=chat_session, role='user', content=query)
+    
+    # Get conversation history
+    recent_messages = ChatMessage.objects.filter(session=chat_session).order_by('-created_at')[:6]
+    conversation_history = [
+        {'role': msg.role, 'content': msg.content} 
+        for msg in reversed(recent_messages) if msg.content != query
+    ]
+    
+    # Prepare context for AI
+    context = _chatbot_context(snapshot)
+    
+    turn = {
+        'query': query,
+        'session_id': session_id,
+        'chat_session': chat_session,
+        'conversation_history': conversation_history,
+        'context': context,
+    }
+    return turn, None
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def ai_chatbot_query(request):
     """Enhanced AI chatbot with comprehensive ESG context"""
     try:
-        snapshot_id = request.data.get('snapshot_id')
-        query = request.data.get('query')
-        session_id = request.data.get('session_id')
-        
-        if not query:
-            return Response({'error': 'Query is required'}, status=status.HTTP_400_BAD_REQUEST)
-        
-        if not snapshot_id:
-            return Response({'error': 'snapshot_id is required'}, status=status.HTTP_400_BAD_REQUEST)
-        
-        snapshot = get_object_or_404(
-            ESGSnapshot,
-            id=snapshot_id,
-            business_profile__user=request.user
-        )
-        
-        # Get or create chat session
-        if session_id:
-            chat_session = ChatSession.objects.filter(session_id=session_id, snapshot=snapshot).first()
-            if not chat_session:
-                session_id = str(uuid.uuid4())
-                chat_session = ChatSession.objects.create(snapshot=snapshot, session_id=session_id)
-        else:
-            session_id = str(uuid.uuid4())
-            chat_session = ChatSession.objects.create(snapshot=snapshot, session_id=session_id)
-        
-        # Save user message
-        ChatMessage.objects.create(session=chat_session, role='user', content=query)
-        
-        # Get conversation history
-        recent_messages = ChatMessage.objects.filter(session=chat_session).order_by('-created_at')[:6]
-        conversation_history = [
-            {'role': msg.role, 'content': msg.content} 
-            for msg in reversed(recent_messages) if msg.content != query
-        ]
-        
-        # Prepare context for AI
-        context = {
-            'business_name': snapshot.business_profile.business_name,
-            'industry': snapshot.business_profile.industry,
-            'environmental_score': snapshot.environmental_score,
-            'social_score': snapshot.social_score,
-            'governance_score': snapshot.governance_score,
-            'overall_score': snapshot.overall_esg_score,
-            'data_completeness': snapshot.data_completeness,
-            'confidence_level': snapshot.confidence_level
-        }
+        turn, error_response = _prepare_chatbot_turn(request)
+        if error_response:
+            return error_response
+        session_id = turn['session_id']
+        context = turn['context']
         
-        # Initialize AI service and generate response
+        # Initialize AI service; a close enough earlier answer is served from the answer cache
         ai_service = FreeAIService()
-        response_text = ai_service.generate_chatbot_response(query, context, conversation_history)
+        cached = ai_service.cached_chatbot_response(turn['query'], context, turn['conversation_history'])
+        if cached:
+            response_text, similarity = cached
+        else:
+            response_text = ai_service.generate_chatbot_response(turn['query'], context, turn['conversation_history'])
         
         # Save assistant response
-        ChatMessage.objects.create(session=chat_session, role='assistant', content=response_text)
+        ChatMessage.objects.create(session=turn['chat_session'], role='assistant', content=response_text)
         
         return Response({
             'response': response_text,
             'session_id': session_id,
-            'context_used': context
+            'context_used': context,
+            **response_fields(cached)
         })
         
     except Exception as e:
@@ -189,6 +258,45 @@ def ai_chatbot_query(request):
         })
 
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@renderer_classes([JSONRenderer, EventStreamRenderer])
+def ai_chatbot_query_stream(request):
+    """Streaming variant of ai_chatbot_query that forwards tokens as Server-Sent Events"""
+    turn, error_response = _prepare_chatbot_turn(request)
+    if error_response:
+        return error_response
+    
+    def events():
+        parts = []
+        try:
+            yield sse_event({'session_id': turn['session_id']}, event='start')
+            ai_service = FreeAIService()
+            cached = ai_service.cached_chatbot_response(turn['query'], turn['context'], turn['conversation_history'])
+            if cached:
+                parts.append(cached[0])
+                yield sse_event({'delta': cached[0]})
+            else:
+                for delta in ai_service.stream_chatbot_response(turn['query'], turn['context'], turn['conversation_history']):
+                    parts.append(delta)
+                    yield sse_event({'delta': delta})
+            yield sse_event({
+                'response': ''.join(parts).strip(),
+                'session_id': turn['session_id'],
+                **response_fields(cached)
+            }, event='done')
+        except Exception as e:
+            print(f"AI chatbot stream error: {e}")
+            yield sse_event({'error': 'AI service temporarily unavailable'}, event='error')
+        finally:
+            # Persist whatever was sent once the stream finishes or the client disconnects
+            response_text = ''.join(parts).strip()
+            if response_text:
+                ChatMessage.objects.create(session=turn['chat_session'], role='assistant', content=response_text)
+    
+    return sse_response(events(), request)
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def generate_ai_report(request):
@@ -204,31 +312,11 @@ def generate_ai_report(request):
             business_profile__user=request.user
         )
         
-        # Prepare analysis data
-        analysis_data = {
-            'scores': {
-                'environmental': snapshot.environmental_score,
-                'social': snapshot.social_score,
-                'governance': snapshot.governance_score,
-                'overall': snapshot.overall_esg_score
-            },
-            'confidence': snapshot.confidence_level,
-            'data_completeness': snapshot.data_completeness,
-            'recommendations_count': snapshot.recommendations.count()
-        }
-        
-        # Initialize AI service and generate report
-        ai_service = FreeAIService()
-        report_data = ai_service.generate_esg_report_data(snapshot.esg_input, analysis_data)
+        if wants_async(request):
+            job = enqueue_job(request.user, 'report', {'snapshot_id': snapshot.id})
+            return accepted_response(request, job)
         
-        # Generate HTML report
-        report_html = _generate_enhanced_html_report(snapshot, report_data)
-        
-        return Response({
-            'report_html': report_html,
-            'report_data': report_data,
-            'message': 'AI-powered ESG report generated successfully'
-        })
+        return Response(_build_ai_report(snapshot))
         
     except Exception as e:
         import traceback
@@ -242,29 +330,104 @@ def generate_ai_report(request):
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+def _report_analysis_data(snapshot):
+    """Scores summary the report prompt is built from"""
+    return {
+        'scores': {
+            'environmental': snapshot.environmental_score,
+            'social': snapshot.social_score,
+            'governance': snapshot.governance_score,
+            'overall': snapshot.overall_esg_score
+        },
+        'confidence': snapshot.confidence_level,
+        'data_completeness': snapshot.data_completeness,
+        'recommendations_count': snapshot.recommendations.count()
+    }
+
+
+def _build_ai_report(snapshot):
+    """Generate the AI report for a snapshot and return the response payload"""
+    # Prepare analysis data
+    analysis_data = _report_analysis_data(snapshot)
+    
+    # Initialize AI service and generate report
+    ai_service = FreeAIService()
+    report_data = ai_service.generate_esg_report_data(snapshot.esg_input, analysis_data)
+    
+    # Generate HTML report
+    report_html = _generate_enhanced_html_report(snapshot, report_data)
+    
+    return {
+        'report_html': report_html,
+        'report_data': report_data,
+        'message': 'AI-powered ESG report generated successfully'
+    }
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def job_status(request, job_id):
+    """Status, progress and (once finished) result of a background AI job"""
+    job = get_object_or_404(AIJob, id=job_id, user=request.user)
+    return Response(AIJobSerializer(job).data)
+
+
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def ai_service_status(request):
-    """Check AI service availability and configuration"""
+    """Whether AI answers are available; provider details are staff-only in /api/ai/metrics/"""
+    return Response({'service_operational': _provider_status()['service_operational']})
+
+
+def _provider_status() -> dict:
+    """Configured providers and the active one's cached health (includes raw upstream errors)"""
     ai_service = FreeAIService()
     client, model = ai_service.get_available_client()
+    provider = ai_service.get_available_provider()
     
-    # Test connection
-    connection_ok, test_result = ai_service.test_connection() if client else (False, "No client available")
+    # Cached health from real call outcomes; no live completion per hit
+    if provider:
+        health = provider_health.status(provider)
+        connection_ok = provider_health.is_healthy(provider)
+        provider_health.maybe_probe(provider)
+        test_result = 'Healthy' if connection_ok else (health['last_error'] or 'Unhealthy')
+    else:
+        health = {}
+        connection_ok, test_result = False, "No client available"
     
-    status_info = {
+    return {
         'groq_available': bool(ai_service.groq_client),
         'openrouter_available': bool(ai_service.openrouter_client),
         'huggingface_available': bool(ai_service.hf_api_key),
-        'active_client': 'groq' if ai_service.groq_client else 'openrouter' if ai_service.openrouter_client else 'none',
+        'active_client': provider or 'none',
         'active_model': model,
         'service_operational': connection_ok,
         'connection_test': test_result,
+        'provider_health': health,
         'api_key_configured': bool(settings.GROQ_API_KEY),
         'base_url': settings.AI_BASE_URL
     }
-    
-    return Response(status_info)
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def ai_metrics(request):
+    """
+    LLM telemetry for staff: calls, latency, tokens, cache hits and fallbacks
+    per prompt type and provider over the rolling window. ``?output=prometheus``
+    returns lifetime counters in the Prometheus text format instead.
+    """
+    if request.query_params.get('output') == 'prometheus':
+        return HttpResponse(llm_metrics.prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+    metrics = llm_metrics.snapshot()
+    # Internal state of the LLM layer, kept off the public /api/ai/status/
+    metrics['provider_health'] = _provider_status()
+    metrics['router'] = llm_router.status()
+    metrics['structured_output'] = {'mode': settings.AI_STRUCTURED_OUTPUT, 'parse_stats': llm_metrics.parse_stats()}
+    metrics['completion_tokens'] = token_budget.stats()
+    metrics['rate_limits'] = rate_limiter.status()
+    metrics['answer_cache'] = answer_cache.status()
+    return Response(metrics)
 
 
 def _generate_enhanced_html_report(snapshot, report_data):
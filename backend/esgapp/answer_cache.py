@@ -0,0 +1,237 @@
+"""
+Semantic answer cache for the chatbot endpoints
+
+Many chat questions are near-identical ("how do I start recycling?") and come
+from businesses in the same industry with similar scores. Answers are cached
+per partition, (prompt type, industry, score band of each pillar), and a new
+question is matched against the questions already answered in its partition
+by TF-IDF cosine similarity over word unigrams and bigrams. Everything is local
+and per worker process; no embedding service is called.
+
+Prompts that also carry one business's own data (chat_query includes its
+employee count, recommendations and roadmap) put 'business_profile_id' in
+the context, which scopes their partition to that business: such answers
+are never served to another business.
+
+Only standalone questions are cached: follow-ups that depend on the
+conversation so far are not looked up or stored. The business name in an
+answer is stored as a placeholder and filled in for the asking business, and
+answers that quote the business's own scores are not stored.
+"""
+import math
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from django.conf import settings
+
+from . import llm_metrics
+
+BUSINESS_PLACEHOLDER = '<<business_name>>'
+PILLARS = ('environmental_score', 'social_score', 'governance_score')
+STOPWORDS = frozenset("""
+a about an and are as at be can could do does for from how i in is it me my of on or our
+please should so that the this to us we what which with would you your
+""".split())
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> list:
+    """Lowercase content words, plural 's' dropped, stopwords removed"""
+    tokens = []
+    for word in _WORD.findall((text or '').lower()):
+        if word in STOPWORDS:
+            continue
+        if len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+            word = word[:-1]
+        tokens.append(word)
+    return tokens
+
+
+def query_signature(tokens: list) -> str:
+    """Order-insensitive signature: exact repeats match without scoring"""
+    return ' '.join(sorted(set(tokens)))
+
+
+def _features(tokens: list) -> Counter:
+    features = Counter(tokens)
+    features.update(f"{first} {second}" for first, second in zip(tokens, tokens[1:]))
+    return features
+
+
+def score_band(score):
+    if score is None:
+        return None
+    return int(float(score) // settings.AI_ANSWER_CACHE_BAND_WIDTH)
+
+
+def partition_for(prompt_type: str, context: dict) -> tuple:
+    """(prompt type, business or None, industry, band per pillar) from a chatbot context dict"""
+    bands = tuple(score_band(context.get(pillar)) for pillar in PILLARS)
+    return (prompt_type, context.get('business_profile_id'), (context.get('industry') or '').lower(), bands)
+
+
+def _quotes_scores(answer: str, context: dict) -> bool:
+    """True when the answer mentions one of the business's own scores, whole or to one decimal"""
+    for pillar in PILLARS + ('overall_score',):
+        score = context.get(pillar)
+        if score is None or float(score) < 10:
+            continue
+        score = float(score)
+        for text in {f"{score:.0f}", str(int(score)), f"{score:.1f}"}:
+            if re.search(rf"(?<![\d.]){re.escape(text)}(?!\d)", answer):
+                return True
+    return False
+
+
+def response_fields(cached) -> dict:
+    """Fields telling the client whether an answer came from the answer cache"""
+    if cached:
+        return {'cached': True, 'cache_similarity': cached[1]}
+    return {'cached': False}
+
+
+class _Entry:
+    def __init__(self, tokens: list, answer: str, expires: float):
+        self.features = _features(tokens)
+        self.answer = answer
+        self.expires = expires
+
+
+class AnswerCache:
+    """Per-process LRU of chatbot answers with TF-IDF lookup inside each partition"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # (partition, signature) -> _Entry
+        self._partitions = {}  # partition -> set of signatures
+        self._document_frequency = Counter()
+        self._stats = Counter()
+
+    @staticmethod
+    def enabled() -> bool:
+        return settings.AI_ANSWER_CACHE_ENABLED
+
+    def lookup(self, prompt_type: str, query: str, context: dict):
+        """(answer, similarity) of the closest cached question in the partition, or None"""
+        if not self.enabled():
+            return None
+        tokens = tokenize(query)
+        if not tokens:
+            return None
+        partition = partition_for(prompt_type, context)
+        now = time.time()
+        with self._lock:
+            best, best_similarity = self._best_match(partition, tokens, now)
+            if best is None or best_similarity < settings.AI_ANSWER_CACHE_MIN_SIMILARITY:
+                self._stats[(prompt_type, 'misses')] += 1
+                return None
+            self._entries.move_to_end(best)
+            self._stats[(prompt_type, 'hits')] += 1
+            answer = self._entries[best].answer
+        llm_metrics.record_call(prompt_type, 'answer_cache', 'tfidf', 'cache_hit')
+        answer = answer.replace(BUSINESS_PLACEHOLDER, context.get('business_name') or 'your business')
+        return answer, round(best_similarity, 3)
+
+    def _best_match(self, partition: tuple, tokens: list, now: float):
+        signature = query_signature(tokens)
+        exact = (partition, signature)
+        if exact in self._entries and self._entries[exact].expires >= now:
+            return exact, 1.0
+
+        query_vector = self._vector(_features(tokens))
+        best, best_similarity = None, 0.0
+        for candidate_signature in list(self._partitions.get(partition, ())):
+            key = (partition, candidate_signature)
+            entry = self._entries[key]
+            if entry.expires < now:
+                self._remove(key)
+                continue
+            similarity = self._cosine(query_vector, self._vector(entry.features))
+            if similarity > best_similarity:
+                best, best_similarity = key, similarity
+        return best, best_similarity
+
+    def _vector(self, features: Counter) -> dict:
+        documents = len(self._entries)
+        return {
+            feature: count * (math.log((1 + documents) / (1 + self._document_frequency[feature])) + 1)
+            for feature, count in features.items()
+        }
+
+    @staticmethod
+    def _cosine(first: dict, second: dict) -> float:
+        dot = sum(weight * second.get(feature, 0) for feature, weight in first.items())
+        if not dot:
+            return 0.0
+        norm = math.sqrt(sum(w * w for w in first.values())) * math.sqrt(sum(w * w for w in second.values()))
+        return dot / norm
+
+    def store(self, prompt_type: str, query: str, context: dict, answer: str):
+        """Cache an AI answer to a standalone question"""
+        if not self.enabled() or not answer:
+            return
+        tokens = tokenize(query)
+        if not tokens:
+            return
+        if _quotes_scores(answer, context):
+            self._count(prompt_type, 'skipped')
+            return
+        business_name = context.get('business_name')
+        if business_name:
+            answer = answer.replace(business_name, BUSINESS_PLACEHOLDER)
+
+        partition = partition_for(prompt_type, context)
+        key = (partition, query_signature(tokens))
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            entry = _Entry(tokens, answer, time.time() + settings.AI_ANSWER_CACHE_TTL)
+            self._entries[key] = entry
+            self._partitions.setdefault(partition, set()).add(key[1])
+            self._document_frequency.update(entry.features.keys())
+            while len(self._entries) > settings.AI_ANSWER_CACHE_MAX_ENTRIES:
+                self._remove(next(iter(self._entries)))
+            self._stats[(prompt_type, 'stored')] += 1
+
+    def _remove(self, key):
+        """Drop an entry and its document frequencies (caller holds the lock)"""
+        entry = self._entries.pop(key)
+        partition, signature = key
+        signatures = self._partitions.get(partition)
+        if signatures is not None:
+            signatures.discard(signature)
+            if not signatures:
+                del self._partitions[partition]
+        for feature in entry.features:
+            self._document_frequency[feature] -= 1
+            if self._document_frequency[feature] <= 0:
+                del self._document_frequency[feature]
+
+    def _count(self, prompt_type: str, outcome: str):
+        with self._lock:
+            self._stats[(prompt_type, outcome)] += 1
+
+    def status(self) -> dict:
+        with self._lock:
+            per_type = {}
+            for (prompt_type, outcome), count in self._stats.items():
+                per_type.setdefault(prompt_type, {'hits': 0, 'misses': 0, 'stored': 0, 'skipped': 0})[outcome] = count
+            return {
+                'enabled': self.enabled(),
+                'entries': len(self._entries),
+                'partitions': len(self._partitions),
+                'prompt_types': per_type,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._partitions.clear()
+            self._document_frequency.clear()
+            self._stats.clear()
+
+
+# Shared answer cache for this worker process
+answer_cache = AnswerCache()
@@ -0,0 +1,117 @@
+"""
+Full assessment pipeline: everything the dashboard needs for an input in one call
+
+Every downstream prompt embeds the new scores, so scoring runs first. The
+recommendations, top opportunities and roadmap calls are independent of each
+other and run concurrently on a bounded thread pool; their results are then
+persisted together in one transaction.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from .ai_recommendation_service import AIRecommendationService
+from .ai_scoring_service import AIScoringService
+from .models import ESGSnapshot, ESGRecommendation
+from .serializers import ESGSnapshotSerializer, ESGRoadmapSerializer
+
+logger = logging.getLogger(__name__)
+
+ROADMAP_MAX_PHASE = {'30': 1, '60': 2, '90': 3}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """Pool shared by all requests in this worker, bounding concurrent LLM calls"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.AI_PIPELINE_MAX_WORKERS, thread_name_prefix='assessment'
+            )
+        return _executor
+
+
+def _in_pool(fn, *args):
+    """Run fn on a pool thread, releasing any DB connection it opened"""
+    try:
+        return fn(*args)
+    finally:
+        connection.close()
+
+
+def _score(esg_input):
+    """AI scores for the input, falling back to rule-based scoring"""
+    ai_scoring_service = AIScoringService()
+    try:
+        return ai_scoring_service.calculate_esg_scores(esg_input)
+    except Exception as ai_error:
+        logger.error(f"AI scoring failed: {ai_error}")
+        return ai_scoring_service._fallback_scoring(esg_input)
+
+
+def _preview_snapshot(esg_input, scores_data):
+    """Unsaved snapshot carrying the new scores, used to build the downstream prompts"""
+    if not scores_data or not isinstance(scores_data, dict):
+        raise ValueError("Invalid scores data from AI service")
+    return ESGSnapshot(
+        business_profile=esg_input.business_profile,
+        esg_input=esg_input,
+        environmental_score=float(scores_data.get('environmental_score', 0)),
+        social_score=float(scores_data.get('social_score', 0)),
+        governance_score=float(scores_data.get('governance_score', 0)),
+        overall_esg_score=float(scores_data.get('overall_esg_score', 0)),
+        confidence_level=str(scores_data.get('confidence_level') or 'low'),
+        data_completeness=float(scores_data.get('data_completeness', 0)),
+    )
+
+
+def run_full_assessment(esg_input, timeframe='90'):
+    """Score, recommend, rank opportunities and plan a roadmap; return the combined payload"""
+    from .views import (
+        _save_scored_snapshot, _save_timeframe_roadmap, _top_opportunities, _dashboard_insights, _scoring_hash
+    )
+
+    max_phase = ROADMAP_MAX_PHASE[timeframe]
+    digest = _scoring_hash(esg_input)
+    scores_data = _score(esg_input)
+    preview = _preview_snapshot(esg_input, scores_data)
+
+    executor = _get_executor()
+    recommendations_future = executor.submit(_in_pool, AIRecommendationService().generate_recommendations, preview)
+    opportunities_future = executor.submit(_in_pool, _top_opportunities, preview)
+    roadmap_future = executor.submit(_in_pool, AIScoringService().generate_timeframe_roadmap, preview, int(timeframe))
+
+    # Each task falls back to rule-based output on AI errors, so these only raise on bugs
+    ai_recommendations = recommendations_future.result()
+    top_opportunities = opportunities_future.result()
+    roadmap_data = roadmap_future.result()
+
+    with transaction.atomic():
+        snapshot = _save_scored_snapshot(esg_input, scores_data, digest)
+
+        # Basic recommendations are already saved; add the AI ones they do not cover
+        existing_titles = set(snapshot.recommendations.values_list('title', flat=True))
+        new_recommendations = []
+        for recommendation in ai_recommendations:
+            if recommendation.title not in existing_titles:
+                recommendation.snapshot = snapshot
+                existing_titles.add(recommendation.title)
+                new_recommendations.append(recommendation)
+        ESGRecommendation.objects.bulk_create(new_recommendations)
+
+        snapshot.roadmaps.filter(phase__lte=max_phase).delete()
+        roadmap_items = _save_timeframe_roadmap(snapshot, roadmap_data, max_phase)
+
+    return {
+        'snapshot': ESGSnapshotSerializer(snapshot).data,
+        'top_opportunities': top_opportunities,
+        'roadmap': ESGRoadmapSerializer(roadmap_items, many=True).data,
+        'dashboard_insights': _dashboard_insights(snapshot),
+        'message': 'Full ESG assessment completed successfully'
+    }
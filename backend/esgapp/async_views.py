@@ -0,0 +1,339 @@
+"""
+Async variants of the LLM-bound endpoints for ASGI deployments
+
+Each view awaits AsyncOpenAI completions, so one worker can hold many LLM
+requests in flight. ORM work runs through sync_to_async and reuses the
+helpers of the sync views, keeping prompts, parsing and persistence identical.
+"""
+import functools
+import logging
+import traceback
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import Http404, JsonResponse
+from rest_framework import exceptions, status
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+
+from .ai_scoring_service import AIScoringService
+from .ai_views import _prepare_chatbot_turn, _save_comprehensive_analysis
+from .answer_cache import answer_cache, response_fields
+from .free_ai_service import FreeAIService
+from .llm_clients import get_async_client
+from .llm_gateway import achat_completion
+from .models import ESGInput, ESGSnapshot, ChatMessage
+from .serializers import ESGSnapshotSerializer, ESGRoadmapSerializer
+from .single_flight import flight_key, input_hash, single_flight
+from .views import (
+    _save_scored_snapshot, _save_timeframe_roadmap,
+    _wants_force, _scoring_hash, _unchanged_snapshot, _unchanged_response,
+    _requested_engine, _unknown_engine_error, _process_esg_input,
+    _top_opportunities_request, _parse_top_opportunities, _fallback_top_opportunities,
+    _simulate_impact_request, _parse_impact_simulation, _fallback_impact_simulation,
+    _prepare_chat_query, _handle_chat_action, _fallback_chat_response, _chat_ai_configured,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _json(data, status_code=status.HTTP_200_OK):
+    """JSON response using DRF's encoder (dates, decimals, UUIDs)"""
+    return JsonResponse(data, status=status_code, encoder=JSONEncoder, safe=False)
+
+
+def _from_drf(response):
+    """Convert an error Response returned by a shared sync helper"""
+    return _json(response.data, response.status_code)
+
+
+def _authenticate(request):
+    """Wrap the request like DRF does and require an authenticated user"""
+    drf_request = Request(
+        request,
+        parsers=[parser() for parser in api_settings.DEFAULT_PARSER_CLASSES],
+        authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES],
+    )
+    if not drf_request.user or not drf_request.user.is_authenticated:
+        raise exceptions.NotAuthenticated()
+    # Parse the body here, off the event loop
+    drf_request.data
+    return drf_request
+
+
+def async_api_view(methods):
+    """
+    Async counterpart of @api_view + IsAuthenticated for plain Django async views.
+    The wrapped view receives a DRF Request and returns a JsonResponse.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in methods:
+                return _json({'detail': f'Method "{request.method}" not allowed.'}, status.HTTP_405_METHOD_NOT_ALLOWED)
+            try:
+                drf_request = await sync_to_async(_authenticate)(request)
+                return await view(drf_request, *args, **kwargs)
+            except (exceptions.NotAuthenticated, exceptions.AuthenticationFailed) as e:
+                response = _json({'detail': e.detail}, status.HTTP_401_UNAUTHORIZED)
+                response['WWW-Authenticate'] = 'Token'
+                return response
+            except exceptions.APIException as e:
+                return _json({'detail': e.detail}, e.status_code)
+            except Http404:
+                return _json({'detail': 'Not found.'}, status.HTTP_404_NOT_FOUND)
+
+        # Same as @csrf_exempt, which in Django 4.2 would hide the coroutine; SessionAuthentication enforces CSRF
+        wrapper.csrf_exempt = True
+        return wrapper
+    return decorator
+
+
+async def _get_owned(queryset, user, **lookup):
+    """Async get_object_or_404 scoped to the requesting user"""
+    try:
+        return await queryset.aget(business_profile__user=user, **lookup)
+    except queryset.model.DoesNotExist:
+        raise Http404
+
+
+@sync_to_async
+def _serialize_snapshot(snapshot):
+    return ESGSnapshotSerializer(snapshot).data
+
+
+@sync_to_async
+def _serialize_roadmap(items):
+    return ESGRoadmapSerializer(items, many=True).data
+
+
+def _error_payload(e, detail):
+    error_detail = traceback.format_exc()
+    logger.error(f"{detail}: {e}")
+    logger.error(error_detail)
+    return {
+        'error': str(e),
+        'detail': detail,
+        'traceback': error_detail if settings.DEBUG else None
+    }
+
+
+@async_api_view(['POST'])
+async def process_esg_input(request, pk):
+    """Async variant of ESGInputViewSet.process"""
+    engine = _requested_engine(request)
+    if engine is None:
+        return _json(_unknown_engine_error(), status.HTTP_400_BAD_REQUEST)
+    esg_input = await _get_owned(ESGInput.objects.select_related('business_profile'), request.user, pk=pk)
+    if engine != 'ai':
+        # Rule-based engines make no AI call; score the same way as the sync endpoint
+        try:
+            return _json(await sync_to_async(_process_esg_input)(esg_input, engine=engine), status.HTTP_201_CREATED)
+        except Exception as e:
+            return _json(_error_payload(e, 'Failed to process ESG input'), status.HTTP_500_INTERNAL_SERVER_ERROR)
+    digest = _scoring_hash(esg_input)
+    if not _wants_force(request):
+        snapshot = await sync_to_async(_unchanged_snapshot)(esg_input, digest)
+        if snapshot:
+            return _json(await sync_to_async(_unchanged_response)(snapshot))
+
+    async def score_and_save():
+        ai_scoring_service = AIScoringService()
+        try:
+            scores_data = await ai_scoring_service.agenerate_esg_scores(esg_input)
+        except Exception as ai_error:
+            logger.error(f"AI scoring failed: {ai_error}")
+            scores_data = ai_scoring_service._fallback_scoring(esg_input)
+
+        snapshot = await sync_to_async(_save_scored_snapshot)(esg_input, scores_data, digest)
+        return await _serialize_snapshot(snapshot)
+
+    try:
+        # Shares in-flight work with the sync endpoint for the same unchanged input
+        key = flight_key('process', esg_input.pk, digest)
+        return _json({
+            'snapshot': await single_flight.ado(key, score_and_save),
+            'message': 'ESG assessment completed successfully'
+        }, status.HTTP_201_CREATED)
+    except Exception as e:
+        return _json(_error_payload(e, 'Failed to process ESG input'), status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@async_api_view(['POST'])
+async def ai_comprehensive_analysis(request):
+    """Async variant of ai_views.ai_comprehensive_analysis"""
+    esg_input_id = request.data.get('esg_input_id')
+    if not esg_input_id:
+        return _json({'error': 'esg_input_id is required'}, status.HTTP_400_BAD_REQUEST)
+
+    esg_input = await _get_owned(ESGInput.objects.select_related('business_profile'), request.user, id=esg_input_id)
+
+    async def analyze_and_save():
+        analysis_data = await FreeAIService().agenerate_comprehensive_esg_analysis(esg_input)
+        snapshot = await sync_to_async(_save_comprehensive_analysis)(esg_input, analysis_data)
+        return {
+            'snapshot': await _serialize_snapshot(snapshot),
+            'comprehensive_analysis': analysis_data,
+        }
+
+    try:
+        key = flight_key('comprehensive_analysis', esg_input.pk, input_hash(esg_input))
+        result = await single_flight.ado(key, analyze_and_save)
+        return _json({
+            'snapshot': result['snapshot'],
+            'comprehensive_analysis': result['comprehensive_analysis'],
+            'message': 'AI-powered comprehensive ESG analysis completed successfully'
+        })
+    except Exception as e:
+        return _json(_error_payload(e, 'Failed to generate AI analysis'), status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@async_api_view(['POST'])
+async def generate_roadmap(request):
+    """Async variant of views.generate_roadmap"""
+    snapshot_id = request.data.get('snapshot_id')
+    timeframe = request.data.get('timeframe', '90')
+
+    if not snapshot_id:
+        return _json({'error': 'snapshot_id is required'}, status.HTTP_400_BAD_REQUEST)
+
+    if timeframe not in ['30', '60', '90']:
+        return _json({'error': 'timeframe must be 30, 60, or 90'}, status.HTTP_400_BAD_REQUEST)
+
+    snapshot = await _get_owned(
+        ESGSnapshot.objects.select_related('business_profile', 'esg_input'), request.user, id=snapshot_id
+    )
+    try:
+        # Clear existing roadmaps for this timeframe to generate fresh ones
+        max_phase = {'30': 1, '60': 2, '90': 3}[timeframe]
+        await snapshot.roadmaps.filter(phase__lte=max_phase).adelete()
+
+        roadmap_data = await AIScoringService().agenerate_timeframe_roadmap(snapshot, int(timeframe))
+        created_items = await sync_to_async(_save_timeframe_roadmap)(snapshot, roadmap_data, max_phase)
+
+        return _json({
+            'message': f'{timeframe}-day roadmap generated successfully',
+            'roadmap': await _serialize_roadmap(created_items)
+        }, status.HTTP_201_CREATED)
+    except Exception as e:
+        return _json(_error_payload(e, 'Failed to generate roadmap'), status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@async_api_view(['GET'])
+async def top_opportunities(request, pk):
+    """Async variant of ESGSnapshotViewSet.top_opportunities"""
+    snapshot = await _get_owned(ESGSnapshot.objects.select_related('business_profile'), request.user, pk=pk)
+
+    client = get_async_client('groq') if _chat_ai_configured() else None
+    if client:
+        try:
+            response = await achat_completion(client, **_top_opportunities_request(snapshot))
+            opportunities = _parse_top_opportunities(response.choices[0].message.content)
+            if opportunities is not None:
+                return _json(opportunities)
+        except Exception as e:
+            logger.warning(f"AI opportunities error: {e}")
+
+    return _json(_fallback_top_opportunities(snapshot))
+
+
+@async_api_view(['POST'])
+async def simulate_impact(request, pk):
+    """Async variant of ESGSnapshotViewSet.simulate_impact"""
+    snapshot = await _get_owned(ESGSnapshot.objects.select_related('business_profile'), request.user, pk=pk)
+    recommendation_data = request.data.get('recommendation', {})
+
+    client = get_async_client('groq') if _chat_ai_configured() else None
+    if client:
+        try:
+            response = await achat_completion(client, **_simulate_impact_request(snapshot, recommendation_data))
+            impact_data = _parse_impact_simulation(response.choices[0].message.content)
+            if impact_data is not None:
+                return _json(impact_data)
+        except Exception as e:
+            logger.warning(f"AI impact simulation error: {e}")
+
+    return _json(_fallback_impact_simulation(recommendation_data))
+
+
+@async_api_view(['POST'])
+async def chat_query(request):
+    """Async variant of views.chat_query"""
+    turn, error_response = await sync_to_async(_prepare_chat_query)(request)
+    if error_response:
+        return _from_drf(error_response)
+    snapshot = turn['snapshot']
+    query = turn['query']
+    session_id = turn['session_id']
+
+    cached = None if turn['action_command'] else answer_cache.lookup('chat_query', query, turn['context'])
+    try:
+        if cached:
+            response_text = cached[0]
+        elif not _chat_ai_configured():
+            response_text = f"DeepSeek API key not configured properly. Please check your .env file. Key length: {len(settings.GROQ_API_KEY) if settings.GROQ_API_KEY else 0}"
+        elif turn['action_command']:
+            response_text = await sync_to_async(_handle_chat_action)(
+                turn['action_command'], snapshot, query, turn['recent_messages'], turn['roadmap_actions']
+            )
+        else:
+            try:
+                response = await achat_completion(
+                    get_async_client('groq'),
+                    prompt_type='chat_query',
+                    provider='groq',
+                    model=settings.AI_MODEL,
+                    messages=turn['messages'],
+                    temperature=0.7,
+                    max_tokens=1500,
+                    timeout=60.0
+                )
+                response_text = response.choices[0].message.content
+                response_text = response_text.replace('**', '').replace('*', '')
+                answer_cache.store('chat_query', query, turn['context'], response_text)
+            except Exception as ai_error:
+                logger.warning(f"Chat AI error: {ai_error}")
+                response_text = await sync_to_async(_fallback_chat_response)(snapshot, query)
+
+        await ChatMessage.objects.acreate(session=turn['chat_session'], role='assistant', content=response_text)
+        return _json({'response': response_text, 'session_id': session_id, **response_fields(cached)})
+    except Exception as e:
+        payload = _error_payload(e, 'Error generating response')
+        payload.update({
+            'response': 'I apologize, but I encountered an error. Please try again or contact support.',
+            'session_id': session_id
+        })
+        return _json(payload, status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@async_api_view(['POST'])
+async def ai_chatbot_query(request):
+    """Async variant of ai_views.ai_chatbot_query"""
+    turn, error_response = await sync_to_async(_prepare_chatbot_turn)(request)
+    if error_response:
+        return _from_drf(error_response)
+    session_id = turn['session_id']
+    context = turn['context']
+
+    try:
+        ai_service = FreeAIService()
+        cached = ai_service.cached_chatbot_response(turn['query'], context, turn['conversation_history'])
+        if cached:
+            response_text = cached[0]
+        else:
+            response_text = await ai_service.agenerate_chatbot_response(turn['query'], context, turn['conversation_history'])
+        await ChatMessage.objects.acreate(session=turn['chat_session'], role='assistant', content=response_text)
+        return _json({
+            'response': response_text,
+            'session_id': session_id,
+            'context_used': context,
+            **response_fields(cached)
+        })
+    except Exception as e:
+        logger.error(f"AI chatbot error: {e}")
+        return _json({
+            'response': "I'm here to help with your ESG improvements. Could you please rephrase your question or ask about specific areas like energy efficiency, employee safety, or governance policies?",
+            'session_id': session_id,
+            'error': 'AI service temporarily unavailable, using fallback response',
+        })
@@ -1,16 +1,45 @@
 """
 ESG Processing Engine - Converts SME-friendly inputs into ESG scores
 """
+import numpy as np
+
 from .models import ESGInput, ESGSnapshot, ESGScore, ESGRecommendation
 
+# Fields the rule-based scores read, loaded as columns by the batch API
+NUMERIC_FIELDS = (
+    'electricity_kwh', 'electricity_bill_amount', 'generator_usage_liters', 'generator_usage_hours',
+    'solar_capacity_kw', 'water_usage_liters', 'business_profile__office_area_sqm',
+)
+CHOICE_FIELDS = ('water_source', 'waste_recycling_frequency', 'safety_training_frequency')
+FLAG_FIELDS = (
+    'has_solar', 'waste_recycling', 'waste_segregation', 'safety_training_provided',
+    'health_insurance', 'diversity_policy',
+)
+# Benchmark bounds of the batch rules; scoring profiles may replace them per industry
+DEFAULT_THRESHOLDS = {
+    'kwh_per_employee': (200, 300, 500),
+    'generator_liters_per_employee': (10, 30),
+    'water_liters_per_employee': (5000, 10000),
+    'solar_kw': (5, 10),
+}
+DEFAULT_WEIGHTS = (0.4, 0.3, 0.3)
+GOVERNANCE_POLICIES = (
+    ('code_of_conduct', 20),
+    ('anti_corruption_policy', 20),
+    ('data_privacy_policy', 15),
+    ('whistleblower_policy', 15),
+    ('board_oversight', 15),
+    ('risk_management_policy', 15),
+)
+
 
 class ESGProcessor:
     """Processes ESG inputs and generates scores with confidence levels"""
     
     @staticmethod
-    def calculate_environmental_score(esg_input: ESGInput) -> tuple[float, float]:
+    def calculate_environmental_score(esg_input: ESGInput, thresholds: dict = DEFAULT_THRESHOLDS) -> tuple[float, float]:
         """
-        Calculate environmental score (0-100) and data completeness
+        Calculate environmental score (0-100) and data completeness against the benchmark bounds
         Returns: (score, completeness_percentage)
         """
         scores = []
@@ -18,13 +47,13 @@ class ESGProcessor:
         max_scores = []
         
         # Energy efficiency (40 points)
-        energy_score = ESGProcessor._calculate_energy_score(esg_input)
+        energy_score = ESGProcessor._calculate_energy_score(esg_input, thresholds)
         scores.append(energy_score['score'])
         max_scores.append(energy_score['max_score'])
         completeness.append(energy_score['completeness'])
         
         # Water management (20 points)
-        water_score = ESGProcessor._calculate_water_score(esg_input)
+        water_score = ESGProcessor._calculate_water_score(esg_input, thresholds)
         scores.append(water_score['score'])
         max_scores.append(water_score['max_score'])
         completeness.append(water_score['completeness'])
@@ -36,7 +65,7 @@ class ESGProcessor:
         completeness.append(waste_score['completeness'])
         
         # Renewable energy (10 points)
-        renewable_score = ESGProcessor._calculate_renewable_score(esg_input)
+        renewable_score = ESGProcessor._calculate_renewable_score(esg_input, thresholds)
         scores.append(renewable_score['score'])
         max_scores.append(renewable_score['max_score'])
         completeness.append(renewable_score['completeness'])
@@ -50,8 +79,10 @@ class ESGProcessor:
         return final_score, avg_completeness
     
     @staticmethod
-    def _calculate_energy_score(esg_input: ESGInput) -> dict:
+    def _calculate_energy_score(esg_input: ESGInput, thresholds: dict = DEFAULT_THRESHOLDS) -> dict:
         """Calculate energy efficiency score"""
+        kwh_bounds = thresholds['kwh_per_employee']
+        liter_bounds = thresholds['generator_liters_per_employee']
         score = 0
         max_score = 40
         completeness = 0
@@ -69,12 +100,12 @@ class ESGProcessor:
             # Normalize per employee
             kwh_per_employee = kwh / esg_input.total_employees if esg_input.total_employees > 0 else kwh
             
-            # Benchmark: < 200 kWh/employee/month = excellent, > 500 = poor
-            if kwh_per_employee < 200:
+            # Benchmark (default): < 200 kWh/employee/month = excellent, > 500 = poor
+            if kwh_per_employee < kwh_bounds[0]:
                 score += 30
-            elif kwh_per_employee < 300:
+            elif kwh_per_employee < kwh_bounds[1]:
                 score += 20
-            elif kwh_per_employee < 500:
+            elif kwh_per_employee < kwh_bounds[2]:
                 score += 10
             else:
                 score += 5
@@ -85,9 +116,9 @@ class ESGProcessor:
             # High generator usage reduces score
             if esg_input.generator_usage_liters:
                 liters_per_employee = esg_input.generator_usage_liters / esg_input.total_employees
-                if liters_per_employee < 10:
+                if liters_per_employee < liter_bounds[0]:
                     score += 5
-                elif liters_per_employee < 30:
+                elif liters_per_employee < liter_bounds[1]:
                     score += 3
                 else:
                     score += 1
@@ -101,8 +132,9 @@ class ESGProcessor:
         return {'score': score, 'max_score': max_score, 'completeness': completeness}
     
     @staticmethod
-    def _calculate_water_score(esg_input: ESGInput) -> dict:
+    def _calculate_water_score(esg_input: ESGInput, thresholds: dict = DEFAULT_THRESHOLDS) -> dict:
         """Calculate water management score"""
+        water_bounds = thresholds['water_liters_per_employee']
         score = 0
         max_score = 20
         completeness = 0
@@ -124,10 +156,10 @@ class ESGProcessor:
             completeness += 50
             # Normalize per employee
             liters_per_employee = esg_input.water_usage_liters / esg_input.total_employees
-            # Benchmark: < 5000L/employee/month = good
-            if liters_per_employee < 5000:
+            # Benchmark (default): < 5000L/employee/month = good
+            if liters_per_employee < water_bounds[0]:
                 score += 12
-            elif liters_per_employee < 10000:
+            elif liters_per_employee < water_bounds[1]:
                 score += 8
             else:
                 score += 4
@@ -170,8 +202,9 @@ class ESGProcessor:
         return {'score': score, 'max_score': max_score, 'completeness': completeness}
     
     @staticmethod
-    def _calculate_renewable_score(esg_input: ESGInput) -> dict:
+    def _calculate_renewable_score(esg_input: ESGInput, thresholds: dict = DEFAULT_THRESHOLDS) -> dict:
         """Calculate renewable energy score"""
+        solar_bounds = thresholds['solar_kw']
         score = 0
         max_score = 10
         completeness = 0
@@ -181,9 +214,9 @@ class ESGProcessor:
             score += 5
             if esg_input.solar_capacity_kw:
                 # More capacity = better score
-                if esg_input.solar_capacity_kw >= 10:
+                if esg_input.solar_capacity_kw >= solar_bounds[1]:
                     score += 5
-                elif esg_input.solar_capacity_kw >= 5:
+                elif esg_input.solar_capacity_kw >= solar_bounds[0]:
                     score += 3
                 else:
                     score += 2
@@ -197,11 +230,27 @@ class ESGProcessor:
     @staticmethod
     def calculate_social_score(esg_input: ESGInput) -> tuple[float, float]:
         """Calculate social score (0-100)"""
+        parts = [calculate(esg_input) for calculate in (
+            ESGProcessor._calculate_safety_score,
+            ESGProcessor._calculate_benefits_score,
+            ESGProcessor._calculate_health_insurance_score,
+            ESGProcessor._calculate_diversity_score,
+            ESGProcessor._calculate_workforce_score,
+        )]
+        score = sum(part['score'] for part in parts)
+        max_score = sum(part['max_score'] for part in parts)
+        completeness = sum(part['completeness'] for part in parts)
+        
+        final_score = (score / max_score * 100) if max_score > 0 else 0
+        avg_completeness = completeness / 4 if completeness > 0 else 0
+        
+        return final_score, avg_completeness
+    
+    @staticmethod
+    def _calculate_safety_score(esg_input: ESGInput) -> dict:
+        """Safety training (30 points)"""
         score = 0
-        max_score = 100
         completeness = 0
-        
-        # Safety training (30 points)
         if esg_input.safety_training_provided:
             completeness += 50
             score += 20
@@ -220,59 +269,60 @@ class ESGProcessor:
         else:
             completeness += 20
         
-        # Employee benefits (25 points)
+        return {'score': score, 'max_score': 30, 'completeness': completeness}
+    
+    @staticmethod
+    def _calculate_benefits_score(esg_input: ESGInput) -> dict:
+        """Employee benefits (25 points)"""
         if esg_input.employee_benefits:
-            completeness += 50
             benefit_count = len(esg_input.employee_benefits) if isinstance(esg_input.employee_benefits, list) else 0
-            score += min(benefit_count * 5, 25)
-        else:
-            completeness += 20
-        
-        # Health insurance (20 points)
+            return {'score': min(benefit_count * 5, 25), 'max_score': 25, 'completeness': 50}
+        return {'score': 0, 'max_score': 25, 'completeness': 20}
+    
+    @staticmethod
+    def _calculate_health_insurance_score(esg_input: ESGInput) -> dict:
+        """Health insurance (20 points)"""
         if esg_input.health_insurance:
-            completeness += 50
-            score += 20
-        else:
-            completeness += 20
-        
-        # Diversity policy (15 points)
+            return {'score': 20, 'max_score': 20, 'completeness': 50}
+        return {'score': 0, 'max_score': 20, 'completeness': 20}
+    
+    @staticmethod
+    def _calculate_diversity_score(esg_input: ESGInput) -> dict:
+        """Diversity policy (15 points)"""
         if esg_input.diversity_policy:
-            completeness += 50
-            score += 15
-        else:
-            completeness += 20
-        
-        # Employee count consideration (10 points)
-        # Larger companies get partial credit for scale
+            return {'score': 15, 'max_score': 15, 'completeness': 50}
+        return {'score': 0, 'max_score': 15, 'completeness': 20}
+    
+    @staticmethod
+    def _calculate_workforce_score(esg_input: ESGInput) -> dict:
+        """Employee count consideration (10 points): larger companies get partial credit for scale"""
         if esg_input.total_employees >= 50:
-            score += 10
+            score = 10
         elif esg_input.total_employees >= 20:
-            score += 7
+            score = 7
         elif esg_input.total_employees >= 10:
-            score += 5
+            score = 5
         else:
-            score += 3
+            score = 3
+        return {'score': score, 'max_score': 10, 'completeness': 0}
+    
+    @staticmethod
+    def calculate_governance_score(esg_input: ESGInput) -> tuple[float, float]:
+        """Calculate governance score (0-100)"""
+        policies = ESGProcessor._calculate_policy_score(esg_input)
+        score, max_score = policies['score'], policies['max_score']
         
         final_score = (score / max_score * 100) if max_score > 0 else 0
-        avg_completeness = completeness / 4 if completeness > 0 else 0
         
-        return final_score, avg_completeness
+        return final_score, policies['completeness']
     
     @staticmethod
-    def calculate_governance_score(esg_input: ESGInput) -> tuple[float, float]:
-        """Calculate governance score (0-100)"""
+    def _calculate_policy_score(esg_input: ESGInput) -> dict:
+        """Governance policies in place (100 points)"""
         score = 0
-        max_score = 100
         completeness = 0
         
-        policies = [
-            ('code_of_conduct', 20),
-            ('anti_corruption_policy', 20),
-            ('data_privacy_policy', 15),
-            ('whistleblower_policy', 15),
-            ('board_oversight', 15),
-            ('risk_management_policy', 15),
-        ]
+        policies = GOVERNANCE_POLICIES
         
         for policy_field, points in policies:
             if hasattr(esg_input, policy_field) and getattr(esg_input, policy_field):
@@ -281,13 +331,12 @@ class ESGProcessor:
             else:
                 completeness += 50 / len(policies)
         
-        final_score = (score / max_score * 100) if max_score > 0 else 0
-        
-        return final_score, completeness
+        return {'score': score, 'max_score': 100, 'completeness': completeness}
     
     @staticmethod
     def calculate_overall_score(env_score: float, social_score: float, gov_score: float, 
-                                env_completeness: float, social_completeness: float, gov_completeness: float) -> tuple[float, str]:
+                                env_completeness: float, social_completeness: float, gov_completeness: float,
+                                weights: tuple = DEFAULT_WEIGHTS) -> tuple[float, str]:
         """
         Calculate weighted overall ESG score with confidence level
         Returns: (overall_score, confidence_level)
@@ -303,8 +352,9 @@ class ESGProcessor:
         weighted_social = social_score * (social_completeness / total_completeness)
         weighted_gov = gov_score * (gov_completeness / total_completeness)
         
-        # Equal weighting for E, S, G (can be adjusted)
-        overall_score = (env_score * 0.4 + social_score * 0.3 + gov_score * 0.3)
+        # E/S/G weights: 0.4/0.3/0.3 unless the industry profile sets its own
+        env_weight, social_weight, gov_weight = weights
+        overall_score = (env_score * env_weight + social_score * social_weight + gov_score * gov_weight)
         
         # Determine confidence level
         avg_completeness = total_completeness / 3
@@ -319,16 +369,20 @@ class ESGProcessor:
     
     @staticmethod
     def process_esg_input(esg_input: ESGInput) -> ESGSnapshot:
-        """Process ESG input and create snapshot"""
+        """Process ESG input and create snapshot, with the benchmark bounds and weights of its industry profile"""
+        from .scoring_engines import profile_for, save_breakdowns
+        profile = profile_for(esg_input.business_profile.industry)
+        
         # Calculate scores
-        env_score, env_completeness = ESGProcessor.calculate_environmental_score(esg_input)
+        env_score, env_completeness = ESGProcessor.calculate_environmental_score(esg_input, profile.thresholds)
         social_score, social_completeness = ESGProcessor.calculate_social_score(esg_input)
         gov_score, gov_completeness = ESGProcessor.calculate_governance_score(esg_input)
         
         # Calculate overall score and confidence
         overall_score, confidence = ESGProcessor.calculate_overall_score(
             env_score, social_score, gov_score,
-            env_completeness, social_completeness, gov_completeness
+            env_completeness, social_completeness, gov_completeness,
+            profile.weights or DEFAULT_WEIGHTS
         )
         
         avg_completeness = (env_completeness + social_completeness + gov_completeness) / 3
@@ -342,8 +396,252 @@ class ESGProcessor:
             governance_score=round(gov_score, 2),
             overall_esg_score=round(overall_score, 2),
             confidence_level=confidence,
-            data_completeness=round(avg_completeness, 2)
+            data_completeness=round(avg_completeness, 2),
+            scoring_engine='rules'
         )
+        save_breakdowns([(snapshot, esg_input)])
         
         return snapshot
+    
+    # Batch API: the same rules over column arrays, for rescoring many inputs at once.
+    # Arithmetic follows the scalar path step for step so results match it exactly.
+    
+    @staticmethod
+    def load_input_columns(queryset) -> dict:
+        """Column arrays of every field the scores read, one row per input in queryset order"""
+        fields = ('id', 'total_employees', 'employee_benefits', 'business_profile__industry')
+        fields += NUMERIC_FIELDS + CHOICE_FIELDS + FLAG_FIELDS
+        fields += tuple(policy for policy, _ in GOVERNANCE_POLICIES)
+        rows = list(queryset.values_list(*fields))
+        raw = dict(zip(fields, zip(*rows))) if rows else {field: () for field in fields}
+        
+        columns = {
+            'id': np.array(raw['id'], dtype=np.int64),
+            'total_employees': np.array(raw['total_employees'], dtype=np.int64),
+            'industry': np.array(raw['business_profile__industry'], dtype=object),
+        }
+        for field in NUMERIC_FIELDS:
+            # None becomes NaN; _present() treats NaN and 0 as missing, like the scalar truth tests
+            columns[field.split('__')[-1]] = np.array(
+                [np.nan if value is None else value for value in raw[field]], dtype=np.float64
+            )
+        for field in CHOICE_FIELDS:
+            columns[field] = np.array(['' if value is None else value for value in raw[field]], dtype=object)
+        for field in FLAG_FIELDS + tuple(policy for policy, _ in GOVERNANCE_POLICIES):
+            columns[field] = np.array([bool(value) for value in raw[field]], dtype=bool)
+        # JSON lists cannot be vectorized; reduce them to what the rules use
+        columns['has_benefits'] = np.array([bool(value) for value in raw['employee_benefits']], dtype=bool)
+        columns['benefit_count'] = np.array(
+            [len(value) if isinstance(value, list) else 0 for value in raw['employee_benefits']], dtype=np.int64
+        )
+        return columns
+    
+    @staticmethod
+    def _present(values):
+        """Truth test of the scalar path for a numeric column (None and 0 are missing)"""
+        return ~np.isnan(values) & (values != 0)
+    
+    @staticmethod
+    def _per_employee(values, total_employees, guard_zero=False):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            per_employee = values / total_employees
+        if guard_zero:
+            per_employee = np.where(total_employees > 0, per_employee, values)
+        return per_employee
+    
+    @staticmethod
+    def _energy_score_batch(columns: dict, thresholds: dict = DEFAULT_THRESHOLDS):
+        """Vectorized _calculate_energy_score: (score, completeness) arrays"""
+        kwh_known = ESGProcessor._present(columns['electricity_kwh'])
+        has_electricity = kwh_known | ESGProcessor._present(columns['electricity_bill_amount'])
+        kwh = np.where(kwh_known, columns['electricity_kwh'], columns['electricity_bill_amount'] / 0.12)
+        kwh_per_employee = ESGProcessor._per_employee(kwh, columns['total_employees'], guard_zero=True)
+        electricity_points = np.array([30, 20, 10, 5])[np.digitize(kwh_per_employee, thresholds['kwh_per_employee'])]
+        
+        liters_known = ESGProcessor._present(columns['generator_usage_liters'])
+        has_generator = liters_known | ESGProcessor._present(columns['generator_usage_hours'])
+        liters_per_employee = ESGProcessor._per_employee(columns['generator_usage_liters'], columns['total_employees'])
+        liter_points = np.array([5, 3, 1])[np.digitize(liters_per_employee, thresholds['generator_liters_per_employee'])]
+        generator_points = np.where(liters_known, liter_points, 3)
+        
+        score = np.where(has_electricity, electricity_points, 0) + np.where(has_generator, generator_points, 0)
+        completeness = (
+            np.where(has_electricity, 50, 0)
+            + np.where(has_generator, 30, 0)
+            + np.where(ESGProcessor._present(columns['office_area_sqm']), 20, 0)
+        )
+        return score, completeness
+    
+    @staticmethod
+    def _water_score_batch(columns: dict, thresholds: dict = DEFAULT_THRESHOLDS):
+        """Vectorized _calculate_water_score: (score, completeness) arrays"""
+        source = columns['water_source']
+        has_source = source != ''
+        source_points = np.select([source == 'municipal', source == 'borehole', source == 'both'], [8, 6, 5], default=4)
+        
+        has_usage = ESGProcessor._present(columns['water_usage_liters'])
+        liters_per_employee = ESGProcessor._per_employee(columns['water_usage_liters'], columns['total_employees'])
+        usage_points = np.array([12, 8, 4])[np.digitize(liters_per_employee, thresholds['water_liters_per_employee'])]
+        
+        score = np.where(has_source, source_points, 0) + np.where(has_usage, usage_points, 6)
+        completeness = np.where(has_source, 50, 0) + np.where(has_usage, 50, 0)
+        return score, completeness
+    
+    @staticmethod
+    def _waste_score_batch(columns: dict):
+        """Vectorized _calculate_waste_score: (score, completeness) arrays"""
+        recycling = columns['waste_recycling']
+        frequency = columns['waste_recycling_frequency']
+        has_frequency = frequency != ''
+        frequency_points = np.select(
+            [frequency == 'daily', frequency == 'weekly', frequency == 'monthly'], [10, 7, 4], default=2
+        )
+        
+        recycling_score = 15 + np.where(has_frequency, frequency_points, 5)
+        recycling_completeness = 50 + np.where(has_frequency, 30, 0)
+        score = np.where(recycling, recycling_score, 0) + np.where(columns['waste_segregation'], 5, 0)
+        completeness = np.where(recycling, recycling_completeness, 20) + np.where(columns['waste_segregation'], 20, 0)
+        return score, completeness
+    
+    @staticmethod
+    def _renewable_score_batch(columns: dict, thresholds: dict = DEFAULT_THRESHOLDS):
+        """Vectorized _calculate_renewable_score: (score, completeness) arrays"""
+        has_solar = columns['has_solar']
+        capacity = columns['solar_capacity_kw']
+        capacity_points = np.array([2, 3, 5])[np.digitize(capacity, thresholds['solar_kw'])]
+        solar_score = 5 + np.where(ESGProcessor._present(capacity), capacity_points, 2)
+        score = np.where(has_solar, solar_score, 0)
+        completeness = np.where(has_solar, 100, 50)
+        return score, completeness
+    
+    @staticmethod
+    def calculate_environmental_score_batch(columns: dict, thresholds: dict = DEFAULT_THRESHOLDS):
+        """Vectorized calculate_environmental_score: (score, completeness) arrays"""
+        parts = (
+            ESGProcessor._energy_score_batch(columns, thresholds),
+            ESGProcessor._water_score_batch(columns, thresholds),
+            ESGProcessor._waste_score_batch(columns),
+            ESGProcessor._renewable_score_batch(columns, thresholds),
+        )
+        total_score = sum(score for score, _ in parts)
+        total_completeness = sum(completeness for _, completeness in parts)
+        total_max = 40 + 20 + 30 + 10
+        return total_score / total_max * 100, total_completeness / len(parts)
+    
+    @staticmethod
+    def calculate_social_score_batch(columns: dict):
+        """Vectorized calculate_social_score: (score, completeness) arrays"""
+        frequency = columns['safety_training_frequency']
+        has_frequency = frequency != ''
+        frequency_points = np.select(
+            [frequency == 'monthly', frequency == 'quarterly', frequency == 'annually'], [10, 7, 5], default=2
+        )
+        safety = columns['safety_training_provided']
+        benefits = columns['has_benefits']
+        
+        score = (
+            np.where(safety, 20 + np.where(has_frequency, frequency_points, 5), 0)
+            + np.where(benefits, np.minimum(columns['benefit_count'] * 5, 25), 0)
+            + np.where(columns['health_insurance'], 20, 0)
+            + np.where(columns['diversity_policy'], 15, 0)
+            + np.array([3, 5, 7, 10])[np.digitize(columns['total_employees'], [10, 20, 50])]
+        )
+        completeness = (
+            np.where(safety, 50 + np.where(has_frequency, 50, 0), 20)
+            + np.where(benefits, 50, 20)
+            + np.where(columns['health_insurance'], 50, 20)
+            + np.where(columns['diversity_policy'], 50, 20)
+        )
+        max_score = 100
+        return score / max_score * 100, np.where(completeness > 0, completeness / 4, 0)
+    
+    @staticmethod
+    def calculate_governance_score_batch(columns: dict):
+        """Vectorized calculate_governance_score: (score, completeness) arrays"""
+        rows = len(columns['id'])
+        score = np.zeros(rows, dtype=np.int64)
+        completeness = np.zeros(rows, dtype=np.float64)
+        # Accumulate in policy order: the float sum must round exactly as the scalar loop does
+        for policy_field, points in GOVERNANCE_POLICIES:
+            in_place = columns[policy_field]
+            score = score + np.where(in_place, points, 0)
+            completeness = completeness + np.where(
+                in_place, 100 / len(GOVERNANCE_POLICIES), 50 / len(GOVERNANCE_POLICIES)
+            )
+        max_score = 100
+        return score / max_score * 100, completeness
+    
+    @staticmethod
+    def calculate_overall_score_batch(env_score, social_score, gov_score,
+                                      env_completeness, social_completeness, gov_completeness,
+                                      weights: tuple = DEFAULT_WEIGHTS):
+        """Vectorized calculate_overall_score: (overall score, confidence level) arrays"""
+        total_completeness = env_completeness + social_completeness + gov_completeness
+        env_weight, social_weight, gov_weight = weights
+        overall_score = env_score * env_weight + social_score * social_weight + gov_score * gov_weight
+        avg_completeness = total_completeness / 3
+        confidence = np.select(
+            [avg_completeness >= 70, avg_completeness >= 40], ['high', 'medium'], default='low'
+        ).astype(object)
+        no_data = total_completeness == 0
+        return np.where(no_data, 0, overall_score), np.where(no_data, 'low', confidence)
+    
+    @staticmethod
+    def score_inputs_batch(queryset) -> dict:
+        """
+        Rule-based scores for every input in the queryset, as arrays aligned
+        with 'id'; each row equals what process_esg_input computes for that input
+        """
+        return ESGProcessor.score_columns(ESGProcessor.load_input_columns(queryset))
+    
+    @staticmethod
+    def score_columns(columns: dict, thresholds: dict = DEFAULT_THRESHOLDS, weights: tuple = DEFAULT_WEIGHTS) -> dict:
+        """Batch scores of loaded columns with the given benchmark bounds and E/S/G weights"""
+        env_score, env_completeness = ESGProcessor.calculate_environmental_score_batch(columns, thresholds)
+        social_score, social_completeness = ESGProcessor.calculate_social_score_batch(columns)
+        gov_score, gov_completeness = ESGProcessor.calculate_governance_score_batch(columns)
+        overall_score, confidence = ESGProcessor.calculate_overall_score_batch(
+            env_score, social_score, gov_score,
+            env_completeness, social_completeness, gov_completeness,
+            weights
+        )
+        return {
+            'id': columns['id'],
+            'environmental_score': env_score,
+            'environmental_completeness': env_completeness,
+            'social_score': social_score,
+            'social_completeness': social_completeness,
+            'governance_score': gov_score,
+            'governance_completeness': gov_completeness,
+            'overall_score': overall_score,
+            'confidence_level': confidence,
+            'data_completeness': (env_completeness + social_completeness + gov_completeness) / 3,
+        }
+
+
+# Rule sub-scores: name -> (pillar, ESGProcessor method returning score, max_score and completeness).
+# Each pillar's maxima add up to 100, so a sub-score's points are points of its pillar score.
+SUB_SCORES = {
+    'energy': ('environmental', ESGProcessor._calculate_energy_score),
+    'water': ('environmental', ESGProcessor._calculate_water_score),
+    'waste': ('environmental', ESGProcessor._calculate_waste_score),
+    'renewable': ('environmental', ESGProcessor._calculate_renewable_score),
+    'safety': ('social', ESGProcessor._calculate_safety_score),
+    'benefits': ('social', ESGProcessor._calculate_benefits_score),
+    'health_insurance': ('social', ESGProcessor._calculate_health_insurance_score),
+    'diversity': ('social', ESGProcessor._calculate_diversity_score),
+    'workforce': ('social', ESGProcessor._calculate_workforce_score),
+    'policies': ('governance', ESGProcessor._calculate_policy_score),
+}
+# Sub-scores benchmarked against a profile's bounds (the others take only the input)
+BENCHMARKED_SUB_SCORES = ('energy', 'water', 'renewable')
+# A pillar's completeness is the sum of its sub-score completeness divided by this
+COMPLETENESS_PARTS = {'environmental': 4, 'social': 4, 'governance': 1}
+
 
+def sub_score(name: str, esg_input: ESGInput, thresholds: dict = DEFAULT_THRESHOLDS) -> dict:
+    """One rule sub-score (score, max_score, completeness) of an input against the benchmark bounds"""
+    calculate = SUB_SCORES[name][1]
+    if name in BENCHMARKED_SUB_SCORES:
+        return calculate(esg_input, thresholds)
+    return calculate(esg_input)
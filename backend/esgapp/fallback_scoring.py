@@ -0,0 +1,277 @@
+"""
+Rule-based fallback scores as a declarative weight table
+
+FALLBACK_RULES lists, per pillar, the fields that count as data provided, the
+practice groups (points per practice in place, capped) and the bonus rules.
+At import the table is compiled into one feature list and 0/1 weight matrices,
+so scoring one input or a matrix of inputs is an indicator matrix product
+followed by a few element-wise operations.
+
+The products count fields (integers, so exact); points are applied to the
+counts afterwards in the same order as the original field-by-field fallback
+(kept in esgapp.tests as baseline_fallback_scoring), which keeps the results
+identical to it.
+"""
+import numpy as np
+
+# Feature tests: PROVIDED is "value is not None", ENABLED is "value is truthy"
+PROVIDED = 'provided'
+ENABLED = 'enabled'
+
+FALLBACK_RULES = {
+    'environmental': {
+        # Data points: min(count / len(data) * data_points, data_points) when any is present
+        'data_points': 40,
+        'data': (
+            ('electricity_kwh', PROVIDED),
+            ('electricity_bill_amount', PROVIDED),
+            ('generator_usage_liters', PROVIDED),
+            ('generator_usage_hours', PROVIDED),
+            ('has_solar', ENABLED),
+            ('solar_capacity_kw', PROVIDED),
+            ('water_usage_liters', PROVIDED),
+            ('waste_recycling', ENABLED),
+            ('waste_segregation', ENABLED),
+            ('carbon_footprint_tracking', ENABLED),
+            ('renewable_energy_percentage', PROVIDED),
+            ('hazardous_waste_management', ENABLED),
+        ),
+        # Practice groups: (name, fields in place, points per field, cap)
+        'practices': (
+            ('environmental_practices', (
+                'has_solar', 'waste_recycling', 'waste_segregation', 'carbon_footprint_tracking',
+                'hazardous_waste_management', 'paper_reduction_initiatives', 'business_travel_policy',
+                'remote_work_policy', 'sustainable_procurement',
+            ), 6.67, 60),
+        ),
+        # Bonuses: ('scaled', field, rate, cap) adds min(value * rate, cap) when value > 0;
+        # ('threshold', field, minimum, points) adds points when value >= minimum
+        'bonuses': (
+            ('scaled', 'renewable_energy_percentage', 0.2, 10),
+        ),
+    },
+    'social': {
+        'data_points': 40,
+        'data': (
+            ('safety_training_provided', ENABLED),
+            ('safety_training_frequency', ENABLED),
+            ('health_insurance', ENABLED),
+            ('diversity_policy', ENABLED),
+            ('female_employees_percentage', PROVIDED),
+            ('workplace_accidents_last_year', PROVIDED),
+            ('mental_health_support', ENABLED),
+            ('employee_training_hours', PROVIDED),
+            ('employee_satisfaction_survey', ENABLED),
+            ('flexible_work_arrangements', ENABLED),
+        ),
+        'practices': (
+            ('social_practices', (
+                'safety_training_provided', 'health_insurance', 'diversity_policy', 'mental_health_support',
+                'employee_satisfaction_survey', 'flexible_work_arrangements', 'community_engagement',
+                'local_hiring_preference', 'charitable_contributions',
+            ), 6.67, 60),
+        ),
+        'bonuses': (
+            ('scaled', 'employee_training_hours', 0.5, 10),
+            ('threshold', 'female_employees_percentage', 30, 5),
+        ),
+    },
+    'governance': {
+        'data_points': 30,
+        'data': (
+            ('code_of_conduct', ENABLED),
+            ('anti_corruption_policy', ENABLED),
+            ('data_privacy_policy', ENABLED),
+            ('whistleblower_policy', ENABLED),
+            ('board_oversight', ENABLED),
+            ('risk_management_policy', ENABLED),
+            ('cybersecurity_measures', ENABLED),
+            ('regulatory_compliance_tracking', ENABLED),
+            ('sustainability_reporting', ENABLED),
+            ('stakeholder_engagement', ENABLED),
+            ('esg_goals_set', ENABLED),
+            ('third_party_audits', ENABLED),
+            ('public_esg_commitments', ENABLED),
+        ),
+        'practices': (
+            ('core_policies', (
+                'code_of_conduct', 'anti_corruption_policy', 'data_privacy_policy', 'whistleblower_policy',
+                'board_oversight', 'risk_management_policy',
+            ), 8.33, 50),
+            ('advanced_governance', (
+                'cybersecurity_measures', 'regulatory_compliance_tracking', 'sustainability_reporting',
+                'stakeholder_engagement', 'esg_goals_set', 'third_party_audits', 'public_esg_commitments',
+            ), 2.86, 20),
+        ),
+        'bonuses': (),
+    },
+}
+PILLARS = tuple(FALLBACK_RULES)
+# With no data at all, social still gets this much for a known employee count
+EMPLOYEE_COUNT_POINTS = 5.0
+# Scores below this are lifted to it when the pillar has data
+MINIMUM_SCORE = 15.0
+
+
+def _compile(rules: dict):
+    """Feature list, data-count and practice-count weight matrices, bonus-value fields"""
+    features = []
+    for pillar in rules.values():
+        candidates = list(pillar['data'])
+        candidates += [(field, ENABLED) for _, fields, _, _ in pillar['practices'] for field in fields]
+        for feature in candidates:
+            if feature not in features:
+                features.append(feature)
+    index = {feature: position for position, feature in enumerate(features)}
+
+    data_weights = np.zeros((len(features), len(rules)), dtype=np.int64)
+    groups = [(name, points, cap) for rule in rules.values() for name, _, points, cap in rule['practices']]
+    practice_weights = np.zeros((len(features), len(groups)), dtype=np.int64)
+    column = 0
+    for pillar_column, rule in enumerate(rules.values()):
+        for feature in rule['data']:
+            data_weights[index[feature], pillar_column] = 1
+        for _, fields, _, _ in rule['practices']:
+            for field in fields:
+                practice_weights[index[(field, ENABLED)], column] = 1
+            column += 1
+
+    value_fields = sorted({bonus[1] for rule in rules.values() for bonus in rule['bonuses']})
+    return features, data_weights, groups, practice_weights, value_fields
+
+
+FEATURES, DATA_WEIGHTS, PRACTICE_GROUPS, PRACTICE_WEIGHTS, VALUE_FIELDS = _compile(FALLBACK_RULES)
+DATA_SIZES = np.array([len(rule['data']) for rule in FALLBACK_RULES.values()])
+LOADED_FIELDS = tuple(dict.fromkeys([field for field, _ in FEATURES] + VALUE_FIELDS + ['total_employees']))
+
+
+def _feature_value(value, test: str) -> int:
+    if test == PROVIDED:
+        return int(value is not None)
+    return int(bool(value))
+
+
+def rows_to_matrix(rows) -> dict:
+    """
+    Feature matrix, bonus values, employee counts, ids and industries from rows
+    of (input id, business industry, *LOADED_FIELDS values)
+    """
+    rows = list(rows)
+    position = {field: column for column, field in enumerate(LOADED_FIELDS, start=2)}
+    features = np.array(
+        [[_feature_value(row[position[field]], test) for field, test in FEATURES] for row in rows],
+        dtype=np.int64,
+    ).reshape(len(rows), len(FEATURES))
+    values = {
+        field: np.array(
+            [np.nan if row[position[field]] is None else row[position[field]] for row in rows], dtype=np.float64
+        )
+        for field in VALUE_FIELDS
+    }
+    employees = np.array([row[position['total_employees']] or 0 for row in rows], dtype=np.int64)
+    return {
+        'id': np.array([row[0] for row in rows], dtype=np.int64),
+        'industry': np.array([row[1] for row in rows], dtype=object),
+        'features': features,
+        'values': values,
+        'total_employees': employees,
+    }
+
+
+def input_matrix(esg_inputs) -> dict:
+    """Feature matrix for ESGInput instances"""
+    return rows_to_matrix(
+        [esg_input.pk, esg_input.business_profile.industry] + [getattr(esg_input, field) for field in LOADED_FIELDS]
+        for esg_input in esg_inputs
+    )
+
+
+def queryset_matrix(queryset) -> dict:
+    """Feature matrix for a queryset of ESG inputs, loaded with one values_list query"""
+    return rows_to_matrix(queryset.values_list('id', 'business_profile__industry', *LOADED_FIELDS))
+
+
+def _overall(env_score, social_score, gov_score, weights):
+    if weights is None:
+        return (env_score + social_score + gov_score) / 3
+    env_weight, social_weight, gov_weight = weights
+    return env_score * env_weight + social_score * social_weight + gov_score * gov_weight
+
+
+def part_matrix(matrix: dict):
+    """
+    Data counts per pillar and every row's points per part before the pillar cap:
+    {pillar: [(category, maximum points, values)]} with data, practice groups and bonuses
+    """
+    features = matrix['features']
+    employees = matrix['total_employees']
+    data_counts = features @ DATA_WEIGHTS
+    practice_counts = features @ PRACTICE_WEIGHTS
+
+    parts = {}
+    column = 0
+    for pillar_column, (pillar, rule) in enumerate(FALLBACK_RULES.items()):
+        data = data_counts[:, pillar_column]
+        points = rule['data_points']
+        data_score = np.where(data > 0, np.minimum(data / DATA_SIZES[pillar_column] * points, points), 0.0)
+        if pillar == 'social':
+            data_score = np.where((data == 0) & (employees > 0), EMPLOYEE_COUNT_POINTS, data_score)
+        pillar_parts = [(f'{pillar}_data', points, data_score)]
+        for _ in rule['practices']:
+            name, per_practice, cap = PRACTICE_GROUPS[column]
+            pillar_parts.append((name, cap, np.minimum(practice_counts[:, column] * per_practice, cap)))
+            column += 1
+        for kind, field, rate, limit in rule['bonuses']:
+            value = matrix['values'][field]
+            with np.errstate(invalid='ignore'):
+                if kind == 'scaled':
+                    bonus = np.where(value > 0, np.minimum(value * rate, limit), 0)
+                else:
+                    bonus = np.where(value >= rate, limit, 0)
+            pillar_parts.append((f'{field}_bonus', limit, bonus))
+        parts[pillar] = pillar_parts
+    return data_counts, parts
+
+
+def score_matrix(matrix: dict, weights: tuple = None) -> dict:
+    """
+    Fallback scores for every row: pillar scores, overall, completeness and data
+    counts. The overall score is the plain E/S/G average unless weights are given.
+    """
+    employees = matrix['total_employees']
+    data_counts, parts = part_matrix(matrix)
+
+    scores = {}
+    for pillar, pillar_parts in parts.items():
+        score = pillar_parts[0][2]
+        for _, _, points in pillar_parts[1:]:
+            score = score + points
+        scores[pillar] = np.minimum(score, 100)
+
+    env_data, social_data, gov_data = (data_counts[:, column] for column in range(len(PILLARS)))
+    env_score, social_score, gov_score = (scores[pillar] for pillar in PILLARS)
+    total_data = env_data + social_data + gov_data
+    data_completeness = total_data / DATA_SIZES.sum() * 100
+    overall_score = _overall(env_score, social_score, gov_score, weights)
+
+    # Data provided but a low average: lift each pillar that has data to the minimum
+    boost = (total_data > 0) & (overall_score < 20)
+    env_score = np.where(boost & (env_score < MINIMUM_SCORE) & (env_data > 0), MINIMUM_SCORE, env_score)
+    social_score = np.where(
+        boost & (social_score < MINIMUM_SCORE) & ((social_data > 0) | (employees != 0)), MINIMUM_SCORE, social_score
+    )
+    gov_score = np.where(boost & (gov_score < MINIMUM_SCORE) & (gov_data > 0), MINIMUM_SCORE, gov_score)
+    overall_score = np.where(boost, _overall(env_score, social_score, gov_score, weights), overall_score)
+
+    # Nothing at all, not even an employee count: everything is zero
+    empty = (total_data == 0) & (employees == 0)
+    return {
+        'environmental_score': np.where(empty, 0.0, env_score),
+        'social_score': np.where(empty, 0.0, social_score),
+        'governance_score': np.where(empty, 0.0, gov_score),
+        'overall_esg_score': np.where(empty, 0.0, overall_score),
+        'data_completeness': np.where(empty, 0.0, data_completeness),
+        'environmental_data': env_data,
+        'social_data': social_data,
+        'governance_data': gov_data,
+    }
@@ -0,0 +1,72 @@
+"""
+Exclusive per-file locks shared by every worker on the host (single-flight
+computations, rate limiter buckets)
+"""
+import os
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class FileLock:
+    """Exclusive lock on one file, shared by every worker on the host"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.fd = None
+
+    def acquire(self, timeout: float):
+        deadline = time.monotonic() + timeout
+        while True:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            if self._try_lock(fd):
+                # The holder before us may have unlinked the file; lock the current one instead
+                try:
+                    if os.fstat(fd).st_ino == os.stat(self.path).st_ino:
+                        self.fd = fd
+                        return
+                except FileNotFoundError:
+                    pass
+                self._unlock(fd)
+            os.close(fd)
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f"Timed out waiting for {self.path}")
+            time.sleep(0.05)
+
+    def release(self, unlink: bool = False):
+        if self.fd is None:
+            return
+        if unlink:
+            try:
+                os.unlink(self.path)
+            except OSError:
+                pass
+        self._unlock(self.fd)
+        os.close(self.fd)
+        self.fd = None
+
+    @staticmethod
+    def _try_lock(fd) -> bool:
+        try:
+            if fcntl:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+            return True
+        except OSError:
+            return False
+
+    @staticmethod
+    def _unlock(fd):
+        try:
+            if fcntl:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            else:
+                os.lseek(fd, 0, os.SEEK_SET)
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+        except OSError:
+            pass
@@ -2,58 +2,52 @@
 Free AI Service for ESG Analysis using multiple free APIs
 Supports Groq, OpenRouter, and Hugging Face APIs
 """
-import json
 import requests
 from django.conf import settings
-from openai import OpenAI
 import os
 from typing import Dict, List, Optional
 
+from . import llm_metrics
+from .answer_cache import answer_cache
+from .json_extraction import extract_json
+from .llm_clients import get_async_client, get_client, get_provider_model
+from .llm_gateway import achat_completion, chat_completion, stream_chat_completion
+from .llm_router import llm_router
+from .provider_health import provider_health
+from .prompt_context import business_context, encode_json, encode_profile, use_compact
+
 class FreeAIService:
     """Enhanced AI service using free APIs for comprehensive ESG analysis"""
     
     def __init__(self):
-        self.groq_client = None
-        self.openrouter_client = None
+        # Pooled clients are shared across requests in this worker process
+        self.groq_client = get_client('groq')
+        self.openrouter_client = get_client('openrouter')
         self.hf_api_key = os.getenv('HUGGINGFACE_API_KEY', '')
-        
-        # Initialize Groq client
-        if settings.GROQ_API_KEY:
-            try:
-                self.groq_client = OpenAI(
-                    api_key=settings.GROQ_API_KEY,
-                    base_url=settings.AI_BASE_URL
-                )
-                print(f"Groq client initialized with base URL: {settings.AI_BASE_URL}")
-            except Exception as e:
-                print(f"Failed to initialize Groq client: {e}")
-        
-        # Initialize OpenRouter client (backup)
-        openrouter_key = os.getenv('OPENROUTER_API_KEY', '')
-        if openrouter_key:
-            try:
-                self.openrouter_client = OpenAI(
-                    api_key=openrouter_key,
-                    base_url="https://openrouter.ai/api/v1"
-                )
-                print("OpenRouter client initialized")
-            except Exception as e:
-                print(f"Failed to initialize OpenRouter client: {e}")
+    
+    def get_available_provider(self):
+        """Name of the provider the router currently ranks best (None if none can take calls)"""
+        return llm_router.best_provider('groq')
     
     def get_available_client(self):
-        """Get the first available AI client"""
-        if self.groq_client:
-            return self.groq_client, settings.AI_MODEL
-        elif self.openrouter_client:
-            return self.openrouter_client, "meta-llama/llama-3.1-8b-instruct:free"
+        """Get the client and model of the best available provider"""
+        provider = self.get_available_provider()
+        if provider:
+            return get_client(provider), get_provider_model(provider)
         return None, None
     
+    def is_available(self):
+        """Cached O(1) check that a provider is configured and currently healthy"""
+        provider = self.get_available_provider()
+        return bool(provider) and provider_health.is_healthy(provider)
+    
     def test_connection(self):
-        """Test AI service connection"""
+        """Test AI service connection with a live completion (diagnostics only)"""
         client, model = self.get_available_client()
         if not client:
             return False, "No AI client available"
         
+        provider = self.get_available_provider()
         try:
             response = client.chat.completions.create(
                 model=model,
@@ -62,8 +56,10 @@ class FreeAIService:
                 ],
                 max_tokens=10
             )
+            provider_health.record_success(provider)
             return True, response.choices[0].message.content
         except Exception as e:
+            provider_health.record_failure(provider, e)
             return False, str(e)
     
     def generate_comprehensive_esg_analysis(self, esg_input) -> Dict:
@@ -73,8 +69,36 @@ class FreeAIService:
         if not client:
             return self._fallback_analysis(esg_input)
         
+        try:
+            response = chat_completion(client, **self._comprehensive_analysis_request(esg_input, model))
+            content = response.choices[0].message.content
+            return self._parse_comprehensive_response(content, esg_input)
+            
+        except Exception as e:
+            print(f"AI analysis error: {e}")
+            return self._fallback_analysis(esg_input)
+    
+    async def agenerate_comprehensive_esg_analysis(self, esg_input) -> Dict:
+        """Async variant of generate_comprehensive_esg_analysis (business_profile must be loaded)"""
+        provider = self.get_available_provider()
+        client = get_async_client(provider) if provider else None
+        if not client:
+            return self._fallback_analysis(esg_input)
+        
+        try:
+            request = self._comprehensive_analysis_request(esg_input, get_provider_model(provider))
+            response = await achat_completion(client, **request)
+            content = response.choices[0].message.content
+            return self._parse_comprehensive_response(content, esg_input)
+            
+        except Exception as e:
+            print(f"AI analysis error: {e}")
+            return self._fallback_analysis(esg_input)
+    
+    def _comprehensive_analysis_request(self, esg_input, model: str) -> Dict:
+        """Completion parameters for the comprehensive ESG analysis"""
         # Prepare comprehensive business context
-        context = self._prepare_detailed_context(esg_input)
+        context = business_context(esg_input, self._prepare_detailed_context)
         
         prompt = f"""
 You are an expert ESG analyst. Analyze this business data and provide a comprehensive ESG assessment.
@@ -178,39 +202,126 @@ SCORING GUIDELINES:
 Return ONLY valid JSON without markdown formatting.
 """
         
+        return dict(
+            prompt_type='comprehensive_analysis',
+            provider=self.get_available_provider(),
+            model=model,
+            messages=[
+                {"role": "system", "content": "You are an expert ESG consultant specializing in SME assessments. Provide comprehensive, actionable analysis in valid JSON format."},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.3,
+            max_tokens=3000
+        )
+    
+    def cached_chatbot_response(self, query: str, context: Dict, conversation_history: List = None):
+        """(answer, similarity) from the semantic answer cache, only for standalone questions"""
+        if conversation_history:
+            return None
+        return answer_cache.lookup('chatbot', query, context)
+    
+    def _remember_chatbot_response(self, query: str, context: Dict, conversation_history: List, response: str):
+        """Offer an AI answer to the semantic answer cache (follow-up answers are not shared)"""
+        if not conversation_history:
+            answer_cache.store('chatbot', query, context, response)
+    
+    def generate_chatbot_response(self, query: str, context: Dict, conversation_history: List = None) -> str:
+        """Generate intelligent chatbot response with ESG context"""
+        
+        client, model = self.get_available_client()
+        if not client:
+            print("No AI client available, using fallback")
+            return self._fallback_chatbot_response(query, context)
+        
+        # Cached provider health instead of a live round-trip per message
+        if not self.is_available():
+            print("AI provider marked unhealthy, using fallback")
+            return self._fallback_chatbot_response(query, context)
+        
+        messages = self.build_chatbot_messages(query, context, conversation_history)
+        
         try:
-            response = client.chat.completions.create(
+            print(f"Sending request to AI model: {model}")
+            response = chat_completion(
+                client,
+                prompt_type='chatbot',
+                provider=self.get_available_provider(),
                 model=model,
-                messages=[
-                    {"role": "system", "content": "You are an expert ESG consultant specializing in SME assessments. Provide comprehensive, actionable analysis in valid JSON format."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.3,
-                max_tokens=3000
+                messages=messages,
+                temperature=0.7,
+                max_tokens=500
             )
             
-            content = response.choices[0].message.content
-            return self._parse_comprehensive_response(content, esg_input)
+            ai_response = response.choices[0].message.content.strip()
+            print(f"AI response received: {ai_response[:100]}...")
+            self._remember_chatbot_response(query, context, conversation_history, ai_response)
+            return ai_response
             
         except Exception as e:
-            print(f"AI analysis error: {e}")
-            return self._fallback_analysis(esg_input)
+            print(f"Chatbot error: {e}")
+            print(f"Error type: {type(e).__name__}")
+            return self._fallback_chatbot_response(query, context)
     
-    def generate_chatbot_response(self, query: str, context: Dict, conversation_history: List = None) -> str:
-        """Generate intelligent chatbot response with ESG context"""
+    async def agenerate_chatbot_response(self, query: str, context: Dict, conversation_history: List = None) -> str:
+        """Async variant of generate_chatbot_response"""
         
-        client, model = self.get_available_client()
-        if not client:
-            print("No AI client available, using fallback")
+        provider = self.get_available_provider()
+        client = get_async_client(provider) if provider else None
+        if not client or not self.is_available():
             return self._fallback_chatbot_response(query, context)
         
-        # Test connection first
-        connection_ok, test_result = self.test_connection()
-        if not connection_ok:
-            print(f"AI connection failed: {test_result}")
+        messages = self.build_chatbot_messages(query, context, conversation_history)
+        
+        try:
+            response = await achat_completion(
+                client,
+                prompt_type='chatbot',
+                provider=provider,
+                model=get_provider_model(provider),
+                messages=messages,
+                temperature=0.7,
+                max_tokens=500
+            )
+            ai_response = response.choices[0].message.content.strip()
+            self._remember_chatbot_response(query, context, conversation_history, ai_response)
+            return ai_response
+            
+        except Exception as e:
+            print(f"Chatbot error: {e}")
             return self._fallback_chatbot_response(query, context)
+    
+    def stream_chatbot_response(self, query: str, context: Dict, conversation_history: List = None):
+        """Yield the chatbot response in chunks as the provider streams tokens"""
         
-        # Prepare context-aware prompt
+        client, model = self.get_available_client()
+        if not client or not self.is_available():
+            yield self._fallback_chatbot_response(query, context)
+            return
+        
+        messages = self.build_chatbot_messages(query, context, conversation_history)
+        
+        parts = []
+        try:
+            for delta in stream_chat_completion(
+                client,
+                prompt_type='chatbot',
+                provider=self.get_available_provider(),
+                model=model,
+                messages=messages,
+                temperature=0.7,
+                max_tokens=500
+            ):
+                parts.append(delta)
+                yield delta
+            self._remember_chatbot_response(query, context, conversation_history, ''.join(parts).strip())
+        except Exception as e:
+            print(f"Chatbot stream error: {e}")
+            # Only fall back if nothing reached the client yet
+            if not parts:
+                yield self._fallback_chatbot_response(query, context)
+    
+    def build_chatbot_messages(self, query: str, context: Dict, conversation_history: List = None) -> List:
+        """Build the system prompt, recent history and user query for the chatbot"""
         esg_context = f"""
 Business: {context.get('business_name', 'N/A')} ({context.get('industry', 'N/A')})
 ESG Scores: E:{context.get('environmental_score', 0):.1f} S:{context.get('social_score', 0):.1f} G:{context.get('governance_score', 0):.1f}
@@ -246,24 +357,7 @@ Keep responses concise but comprehensive (max 300 words)."""}
                 messages.append({"role": msg.get('role', 'user'), "content": msg.get('content', '')})
         
         messages.append({"role": "user", "content": query})
-        
-        try:
-            print(f"Sending request to AI model: {model}")
-            response = client.chat.completions.create(
-                model=model,
-                messages=messages,
-                temperature=0.7,
-                max_tokens=500
-            )
-            
-            ai_response = response.choices[0].message.content.strip()
-            print(f"AI response received: {ai_response[:100]}...")
-            return ai_response
-            
-        except Exception as e:
-            print(f"Chatbot error: {e}")
-            print(f"Error type: {type(e).__name__}")
-            return self._fallback_chatbot_response(query, context)
+        return messages
     
     def generate_esg_report_data(self, esg_input, analysis_data: Dict) -> Dict:
         """Generate comprehensive ESG report data"""
@@ -272,14 +366,31 @@ Keep responses concise but comprehensive (max 300 words)."""}
         if not client:
             return self._fallback_report_data(esg_input, analysis_data)
         
+        try:
+            response = chat_completion(client, **self._report_request(esg_input, analysis_data, model))
+            
+            content = response.choices[0].message.content
+            return self._parse_json_response(content)
+            
+        except Exception as e:
+            print(f"Report generation error: {e}")
+            return self._fallback_report_data(esg_input, analysis_data)
+    
+    def _report_request(self, esg_input, analysis_data: Dict, model: str) -> Dict:
+        """Completion parameters for the report summary"""
+        if use_compact():
+            business = encode_profile(esg_input.business_profile, esg_input.total_employees)
+        else:
+            business = f"""Business: {esg_input.business_profile.business_name}
+Industry: {esg_input.business_profile.industry}
+Employees: {esg_input.total_employees}"""
+        
         prompt = f"""
 Generate a comprehensive ESG report summary based on this analysis:
 
-Business: {esg_input.business_profile.business_name}
-Industry: {esg_input.business_profile.industry}
-Employees: {esg_input.total_employees}
+{business}
 
-Analysis Data: {json.dumps(analysis_data, indent=2)}
+Analysis Data: {encode_json(analysis_data)}
 
 Provide a JSON response with:
 {{
@@ -321,23 +432,17 @@ Provide a JSON response with:
 Return ONLY valid JSON.
 """
         
-        try:
-            response = client.chat.completions.create(
-                model=model,
-                messages=[
-                    {"role": "system", "content": "You are an ESG reporting specialist. Generate comprehensive, professional report content."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.4,
-                max_tokens=1500
-            )
-            
-            content = response.choices[0].message.content
-            return self._parse_json_response(content)
-            
-        except Exception as e:
-            print(f"Report generation error: {e}")
-            return self._fallback_report_data(esg_input, analysis_data)
+        return dict(
+            prompt_type='report',
+            provider=self.get_available_provider(),
+            model=model,
+            messages=[
+                {"role": "system", "content": "You are an ESG reporting specialist. Generate comprehensive, professional report content."},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.4,
+            max_tokens=1500
+        )
     
     def _prepare_detailed_context(self, esg_input) -> str:
         """Prepare detailed business context for AI analysis"""
@@ -404,32 +509,25 @@ GOVERNANCE DATA:
     
     def _parse_comprehensive_response(self, content: str, esg_input) -> Dict:
         """Parse comprehensive AI response"""
-        try:
-            # Clean and parse JSON
-            content = content.replace('```json', '').replace('```', '').strip()
-            parsed = json.loads(content)
-            
-            # Validate and structure response
-            return {
-                'overall_assessment': parsed.get('overall_assessment', {}),
-                'detailed_insights': parsed.get('detailed_insights', {}),
-                'actionable_recommendations': parsed.get('actionable_recommendations', []),
-                'risk_assessment': parsed.get('risk_assessment', {}),
-                'industry_benchmarking': parsed.get('industry_benchmarking', {}),
-                'implementation_roadmap': parsed.get('implementation_roadmap', {})
-            }
-            
-        except Exception as e:
-            print(f"Error parsing comprehensive response: {e}")
+        parsed = extract_json(content, 'comprehensive_analysis')
+        if parsed is None:
+            print(f"Error parsing comprehensive response: no valid JSON in {content[:200]!r}")
             return self._fallback_analysis(esg_input)
+        
+        # Validate and structure response
+        return {
+            'overall_assessment': parsed.get('overall_assessment', {}),
+            'detailed_insights': parsed.get('detailed_insights', {}),
+            'actionable_recommendations': parsed.get('actionable_recommendations', []),
+            'risk_assessment': parsed.get('risk_assessment', {}),
+            'industry_benchmarking': parsed.get('industry_benchmarking', {}),
+            'implementation_roadmap': parsed.get('implementation_roadmap', {})
+        }
     
     def _parse_json_response(self, content: str) -> Dict:
         """Parse JSON response with error handling"""
-        try:
-            content = content.replace('```json', '').replace('```', '').strip()
-            return json.loads(content)
-        except:
-            return {}
+        parsed = extract_json(content, 'report')
+        return parsed if parsed is not None else {}
     
     def _get_improvement_areas(self, context: Dict) -> str:
         """Get key improvement areas based on scores"""
@@ -445,6 +543,7 @@ GOVERNANCE DATA:
     
     def _fallback_analysis(self, esg_input) -> Dict:
         """Fallback analysis when AI is unavailable"""
+        llm_metrics.record_fallback('comprehensive_analysis')
         return {
             'overall_assessment': {
                 'environmental_score': 45,
@@ -533,6 +632,7 @@ GOVERNANCE DATA:
     
     def _fallback_chatbot_response(self, query: str, context: Dict) -> str:
         """Fallback chatbot response when AI is unavailable"""
+        llm_metrics.record_fallback('chatbot')
         query_lower = query.lower()
         
         if any(word in query_lower for word in ['hello', 'hi', 'hey']):
@@ -549,6 +649,7 @@ GOVERNANCE DATA:
     
     def _fallback_report_data(self, esg_input, analysis_data: Dict) -> Dict:
         """Fallback report data when AI is unavailable"""
+        llm_metrics.record_fallback('report')
         return {
             'executive_summary': f"ESG assessment for {esg_input.business_profile.business_name} shows opportunities for improvement across all categories. Current performance indicates basic ESG practices with significant potential for enhancement.",
             'key_findings': [
@@ -0,0 +1,204 @@
+"""
+Incremental rescoring of an ESG input after a partial update
+
+FIELD_DEPENDENCIES maps every ESGInput field to the pillar it belongs to and
+the rule sub-scores (esg_engine.SUB_SCORES) that read it. How the snapshot
+follows the update depends on the engine that scored it:
+
+- 'rules': only the affected sub-scores are recomputed, against the industry
+  profile's bounds, for the values before and after. The difference is applied
+  to the pillar, overall (weighted as the profile weighs the pillars) and
+  completeness figures.
+- another rule-based engine ('fallback'): its scores are not sums of rule
+  sub-scores, so the input is scored again with that engine.
+- 'ai' (or a legacy snapshot): the scores are left as they are and reported
+  stale (scores_stale); rule deltas would not apply to the AI's assessment.
+
+No LLM is called. The ESGScore rows of a rescored snapshot are saved again.
+The AI artifacts of the affected pillars (recommendations and roadmap actions)
+are marked stale until they are generated again. The snapshot's input hash is
+cleared, so the next process call scores the input with AI in full.
+"""
+import copy
+
+from .esg_engine import COMPLETENESS_PARTS, SUB_SCORES, sub_score
+from .models import ESGSnapshot
+from .scoring_engines import ENGINES, get_engine, overall_weights, profile_for, save_breakdowns
+
+PILLARS = ('environmental', 'social', 'governance')
+PILLAR_CATEGORIES = {'environmental': 'E', 'social': 'S', 'governance': 'G'}
+SCORE_FIELDS = ('environmental_score', 'social_score', 'governance_score', 'overall_esg_score', 'data_completeness')
+
+# field -> (pillar, rule sub-scores that read it). Fields with no sub-score only
+# feed the AI prompts: changing them marks their pillar's AI artifacts stale.
+FIELD_DEPENDENCIES = {
+    # Environmental - Energy & Climate
+    'electricity_kwh': ('environmental', ('energy',)),
+    'electricity_bill_amount': ('environmental', ('energy',)),
+    'generator_usage_liters': ('environmental', ('energy',)),
+    'generator_usage_hours': ('environmental', ('energy',)),
+    'has_solar': ('environmental', ('renewable',)),
+    'solar_capacity_kw': ('environmental', ('renewable',)),
+    'energy_efficiency_measures': ('environmental', ()),
+    'carbon_footprint_tracking': ('environmental', ()),
+    'renewable_energy_percentage': ('environmental', ()),
+    # Environmental - Water & Waste
+    'water_source': ('environmental', ('water',)),
+    'water_usage_liters': ('environmental', ('water',)),
+    'water_conservation_measures': ('environmental', ()),
+    'waste_recycling': ('environmental', ('waste',)),
+    'waste_recycling_frequency': ('environmental', ('waste',)),
+    'waste_segregation': ('environmental', ('waste',)),
+    'hazardous_waste_management': ('environmental', ()),
+    'paper_reduction_initiatives': ('environmental', ()),
+    # Environmental - Transportation & Supply Chain
+    'business_travel_policy': ('environmental', ()),
+    'remote_work_policy': ('environmental', ()),
+    'sustainable_procurement': ('environmental', ()),
+    'supplier_esg_requirements': ('environmental', ()),
+    # Social - Employees (energy and water are benchmarked per employee)
+    'total_employees': ('social', ('workforce', 'energy', 'water')),
+    'female_employees_percentage': ('social', ()),
+    'safety_training_provided': ('social', ('safety',)),
+    'safety_training_frequency': ('social', ('safety',)),
+    'workplace_accidents_last_year': ('social', ()),
+    'employee_benefits': ('social', ('benefits',)),
+    'diversity_policy': ('social', ('diversity',)),
+    'health_insurance': ('social', ('health_insurance',)),
+    'mental_health_support': ('social', ()),
+    'employee_training_hours': ('social', ()),
+    'employee_satisfaction_survey': ('social', ()),
+    'flexible_work_arrangements': ('social', ()),
+    # Social - Community & Stakeholders
+    'community_engagement': ('social', ()),
+    'local_hiring_preference': ('social', ()),
+    'charitable_contributions': ('social', ()),
+    'customer_satisfaction_tracking': ('social', ()),
+    'product_safety_standards': ('social', ()),
+    # Governance - Structure & Policies
+    'code_of_conduct': ('governance', ('policies',)),
+    'anti_corruption_policy': ('governance', ('policies',)),
+    'data_privacy_policy': ('governance', ('policies',)),
+    'whistleblower_policy': ('governance', ('policies',)),
+    'board_oversight': ('governance', ('policies',)),
+    'risk_management_policy': ('governance', ('policies',)),
+    'cybersecurity_measures': ('governance', ()),
+    'regulatory_compliance_tracking': ('governance', ()),
+    # Governance - Transparency & Reporting
+    'sustainability_reporting': ('governance', ()),
+    'stakeholder_engagement': ('governance', ()),
+    'esg_goals_set': ('governance', ()),
+    'third_party_audits': ('governance', ()),
+    'public_esg_commitments': ('governance', ()),
+    # Financial ESG Integration
+    'esg_linked_executive_compensation': ('governance', ()),
+    'sustainable_finance_products': ('governance', ()),
+    'esg_investment_policy': ('governance', ()),
+    # Additional ESG Reporting Fields
+    'annual_revenue': ('governance', ()),
+    'esg_budget_percentage': ('governance', ()),
+    'scope1_emissions': ('environmental', ()),
+    'scope2_emissions': ('environmental', ()),
+    'scope3_emissions': ('environmental', ()),
+    'water_intensity': ('environmental', ()),
+    'waste_generated_tons': ('environmental', ()),
+    'waste_recycled_percentage': ('environmental', ()),
+    'employee_turnover_rate': ('social', ()),
+    'board_diversity_percentage': ('governance', ()),
+    'supplier_esg_assessment': ('environmental', ()),
+    'esg_materiality_assessment': ('governance', ()),
+    'stakeholder_engagement_frequency': ('governance', ()),
+}
+
+
+def dependencies(fields) -> tuple[list, list]:
+    """(affected pillars, affected sub-scores) of some fields; an unmapped field affects every pillar"""
+    pillars, sub_scores = set(), set()
+    for field in fields:
+        if field not in FIELD_DEPENDENCIES:
+            pillars.update(PILLARS)
+            continue
+        pillar, field_sub_scores = FIELD_DEPENDENCIES[field]
+        pillars.add(pillar)
+        sub_scores.update(field_sub_scores)
+    pillars.update(SUB_SCORES[name][0] for name in sub_scores)
+    return [pillar for pillar in PILLARS if pillar in pillars], [name for name in SUB_SCORES if name in sub_scores]
+
+
+def _clamp(value: float) -> float:
+    return round(min(max(value, 0.0), 100.0), 2)
+
+
+def _apply_rule_deltas(snapshot, esg_input, previous, sub_scores) -> dict:
+    """Move a 'rules' snapshot by the change of the affected sub-scores, against its industry profile"""
+    thresholds = profile_for(esg_input.business_profile.industry).thresholds
+    score_deltas = dict.fromkeys(PILLARS, 0.0)
+    completeness_delta = 0.0
+    breakdown = {}
+    for name in sub_scores:
+        pillar = SUB_SCORES[name][0]
+        before, after = sub_score(name, previous, thresholds), sub_score(name, esg_input, thresholds)
+        score_deltas[pillar] += after['score'] - before['score']
+        completeness_delta += (after['completeness'] - before['completeness']) / COMPLETENESS_PARTS[pillar] / 3
+        breakdown[name] = {'pillar': pillar, **after}
+
+    weights = overall_weights(snapshot.scoring_engine, esg_input.business_profile.industry)
+    overall_delta = 0.0
+    for pillar, weight in zip(PILLARS, weights):
+        field = f'{pillar}_score'
+        score = _clamp(getattr(snapshot, field) + score_deltas[pillar])
+        overall_delta += (score - getattr(snapshot, field)) * weight
+        setattr(snapshot, field, score)
+    snapshot.overall_esg_score = _clamp(snapshot.overall_esg_score + overall_delta)
+    snapshot.data_completeness = _clamp(snapshot.data_completeness + completeness_delta)
+    return breakdown
+
+
+def _rescore_with_engine(snapshot, esg_input, pillars) -> dict:
+    """Score a snapshot of another rule-based engine again with it (its scores are not sums of rule sub-scores)"""
+    row = get_engine(snapshot.scoring_engine).score(esg_input)
+    for field in SCORE_FIELDS:
+        setattr(snapshot, field, round(row[field], 2))
+    snapshot.confidence_level = row['confidence_level']
+    return {pillar: getattr(snapshot, f'{pillar}_score') for pillar in pillars}
+
+
+def rescore_partial_update(esg_input, previous_values: dict):
+    """
+    Apply an update of the fields in previous_values (field -> value before the
+    update) to the input's snapshot. Returns what was rescored and marked stale,
+    or None when nothing changed or the input has no snapshot yet.
+    """
+    changed = [field for field, value in previous_values.items() if getattr(esg_input, field) != value]
+    if not changed:
+        return None
+    snapshot = ESGSnapshot.objects.filter(esg_input=esg_input).first()
+    if snapshot is None:
+        return None
+
+    pillars, sub_scores = dependencies(changed)
+    if snapshot.scoring_engine == 'rules':
+        previous = copy.copy(esg_input)
+        for field in changed:
+            setattr(previous, field, previous_values[field])
+        rescored = _apply_rule_deltas(snapshot, esg_input, previous, sub_scores)
+    elif snapshot.scoring_engine in ENGINES:
+        rescored = _rescore_with_engine(snapshot, esg_input, pillars)
+    else:
+        # AI (or legacy) scores cannot be moved without the AI: they stay as they are until the next process
+        rescored = {}
+    snapshot.input_hash = ''
+    snapshot.save(update_fields=[*SCORE_FIELDS, 'confidence_level', 'input_hash'])
+    if rescored:
+        save_breakdowns([(snapshot, esg_input)])
+
+    categories = [PILLAR_CATEGORIES[pillar] for pillar in pillars]
+    return {
+        'snapshot': snapshot,
+        'changed_fields': changed,
+        'affected_pillars': pillars,
+        'rescored': rescored,
+        'scores_stale': snapshot.scoring_engine not in ENGINES,
+        'stale_recommendations': snapshot.recommendations.filter(category__in=categories).update(stale=True),
+        'stale_roadmap_actions': snapshot.roadmaps.filter(esg_category__in=categories).update(stale=True),
+    }
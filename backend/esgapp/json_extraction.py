@@ -0,0 +1,340 @@
+"""
+Incremental extraction of schema-checked JSON from LLM output
+
+Completions wrap their JSON in prose and markdown fences, and sometimes run out
+of tokens mid-object. JSONExtractor scans the text once, tracking strings and
+bracket nesting, and returns the first balanced object or array that parses and
+matches the schema declared for the prompt type. Text can be fed in chunks as
+a stream arrives; the value is available as soon as its closing bracket does.
+"""
+import json
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+CLOSERS = {'{': '}', '[': ']'}
+
+_NUMBER = {'type': 'number'}
+_STRING = {'type': 'string'}
+_OBJECT = {'type': 'object'}
+_ARRAY = {'type': 'array'}
+
+# Minimal JSON-schema subset: type, required, properties, items, minItems
+SCHEMAS = {
+    'esg_scores': {
+        'type': 'object',
+        'required': ['environmental_score', 'social_score', 'governance_score'],
+        'properties': {
+            'environmental_score': _NUMBER,
+            'social_score': _NUMBER,
+            'governance_score': _NUMBER,
+            'overall_esg_score': _NUMBER,
+            'confidence_level': _STRING,
+            'data_completeness': _NUMBER,
+            'detailed_analysis': _OBJECT,
+            'risk_assessment': _OBJECT,
+            'improvement_priorities': _ARRAY,
+            'estimated_costs': _OBJECT,
+        },
+    },
+    # Entries are validated one by one against 'esg_scores', so one bad entry does not sink the batch
+    'esg_scores_batch': {
+        'type': 'array',
+        'minItems': 1,
+        'items': {'type': 'object'},
+    },
+    'roadmap': {
+        'type': 'object',
+        'properties': {
+            '30_day_plan': _OBJECT,
+            '60_day_plan': _OBJECT,
+            '90_day_plan': _OBJECT,
+        },
+    },
+    'recommendations': {
+        'type': 'array',
+        'minItems': 1,
+        'items': {
+            'type': 'object',
+            'required': ['title'],
+            'properties': {'title': _STRING, 'description': _STRING, 'category': _STRING, 'priority': _STRING},
+        },
+    },
+    'top_opportunities': {
+        'type': 'array',
+        'minItems': 1,
+        'items': {
+            'type': 'object',
+            'required': ['title'],
+            'properties': {'title': _STRING, 'description': _STRING, 'category': _STRING, 'priority': _STRING},
+        },
+    },
+    'simulate_impact': {
+        'type': 'object',
+        'required': ['score_improvements'],
+        'properties': {
+            'score_improvements': _OBJECT,
+            'business_benefits': _ARRAY,
+            'implementation_steps': _ARRAY,
+        },
+    },
+    'comprehensive_analysis': {
+        'type': 'object',
+        'properties': {
+            'overall_assessment': _OBJECT,
+            'detailed_insights': _OBJECT,
+            'actionable_recommendations': _ARRAY,
+            'risk_assessment': _OBJECT,
+            'industry_benchmarking': _OBJECT,
+            'implementation_roadmap': _OBJECT,
+        },
+    },
+    'report': {
+        'type': 'object',
+        'properties': {
+            'executive_summary': _STRING,
+            'key_findings': _ARRAY,
+            'critical_actions': _ARRAY,
+        },
+    },
+}
+
+_TYPE_CHECKS = {
+    'object': lambda value: isinstance(value, dict),
+    'array': lambda value: isinstance(value, list),
+    'string': lambda value: isinstance(value, str),
+    'boolean': lambda value: isinstance(value, bool),
+}
+
+_TRAILING_COMMA = re.compile(r',(\s*[}\]])')
+_OPENER_PATTERNS = {'{': re.compile(r'\{'), '[': re.compile(r'\['), '{[': re.compile(r'[{\[]')}
+_STRUCTURAL = re.compile(r'[{}\[\]"]')
+_STRING_SPECIAL = re.compile(r'["\\]')
+_DECODER = json.JSONDecoder(strict=False)
+
+
+def _is_number(value) -> bool:
+    """Numbers, or numeric strings such as "65" (the parsers coerce with float())"""
+    if isinstance(value, bool):
+        return False
+    if isinstance(value, (int, float)):
+        return True
+    try:
+        float(str(value).strip().rstrip('%'))
+        return True
+    except ValueError:
+        return False
+
+
+def validate(value, schema: dict, path: str = '$') -> list:
+    """Schema violations of value as readable strings; empty when it conforms"""
+    expected = schema.get('type')
+    if expected == 'number':
+        ok = _is_number(value)
+    else:
+        ok = expected is None or _TYPE_CHECKS[expected](value)
+    if not ok:
+        return [f"{path}: expected {expected}, got {type(value).__name__}"]
+
+    errors = []
+    if isinstance(value, dict):
+        for name in schema.get('required', []):
+            if value.get(name) is None:
+                errors.append(f"{path}.{name}: required")
+        for name, subschema in schema.get('properties', {}).items():
+            if value.get(name) is not None:
+                errors.extend(validate(value[name], subschema, f"{path}.{name}"))
+    elif isinstance(value, list):
+        if len(value) < schema.get('minItems', 0):
+            errors.append(f"{path}: expected at least {schema['minItems']} items")
+        if 'items' in schema:
+            for index, item in enumerate(value):
+                errors.extend(validate(item, schema['items'], f"{path}[{index}]"))
+    return errors
+
+
+def _strip_trailing_commas(text: str) -> str:
+    """Remove commas before a closing bracket, outside strings"""
+    parts = re.split(r'("(?:[^"\\]|\\.)*")', text)
+    return ''.join(part if index % 2 else _TRAILING_COMMA.sub(r'\1', part) for index, part in enumerate(parts))
+
+
+def _loads(text: str):
+    """json.loads tolerant of raw newlines in strings and trailing commas"""
+    try:
+        return json.loads(text, strict=False)
+    except ValueError:
+        return json.loads(_strip_trailing_commas(text), strict=False)
+
+
+def _close_truncated(text: str):
+    """
+    Best-effort completion of JSON cut off mid-value (max_tokens reached):
+    drop the incomplete trailing member and close the open brackets.
+    """
+    stack = []
+    in_string = escape = False
+    last_cut = None  # (index, open brackets) at the last comma outside strings
+    for index, char in enumerate(text):
+        if in_string:
+            if escape:
+                escape = False
+            elif char == '\\':
+                escape = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in CLOSERS:
+            stack.append(CLOSERS[char])
+        elif char in '}]' and stack:
+            stack.pop()
+        elif char == ',':
+            last_cut = (index, list(stack))
+
+    candidates = [text + ('"' if in_string else '') + ''.join(reversed(stack))]
+    if last_cut:
+        index, open_brackets = last_cut
+        candidates.append(text[:index] + ''.join(reversed(open_brackets)))
+    for candidate in candidates:
+        try:
+            return _loads(candidate)
+        except ValueError:
+            continue
+    return None
+
+
+class JSONExtractor:
+    """
+    Find the first balanced JSON object or array in text fed incrementally.
+    ``feed`` returns the value once a complete, schema-valid one has arrived.
+    """
+
+    def __init__(self, prompt_type: str = None, kind: str = None):
+        self.schema = SCHEMAS.get(prompt_type) if prompt_type else None
+        kind = kind or (self.schema or {}).get('type')
+        self.openers = {'object': '{', 'array': '['}.get(kind, '{[')
+        self.value = None
+        self.done = False
+        self._buffer = ''
+        self._pos = 0
+        self._start = None
+        self._stack = []
+        self._in_string = False
+
+    def feed(self, chunk: str):
+        """Add text; return the extracted value once complete, else None"""
+        if self.done:
+            return self.value
+        self._buffer += chunk
+        self._scan()
+        return self.value if self.done else None
+
+    def finish(self):
+        """End of input: repair a truncated candidate if nothing complete was found"""
+        if not self.done and self._start is not None:
+            value = _close_truncated(self._buffer[self._start:])
+            if value is not None and self._accept(value):
+                logger.info("Recovered truncated JSON from LLM output")
+        return self.value
+
+    def _accept(self, value) -> bool:
+        if self.schema is not None:
+            errors = validate(value, self.schema)
+            if errors:
+                logger.debug(f"JSON candidate rejected: {'; '.join(errors[:3])}")
+                return False
+        self.value = value
+        self.done = True
+        return True
+
+    def _restart(self):
+        """Abandon the current candidate and rescan from just after its opening bracket"""
+        self._pos = self._start + 1
+        self._start = None
+        self._stack = []
+        self._in_string = False
+
+    def _scan(self):
+        # Jump between structural characters with regexes rather than stepping
+        # through every character in Python
+        buffer = self._buffer
+        find_opener = _OPENER_PATTERNS[self.openers]
+        while self._pos < len(buffer) and not self.done:
+            if self._start is None:
+                match = find_opener.search(buffer, self._pos)
+                if not match:
+                    self._pos = len(buffer)
+                    return
+                self._start = match.start()
+                self._stack = [CLOSERS[match.group()]]
+                self._pos = match.end()
+                continue
+
+            if self._in_string:
+                match = _STRING_SPECIAL.search(buffer, self._pos)
+                if not match:
+                    self._pos = len(buffer)
+                    return
+                if match.group() == '\\':
+                    self._pos = match.end() + 1  # skip the escaped character, even if not here yet
+                else:
+                    self._in_string = False
+                    self._pos = match.end()
+                continue
+
+            match = _STRUCTURAL.search(buffer, self._pos)
+            if not match:
+                self._pos = len(buffer)
+                return
+            char = match.group()
+            self._pos = match.end()
+            if char == '"':
+                self._in_string = True
+            elif char in CLOSERS:
+                self._stack.append(CLOSERS[char])
+            else:
+                if char != self._stack[-1]:
+                    self._restart()
+                    continue
+                self._stack.pop()
+                if not self._stack:
+                    try:
+                        value = _loads(buffer[self._start:self._pos])
+                    except ValueError:
+                        value = None
+                    if value is None or not self._accept(value):
+                        self._restart()
+
+
+def extract_json(text: str, prompt_type: str = None, kind: str = None):
+    """First schema-valid JSON value in a completion, None if there is none"""
+    if not text:
+        return None
+    extractor = JSONExtractor(prompt_type, kind)
+    # Fast path for well-formed output: decode in C from the first opening bracket,
+    # ignoring whatever follows the value
+    match = _OPENER_PATTERNS[extractor.openers].search(text)
+    if match:
+        try:
+            value, _ = _DECODER.raw_decode(text, match.start())
+        except ValueError:
+            value = None
+        if value is not None and extractor._accept(value):
+            return value
+    if extractor.feed(text) is not None:
+        return extractor.value
+    return extractor.finish()
+
+
+def extract_json_from_stream(deltas, prompt_type: str = None, kind: str = None):
+    """
+    Consume streamed text deltas until a complete value arrives; stops reading
+    (so the caller can close the stream) as soon as it does.
+    """
+    extractor = JSONExtractor(prompt_type, kind)
+    for delta in deltas:
+        if extractor.feed(delta) is not None:
+            return extractor.value
+    return extractor.finish()
@@ -0,0 +1,190 @@
+"""
+Content-addressed cache for LLM completions with TTL and LRU eviction
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Request parameters that change the completion and therefore belong in the key
+SAMPLING_PARAMS = (
+    'temperature', 'top_p', 'max_tokens', 'n', 'stop', 'seed',
+    'presence_penalty', 'frequency_penalty', 'response_format',
+)
+
+
+def _normalize_content(content) -> str:
+    """Collapse whitespace so cosmetic prompt formatting does not split the cache"""
+    if not isinstance(content, str):
+        content = json.dumps(content, sort_keys=True)
+    return re.sub(r'\s+', ' ', content).strip()
+
+
+def normalize_messages(messages: list) -> list:
+    """Normalized message list used for cache keys"""
+    return [
+        {'role': message.get('role', 'user'), 'content': _normalize_content(message.get('content', ''))}
+        for message in messages
+    ]
+
+
+def make_cache_key(model: str, messages: list, params: dict) -> str:
+    """Content address for a completion: model + normalized messages + sampling params"""
+    payload = {
+        'model': model,
+        'messages': normalize_messages(messages),
+        'params': {name: params[name] for name in SAMPLING_PARAMS if params.get(name) is not None},
+    }
+    encoded = json.dumps(payload, sort_keys=True, separators=(',', ':'), default=str)
+    return 'llm:' + hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+class LocMemLRUCache:
+    """In-process LRU cache with per-entry TTL"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires < time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value, ttl: float):
+        with self._lock:
+            self._data[key] = (time.time() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class DjangoCacheBackend:
+    """Stores completions in a configured Django cache alias"""
+
+    def __init__(self, alias: str):
+        self.alias = alias
+
+    @property
+    def _cache(self):
+        from django.core.cache import caches
+        return caches[self.alias]
+
+    def get(self, key: str):
+        return self._cache.get(key)
+
+    def set(self, key: str, value, ttl: float):
+        self._cache.set(key, value, timeout=ttl)
+
+    def clear(self):
+        self._cache.clear()
+
+
+class SQLiteCache:
+    """SQLite file cache shared by every gunicorn worker on the host"""
+
+    def __init__(self, path, max_entries: int):
+        self.path = str(path)
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._writes = 0
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS llm_cache ('
+                'key TEXT PRIMARY KEY, value TEXT NOT NULL, '
+                'expires REAL NOT NULL, last_access REAL NOT NULL)'
+            )
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key: str):
+        conn = self._connection()
+        now = time.time()
+        row = conn.execute('SELECT value, expires FROM llm_cache WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        if row[1] < now:
+            conn.execute('DELETE FROM llm_cache WHERE key = ?', (key,))
+            return None
+        conn.execute('UPDATE llm_cache SET last_access = ? WHERE key = ?', (now, key))
+        return json.loads(row[0])
+
+    def set(self, key: str, value, ttl: float):
+        conn = self._connection()
+        now = time.time()
+        conn.execute(
+            'INSERT OR REPLACE INTO llm_cache (key, value, expires, last_access) VALUES (?, ?, ?, ?)',
+            (key, json.dumps(value), now + ttl, now)
+        )
+        self._writes += 1
+        if self._writes % 50 == 0:
+            self._evict(conn, now)
+
+    def _evict(self, conn, now: float):
+        """Drop expired rows, then the least recently used ones above max_entries"""
+        conn.execute('DELETE FROM llm_cache WHERE expires < ?', (now,))
+        conn.execute(
+            'DELETE FROM llm_cache WHERE key IN ('
+            'SELECT key FROM llm_cache ORDER BY last_access DESC LIMIT -1 OFFSET ?)',
+            (self.max_entries,)
+        )
+
+    def clear(self):
+        self._connection().execute('DELETE FROM llm_cache')
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_cache():
+    """Configured cache backend for this process, or None when caching is disabled"""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                kind = settings.AI_CACHE_BACKEND
+                if kind == 'django':
+                    _backend = DjangoCacheBackend(settings.AI_CACHE_ALIAS)
+                elif kind == 'sqlite':
+                    _backend = SQLiteCache(settings.AI_CACHE_SQLITE_PATH, settings.AI_CACHE_MAX_ENTRIES)
+                elif kind == 'locmem':
+                    _backend = LocMemLRUCache(settings.AI_CACHE_MAX_ENTRIES)
+                else:
+                    _backend = False
+    return _backend or None
+
+
+def get_ttl(prompt_type: str, params: dict) -> float:
+    """TTL for a prompt type; 0 disables caching (e.g. high-temperature chat)"""
+    temperature = params.get('temperature')
+    if temperature is not None and temperature > settings.AI_CACHE_MAX_TEMPERATURE:
+        return 0
+    return settings.AI_CACHE_TTLS.get(prompt_type, settings.AI_CACHE_DEFAULT_TTL)
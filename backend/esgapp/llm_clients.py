@@ -0,0 +1,161 @@
+"""
+Process-wide registry of pooled LLM clients (one per provider per worker)
+"""
+import asyncio
+import logging
+import os
+import threading
+import weakref
+
+import httpx
+from django.conf import settings
+from openai import AsyncOpenAI, OpenAI
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_clients = {}
+_owner_pid = None
+# Async clients are bound to the event loop that created their connections
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_provider_configs() -> dict:
+    """Return the configured providers keyed by name (only those with an API key)"""
+    providers = {}
+    if settings.GROQ_API_KEY:
+        providers['groq'] = {
+            'api_key': settings.GROQ_API_KEY,
+            'base_url': settings.AI_BASE_URL,
+            'model': settings.AI_MODEL,
+        }
+    if settings.OPENROUTER_API_KEY:
+        providers['openrouter'] = {
+            'api_key': settings.OPENROUTER_API_KEY,
+            'base_url': settings.OPENROUTER_BASE_URL,
+            'model': settings.OPENROUTER_MODEL,
+        }
+    return providers
+
+
+def available_providers() -> list:
+    """Names of configured providers in preference order"""
+    return list(get_provider_configs().keys())
+
+
+def get_provider_model(provider: str):
+    """Default model for a provider, or None if the provider is not configured"""
+    config = get_provider_configs().get(provider)
+    return config['model'] if config else None
+
+
+def _build_http_client() -> httpx.Client:
+    """Build an httpx client with the tuned pool, keep-alive and timeouts"""
+    limits = httpx.Limits(
+        max_connections=settings.AI_HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.AI_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=settings.AI_HTTP_KEEPALIVE_EXPIRY,
+    )
+    timeout = httpx.Timeout(
+        settings.AI_HTTP_TIMEOUT,
+        connect=settings.AI_HTTP_CONNECT_TIMEOUT,
+    )
+    return httpx.Client(limits=limits, timeout=timeout, follow_redirects=True)
+
+
+def _build_async_http_client() -> httpx.AsyncClient:
+    """Async counterpart of _build_http_client with a larger pool for ASGI workers"""
+    limits = httpx.Limits(
+        max_connections=settings.AI_ASYNC_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.AI_ASYNC_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=settings.AI_HTTP_KEEPALIVE_EXPIRY,
+    )
+    timeout = httpx.Timeout(
+        settings.AI_HTTP_TIMEOUT,
+        connect=settings.AI_HTTP_CONNECT_TIMEOUT,
+    )
+    return httpx.AsyncClient(limits=limits, timeout=timeout, follow_redirects=True)
+
+
+def _reset_after_fork():
+    """Drop clients inherited from a parent process (e.g. gunicorn --preload)"""
+    global _owner_pid
+    pid = os.getpid()
+    if _owner_pid != pid:
+        # Sockets shared with the parent must not be reused, just forget them
+        _clients.clear()
+        _owner_pid = pid
+
+
+def get_client(provider: str = 'groq'):
+    """
+    Return the shared OpenAI client for a provider, creating it on first use.
+    Returns None when the provider is not configured or fails to initialise.
+    """
+    with _lock:
+        _reset_after_fork()
+        if provider in _clients:
+            return _clients[provider]
+
+        config = get_provider_configs().get(provider)
+        if not config:
+            return None
+
+        try:
+            client = OpenAI(
+                api_key=config['api_key'],
+                base_url=config['base_url'],
+                max_retries=settings.AI_HTTP_MAX_RETRIES,
+                http_client=_build_http_client(),
+            )
+            logger.info(f"Initialized pooled {provider} client with base URL: {config['base_url']}")
+        except Exception as e:
+            logger.error(f"Failed to initialize {provider} client: {e}")
+            return None
+
+        _clients[provider] = client
+        return client
+
+
+def get_async_client(provider: str = 'groq'):
+    """
+    Return the shared AsyncOpenAI client for a provider on the running event loop.
+    Must be called from a coroutine; returns None when the provider is not configured.
+    """
+    loop = asyncio.get_running_loop()
+    with _lock:
+        clients = _async_clients.setdefault(loop, {})
+        if provider in clients:
+            return clients[provider]
+
+        config = get_provider_configs().get(provider)
+        if not config:
+            return None
+
+        try:
+            client = AsyncOpenAI(
+                api_key=config['api_key'],
+                base_url=config['base_url'],
+                max_retries=settings.AI_HTTP_MAX_RETRIES,
+                http_client=_build_async_http_client(),
+            )
+            logger.info(f"Initialized async {provider} client with base URL: {config['base_url']}")
+        except Exception as e:
+            logger.error(f"Failed to initialize async {provider} client: {e}")
+            return None
+
+        clients[provider] = client
+        return client
+
+
+def reset_clients():
+    """Close and forget every pooled client (used by tests and settings changes)"""
+    with _lock:
+        for client in _clients.values():
+            try:
+                client.close()
+            except Exception:
+                pass
+        _clients.clear()
+        # Async clients can only be closed on their own loop; dropping them is enough
+        _async_clients.clear()
@@ -0,0 +1,411 @@
+"""
+Single entry point for chat completions (response caching, provider routing,
+rate limits, latency budgets, structured output, adaptive max_tokens, health
+tracking and telemetry)
+"""
+import asyncio
+import logging
+import math
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+from openai import APITimeoutError, BadRequestError, RateLimitError
+from openai.types.chat import ChatCompletion
+
+from . import llm_metrics, token_budget
+from .json_extraction import SCHEMAS, extract_json
+from .llm_cache import get_cache, get_ttl, make_cache_key
+from .llm_router import llm_router
+from .prompt_context import estimate_tokens
+from .rate_limiter import RateLimitExceeded, rate_limiter
+from .structured_output import is_response_format_error, mark_unsupported, response_format
+
+logger = logging.getLogger(__name__)
+
+_hedge_executor = None
+_hedge_executor_lock = threading.Lock()
+# Async calls abandoned at their budget keep running to warm the cache
+_background_tasks = set()
+
+
+class LatencyBudgetExceeded(TimeoutError):
+    """No provider answered within the prompt type's latency budget"""
+
+
+def _dump_response(response) -> dict:
+    return response.model_dump(mode='json')
+
+
+def _load_response(data: dict) -> ChatCompletion:
+    try:
+        return ChatCompletion.model_validate(data)
+    except AttributeError:  # pydantic v1
+        return ChatCompletion.parse_obj(data)
+
+
+def _cache_lookup(prompt_type: str, cache_ttl, params: dict):
+    """Return (cache, key, ttl, cached_response); key is None when the call is not cacheable"""
+    cache = get_cache()
+    ttl = get_ttl(prompt_type, params) if cache_ttl is None else cache_ttl
+    if not cache or ttl <= 0:
+        return cache, None, ttl, None
+
+    key = make_cache_key(params.get('model'), params.get('messages', []), params)
+    try:
+        cached = cache.get(key)
+    except Exception as e:
+        logger.warning(f"LLM cache read failed: {e}")
+        cached = None
+    if cached is not None:
+        logger.info(f"LLM cache hit for {prompt_type}")
+        return cache, key, ttl, _load_response(cached)
+    return cache, key, ttl, None
+
+
+def _cache_store(cache, key, ttl, response):
+    """Cache a successful, non-empty completion"""
+    if key and response.choices and response.choices[0].message.content:
+        try:
+            cache.set(key, _dump_response(response), ttl)
+        except Exception as e:
+            logger.warning(f"LLM cache write failed: {e}")
+
+
+def get_budget(prompt_type: str) -> float:
+    """Latency budget in seconds for a prompt type (0 = wait for the client timeout)"""
+    return settings.AI_LATENCY_BUDGETS.get(prompt_type, 0)
+
+
+def _hedge_delay(provider, budget: float) -> float:
+    """Seconds to wait on a call before hedging: the provider's recent latency percentile"""
+    delay = llm_router.latency_percentile(provider, settings.AI_HEDGE_PERCENTILE)
+    if delay is None:
+        delay = settings.AI_HEDGE_DEFAULT_DELAY
+    return min(delay, budget)
+
+
+def _get_hedge_executor() -> ThreadPoolExecutor:
+    """Pool running budgeted calls; abandoned calls finish here in the background"""
+    global _hedge_executor
+    with _hedge_executor_lock:
+        if _hedge_executor is None:
+            _hedge_executor = ThreadPoolExecutor(
+                max_workers=settings.AI_HEDGE_MAX_WORKERS, thread_name_prefix='llm-hedge'
+            )
+        return _hedge_executor
+
+
+def _parse_ok(prompt_type: str, response, structured: bool) -> bool:
+    """Record whether a JSON prompt's answer parses; always True for free-text prompts"""
+    if prompt_type not in SCHEMAS:
+        return True
+    content = response.choices[0].message.content if response.choices else None
+    ok = extract_json(content or '', prompt_type) is not None
+    llm_metrics.record_parse(prompt_type, 'structured' if structured else 'prompt', ok)
+    return ok
+
+
+def _prompt_tokens(params: dict) -> int:
+    return estimate_tokens(''.join(str(message.get('content', '')) for message in params.get('messages', [])))
+
+
+def _requested_tokens(params: dict) -> int:
+    """Tokens a call may use, as rate limits count them: prompt plus max_tokens"""
+    return _prompt_tokens(params) + (params.get('max_tokens') or 0)
+
+
+def _usage(params: dict, response):
+    """(prompt tokens, completion tokens) from usage when the provider sends it, else estimated"""
+    usage = getattr(response, 'usage', None)
+    prompt_tokens = getattr(usage, 'prompt_tokens', None)
+    completion_tokens = getattr(usage, 'completion_tokens', None)
+    if prompt_tokens is None:
+        prompt_tokens = _prompt_tokens(params)
+    if completion_tokens is None:
+        completion_tokens = estimate_tokens(response.choices[0].message.content or '') if response.choices else 0
+    return prompt_tokens, completion_tokens
+
+
+def _record_success(prompt_type, provider, params, started, response, ticket):
+    elapsed = time.monotonic() - started
+    prompt_tokens, completion_tokens = _usage(params, response)
+    llm_router.record_success(provider, elapsed)
+    llm_metrics.record_call(prompt_type, provider, params.get('model'), 'ok', elapsed, prompt_tokens, completion_tokens)
+    rate_limiter.settle(ticket, prompt_tokens + completion_tokens)
+    token_budget.record_completion(prompt_type, params, response)
+
+
+def _record_failure(prompt_type, provider, params, started, error, ticket, streamed_text=''):
+    llm_router.record_failure(provider, error)
+    llm_metrics.record_call(prompt_type, provider, params.get('model'), 'error', time.monotonic() - started)
+    # Refund the reservation: a call that failed used no tokens unless the provider
+    # may have processed the prompt (a timeout) or already streamed part of the answer
+    used_tokens = 0
+    if streamed_text:
+        used_tokens = _prompt_tokens(params) + estimate_tokens(streamed_text)
+    elif isinstance(error, APITimeoutError):
+        used_tokens = _prompt_tokens(params)
+    rate_limiter.settle(ticket, used_tokens)
+    if isinstance(error, RateLimitError):
+        rate_limiter.penalize(provider, _retry_after(error))
+
+
+def _retry_after(error) -> float:
+    """Seconds a 429 asks us to wait (Retry-After header), 1 when absent"""
+    try:
+        return max(1.0, float(error.response.headers.get('retry-after')))
+    except (AttributeError, TypeError, ValueError):
+        return 1.0
+
+
+def _attempt(prompt_type, provider, client, params, cache, key, ttl):
+    """
+    One provider call, recorded by the router and cached on success. Answers
+    that do not parse are not cached, so a retry gets a fresh completion.
+    """
+    fmt = response_format(prompt_type, provider, params.get('model'))
+    ticket = rate_limiter.acquire(provider, prompt_type, _requested_tokens(params))
+    started = time.monotonic()
+    try:
+        try:
+            response = client.chat.completions.create(**params, **({'response_format': fmt} if fmt else {}))
+        except BadRequestError as e:
+            if not fmt or not is_response_format_error(e):
+                raise
+            mark_unsupported(provider, params.get('model'), e)
+            fmt = None
+            response = client.chat.completions.create(**params)
+    except Exception as e:
+        _record_failure(prompt_type, provider, params, started, e, ticket)
+        raise
+    _record_success(prompt_type, provider, params, started, response, ticket)
+    if _parse_ok(prompt_type, response, bool(fmt)):
+        _cache_store(cache, key, ttl, response)
+    return response
+
+
+async def _aattempt(prompt_type, provider, client, params, cache, key, ttl):
+    """Async variant of _attempt"""
+    fmt = response_format(prompt_type, provider, params.get('model'))
+    ticket = await rate_limiter.aacquire(provider, prompt_type, _requested_tokens(params))
+    started = time.monotonic()
+    try:
+        try:
+            response = await client.chat.completions.create(**params, **({'response_format': fmt} if fmt else {}))
+        except BadRequestError as e:
+            if not fmt or not is_response_format_error(e):
+                raise
+            mark_unsupported(provider, params.get('model'), e)
+            fmt = None
+            response = await client.chat.completions.create(**params)
+    except Exception as e:
+        _record_failure(prompt_type, provider, params, started, e, ticket)
+        raise
+    _record_success(prompt_type, provider, params, started, response, ticket)
+    if _parse_ok(prompt_type, response, bool(fmt)):
+        _cache_store(cache, key, ttl, response)
+    return response
+
+
+def _budgeted(prompt_type, budget, attempts, cache, key, ttl):
+    """
+    Run attempts on the hedge pool within budget seconds. The next provider is
+    started when a call fails or, once, when the first call outlives the hedge
+    delay; the first success wins. Calls still running at the deadline are left
+    to finish in the background.
+    """
+    executor = _get_hedge_executor()
+    deadline = time.monotonic() + budget
+    pending = set()
+    error = None
+
+    def launch():
+        attempt = next(attempts, None)
+        if attempt is not None:
+            pending.add(executor.submit(_attempt, prompt_type, *attempt, cache, key, ttl))
+        return attempt
+
+    primary_provider = launch()[0]
+    hedge_at = time.monotonic() + _hedge_delay(primary_provider, budget)
+    while pending:
+        now = time.monotonic()
+        if now >= deadline:
+            break
+        done, _ = wait(pending, timeout=min(hedge_at, deadline) - now, return_when=FIRST_COMPLETED)
+        for future in done:
+            pending.discard(future)
+            if future.exception() is None:
+                return future.result()
+            error = future.exception()
+        if done and not pending:
+            launch()  # fail over
+        elif not done and time.monotonic() >= hedge_at:
+            hedge_at = math.inf
+            if launch():
+                logger.info(f"LLM hedge: {prompt_type} call slower than expected, also trying the next provider")
+
+    if pending:
+        logger.warning(f"LLM {prompt_type} call exceeded its {budget:.0f}s budget")
+        raise LatencyBudgetExceeded(f"{prompt_type} call exceeded its {budget:.0f}s latency budget")
+    raise error
+
+
+async def _abudgeted(prompt_type, budget, attempts, cache, key, ttl):
+    """Async variant of _budgeted; abandoned calls keep running on the event loop"""
+    deadline = time.monotonic() + budget
+    pending = set()
+    error = None
+
+    def launch():
+        attempt = next(attempts, None)
+        if attempt is not None:
+            pending.add(asyncio.ensure_future(_aattempt(prompt_type, *attempt, cache, key, ttl)))
+        return attempt
+
+    primary_provider = launch()[0]
+    hedge_at = time.monotonic() + _hedge_delay(primary_provider, budget)
+    while pending:
+        now = time.monotonic()
+        if now >= deadline:
+            break
+        done, _ = await asyncio.wait(pending, timeout=min(hedge_at, deadline) - now, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            pending.discard(task)
+            if task.exception() is None:
+                return task.result()
+            error = task.exception()
+        if done and not pending:
+            launch()  # fail over
+        elif not done and time.monotonic() >= hedge_at:
+            hedge_at = math.inf
+            if launch():
+                logger.info(f"LLM hedge: {prompt_type} call slower than expected, also trying the next provider")
+
+    if pending:
+        for task in pending:
+            _background_tasks.add(task)
+            task.add_done_callback(_forget_task)
+        logger.warning(f"LLM {prompt_type} call exceeded its {budget:.0f}s budget")
+        raise LatencyBudgetExceeded(f"{prompt_type} call exceeded its {budget:.0f}s latency budget")
+    raise error
+
+
+def _forget_task(task):
+    _background_tasks.discard(task)
+    if not task.cancelled():
+        task.exception()  # already recorded by the router; avoid "never retrieved" warnings
+
+
+def chat_completion(client, *, prompt_type: str, provider: str = None, cache_ttl: float = None,
+                    budget: float = None, **params):
+    """
+    Drop-in replacement for ``client.chat.completions.create(**params)``.
+    Identical requests are served from the LLM cache while their TTL lasts.
+    When a provider is named the router picks the client: a failed call is
+    retried on the next healthy provider and ``client`` is only used unrouted.
+    With a latency budget (AI_LATENCY_BUDGETS per prompt type unless given) a
+    slow call is hedged on the next provider, and LatencyBudgetExceeded is
+    raised once the budget is spent so the caller can use its fallback. Each
+    provider call first waits for rate-limit capacity (see rate_limiter).
+    """
+    cache, key, ttl, cached = _cache_lookup(prompt_type, cache_ttl, params)
+    if cached is not None:
+        llm_metrics.record_call(prompt_type, 'cache', params.get('model'), 'cache_hit')
+        return cached
+
+    # Cache key above uses the call site's max_tokens, so adapting it keeps cache hits
+    params = token_budget.adapt_params(prompt_type, params)
+    attempts = llm_router.attempts(provider, client, params)
+    budget = get_budget(prompt_type) if budget is None else budget
+    if budget > 0:
+        return _budgeted(prompt_type, budget, attempts, cache, key, ttl)
+
+    error = None
+    for attempt in attempts:
+        try:
+            return _attempt(prompt_type, *attempt, cache, key, ttl)
+        except Exception as e:
+            error = e
+    raise error
+
+
+async def achat_completion(client, *, prompt_type: str, provider: str = None, cache_ttl: float = None,
+                           budget: float = None, **params):
+    """
+    Async variant of chat_completion for an ``AsyncOpenAI`` client.
+    Shares the cache, routing, budgets and health tracking; cache access stays
+    synchronous as it is negligible next to the completion itself.
+    """
+    cache, key, ttl, cached = _cache_lookup(prompt_type, cache_ttl, params)
+    if cached is not None:
+        llm_metrics.record_call(prompt_type, 'cache', params.get('model'), 'cache_hit')
+        return cached
+
+    params = token_budget.adapt_params(prompt_type, params)
+    attempts = llm_router.attempts(provider, client, params, use_async=True)
+    budget = get_budget(prompt_type) if budget is None else budget
+    if budget > 0:
+        return await _abudgeted(prompt_type, budget, attempts, cache, key, ttl)
+
+    error = None
+    for attempt in attempts:
+        try:
+            return await _aattempt(prompt_type, *attempt, cache, key, ttl)
+        except Exception as e:
+            error = e
+    raise error
+
+
+def stream_chat_completion(client, *, prompt_type: str, provider: str = None, **params):
+    """
+    Stream a chat completion, yielding text deltas as the provider sends them.
+    Streams bypass the response cache. They fail over to another provider only
+    until the first delta is sent; health is recorded when the stream ends.
+    """
+    error = None
+    params = token_budget.adapt_params(prompt_type, params)
+    for attempt_provider, attempt_client, attempt_params in llm_router.attempts(provider, client, params):
+        try:
+            ticket = rate_limiter.acquire(attempt_provider, prompt_type, _requested_tokens(attempt_params))
+        except RateLimitExceeded as e:
+            error = e
+            continue
+        started = time.monotonic()
+        stream = None
+        sent = False
+        parts = []
+        finish_reason = None
+        try:
+            stream = attempt_client.chat.completions.create(stream=True, **attempt_params)
+            for chunk in stream:
+                if not chunk.choices:
+                    continue
+                finish_reason = chunk.choices[0].finish_reason or finish_reason
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    sent = True
+                    parts.append(delta)
+                    yield delta
+        except Exception as e:
+            _record_failure(prompt_type, attempt_provider, attempt_params, started, e, ticket, ''.join(parts))
+            if sent:
+                raise
+            error = e
+            continue
+        finally:
+            # Release the pooled connection if the consumer stops early
+            if stream is not None:
+                stream.close()
+
+        elapsed = time.monotonic() - started
+        text = ''.join(parts)
+        prompt_tokens, completion_tokens = _prompt_tokens(attempt_params), estimate_tokens(text)
+        llm_router.record_success(attempt_provider, elapsed)
+        llm_metrics.record_call(prompt_type, attempt_provider, attempt_params.get('model'), 'ok', elapsed,
+                                prompt_tokens, completion_tokens)
+        rate_limiter.settle(ticket, prompt_tokens + completion_tokens)
+        token_budget.record_stream(prompt_type, attempt_params, text, finish_reason)
+        return
+    raise error
@@ -0,0 +1,258 @@
+"""
+In-process LLM metrics
+
+Every completion the gateway makes (or serves from cache) is recorded per
+prompt type, provider and model: outcome, latency and prompt/completion tokens.
+Rule-based fallbacks are counted per prompt type, and parse outcomes of
+JSON-returning completions are split by whether the provider was asked for
+structured output ('structured') or only the prompt asks for JSON ('prompt').
+
+Histograms keep lifetime bucket counts (for Prometheus, which expects
+monotonic counters) and a rolling AI_METRICS_WINDOW of time slices for the
+percentiles shown in the JSON view. Counts are per worker process.
+"""
+import bisect
+import threading
+import time
+from collections import defaultdict, deque
+
+from django.conf import settings
+
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30, 60)
+TOKEN_BUCKETS = (50, 100, 250, 500, 1000, 2000, 4000, 8000)
+OUTCOMES = ('ok', 'error', 'cache_hit')
+# The rolling window is kept as this many slices
+WINDOW_SLICES = 10
+
+_lock = threading.Lock()
+# prompt_type -> mode -> {'parsed': n, 'failed': n}
+_parse_counts = defaultdict(lambda: defaultdict(lambda: {'parsed': 0, 'failed': 0}))
+# (prompt_type, provider, model) -> series name -> RollingHistogram
+_series = {}
+# prompt_type -> RollingHistogram
+_fallbacks = {}
+
+
+class RollingHistogram:
+    """
+    Bucketed observations, lifetime and over the rolling window. With no
+    buckets it is just a rolling counter (count and sum).
+    """
+
+    def __init__(self, buckets=()):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last bucket is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._slices = deque()  # [slice_start, counts, sum, count, max]
+
+    def observe(self, value: float, now: float):
+        index = bisect.bisect_left(self.buckets, value)
+        self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+        slice_seconds = settings.AI_METRICS_WINDOW / WINDOW_SLICES
+        start = now - now % slice_seconds
+        if not self._slices or self._slices[-1][0] != start:
+            self._slices.append([start, [0] * len(self.counts), 0.0, 0, value])
+        current = self._slices[-1]
+        current[1][index] += 1
+        current[2] += value
+        current[3] += 1
+        current[4] = max(current[4], value)
+        self._prune(now)
+
+    def _prune(self, now: float):
+        cutoff = now - settings.AI_METRICS_WINDOW
+        while self._slices and self._slices[0][0] < cutoff:
+            self._slices.popleft()
+
+    def window(self, now: float):
+        """(bucket counts, sum, count, max) over the rolling window"""
+        self._prune(now)
+        counts = [0] * len(self.counts)
+        total = 0.0
+        count = 0
+        largest = None
+        for _, slice_counts, slice_sum, slice_count, slice_max in self._slices:
+            for index, value in enumerate(slice_counts):
+                counts[index] += value
+            total += slice_sum
+            count += slice_count
+            largest = slice_max if largest is None else max(largest, slice_max)
+        return counts, total, count, largest
+
+    def quantile(self, counts: list, q: float, largest=None):
+        """
+        Estimate a quantile from bucket counts, interpolating inside the bucket
+        and never above the largest observed value
+        """
+        count = sum(counts)
+        if not count or not self.buckets:
+            return None
+        rank = q * count
+        seen = 0
+        for index, bucket_count in enumerate(counts):
+            if seen + bucket_count >= rank and bucket_count:
+                if index == len(self.buckets):
+                    estimate = largest if largest is not None else self.buckets[-1]
+                else:
+                    lower = self.buckets[index - 1] if index else 0
+                    upper = self.buckets[index]
+                    estimate = lower + (upper - lower) * (rank - seen) / bucket_count
+                if largest is not None:
+                    estimate = min(estimate, largest)
+                return round(estimate, 3)
+            seen += bucket_count
+        return None
+
+
+def _new_series() -> dict:
+    series = {outcome: RollingHistogram() for outcome in OUTCOMES}
+    series['latency'] = RollingHistogram(LATENCY_BUCKETS)
+    series['prompt_tokens'] = RollingHistogram(TOKEN_BUCKETS)
+    series['completion_tokens'] = RollingHistogram(TOKEN_BUCKETS)
+    return series
+
+
+def record_call(prompt_type: str, provider, model, outcome: str, seconds: float = None,
+                prompt_tokens: int = None, completion_tokens: int = None):
+    """Record one completion: outcome is 'ok', 'error' or 'cache_hit'"""
+    now = time.monotonic()
+    key = (prompt_type or 'unknown', provider or 'default', model or 'unknown')
+    with _lock:
+        series = _series.get(key)
+        if series is None:
+            series = _series[key] = _new_series()
+        series[outcome].observe(1, now)
+        if seconds is not None:
+            series['latency'].observe(seconds, now)
+        if prompt_tokens is not None:
+            series['prompt_tokens'].observe(prompt_tokens, now)
+        if completion_tokens is not None:
+            series['completion_tokens'].observe(completion_tokens, now)
+
+
+def record_fallback(prompt_type: str):
+    """Count a rule-based answer served in place of the AI one"""
+    now = time.monotonic()
+    with _lock:
+        _fallbacks.setdefault(prompt_type, RollingHistogram()).observe(1, now)
+
+
+def record_parse(prompt_type: str, mode: str, ok: bool):
+    with _lock:
+        _parse_counts[prompt_type][mode]['parsed' if ok else 'failed'] += 1
+
+
+def parse_stats() -> dict:
+    """Parse counts and failure rate per prompt type and mode"""
+    with _lock:
+        stats = {}
+        for prompt_type, modes in _parse_counts.items():
+            stats[prompt_type] = {}
+            for mode, counts in modes.items():
+                total = counts['parsed'] + counts['failed']
+                stats[prompt_type][mode] = {
+                    **counts,
+                    'failure_rate': round(counts['failed'] / total, 4) if total else None,
+                }
+        return stats
+
+
+def _histogram_summary(histogram: RollingHistogram, now: float) -> dict:
+    counts, total, count, largest = histogram.window(now)
+    return {
+        'count': count,
+        'sum': round(total, 3),
+        'p50': histogram.quantile(counts, 0.50, largest),
+        'p95': histogram.quantile(counts, 0.95, largest),
+        'p99': histogram.quantile(counts, 0.99, largest),
+        'max': round(largest, 3) if largest is not None else None,
+    }
+
+
+def snapshot() -> dict:
+    """Rolling-window view: one entry per prompt type/provider/model, most tokens first"""
+    now = time.monotonic()
+    with _lock:
+        calls = []
+        for (prompt_type, provider, model), series in _series.items():
+            entry = {'prompt_type': prompt_type, 'provider': provider, 'model': model}
+            for outcome in OUTCOMES:
+                entry[outcome] = series[outcome].window(now)[2]
+            for name in ('latency', 'prompt_tokens', 'completion_tokens'):
+                entry[name] = _histogram_summary(series[name], now)
+            calls.append(entry)
+        fallbacks = {prompt_type: histogram.window(now)[2] for prompt_type, histogram in _fallbacks.items()}
+    calls.sort(key=lambda entry: entry['prompt_tokens']['sum'] + entry['completion_tokens']['sum'], reverse=True)
+    return {
+        'window_seconds': settings.AI_METRICS_WINDOW,
+        'calls': calls,
+        'fallbacks': fallbacks,
+        'parse': parse_stats(),
+    }
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels) -> str:
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + '}'
+
+
+def _prometheus_histogram(lines: list, name: str, histogram: RollingHistogram, labels: dict):
+    cumulative = 0
+    for bound, count in zip(list(histogram.buckets) + ['+Inf'], histogram.counts):
+        cumulative += count
+        lines.append(f"{name}_bucket{_labels(**labels, le=bound)} {cumulative}")
+    lines.append(f"{name}_sum{_labels(**labels)} {histogram.sum}")
+    lines.append(f"{name}_count{_labels(**labels)} {histogram.count}")
+
+
+def prometheus() -> str:
+    """Lifetime counters and histograms in the Prometheus text exposition format"""
+    lines = []
+    with _lock:
+        series_items = list(_series.items())
+        lines.append('# HELP esg_llm_calls_total LLM completions by outcome (ok, error, cache_hit)')
+        lines.append('# TYPE esg_llm_calls_total counter')
+        for (prompt_type, provider, model), series in series_items:
+            for outcome in OUTCOMES:
+                labels = _labels(prompt_type=prompt_type, provider=provider, model=model, outcome=outcome)
+                lines.append(f"esg_llm_calls_total{labels} {series[outcome].count}")
+
+        for name, unit_help in (
+            ('latency', 'LLM call latency in seconds'),
+            ('prompt_tokens', 'Prompt tokens per LLM call'),
+            ('completion_tokens', 'Completion tokens per LLM call'),
+        ):
+            metric = 'esg_llm_latency_seconds' if name == 'latency' else f'esg_llm_{name}'
+            lines.append(f'# HELP {metric} {unit_help}')
+            lines.append(f'# TYPE {metric} histogram')
+            for (prompt_type, provider, model), series in series_items:
+                _prometheus_histogram(lines, metric, series[name],
+                                      {'prompt_type': prompt_type, 'provider': provider, 'model': model})
+
+        lines.append('# HELP esg_llm_fallbacks_total Rule-based answers served instead of AI ones')
+        lines.append('# TYPE esg_llm_fallbacks_total counter')
+        for prompt_type, histogram in _fallbacks.items():
+            lines.append(f"esg_llm_fallbacks_total{_labels(prompt_type=prompt_type)} {histogram.count}")
+
+        lines.append('# HELP esg_llm_parse_total JSON parse outcomes by output mode')
+        lines.append('# TYPE esg_llm_parse_total counter')
+        for prompt_type, modes in _parse_counts.items():
+            for mode, counts in modes.items():
+                for result, count in counts.items():
+                    labels = _labels(prompt_type=prompt_type, mode=mode, result=result)
+                    lines.append(f"esg_llm_parse_total{labels} {count}")
+    return '\n'.join(lines) + '\n'
+
+
+def reset():
+    with _lock:
+        _parse_counts.clear()
+        _series.clear()
+        _fallbacks.clear()
@@ -0,0 +1,236 @@
+"""
+Multi-provider LLM routing with circuit breakers and rolling latency stats
+
+Every gateway call names its preferred provider; the router turns that into an
+ordered list of attempts across the configured providers. Providers whose
+breaker is open are skipped without a network round-trip, the rest are ranked
+by rolling p95 latency, and a failed attempt moves on to the next provider
+instead of dropping straight to a rule-based fallback.
+"""
+import logging
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+
+from .llm_clients import available_providers, get_async_client, get_client, get_provider_model
+from .provider_health import provider_health
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on latency samples kept per provider, whatever the window
+MAX_SAMPLES = 500
+
+
+class ProviderUnavailableError(Exception):
+    """No configured provider can take the call right now (breakers open)"""
+
+
+class CircuitBreaker:
+    """closed -> open after consecutive failures -> half_open trial after a cool-down"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.state = 'closed'
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.trial_started = None
+
+    def _refresh(self, now: float):
+        if self.state == 'open' and now - self.opened_at >= settings.AI_ROUTER_OPEN_SECONDS:
+            self.state = 'half_open'
+            self.trial_started = None
+
+    def current_state(self) -> str:
+        with self._lock:
+            self._refresh(time.monotonic())
+            return self.state
+
+    def allow(self) -> bool:
+        """Whether a call may go out; in half_open only one trial call at a time"""
+        now = time.monotonic()
+        with self._lock:
+            self._refresh(now)
+            if self.state == 'closed':
+                return True
+            if self.state == 'half_open':
+                # A trial that never reported back (e.g. killed request) must not block forever
+                if self.trial_started is None or now - self.trial_started >= settings.AI_ROUTER_OPEN_SECONDS:
+                    self.trial_started = now
+                    return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = 'closed'
+            self.consecutive_failures = 0
+            self.trial_started = None
+
+    def record_failure(self) -> bool:
+        """Count a failure; True when this one opened the breaker"""
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.state == 'half_open' or (
+                self.state == 'closed' and self.consecutive_failures >= settings.AI_ROUTER_FAILURE_THRESHOLD
+            ):
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+                self.trial_started = None
+                return True
+            return False
+
+
+class LatencyTracker:
+    """Successful-call latencies over the last AI_ROUTER_LATENCY_WINDOW seconds"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._samples = deque(maxlen=MAX_SAMPLES)  # (timestamp, seconds)
+
+    def add(self, seconds: float):
+        with self._lock:
+            self._samples.append((time.monotonic(), seconds))
+
+    def _recent(self) -> list:
+        cutoff = time.monotonic() - settings.AI_ROUTER_LATENCY_WINDOW
+        with self._lock:
+            while self._samples and self._samples[0][0] < cutoff:
+                self._samples.popleft()
+            return sorted(seconds for _, seconds in self._samples)
+
+    @staticmethod
+    def _percentile(values: list, q: float):
+        if not values:
+            return None
+        return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+    def percentile(self, q: float):
+        return self._percentile(self._recent(), q)
+
+    def stats(self) -> dict:
+        values = self._recent()
+        return {
+            'samples': len(values),
+            'p50': self._percentile(values, 0.50),
+            'p95': self._percentile(values, 0.95),
+        }
+
+
+class LLMRouter:
+    """Per-process provider selection shared by every service class"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._breakers = {}
+        self._latency = {}
+
+    def _breaker(self, provider: str) -> CircuitBreaker:
+        with self._lock:
+            return self._breakers.setdefault(provider, CircuitBreaker())
+
+    def _tracker(self, provider: str) -> LatencyTracker:
+        with self._lock:
+            return self._latency.setdefault(provider, LatencyTracker())
+
+    def ranked(self, preferred: str = None) -> list:
+        """
+        Configured providers, best first: closed breakers before half-open ones,
+        then lowest p95. A provider without enough recent samples keeps its place
+        only if it is the preferred one; others must earn traffic with measurements.
+        """
+        providers = available_providers()
+        state_rank = {'closed': 0, 'half_open': 1, 'open': 2}
+
+        def key(provider):
+            stats = self._tracker(provider).stats()
+            if stats['samples'] >= settings.AI_ROUTER_MIN_SAMPLES:
+                latency = stats['p95']
+            else:
+                latency = 0.0 if provider == preferred else float('inf')
+            return (state_rank[self._breaker(provider).current_state()], latency, providers.index(provider))
+
+        return sorted(providers, key=key)
+
+    def best_provider(self, preferred: str = 'groq'):
+        """Provider the next call would try first, or None if every breaker is open"""
+        if not settings.AI_ROUTER_ENABLED:
+            providers = available_providers()
+            return preferred if preferred in providers else next(iter(providers), None)
+        for provider in self.ranked(preferred):
+            if self._breaker(provider).current_state() != 'open':
+                return provider
+        return None
+
+    def get_client(self, preferred: str = 'groq'):
+        """Pooled client of the best provider, None when nothing can take calls"""
+        provider = self.best_provider(preferred)
+        return get_client(provider) if provider else None
+
+    def get_async_client(self, preferred: str = 'groq'):
+        """Async counterpart of get_client (call from a coroutine)"""
+        provider = self.best_provider(preferred)
+        return get_async_client(provider) if provider else None
+
+    def attempts(self, provider, client, params: dict, use_async: bool = False):
+        """
+        Yield (provider, client, params) to try in order. Unrouted calls (no
+        provider, or AI_ROUTER_ENABLED off) get the caller's client as the only
+        attempt. Other providers are called with their own configured model.
+        """
+        if not provider or not settings.AI_ROUTER_ENABLED:
+            yield provider, client, params
+            return
+
+        tried = False
+        for candidate in self.ranked(provider):
+            candidate_client = get_async_client(candidate) if use_async else get_client(candidate)
+            if not candidate_client or not self._breaker(candidate).allow():
+                continue
+            tried = True
+            if candidate == provider:
+                yield candidate, candidate_client, params
+            else:
+                logger.info(f"LLM router: sending {provider} call to {candidate}")
+                yield candidate, candidate_client, {**params, 'model': get_provider_model(candidate)}
+
+        if not tried:
+            raise ProviderUnavailableError(f"No LLM provider available (preferred: {provider})")
+
+    def latency_percentile(self, provider, q: float):
+        """Recent latency percentile of a provider, None until it has enough samples"""
+        if not provider:
+            return None
+        tracker = self._tracker(provider)
+        if tracker.stats()['samples'] < settings.AI_ROUTER_MIN_SAMPLES:
+            return None
+        return tracker.percentile(q)
+
+    def record_success(self, provider, seconds: float):
+        if not provider:
+            return
+        self._breaker(provider).record_success()
+        self._tracker(provider).add(seconds)
+        provider_health.record_success(provider)
+
+    def record_failure(self, provider, error):
+        if not provider:
+            return
+        if self._breaker(provider).record_failure():
+            logger.warning(f"LLM router: circuit opened for {provider}: {str(error)[:200]}")
+        provider_health.record_failure(provider, error)
+
+    def status(self) -> dict:
+        """Breaker state and latency stats per configured provider"""
+        return {
+            provider: {
+                'circuit': self._breaker(provider).current_state(),
+                'consecutive_failures': self._breaker(provider).consecutive_failures,
+                **self._tracker(provider).stats(),
+            }
+            for provider in available_providers()
+        }
+
+
+# Shared router for this worker process
+llm_router = LLMRouter()
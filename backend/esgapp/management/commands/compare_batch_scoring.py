@@ -0,0 +1,106 @@
+"""
+Check the vectorized ESGProcessor batch scores (or, with --fallback, the compiled
+fallback scoring table) against the per-input path
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from esgapp import fallback_scoring
+from esgapp.ai_scoring_service import AIScoringService
+from esgapp.esg_engine import ESGProcessor
+from esgapp.models import ESGInput
+
+# Response fields the fallback table must reproduce from the baseline fallback
+FALLBACK_FIELDS = (
+    'environmental_score', 'social_score', 'governance_score', 'overall_esg_score',
+    'confidence_level', 'data_completeness',
+)
+
+
+class Command(BaseCommand):
+    help = 'Score stored ESG inputs with the batch and the per-input rules, report any difference and both timings'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, help='Only the first N inputs by id (default: all)')
+        parser.add_argument('--show', type=int, default=5, help='Print at most this many mismatching inputs')
+        parser.add_argument('--fallback', action='store_true',
+                            help='Check the AI fallback scoring table against the baseline field-by-field fallback instead')
+
+    def handle(self, *args, **options):
+        inputs = ESGInput.objects.select_related('business_profile').order_by('id')
+        if options['limit']:
+            inputs = inputs[:options['limit']]
+
+        if options['fallback']:
+            batch_scores, scalar_scores = self._fallback_batch_scores, self._baseline_fallback_scores
+        else:
+            batch_scores, scalar_scores = ESGProcessor.score_inputs_batch, self._scalar_scores
+
+        started = time.perf_counter()
+        batch = batch_scores(inputs)
+        batch_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        scalar = [scalar_scores(esg_input) for esg_input in list(inputs)]
+        scalar_seconds = time.perf_counter() - started
+
+        mismatches = 0
+        for row, (input_id, expected) in enumerate(scalar):
+            got = {name: batch[name][row] for name in expected}
+            if batch['id'][row] != input_id or got != expected:
+                mismatches += 1
+                if mismatches <= options['show']:
+                    diff = {name: (expected[name], got[name]) for name in expected if got[name] != expected[name]}
+                    self.stdout.write(f"ESG input {input_id}: (scalar, batch) {diff}")
+
+        self.stdout.write(
+            f"{len(scalar)} inputs, loading included: batch {batch_seconds * 1000:.1f} ms, "
+            f"per input {scalar_seconds * 1000:.1f} ms"
+        )
+        if mismatches:
+            raise CommandError(f"{mismatches} of {len(scalar)} inputs differ")
+        self.stdout.write(self.style.SUCCESS('Batch scores match the per-input scores exactly'))
+
+    @staticmethod
+    def _scalar_scores(esg_input):
+        env_score, env_completeness = ESGProcessor.calculate_environmental_score(esg_input)
+        social_score, social_completeness = ESGProcessor.calculate_social_score(esg_input)
+        gov_score, gov_completeness = ESGProcessor.calculate_governance_score(esg_input)
+        overall_score, confidence = ESGProcessor.calculate_overall_score(
+            env_score, social_score, gov_score,
+            env_completeness, social_completeness, gov_completeness
+        )
+        return esg_input.id, {
+            'environmental_score': env_score,
+            'environmental_completeness': env_completeness,
+            'social_score': social_score,
+            'social_completeness': social_completeness,
+            'governance_score': gov_score,
+            'governance_completeness': gov_completeness,
+            'overall_score': overall_score,
+            'confidence_level': confidence,
+            'data_completeness': (env_completeness + social_completeness + gov_completeness) / 3,
+        }
+
+    @staticmethod
+    def _fallback_batch_scores(inputs) -> dict:
+        """Fallback responses from one table evaluation without profile weights, as the baseline scores"""
+        matrix = fallback_scoring.queryset_matrix(inputs)
+        scores = fallback_scoring.score_matrix(matrix)
+        service = AIScoringService()
+        results = [
+            service._rule_based_result(esg_input, {field: values[row] for field, values in scores.items()})
+            for row, esg_input in enumerate(inputs)
+        ]
+        return {
+            'id': matrix['id'],
+            **{field: [result[field] for result in results] for field in FALLBACK_FIELDS},
+        }
+
+    @staticmethod
+    def _baseline_fallback_scores(esg_input):
+        # The baseline lives with the tests; only this check needs it
+        from esgapp.tests import baseline_fallback_scoring
+        result = baseline_fallback_scoring(esg_input)
+        return esg_input.id, {field: result[field] for field in FALLBACK_FIELDS}
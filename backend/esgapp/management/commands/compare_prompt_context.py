@@ -0,0 +1,43 @@
+"""
+Compare verbose and compact prompt context for stored ESG inputs
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from esgapp.ai_scoring_service import AIScoringService
+from esgapp.free_ai_service import FreeAIService
+from esgapp.models import ESGInput
+from esgapp.prompt_context import encode_business_context, estimate_tokens
+
+
+class Command(BaseCommand):
+    help = 'Print estimated prompt-context tokens in verbose and compact style (AI_PROMPT_CONTEXT)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--input-id', type=int, help='Only this ESG input (default: the 20 most recent)')
+        parser.add_argument('--show', action='store_true', help='Also print both contexts')
+
+    def handle(self, *args, **options):
+        inputs = ESGInput.objects.select_related('business_profile').order_by('-created_at')
+        if options['input_id']:
+            inputs = inputs.filter(id=options['input_id'])
+            if not inputs.exists():
+                raise CommandError(f"ESG input {options['input_id']} not found")
+        else:
+            inputs = inputs[:20]
+
+        scoring, analysis = AIScoringService(), FreeAIService()
+        for esg_input in inputs:
+            compact = encode_business_context(esg_input)
+            compact_tokens = estimate_tokens(compact)
+            self.stdout.write(f"ESG input {esg_input.id} ({esg_input.business_profile.business_name}): compact ~{compact_tokens} tokens")
+            for name, verbose in (
+                ('scoring', scoring._prepare_business_context(esg_input)),
+                ('comprehensive analysis', analysis._prepare_detailed_context(esg_input)),
+            ):
+                verbose_tokens = estimate_tokens(verbose)
+                saved = 100 * (verbose_tokens - compact_tokens) / verbose_tokens
+                self.stdout.write(f"  {name}: verbose ~{verbose_tokens} tokens, compact saves {saved:.0f}%")
+                if options['show']:
+                    self.stdout.write(verbose)
+            if options['show']:
+                self.stdout.write(compact + "\n")
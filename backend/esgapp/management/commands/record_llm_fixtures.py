@@ -0,0 +1,139 @@
+"""
+Record LLM fixtures from the real prompt builders for the mock LLM server
+"""
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from esgapp.ai_recommendation_service import AIRecommendationService
+from esgapp.ai_scoring_service import AIScoringService
+from esgapp.ai_views import _chatbot_context, _report_analysis_data
+from esgapp.free_ai_service import FreeAIService
+from esgapp.llm_cache import normalize_messages
+from esgapp.llm_gateway import chat_completion
+from esgapp.llm_router import llm_router
+from esgapp.mock_llm import classify_messages, fixture_key, write_fixtures
+from esgapp.models import ESGSnapshot
+from esgapp.views import (
+    _build_chat_messages, _fallback_chat_response, _fallback_impact_simulation, _fallback_top_opportunities,
+    _simulate_impact_request, _top_opportunities_request,
+)
+
+# Chat turns recorded per snapshot
+SAMPLE_QUERIES = [
+    "What should I focus on this month?",
+    "How do I implement a waste recycling program?",
+    "Why is my governance score low?",
+]
+
+
+def _recommendation_dicts(recommendations):
+    return [
+        {
+            'title': r.title, 'description': r.description, 'category': r.category,
+            'priority': r.priority, 'cost_level': r.cost_level, 'expected_impact': r.expected_impact,
+        }
+        for r in recommendations
+    ]
+
+
+class Command(BaseCommand):
+    help = 'Write record/replay fixtures for run_mock_llm from the prompt builders and stored snapshots'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=settings.AI_MOCK_FIXTURES)
+        parser.add_argument('--limit', type=int, default=20, help='Most recent snapshots to record')
+        parser.add_argument('--live', action='store_true',
+                            help='Record answers from the configured providers instead of the rule-based fallbacks')
+
+    def handle(self, *args, **options):
+        if options['live'] and not llm_router.best_provider():
+            raise CommandError("--live needs a configured, reachable LLM provider")
+
+        snapshots = ESGSnapshot.objects.select_related(
+            'business_profile', 'esg_input'
+        ).filter(esg_input__isnull=False).order_by('-created_at')[:options['limit']]
+        if not snapshots:
+            raise CommandError("No snapshots to record; process an ESG input first")
+
+        fixtures = {}
+        for snapshot in snapshots:
+            for prompt_type, request, fallback in self._requests(snapshot):
+                key = fixture_key(request['messages'])
+                if key in fixtures:
+                    continue
+                if classify_messages(request['messages']) != prompt_type:
+                    self.stdout.write(self.style.WARNING(
+                        f"{prompt_type} prompt does not match its marker in esgapp/mock_llm.PROMPT_MARKERS"
+                    ))
+                content = self._live_content(prompt_type, request) if options['live'] else fallback()
+                if content is None:
+                    continue
+                fixtures[key] = {
+                    'prompt_type': prompt_type,
+                    'key': key,
+                    'model': request.get('model'),
+                    'preview': normalize_messages(request['messages'])[-1]['content'][:120],
+                    'content': content,
+                }
+            self.stdout.write(f"Recorded snapshot {snapshot.id} ({snapshot.business_profile.business_name})")
+
+        write_fixtures(options['output'], list(fixtures.values()), 'live' if options['live'] else 'fallback')
+        self.stdout.write(self.style.SUCCESS(f"Wrote {len(fixtures)} fixtures to {options['output']}"))
+
+    def _live_content(self, prompt_type, request):
+        try:
+            response = chat_completion(None, cache_ttl=0, budget=0, **request)
+            return response.choices[0].message.content
+        except Exception as e:
+            self.stdout.write(self.style.WARNING(f"  {prompt_type} call failed, skipped: {e}"))
+            return None
+
+    def _requests(self, snapshot):
+        """(prompt_type, completion params, rule-based content) for every prompt builder"""
+        esg_input = snapshot.esg_input
+        scoring, recommender, analysis = AIScoringService(), AIRecommendationService(), FreeAIService()
+        model = analysis.get_available_client()[1] or settings.AI_MODEL
+
+        yield 'esg_scores', scoring._esg_scores_request(esg_input), \
+            lambda: json.dumps(scoring._fallback_scoring(esg_input))
+        for timeframe in (30, 60, 90):
+            yield 'roadmap', scoring._timeframe_roadmap_request(snapshot, timeframe), \
+                lambda timeframe=timeframe: json.dumps(scoring._fallback_timeframe_roadmap(timeframe))
+        yield 'recommendations', recommender._recommendations_request(snapshot), \
+            lambda: json.dumps(_recommendation_dicts(recommender._fallback_recommendations(snapshot))
+                               or recommender._simple_parse(''))
+
+        analysis_fallback = analysis._fallback_analysis(esg_input)
+        yield 'comprehensive_analysis', analysis._comprehensive_analysis_request(esg_input, model), \
+            lambda: json.dumps(analysis_fallback, default=str)
+        report_data = _report_analysis_data(snapshot)
+        yield 'report', analysis._report_request(esg_input, report_data, model), \
+            lambda: json.dumps(analysis._fallback_report_data(esg_input, report_data), default=str)
+
+        opportunities = _fallback_top_opportunities(snapshot)
+        yield 'top_opportunities', _top_opportunities_request(snapshot), lambda: json.dumps(opportunities)
+        for opportunity in opportunities[:1]:
+            yield 'simulate_impact', _simulate_impact_request(snapshot, opportunity), \
+                lambda opportunity=opportunity: json.dumps(_fallback_impact_simulation(opportunity))
+
+        roadmap_actions = snapshot.roadmaps.all()
+        context = _chatbot_context(snapshot)
+        for query in SAMPLE_QUERIES:
+            yield 'chat_query', dict(
+                prompt_type='chat_query',
+                provider='groq',
+                model=settings.AI_MODEL,
+                messages=_build_chat_messages(snapshot, query, None, roadmap_actions),
+                temperature=0.7,
+                max_tokens=1500,
+            ), lambda query=query: _fallback_chat_response(snapshot, query)
+            yield 'chatbot', dict(
+                prompt_type='chatbot',
+                provider=analysis.get_available_provider(),
+                model=model,
+                messages=analysis.build_chatbot_messages(query, context),
+                temperature=0.7,
+                max_tokens=500,
+            ), lambda query=query: analysis._fallback_chatbot_response(query, context)
@@ -0,0 +1,96 @@
+"""
+Worker for background AI jobs queued by the ?async=1 endpoints
+"""
+import signal
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+from esgapp.ai_jobs import (
+    claim_next_job, run_job, requeue_stale_jobs, purge_finished_jobs, worker_name, heartbeat
+)
+
+# Seconds between stale-job sweeps and finished-job purges
+SWEEP_INTERVAL = 60
+PURGE_INTERVAL = 3600
+
+
+class Command(BaseCommand):
+    help = 'Run queued background AI jobs (process, roadmap, comprehensive analysis, report)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=settings.AI_JOB_WORKER_CONCURRENCY,
+                            help='Jobs run in parallel by this process')
+        parser.add_argument('--poll-interval', type=float, default=settings.AI_JOB_POLL_INTERVAL,
+                            help='Seconds to wait when the queue is empty')
+        parser.add_argument('--once', action='store_true',
+                            help='Exit once the queue is empty instead of polling')
+
+    def handle(self, *args, **options):
+        self.stopping = threading.Event()
+        self.workers = set()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(sig, self._stop)
+
+        requeue_stale_jobs()
+        purge_finished_jobs()
+        last_sweep = last_purge = last_heartbeat = time.monotonic()
+
+        threads = [
+            threading.Thread(target=self._work, args=(options['once'], options['poll_interval']), daemon=True)
+            for _ in range(max(1, options['concurrency']))
+        ]
+        for thread in threads:
+            thread.start()
+        self.stdout.write(f"AI worker started with {len(threads)} threads")
+
+        while any(thread.is_alive() for thread in threads):
+            for thread in threads:
+                thread.join(timeout=1)
+            now = time.monotonic()
+            if now - last_heartbeat >= settings.AI_JOB_HEARTBEAT_INTERVAL:
+                # Long jobs (rate-limit waits, big batches) stay claimed while this process lives
+                try:
+                    heartbeat(self.workers)
+                except Exception as e:
+                    self.stderr.write(f"Could not record AI job heartbeat: {e}")
+                last_heartbeat = now
+            if now - last_sweep >= SWEEP_INTERVAL:
+                requeue_stale_jobs()
+                last_sweep = now
+            if now - last_purge >= PURGE_INTERVAL:
+                purge_finished_jobs()
+                last_purge = now
+
+        connection.close()
+        self.stdout.write("AI worker stopped")
+
+    def _stop(self, signum, frame):
+        """Finish the jobs in progress, then exit"""
+        self.stdout.write("AI worker stopping after current jobs...")
+        self.stopping.set()
+
+    def _work(self, once, poll_interval):
+        worker = worker_name()
+        self.workers.add(worker)
+        try:
+            while not self.stopping.is_set():
+                close_old_connections()
+                try:
+                    job = claim_next_job(worker)
+                except Exception as e:
+                    self.stderr.write(f"Could not claim AI job: {e}")
+                    self.stopping.wait(poll_interval)
+                    continue
+                if job is None:
+                    if once:
+                        break
+                    self.stopping.wait(poll_interval)
+                    continue
+                self.stdout.write(f"Running AI job {job.id} ({job.operation})")
+                run_job(job)
+        finally:
+            connection.close()
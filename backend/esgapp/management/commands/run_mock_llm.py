@@ -0,0 +1,72 @@
+"""
+Local OpenAI-compatible mock LLM server for offline load testing
+"""
+import os
+import signal
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from esgapp.mock_llm import FixtureStore, LatencyModel, MockLLMServer
+
+
+class Command(BaseCommand):
+    help = 'Serve recorded LLM fixtures on an OpenAI-compatible endpoint with latency and error injection'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--fixtures', default=settings.AI_MOCK_FIXTURES,
+                            help='Fixture file written by record_llm_fixtures')
+        parser.add_argument('--latency', default='lognormal:0.8,0.5',
+                            help="Latency distribution: '0.5', 'uniform:0.2,1.5' or 'lognormal:<median>,<sigma>'")
+        parser.add_argument('--error-rate', type=float, default=0.0,
+                            help='Share of requests answered with an injected error')
+        parser.add_argument('--error-status', default='429,500,503',
+                            help='Comma-separated HTTP statuses to inject')
+        parser.add_argument('--hang-rate', type=float, default=0.0,
+                            help='Share of requests that stall for --hang-seconds (stuck provider)')
+        parser.add_argument('--hang-seconds', type=float, default=120.0)
+        parser.add_argument('--stream-chunk-delay', type=float, default=0.02,
+                            help='Seconds between streamed chunks')
+        parser.add_argument('--reject-response-format', action='store_true',
+                            help='Answer requests carrying response_format with a 400, like a model without JSON mode')
+
+    def handle(self, *args, **options):
+        try:
+            latency = LatencyModel(options['latency'])
+            statuses = [int(value) for value in options['error_status'].split(',') if value.strip()]
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        if os.path.exists(options['fixtures']):
+            store = FixtureStore.load(options['fixtures'])
+            self.stdout.write(f"Loaded {len(store.by_key)} fixtures from {options['fixtures']}")
+        else:
+            store = FixtureStore()
+            self.stdout.write(self.style.WARNING(
+                f"No fixture file at {options['fixtures']}; run record_llm_fixtures first. Serving placeholder replies."
+            ))
+
+        server = MockLLMServer(
+            (options['host'], options['port']), store, latency,
+            error_rate=options['error_rate'],
+            error_statuses=statuses,
+            hang_rate=options['hang_rate'],
+            hang_seconds=options['hang_seconds'],
+            stream_chunk_delay=options['stream_chunk_delay'],
+            reject_response_format=options['reject_response_format'],
+        )
+        base_url = f"http://{options['host']}:{options['port']}/v1"
+        self.stdout.write(f"Mock LLM listening on {base_url} (latency {latency.spec}, error rate {options['error_rate']})")
+        self.stdout.write(f"Point the backend at it with AI_BASE_URL={base_url} (and OPENROUTER_BASE_URL for failover)")
+        # shutdown() blocks until serve_forever returns, so it cannot run in the signal handler's thread
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(sig, lambda signum, frame: threading.Thread(target=server.shutdown).start())
+        try:
+            server.serve_forever()
+        finally:
+            server.server_close()
+            for key, count in sorted(server.stats.items()):
+                self.stdout.write(f"  {key}: {count}")
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 02:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('esgapp', '0005_aijob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='esgsnapshot',
+            name='input_hash',
+            field=models.CharField(blank=True, default='', help_text='Hash of the input and profile the AI scores were computed from', max_length=64),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-17 03:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('esgapp', '0006_esgsnapshot_input_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='esgrecommendation',
+            name='stale',
+            field=models.BooleanField(default=False, help_text='Input fields of its pillar changed after it was generated'),
+        ),
+        migrations.AddField(
+            model_name='esgroadmap',
+            name='stale',
+            field=models.BooleanField(default=False, help_text='Input fields of its pillar changed after it was generated'),
+        ),
+    ]
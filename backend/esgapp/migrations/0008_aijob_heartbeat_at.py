@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 03:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('esgapp', '0007_esgrecommendation_stale_esgroadmap_stale'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='aijob',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, help_text='Last time the claiming worker showed it is still running the job', null=True),
+        ),
+    ]
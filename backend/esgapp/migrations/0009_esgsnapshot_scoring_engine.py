@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 03:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('esgapp', '0008_aijob_heartbeat_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='esgsnapshot',
+            name='scoring_engine',
+            field=models.CharField(blank=True, default='', help_text="What produced the scores: 'ai' or a rule-based scoring engine name", max_length=20),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.7 on 2026-10-17 03:43
+
+from django.db import migrations, models
+
+# Rows saved before this migration are rule sub-scores; their pillars at the time
+SUB_SCORE_PILLARS = {
+    'energy': 'environmental', 'water': 'environmental', 'waste': 'environmental', 'renewable': 'environmental',
+    'safety': 'social', 'benefits': 'social', 'health_insurance': 'social', 'diversity': 'social',
+    'workforce': 'social',
+    'policies': 'governance',
+}
+
+
+def tag_rule_rows(apps, schema_editor):
+    ESGScore = apps.get_model('esgapp', 'ESGScore')
+    for category, pillar in SUB_SCORE_PILLARS.items():
+        ESGScore.objects.filter(category=category).update(pillar=pillar, source='rules')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('esgapp', '0009_esgsnapshot_scoring_engine'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='esgscore',
+            name='pillar',
+            field=models.CharField(blank=True, help_text='environmental, social or governance', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='esgscore',
+            name='source',
+            field=models.CharField(blank=True, help_text="Scoring engine that computed this part (the snapshot's scoring_engine)", max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='esgscore',
+            name='score',
+            field=models.FloatField(),
+        ),
+        migrations.RunPython(tag_rule_rows, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,289 @@
+"""
+Local OpenAI-compatible stand-in for load testing without provider quota
+
+Serves /v1/chat/completions (plain and streaming) from record/replay fixtures
+written by `manage.py record_llm_fixtures`, with configurable latency and
+error injection. Run it with `manage.py run_mock_llm` and point AI_BASE_URL
+(and OPENROUTER_BASE_URL) at it.
+"""
+import json
+import logging
+import math
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .llm_cache import make_cache_key
+from .prompt_context import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+FIXTURE_VERSION = 1
+
+# Phrase unique to each prompt builder -> prompt type, so unmatched requests
+# can still be answered with a response of the right shape
+PROMPT_MARKERS = [
+    ('esg_scores', 'Provide detailed, accurate ESG assessments'),
+    ('esg_scores_batch', 'Score every business listed'),
+    ('roadmap', 'You are an ESG implementation expert'),
+    ('comprehensive_analysis', 'specializing in SME assessments'),
+    ('report', 'You are an ESG reporting specialist'),
+    ('recommendations', 'Generate 5-8 actionable recommendations'),
+    ('top_opportunities', 'Generate exactly 3 top ESG opportunities'),
+    ('simulate_impact', 'analyzing the impact of implementing a specific recommendation'),
+    ('chat_query', 'You are an ESG Implementation Assistant for SMEs'),
+    ('chatbot', 'You are an expert ESG consultant and implementation specialist'),
+]
+
+DEFAULT_CONTENT = "Mock response: no fixture recorded for this prompt."
+
+
+def classify_messages(messages: list):
+    """Prompt type of a request from its builder's marker phrase, None if unknown"""
+    text = "\n".join(str(message.get('content', '')) for message in messages)
+    for prompt_type, marker in PROMPT_MARKERS:
+        if marker in text:
+            return prompt_type
+    return None
+
+
+def fixture_key(messages: list) -> str:
+    """Model-independent key, so a fixture replays whichever provider the router picks"""
+    return make_cache_key(None, messages, {})
+
+
+class LatencyModel:
+    """
+    Response latency distribution, parsed from a spec:
+    '0.5' or 'fixed:0.5', 'uniform:0.2,1.5', 'lognormal:<median>,<sigma>'
+    """
+
+    def __init__(self, spec: str = '0'):
+        self.spec = spec
+        kind, _, args = spec.partition(':') if ':' in spec else ('fixed', '', spec)
+        try:
+            values = [float(value) for value in args.split(',')]
+        except ValueError:
+            raise ValueError(f"Invalid latency spec: {spec}")
+        if kind == 'fixed' and len(values) == 1:
+            self._sample = lambda: values[0]
+        elif kind == 'uniform' and len(values) == 2:
+            self._sample = lambda: random.uniform(*values)
+        elif kind == 'lognormal' and len(values) == 2 and values[0] > 0:
+            self._sample = lambda: random.lognormvariate(math.log(values[0]), values[1])
+        else:
+            raise ValueError(f"Invalid latency spec: {spec}")
+
+    def sample(self) -> float:
+        return max(0.0, self._sample())
+
+
+class FixtureStore:
+    """Recorded completions, looked up by exact request and by prompt type"""
+
+    def __init__(self, fixtures=None):
+        self._lock = threading.Lock()
+        self.by_key = {}
+        self.by_type = {}
+        self._next = Counter()
+        for fixture in fixtures or []:
+            self.by_key[fixture['key']] = fixture
+            self.by_type.setdefault(fixture['prompt_type'], []).append(fixture)
+
+    @classmethod
+    def load(cls, path: str):
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('version') != FIXTURE_VERSION:
+            raise ValueError(f"Unsupported fixture file version: {data.get('version')}")
+        return cls(data['fixtures'])
+
+    def lookup(self, messages: list):
+        """(prompt_type, content, match) with match one of 'exact', 'type', 'none'"""
+        fixture = self.by_key.get(fixture_key(messages))
+        if fixture:
+            return fixture['prompt_type'], fixture['content'], 'exact'
+
+        prompt_type = classify_messages(messages)
+        candidates = self.by_type.get(prompt_type)
+        if candidates:
+            # Rotate through same-type fixtures so replies vary like real traffic
+            with self._lock:
+                index = self._next[prompt_type] % len(candidates)
+                self._next[prompt_type] += 1
+            return prompt_type, candidates[index]['content'], 'type'
+        return prompt_type, DEFAULT_CONTENT, 'none'
+
+
+def write_fixtures(path: str, fixtures: list, source: str):
+    """Write a fixture file readable by FixtureStore.load"""
+    data = {
+        'version': FIXTURE_VERSION,
+        'source': source,
+        'recorded_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'fixtures': fixtures,
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=1)
+
+
+class MockLLMServer(ThreadingHTTPServer):
+    """Threaded HTTP server holding the replay and fault-injection configuration"""
+
+    daemon_threads = True
+
+    def __init__(self, address, store: FixtureStore, latency: LatencyModel, error_rate: float = 0.0,
+                 error_statuses=(429, 500, 503), hang_rate: float = 0.0, hang_seconds: float = 120.0,
+                 stream_chunk_delay: float = 0.02, reject_response_format: bool = False):
+        super().__init__(address, MockLLMHandler)
+        self.store = store
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_statuses = tuple(error_statuses)
+        self.hang_rate = hang_rate
+        self.hang_seconds = hang_seconds
+        self.stream_chunk_delay = stream_chunk_delay
+        self.reject_response_format = reject_response_format
+        self.stats = Counter()
+        self._stats_lock = threading.Lock()
+
+    def count(self, *keys):
+        with self._stats_lock:
+            for key in keys:
+                self.stats[key] += 1
+
+
+class MockLLMHandler(BaseHTTPRequestHandler):
+    """OpenAI chat completions API subset used by the backend"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        logger.debug("mock LLM: " + format % args)
+
+    def _send_json(self, status: int, payload: dict, headers=None):
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path.rstrip('/').endswith('/models'):
+            self._send_json(200, {'object': 'list', 'data': [{'id': 'mock', 'object': 'model', 'owned_by': 'mock'}]})
+        else:
+            self._send_json(404, {'error': {'message': 'Not found', 'type': 'invalid_request_error'}})
+
+    def do_POST(self):
+        server = self.server
+        length = int(self.headers.get('Content-Length') or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            self._send_json(400, {'error': {'message': 'Invalid JSON body', 'type': 'invalid_request_error'}})
+            return
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self._send_json(404, {'error': {'message': 'Not found', 'type': 'invalid_request_error'}})
+            return
+
+        messages = body.get('messages') or []
+        prompt_type, content, match = server.store.lookup(messages)
+        server.count('requests', f"prompt_type:{prompt_type}", f"match:{match}")
+
+        requested_format = (body.get('response_format') or {}).get('type')
+        if requested_format:
+            server.count(f"response_format:{requested_format}")
+            if server.reject_response_format:
+                self._send_json(400, {'error': {
+                    'message': f"response_format '{requested_format}' is not supported by this model",
+                    'type': 'invalid_request_error', 'param': 'response_format',
+                }})
+                return
+
+        roll = random.random()
+        if roll < server.hang_rate:
+            server.count('hangs')
+            time.sleep(server.hang_seconds)
+        elif roll < server.hang_rate + server.error_rate:
+            status = random.choice(server.error_statuses)
+            server.count(f"errors:{status}")
+            time.sleep(server.latency.sample())
+            headers = {'Retry-After': '1'} if status == 429 else None
+            self._send_json(status, {'error': {
+                'message': f"Injected mock error ({status})", 'type': 'mock_error', 'code': str(status)
+            }}, headers)
+            return
+
+        time.sleep(server.latency.sample())
+        completion_id = f"chatcmpl-mock-{uuid.uuid4().hex[:12]}"
+        model = body.get('model') or 'mock'
+        content, finish_reason = self._truncate(content, body.get('max_tokens'))
+        if finish_reason == 'length':
+            server.count('truncated')
+        if body.get('stream'):
+            self._stream(completion_id, model, content, finish_reason)
+            return
+
+        prompt_tokens = estimate_tokens("".join(str(message.get('content', '')) for message in messages))
+        completion_tokens = estimate_tokens(content)
+        self._send_json(200, {
+            'id': completion_id,
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': model,
+            'choices': [{
+                'index': 0,
+                'finish_reason': finish_reason,
+                'message': {'role': 'assistant', 'content': content},
+            }],
+            'usage': {
+                'prompt_tokens': prompt_tokens,
+                'completion_tokens': completion_tokens,
+                'total_tokens': prompt_tokens + completion_tokens,
+            },
+        })
+
+    @staticmethod
+    def _truncate(content: str, max_tokens):
+        """Cut the reply at max_tokens like a real provider: (content, finish_reason)"""
+        if not max_tokens or estimate_tokens(content) <= max_tokens:
+            return content, 'stop'
+        limit = len(content) * max_tokens // estimate_tokens(content)
+        return content[:limit], 'length'
+
+    def _stream(self, completion_id: str, model: str, content: str, finish_reason: str = 'stop'):
+        """Server-sent events in the OpenAI chunk format, a few words per chunk"""
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+
+        words = content.split(' ')
+        pieces = [' '.join(words[i:i + 4]) + (' ' if i + 4 < len(words) else '') for i in range(0, len(words), 4)]
+        created = int(time.time())
+        for index, piece in enumerate(pieces + [None]):
+            chunk = {
+                'id': completion_id,
+                'object': 'chat.completion.chunk',
+                'created': created,
+                'model': model,
+                'choices': [{
+                    'index': 0,
+                    'delta': {'content': piece} if piece is not None else {},
+                    'finish_reason': None if piece is not None else finish_reason,
+                }],
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode('utf-8'))
+            self.wfile.flush()
+            if piece is not None and index < len(pieces) - 1:
+                time.sleep(self.server.stream_chunk_delay)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
@@ -1,5 +1,8 @@
+import uuid
+
 from django.db import models
 from django.contrib.auth.models import User
+from django.core.serializers.json import DjangoJSONEncoder
 from django.core.validators import MinValueValidator, MaxValueValidator
 
 
@@ -156,6 +159,10 @@ class ESGSnapshot(models.Model):
     # Metadata
     data_completeness = models.FloatField(validators=[MinValueValidator(0), MaxValueValidator(100)], 
                                          help_text="Percentage of data completeness")
+    input_hash = models.CharField(max_length=64, blank=True, default='',
+                                  help_text="Hash of the input and profile the AI scores were computed from")
+    scoring_engine = models.CharField(max_length=20, blank=True, default='',
+                                      help_text="What produced the scores: 'ai' or a rule-based scoring engine name")
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
@@ -169,9 +176,13 @@ class ESGScore(models.Model):
     """Detailed breakdown of ESG scores (optional)"""
     snapshot = models.ForeignKey(ESGSnapshot, on_delete=models.CASCADE, related_name='score_breakdown')
     category = models.CharField(max_length=50)  # e.g., "energy_efficiency", "waste_management"
-    score = models.FloatField(validators=[MinValueValidator(0)])
+    # Negative for a pillar adjustment row when the pillar score was capped
+    score = models.FloatField()
     max_score = models.FloatField(validators=[MinValueValidator(0)])
     notes = models.TextField(blank=True)
+    pillar = models.CharField(max_length=20, blank=True, help_text="environmental, social or governance")
+    source = models.CharField(max_length=20, blank=True,
+                              help_text="Scoring engine that computed this part (the snapshot's scoring_engine)")
 
     def __str__(self):
         return f"{self.category}: {self.score}/{self.max_score}"
@@ -209,6 +220,7 @@ class ESGRecommendation(models.Model):
         ('medium', 'Medium'),
         ('low', 'Low'),
     ], default='medium', help_text="Risk reduction level")
+    stale = models.BooleanField(default=False, help_text="Input fields of its pillar changed after it was generated")
     
     created_at = models.DateTimeField(auto_now_add=True)
 
@@ -241,6 +253,7 @@ class ESGRoadmap(models.Model):
         ('S', 'Social'),
         ('G', 'Governance'),
     ])
+    stale = models.BooleanField(default=False, help_text="Input fields of its pillar changed after it was generated")
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -277,3 +290,35 @@ class ChatMessage(models.Model):
     def __str__(self):
         return f"{self.role}: {self.content[:50]}..."
 
+
+class AIJob(models.Model):
+    """Long-running AI operation queued for the background worker"""
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('succeeded', 'Succeeded'),
+        ('failed', 'Failed'),
+    ]
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='ai_jobs')
+    operation = models.CharField(max_length=50)
+    params = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    progress = models.IntegerField(default=0, validators=[MinValueValidator(0), MaxValueValidator(100)])
+    progress_message = models.CharField(max_length=255, blank=True)
+    result = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    error = models.TextField(blank=True)
+    attempts = models.IntegerField(default=0)
+    worker = models.CharField(max_length=100, blank=True, help_text="Worker that claimed the job")
+    heartbeat_at = models.DateTimeField(null=True, blank=True,
+                                        help_text="Last time the claiming worker showed it is still running the job")
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [models.Index(fields=['status', 'created_at'])]
+
+    def __str__(self):
+        return f"{self.operation} job {self.id} ({self.status})"
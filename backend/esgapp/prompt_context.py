@@ -0,0 +1,168 @@
+"""
+Compact encoding of business context for LLM prompts
+
+The verbose prompt builders spell out every ESGInput field, most of them
+reading "Not specified" or "No". The compact encoder keeps only provided values
+and the practices in place, grouped per pillar, for a fraction of the tokens.
+AI_PROMPT_CONTEXT selects the style: 'compact' (default) or 'verbose'.
+"""
+import json
+import logging
+import math
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Measured values per pillar: (field, template)
+VALUE_FIELDS = {
+    'Environmental': [
+        ('electricity_kwh', 'electricity {} kWh/mo'),
+        ('electricity_bill_amount', 'electricity bill ${}/mo'),
+        ('generator_usage_liters', 'generator fuel {} L/mo'),
+        ('generator_usage_hours', 'generator {} h/mo'),
+        ('water_source', 'water source {}'),
+        ('water_usage_liters', 'water {} L/mo'),
+        ('solar_capacity_kw', 'solar capacity {} kW'),
+        ('renewable_energy_percentage', 'renewable energy {}%'),
+        ('energy_efficiency_measures', 'efficiency measures: {}'),
+        ('water_conservation_measures', 'water conservation: {}'),
+    ],
+    'Social': [
+        ('female_employees_percentage', 'female employees {}%'),
+        ('workplace_accidents_last_year', 'accidents last year {}'),
+        ('employee_training_hours', 'training {} h/employee'),
+        ('employee_benefits', 'benefits: {}'),
+    ],
+    'Governance': [],
+}
+
+# Yes/no practices per pillar: (field, label, optional frequency field)
+PRACTICE_FIELDS = {
+    'Environmental': [
+        ('has_solar', 'solar', None),
+        ('waste_recycling', 'recycling', 'waste_recycling_frequency'),
+        ('waste_segregation', 'waste segregation', None),
+        ('carbon_footprint_tracking', 'carbon tracking', None),
+        ('hazardous_waste_management', 'hazardous waste mgmt', None),
+        ('paper_reduction_initiatives', 'paper reduction', None),
+        ('business_travel_policy', 'travel policy', None),
+        ('remote_work_policy', 'remote work policy', None),
+        ('sustainable_procurement', 'sustainable procurement', None),
+        ('supplier_esg_requirements', 'supplier ESG requirements', None),
+    ],
+    'Social': [
+        ('safety_training_provided', 'safety training', 'safety_training_frequency'),
+        ('health_insurance', 'health insurance', None),
+        ('diversity_policy', 'diversity policy', None),
+        ('mental_health_support', 'mental health support', None),
+        ('employee_satisfaction_survey', 'satisfaction survey', None),
+        ('flexible_work_arrangements', 'flexible work', None),
+        ('community_engagement', 'community engagement', None),
+        ('local_hiring_preference', 'local hiring', None),
+        ('charitable_contributions', 'charitable giving', None),
+        ('customer_satisfaction_tracking', 'customer satisfaction tracking', None),
+        ('product_safety_standards', 'product safety standards', None),
+    ],
+    'Governance': [
+        ('code_of_conduct', 'code of conduct', None),
+        ('anti_corruption_policy', 'anti-corruption', None),
+        ('data_privacy_policy', 'data privacy', None),
+        ('whistleblower_policy', 'whistleblower', None),
+        ('board_oversight', 'board oversight', None),
+        ('risk_management_policy', 'risk management', None),
+        ('cybersecurity_measures', 'cybersecurity', None),
+        ('regulatory_compliance_tracking', 'compliance tracking', None),
+        ('sustainability_reporting', 'sustainability reporting', None),
+        ('stakeholder_engagement', 'stakeholder engagement', None),
+        ('esg_goals_set', 'ESG goals', None),
+        ('third_party_audits', 'third-party audits', None),
+        ('public_esg_commitments', 'public ESG commitments', None),
+        ('esg_linked_executive_compensation', 'ESG-linked exec pay', None),
+        ('sustainable_finance_products', 'sustainable finance', None),
+        ('esg_investment_policy', 'ESG investment policy', None),
+    ],
+}
+
+
+def use_compact() -> bool:
+    return settings.AI_PROMPT_CONTEXT != 'verbose'
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token for English prompts)"""
+    return math.ceil(len(text) / 4)
+
+
+def _format_value(value) -> str:
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    if isinstance(value, (list, tuple)):
+        return ', '.join(str(item) for item in value)
+    return str(value)
+
+
+def _is_empty(value) -> bool:
+    return value is None or value == '' or value == [] or value == {}
+
+
+def encode_profile(business_profile, employees) -> str:
+    """One-line business profile: name | industry | size | office | location"""
+    parts = [business_profile.business_name, business_profile.industry, f"{employees} employees"]
+    if business_profile.office_area_sqm:
+        parts.append(f"{_format_value(business_profile.office_area_sqm)} sqm")
+    if business_profile.location:
+        parts.append(business_profile.location)
+    return "Business: " + " | ".join(str(part) for part in parts)
+
+
+def encode_scores(snapshot) -> str:
+    """One-line ESG scores"""
+    return (
+        f"Scores (0-100): E {snapshot.environmental_score:.0f}, S {snapshot.social_score:.0f}, "
+        f"G {snapshot.governance_score:.0f}, overall {snapshot.overall_esg_score:.0f}"
+    )
+
+
+def encode_snapshot(snapshot) -> str:
+    """Profile and scores of a snapshot, the header shared by the snapshot-based prompts"""
+    return encode_profile(snapshot.business_profile, snapshot.esg_input.total_employees) + "\n" + encode_scores(snapshot)
+
+
+def encode_business_context(esg_input) -> str:
+    """Business profile plus provided values and practices in place, per pillar"""
+    lines = [encode_profile(esg_input.business_profile, esg_input.total_employees)]
+    for pillar, value_fields in VALUE_FIELDS.items():
+        values = []
+        for field, template in value_fields:
+            value = getattr(esg_input, field)
+            if not _is_empty(value):
+                values.append(template.format(_format_value(value)))
+
+        practices = []
+        for field, label, frequency_field in PRACTICE_FIELDS[pillar]:
+            if getattr(esg_input, field):
+                frequency = getattr(esg_input, frequency_field) if frequency_field else None
+                practices.append(f"{label} ({frequency})" if frequency else label)
+
+        lines.append(f"{pillar}: " + "; ".join(values) if values else f"{pillar}:")
+        lines.append("  In place: " + (", ".join(practices) if practices else "none"))
+    lines.append("Practices not listed as in place are absent.")
+    return "\n".join(lines)
+
+
+def business_context(esg_input, verbose_builder) -> str:
+    """Context for esg_input in the configured style; verbose_builder renders the verbose one"""
+    if use_compact():
+        context = encode_business_context(esg_input)
+    else:
+        context = verbose_builder(esg_input)
+    logger.debug(f"Prompt context ({settings.AI_PROMPT_CONTEXT}): ~{estimate_tokens(context)} tokens")
+    return context
+
+
+def encode_json(data) -> str:
+    """JSON for embedding in a prompt: minified when compact, indented when verbose"""
+    if use_compact():
+        return json.dumps(data, separators=(',', ':'), default=str)
+    return json.dumps(data, indent=2)
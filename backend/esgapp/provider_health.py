@@ -0,0 +1,111 @@
+"""
+Cached LLM provider health, learned from real call outcomes
+"""
+import logging
+import threading
+import time
+
+from django.conf import settings
+
+from .llm_clients import get_client, get_provider_model
+
+logger = logging.getLogger(__name__)
+
+
+class ProviderHealth:
+    """Tracks per-provider health so callers get an O(1) "is the provider up" check"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._state = {}
+
+    def _entry(self, provider: str) -> dict:
+        entry = self._state.get(provider)
+        if entry is None:
+            entry = {
+                'healthy': True,  # Optimistic until a real call says otherwise
+                'consecutive_failures': 0,
+                'last_success': None,
+                'last_failure': None,
+                'last_error': None,
+                'last_probe': None,
+                'probing': False,
+            }
+            self._state[provider] = entry
+        return entry
+
+    def record_success(self, provider: str):
+        """Mark a provider healthy after a successful completion"""
+        with self._lock:
+            entry = self._entry(provider)
+            entry['healthy'] = True
+            entry['consecutive_failures'] = 0
+            entry['last_success'] = time.time()
+
+    def record_failure(self, provider: str, error):
+        """Count a failed completion and mark the provider down past the threshold"""
+        with self._lock:
+            entry = self._entry(provider)
+            entry['consecutive_failures'] += 1
+            entry['last_failure'] = time.time()
+            entry['last_error'] = str(error)[:200]
+            if entry['consecutive_failures'] >= settings.AI_HEALTH_FAILURE_THRESHOLD:
+                if entry['healthy']:
+                    logger.warning(f"AI provider {provider} marked unhealthy: {entry['last_error']}")
+                entry['healthy'] = False
+
+    def is_healthy(self, provider: str) -> bool:
+        """O(1) health check; schedules a background probe when the state is stale"""
+        entry = self._state.get(provider)
+        if entry is None:
+            return True
+        if not entry['healthy']:
+            self.maybe_probe(provider)
+        return entry['healthy']
+
+    def maybe_probe(self, provider: str):
+        """Start a background probe if nothing was learned within the probe interval"""
+        now = time.time()
+        with self._lock:
+            entry = self._entry(provider)
+            if entry['probing']:
+                return
+            last_seen = max(entry['last_success'] or 0, entry['last_failure'] or 0, entry['last_probe'] or 0)
+            if now - last_seen < settings.AI_HEALTH_PROBE_INTERVAL:
+                return
+            entry['probing'] = True
+            entry['last_probe'] = now
+
+        thread = threading.Thread(target=self._probe, args=(provider,), daemon=True)
+        thread.start()
+
+    def _probe(self, provider: str):
+        """Send a minimal completion and record its outcome"""
+        try:
+            client = get_client(provider)
+            if not client:
+                self.record_failure(provider, 'Provider not configured')
+                return
+            client.chat.completions.create(
+                model=get_provider_model(provider),
+                messages=[{"role": "user", "content": "ping"}],
+                max_tokens=1,
+                timeout=settings.AI_HEALTH_PROBE_TIMEOUT
+            )
+            self.record_success(provider)
+        except Exception as e:
+            self.record_failure(provider, e)
+        finally:
+            with self._lock:
+                self._entry(provider)['probing'] = False
+
+    def status(self, provider: str) -> dict:
+        """Copy of the cached state for status reporting"""
+        with self._lock:
+            entry = dict(self._entry(provider))
+        entry.pop('probing', None)
+        return entry
+
+
+# Shared tracker for this worker process
+provider_health = ProviderHealth()
@@ -0,0 +1,280 @@
+"""
+Client-side rate limiting of LLM calls, per provider
+
+Each provider in AI_RATE_LIMITS has two token buckets, requests per second and
+tokens per minute, kept in a small state file under AI_RATE_LIMIT_DIR so every
+worker on the host draws from the same budget (updates hold a file lock).
+
+Calls queue by lane. Inside a worker, waiting interactive calls (chat, impact
+simulation) are always served before bulk ones (scoring, reports). Across
+workers, bulk calls must leave AI_RATE_LIMIT_INTERACTIVE_RESERVE of each bucket
+untouched, so interactive calls find headroom even when another worker is busy
+with bulk work. Waits are bounded per lane; past the bound RateLimitExceeded is
+raised and the gateway moves on to the next provider, or the caller to its
+fallback.
+"""
+import heapq
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .file_lock import FileLock
+
+logger = logging.getLogger(__name__)
+
+LANES = ('interactive', 'bulk')
+# Lock wait before giving up on the shared state and letting the call through
+STATE_LOCK_TIMEOUT = 2.0
+# Longest single sleep while queued, so new arrivals and refunds are noticed
+MAX_POLL_SECONDS = 0.25
+
+
+class RateLimitExceeded(TimeoutError):
+    """A call waited its lane's maximum for provider capacity"""
+
+
+def lane_for(prompt_type: str) -> str:
+    return settings.AI_RATE_LIMIT_LANES.get(prompt_type, 'interactive')
+
+
+class Ticket:
+    """Capacity taken by one call, settled against its actual usage afterwards"""
+
+    def __init__(self, provider: str, cost: int):
+        self.provider = provider
+        self.cost = cost
+
+
+class _ProviderQueue:
+    """Waiting calls of one provider in this worker, interactive first, then by arrival"""
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.heap = []
+
+
+class RateLimiter:
+    """Per-process front end to the shared per-provider buckets"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._queues = {}
+        self._sequence = itertools.count()
+        self._stats = Counter()
+
+    def _queue(self, provider: str) -> _ProviderQueue:
+        with self._lock:
+            return self._queues.setdefault(provider, _ProviderQueue())
+
+    @staticmethod
+    def _limits(provider):
+        if not settings.AI_RATE_LIMIT_ENABLED or not provider:
+            return None
+        limits = settings.AI_RATE_LIMITS.get(provider)
+        if not limits or not (limits.get('requests_per_second') or limits.get('tokens_per_minute')):
+            return None
+        return limits
+
+    @staticmethod
+    def _capacities(limits: dict):
+        """(request bucket size, token bucket size); 0 means that dimension is unlimited"""
+        rps = limits.get('requests_per_second') or 0
+        tpm = limits.get('tokens_per_minute') or 0
+        requests = max(1.0, rps * settings.AI_RATE_LIMIT_BURST_SECONDS) if rps else 0
+        return requests, float(tpm)
+
+    def acquire(self, provider, prompt_type: str, cost: int):
+        """
+        Block until the provider has capacity for one call of about ``cost``
+        tokens; returns a Ticket (None when the provider is not limited)
+        """
+        limits = self._limits(provider)
+        if limits is None:
+            return None
+        lane = lane_for(prompt_type)
+        queue = self._queue(provider)
+        entry = (LANES.index(lane), next(self._sequence))
+        started = time.monotonic()
+        deadline = started + settings.AI_RATE_LIMIT_MAX_WAIT.get(lane, 0)
+
+        with queue.condition:
+            heapq.heappush(queue.heap, entry)
+            try:
+                while True:
+                    if queue.heap[0] == entry:
+                        wait = self._take(provider, limits, lane, cost)
+                        if wait <= 0:
+                            self._count(provider, lane, 'admitted', time.monotonic() - started)
+                            return Ticket(provider, cost)
+                    else:
+                        wait = MAX_POLL_SECONDS
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._count(provider, lane, 'timed_out')
+                        raise RateLimitExceeded(
+                            f"{provider} rate limit: {prompt_type} call waited {time.monotonic() - started:.1f}s"
+                        )
+                    queue.condition.wait(min(wait, remaining, MAX_POLL_SECONDS))
+            finally:
+                if entry in queue.heap:
+                    queue.heap.remove(entry)
+                    heapq.heapify(queue.heap)
+                queue.condition.notify_all()
+
+    async def aacquire(self, provider, prompt_type: str, cost: int):
+        """Async variant of acquire; the wait runs in a worker thread"""
+        if self._limits(provider) is None:
+            return None
+        return await sync_to_async(self.acquire, thread_sensitive=False)(provider, prompt_type, cost)
+
+    def settle(self, ticket, used_tokens):
+        """Return over-estimated tokens to the bucket (or charge the shortfall)"""
+        if ticket is None or used_tokens is None or used_tokens == ticket.cost:
+            return
+        limits = self._limits(ticket.provider)
+        if limits is None or not limits.get('tokens_per_minute'):
+            return
+        _, token_capacity = self._capacities(limits)
+        with self._state(ticket.provider, limits) as state:
+            state['tokens'] = min(token_capacity, state['tokens'] + ticket.cost - used_tokens)
+
+    def penalize(self, provider, seconds: float):
+        """Hold every worker's calls to a provider that answered 429 for ``seconds``"""
+        limits = self._limits(provider)
+        if limits is None:
+            return
+        with self._state(provider, limits) as state:
+            state['blocked_until'] = max(state.get('blocked_until', 0), time.time() + seconds)
+        logger.warning(f"{provider} returned 429; holding calls for {seconds:.1f}s")
+
+    def _take(self, provider: str, limits: dict, lane: str, cost: int) -> float:
+        """Consume capacity for one call if available; else seconds until it may be"""
+        rps = limits.get('requests_per_second') or 0
+        tokens_per_second = (limits.get('tokens_per_minute') or 0) / 60
+        request_capacity, token_capacity = self._capacities(limits)
+        reserve = settings.AI_RATE_LIMIT_INTERACTIVE_RESERVE if lane == 'bulk' else 0
+
+        with self._state(provider, limits) as state:
+            now = time.time()
+            if state.get('blocked_until', 0) > now:
+                return state['blocked_until'] - now
+
+            waits = []
+            if rps:
+                need = min(request_capacity, 1 + reserve * request_capacity)
+                if state['requests'] < need:
+                    waits.append((need - state['requests']) / rps)
+            if tokens_per_second:
+                cost = min(cost, token_capacity)
+                need = min(token_capacity, cost + reserve * token_capacity)
+                if state['tokens'] < need:
+                    waits.append((need - state['tokens']) / tokens_per_second)
+            if waits:
+                return max(waits)
+
+            if rps:
+                state['requests'] -= 1
+            if tokens_per_second:
+                state['tokens'] -= cost
+            return 0
+
+    def _state(self, provider: str, limits: dict):
+        return _BucketState(provider, limits, self._capacities(limits))
+
+    def _count(self, provider: str, lane: str, outcome: str, waited: float = 0):
+        with self._lock:
+            self._stats[(provider, lane, outcome)] += 1
+            self._stats[(provider, lane, 'wait_ms')] += int(waited * 1000)
+
+    def status(self) -> dict:
+        """Per provider: limits, shared bucket levels and this worker's lane counters"""
+        result = {}
+        with self._lock:
+            stats = dict(self._stats)
+            queues = dict(self._queues)
+        for provider, limits in settings.AI_RATE_LIMITS.items():
+            if self._limits(provider) is None:
+                continue
+            with self._state(provider, limits) as state:
+                levels = {'requests': round(state['requests'], 2), 'tokens': round(state['tokens'])}
+            queue = queues.get(provider)
+            lanes = {}
+            for lane in LANES:
+                admitted = stats.get((provider, lane, 'admitted'), 0)
+                lanes[lane] = {
+                    'admitted': admitted,
+                    'timed_out': stats.get((provider, lane, 'timed_out'), 0),
+                    'avg_wait_ms': round(stats.get((provider, lane, 'wait_ms'), 0) / admitted) if admitted else None,
+                    'waiting': sum(1 for rank, _ in (queue.heap if queue else []) if LANES[rank] == lane),
+                }
+            result[provider] = {'limits': limits, 'available': levels, 'lanes': lanes}
+        return result
+
+
+class _BucketState:
+    """
+    Context manager over a provider's shared bucket file: refills on entry and
+    writes back on exit, holding the file lock in between
+    """
+
+    def __init__(self, provider: str, limits: dict, capacities):
+        directory = settings.AI_RATE_LIMIT_DIR
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, f"{provider}.json")
+        self.lock = FileLock(os.path.join(directory, f"{provider}.lock"))
+        self.limits = limits
+        self.request_capacity, self.token_capacity = capacities
+        self.state = None
+
+    def __enter__(self) -> dict:
+        try:
+            self.lock.acquire(STATE_LOCK_TIMEOUT)
+        except TimeoutError:
+            # A stuck lock must not stop every LLM call: work on a private full bucket
+            logger.warning(f"Rate limiter: could not lock {self.lock.path}, not limiting this call")
+            self.lock = None
+            return self._full(time.time())
+
+        now = time.time()
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            state = self._full(now)
+
+        elapsed = max(0.0, now - state.get('updated', now))
+        rps = self.limits.get('requests_per_second') or 0
+        tpm = self.limits.get('tokens_per_minute') or 0
+        state['requests'] = min(self.request_capacity, state.get('requests', 0) + elapsed * rps)
+        state['tokens'] = min(self.token_capacity, state.get('tokens', 0) + elapsed * tpm / 60)
+        state['updated'] = now
+        self.state = state
+        return state
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.lock is None:
+            return False
+        try:
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.state, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"Rate limiter: could not save {self.path}: {e}")
+        finally:
+            self.lock.release()
+        return False
+
+    def _full(self, now: float) -> dict:
+        return {'requests': self.request_capacity, 'tokens': self.token_capacity, 'updated': now}
+
+
+# Shared limiter for this worker process
+rate_limiter = RateLimiter()
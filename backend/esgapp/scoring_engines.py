@@ -0,0 +1,283 @@
+"""
+Registry of rule-based scoring engines and per-industry scoring profiles
+
+Engines register with @scoring_engine(name) and share one batch interface:
+score_batch(esg_inputs) takes a queryset or list of ESG inputs and returns
+arrays aligned with 'id' (pillar scores, overall score, completeness,
+confidence and the profile used). So a whole portfolio can be rescored with
+another engine by name, e.g. batch_process with "engine": "rules".
+
+Profiles come from settings.SCORING_PROFILES. They are built once per process
+and matched to BusinessProfile.industry by keyword, with results cached per
+industry string. A profile can set the E/S/G weights of the overall score and
+replace the benchmark bounds of the 'rules' engine. Inputs with no matching
+industry use the 'default' profile, which keeps each engine's own weighting.
+
+Each engine also breaks one input's scores down into its own parts (rule
+sub-scores, or the fallback's data, practice and bonus points); save_breakdowns
+stores them as the snapshot's ESGScore rows.
+"""
+import re
+import threading
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+
+from . import fallback_scoring
+from .esg_engine import DEFAULT_THRESHOLDS, DEFAULT_WEIGHTS, SUB_SCORES, ESGProcessor, sub_score
+from .models import ESGScore
+
+ENGINES = {}
+PILLARS = ('environmental', 'social', 'governance')
+# Per-row score fields every engine returns
+SCORE_FIELDS = (
+    'environmental_score', 'social_score', 'governance_score', 'overall_esg_score',
+    'data_completeness', 'confidence_level',
+)
+
+_lock = threading.Lock()
+_profiles = None
+_instances = {}
+_industry_profiles = {}
+
+
+def scoring_engine(name):
+    """Register a ScoringEngine subclass under a name"""
+    def decorator(cls):
+        cls.name = name
+        ENGINES[name] = cls
+        return cls
+    return decorator
+
+
+class ScoringProfile:
+    """E/S/G weights (None keeps the engine's own) and benchmark bounds for one group of industries"""
+
+    def __init__(self, name: str, keywords=(), weights=None, thresholds=None):
+        self.name = name
+        self.keywords = tuple(keyword.lower() for keyword in keywords)
+        if weights is not None:
+            weights = tuple(float(weights[pillar]) for pillar in PILLARS)
+            if abs(sum(weights) - 1) > 1e-9:
+                raise ValueError(f"Scoring profile {name}: weights must add up to 1, not {sum(weights)}")
+        self.weights = weights
+        self.thresholds = {**DEFAULT_THRESHOLDS, **{key: tuple(bounds) for key, bounds in (thresholds or {}).items()}}
+
+    def matches(self, words: list) -> bool:
+        return any(word.startswith(keyword) for keyword in self.keywords for word in words)
+
+
+def get_profiles() -> dict:
+    """Profiles from settings.SCORING_PROFILES, built on first use"""
+    global _profiles
+    if _profiles is None:
+        with _lock:
+            if _profiles is None:
+                profiles = {
+                    name: ScoringProfile(name, config.get('match', ()), config.get('weights'), config.get('thresholds'))
+                    for name, config in settings.SCORING_PROFILES.items()
+                }
+                profiles.setdefault('default', ScoringProfile('default'))
+                _profiles = profiles
+    return _profiles
+
+
+def profile_for(industry) -> ScoringProfile:
+    """First profile whose keywords start a word of the industry, else 'default'"""
+    key = (industry or '').strip().lower()
+    profile = _industry_profiles.get(key)
+    if profile is None:
+        profiles = get_profiles()
+        words = re.findall(r'[a-z0-9]+', key)
+        profile = next(
+            (candidate for name, candidate in profiles.items() if name != 'default' and candidate.matches(words)),
+            profiles['default'],
+        )
+        _industry_profiles[key] = profile
+    return profile
+
+
+def get_engine(name: str):
+    """Shared instance of a registered engine; ValueError for unknown names"""
+    if name not in ENGINES:
+        raise ValueError(f"Unknown scoring engine '{name}' (choose from {', '.join(sorted(ENGINES))})")
+    with _lock:
+        if name not in _instances:
+            _instances[name] = ENGINES[name]()
+        return _instances[name]
+
+
+def overall_weights(engine_name: str, industry) -> tuple:
+    """
+    E/S/G weights of the overall score as an engine computes it for an industry.
+    'ai' and unknown names (snapshots saved before engines were recorded) use the rules weighting.
+    """
+    weights = profile_for(industry).weights
+    if weights is not None:
+        return weights
+    return ENGINES.get(engine_name, RulesEngine).default_weights
+
+
+def save_breakdowns(scored):
+    """
+    Replace the ESGScore rows of (snapshot, esg_input) pairs with the parts of the engine
+    that scored each snapshot (snapshot.scoring_engine): one delete and one bulk_create.
+    A pillar whose parts do not add up to its stored score (cap, minimum score, rounding)
+    gets an '<pillar>_adjustment' row with the difference. AI snapshots get no rows:
+    the AI returns no parts, and rule numbers would not add up to its scores.
+    """
+    rows = []
+    for snapshot, esg_input in scored:
+        if snapshot.scoring_engine not in ENGINES:
+            continue
+        parts = [{**part, 'score': round(part['score'], 2)}
+                 for part in get_engine(snapshot.scoring_engine).breakdown(esg_input)]
+        for pillar in PILLARS:
+            difference = getattr(snapshot, f'{pillar}_score') - sum(
+                part['score'] for part in parts if part['pillar'] == pillar
+            )
+            if round(difference, 2):
+                parts.append({'category': f'{pillar}_adjustment', 'pillar': pillar, 'score': round(difference, 2),
+                              'max_score': 0, 'notes': 'Pillar cap, minimum score or rounding'})
+        rows += [ESGScore(snapshot=snapshot, source=snapshot.scoring_engine, **part) for part in parts]
+    with transaction.atomic():
+        ESGScore.objects.filter(snapshot__in=[snapshot for snapshot, _ in scored]).delete()
+        ESGScore.objects.bulk_create(rows)
+
+
+def reset():
+    """Drop built profiles and engine instances (after changing SCORING_PROFILES)"""
+    global _profiles
+    with _lock:
+        _profiles = None
+        _instances.clear()
+        _industry_profiles.clear()
+
+
+def _select(columns: dict, rows) -> dict:
+    """Loaded columns restricted to some rows; nested dicts of columns are restricted too"""
+    return {
+        name: _select(value, rows) if isinstance(value, dict) else value[rows]
+        for name, value in columns.items()
+    }
+
+
+class ScoringEngine:
+    """
+    Base of the rule-based engines. Subclasses load columns for a set of inputs
+    and evaluate one profile's rows at a time; score_batch groups rows by profile.
+    """
+    name = None
+    # Overall-score weights when the industry profile sets none
+    default_weights = DEFAULT_WEIGHTS
+
+    def load(self, esg_inputs) -> dict:
+        """Columns with at least 'id' and 'industry', one row per input"""
+        raise NotImplementedError
+
+    def evaluate(self, columns: dict, profile: ScoringProfile) -> dict:
+        """Arrays of SCORE_FIELDS (and any engine-specific extras) for rows of one profile"""
+        raise NotImplementedError
+
+    def score_batch(self, esg_inputs) -> dict:
+        """Scores for a queryset or list of inputs, as arrays aligned with 'id'"""
+        return self.score_columns(self.load(esg_inputs))
+
+    def score_columns(self, columns: dict) -> dict:
+        rows = len(columns['id'])
+        profiles = np.array([profile_for(industry).name for industry in columns['industry']], dtype=object)
+        result = {'id': columns['id'], 'profile': profiles}
+        for name in set(profiles.tolist()):
+            rows_of_profile = np.flatnonzero(profiles == name)
+            scores = self.evaluate(_select(columns, rows_of_profile), get_profiles()[name])
+            for field, values in scores.items():
+                if field not in result:
+                    result[field] = np.empty(rows, dtype=values.dtype)
+                result[field][rows_of_profile] = values
+        for field in SCORE_FIELDS:
+            result.setdefault(field, np.empty(0))
+        return result
+
+    def score(self, esg_input) -> dict:
+        """One input's row of score_batch, as plain Python values"""
+        return self.row(self.score_batch([esg_input]), 0)
+
+    def breakdown(self, esg_input) -> list:
+        """ESGScore fields (category, pillar, score, max_score, notes) of the parts of one input's pillar scores"""
+        raise NotImplementedError
+
+    def row(self, scores: dict, index: int) -> dict:
+        """Row of a score_batch result in the shape _save_scored_snapshot takes"""
+        row = {field: values[index].item() if hasattr(values[index], 'item') else values[index]
+               for field, values in scores.items()}
+        row.update({'scoring_source': 'rule_based', 'scoring_engine': self.name})
+        return row
+
+    @staticmethod
+    def _queryset(esg_inputs):
+        """A queryset for a list of inputs (querysets pass through)"""
+        if hasattr(esg_inputs, 'values_list'):
+            return esg_inputs
+        from .models import ESGInput
+        return ESGInput.objects.filter(pk__in=[esg_input.pk for esg_input in esg_inputs])
+
+
+@scoring_engine('rules')
+class RulesEngine(ScoringEngine):
+    """ESGProcessor's benchmark rules; profiles set weights and benchmark bounds"""
+
+    def load(self, esg_inputs) -> dict:
+        return ESGProcessor.load_input_columns(self._queryset(esg_inputs).order_by('pk'))
+
+    def evaluate(self, columns: dict, profile: ScoringProfile) -> dict:
+        scores = ESGProcessor.score_columns(columns, profile.thresholds, profile.weights or DEFAULT_WEIGHTS)
+        scores['overall_esg_score'] = scores.pop('overall_score')
+        del scores['id']
+        return scores
+
+    def breakdown(self, esg_input) -> list:
+        # Each pillar's sub-score maxima add up to 100, so the points add up to the pillar score
+        thresholds = profile_for(esg_input.business_profile.industry).thresholds
+        parts = []
+        for name, (pillar, _) in SUB_SCORES.items():
+            part = sub_score(name, esg_input, thresholds)
+            parts.append({'category': name, 'pillar': pillar, 'score': part['score'], 'max_score': part['max_score'],
+                          'notes': f"{part['completeness']:.0f}% of the data for this part provided"})
+        return parts
+
+
+@scoring_engine('fallback')
+class FallbackEngine(ScoringEngine):
+    """The AI fallback's data-and-practice table (fallback_scoring); profiles set weights"""
+    # fallback_scoring averages the pillars unless a profile sets weights
+    default_weights = (1 / 3, 1 / 3, 1 / 3)
+
+    def load(self, esg_inputs) -> dict:
+        if hasattr(esg_inputs, 'values_list'):
+            return fallback_scoring.queryset_matrix(esg_inputs)
+        # Instances are already loaded: no query needed
+        return fallback_scoring.input_matrix(esg_inputs)
+
+    def evaluate(self, columns: dict, profile: ScoringProfile) -> dict:
+        scores = fallback_scoring.score_matrix(columns, profile.weights)
+        completeness = scores['data_completeness']
+        scores['confidence_level'] = np.select(
+            [completeness < 30, completeness < 70], ['low', 'medium'], default='high'
+        ).astype(object)
+        return scores
+
+    def breakdown(self, esg_input) -> list:
+        data_counts, parts = fallback_scoring.part_matrix(fallback_scoring.input_matrix([esg_input]))
+        result = []
+        for column, (pillar, pillar_parts) in enumerate(parts.items()):
+            for category, max_points, points in pillar_parts:
+                if category == f'{pillar}_data':
+                    notes = f"{data_counts[0, column]} of {fallback_scoring.DATA_SIZES[column]} data points provided"
+                elif category.endswith('_bonus'):
+                    notes = f"Bonus for {category[:-len('_bonus')]}"
+                else:
+                    notes = f'Points for practices in place, capped at {max_points}'
+                result.append({'category': category, 'pillar': pillar, 'score': float(points[0]),
+                               'max_score': max_points, 'notes': notes})
+        return result
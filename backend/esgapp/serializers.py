@@ -2,7 +2,7 @@ from rest_framework import serializers
 from django.contrib.auth.models import User
 from .models import (
     BusinessProfile, ESGInput, ESGSnapshot, ESGScore,
-    ESGRecommendation, ESGRoadmap, ChatSession, ChatMessage
+    ESGRecommendation, ESGRoadmap, ChatSession, ChatMessage, AIJob
 )
 
 
@@ -71,7 +71,7 @@ class ESGSnapshotSerializer(serializers.ModelSerializer):
         model = ESGSnapshot
         fields = ['id', 'business_profile', 'environmental_score', 'social_score',
                  'governance_score', 'overall_esg_score', 'confidence_level',
-                 'data_completeness', 'created_at', 'recommendations', 'roadmaps',
+                 'data_completeness', 'scoring_engine', 'created_at', 'recommendations', 'roadmaps',
                  'ai_insights', 'strengths', 'weaknesses', 'score_breakdown', 'esg_input']
     
     def get_recommendations(self, obj):
@@ -91,7 +91,17 @@ class ESGSnapshotSerializer(serializers.ModelSerializer):
         return getattr(obj, '_weaknesses', [])
     
     def get_score_breakdown(self, obj):
-        return getattr(obj, '_score_breakdown', {})
+        # Parts of the pillar scores saved by the snapshot's engine; .all() uses prefetch_related('score_breakdown')
+        return {
+            row.category: {
+                'pillar': row.pillar or None,
+                'score': row.score,
+                'max_score': row.max_score,
+                'notes': row.notes,
+                'source': row.source,
+            }
+            for row in obj.score_breakdown.all()
+        }
     
     def get_esg_input(self, obj):
         # Include ESG input data for calculations
@@ -130,3 +140,10 @@ class ChatSessionSerializer(serializers.ModelSerializer):
         model = ChatSession
         fields = ['id', 'snapshot', 'session_id', 'created_at', 'updated_at', 'messages']
 
+
+class AIJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = AIJob
+        fields = ['id', 'operation', 'status', 'progress', 'progress_message', 'result', 'error',
+                 'attempts', 'created_at', 'started_at', 'finished_at']
+        read_only_fields = fields
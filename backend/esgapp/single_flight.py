@@ -0,0 +1,178 @@
+"""
+Single-flight de-duplication of concurrent identical AI computations
+
+Callers with the same key share one in-flight computation: threads in a worker
+wait on the leader's result, and workers on the same host serialise on a
+per-key file lock and pick up the result the previous holder just published.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .file_lock import FileLock
+
+logger = logging.getLogger(__name__)
+
+# Fields that change on every save without changing what the AI sees
+UNHASHED_FIELDS = ('id', 'created_at', 'updated_at')
+
+
+def input_hash(*instances, exclude=UNHASHED_FIELDS) -> str:
+    """Stable hash of the field values of one or more model instances"""
+    values = [
+        {
+            field.attname: field.value_from_object(instance)
+            for field in instance._meta.concrete_fields
+            if field.name not in exclude
+        }
+        for instance in instances
+    ]
+    encoded = json.dumps(values, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()[:16]
+
+
+def flight_key(operation: str, object_id, digest: str) -> str:
+    """Key for one computation: operation + object id + input hash"""
+    return f"{operation}:{object_id}:{digest}"
+
+
+class _Call:
+    """One in-flight computation in this worker"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Runs a computation once per key while identical callers wait for its result"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key: str, fn):
+        """Return fn()'s result, sharing one execution among concurrent callers of key"""
+        call, leader = self._join(key)
+        if not leader:
+            return self._wait(key, call)
+
+        try:
+            started = time.time()
+            lock = self._acquire(key)
+            try:
+                result = self._read_result(key, started)
+                if result is None:
+                    result = fn()
+                    self._write_result(key, result)
+            finally:
+                lock.release(unlink=True)
+        except BaseException as e:
+            self._finish(key, call, error=e)
+            raise
+        self._finish(key, call, result=result)
+        return result
+
+    async def ado(self, key: str, coro_fn):
+        """Async variant of do() for coroutine functions"""
+        call, leader = self._join(key)
+        if not leader:
+            return await sync_to_async(self._wait, thread_sensitive=False)(key, call)
+
+        try:
+            started = time.time()
+            lock = await sync_to_async(self._acquire, thread_sensitive=False)(key)
+            try:
+                result = self._read_result(key, started)
+                if result is None:
+                    result = await coro_fn()
+                    self._write_result(key, result)
+            finally:
+                lock.release(unlink=True)
+        except BaseException as e:
+            self._finish(key, call, error=e)
+            raise
+        self._finish(key, call, result=result)
+        return result
+
+    def _join(self, key: str):
+        """Register interest in key; the first caller becomes the leader"""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                return call, False
+            call = _Call()
+            self._calls[key] = call
+            return call, True
+
+    def _wait(self, key: str, call: _Call):
+        logger.info(f"Single-flight: waiting for in-flight {key}")
+        if not call.done.wait(settings.AI_SINGLE_FLIGHT_TIMEOUT):
+            raise TimeoutError(f"Timed out waiting for in-flight {key}")
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def _finish(self, key: str, call: _Call, result=None, error=None):
+        call.result = result
+        call.error = error
+        with self._lock:
+            self._calls.pop(key, None)
+        call.done.set()
+
+    def _path(self, key: str, suffix: str) -> str:
+        directory = settings.AI_SINGLE_FLIGHT_DIR
+        os.makedirs(directory, exist_ok=True)
+        return os.path.join(directory, hashlib.sha256(key.encode('utf-8')).hexdigest()[:32] + suffix)
+
+    def _acquire(self, key: str) -> FileLock:
+        lock = FileLock(self._path(key, '.lock'))
+        lock.acquire(settings.AI_SINGLE_FLIGHT_TIMEOUT)
+        return lock
+
+    def _read_result(self, key: str, started: float):
+        """Result another worker finished while we waited for the lock, if any"""
+        try:
+            with open(self._path(key, '.json'), encoding='utf-8') as f:
+                published = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if published.get('finished_at', 0) < started:
+            return None
+        logger.info(f"Single-flight: reusing result of {key} from another worker")
+        return published['result']
+
+    def _write_result(self, key: str, result):
+        """Publish the result for workers queued on the same lock"""
+        path = self._path(key, '.json')
+        try:
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'finished_at': time.time(), 'result': result}, f, default=str)
+            os.replace(tmp_path, path)
+        except (OSError, TypeError, ValueError) as e:
+            logger.warning(f"Single-flight: could not publish result of {key}: {e}")
+        self._sweep()
+
+    def _sweep(self):
+        """Drop published results nobody can still be waiting for"""
+        directory = settings.AI_SINGLE_FLIGHT_DIR
+        cutoff = time.time() - settings.AI_SINGLE_FLIGHT_TIMEOUT
+        try:
+            for name in os.listdir(directory):
+                path = os.path.join(directory, name)
+                if name.endswith('.json') and os.path.getmtime(path) < cutoff:
+                    os.unlink(path)
+        except OSError:
+            pass
+
+
+# Shared registry for this worker process
+single_flight = SingleFlight()
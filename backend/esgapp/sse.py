@@ -0,0 +1,60 @@
+"""
+Server-Sent Events helpers for streaming chat responses
+
+Under ASGI, Django buffers a sync iterator completely before sending it, so
+sse_response hands ASGI requests an async iterator that pulls each frame from
+the sync generator in the request's sync thread and sends it immediately.
+"""
+import json
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import BaseRenderer
+
+
+class EventStreamRenderer(BaseRenderer):
+    """Lets DRF accept `Accept: text/event-stream`; non-stream replies become an error event"""
+    media_type = 'text/event-stream'
+    format = 'sse'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return sse_event(data, event='error').encode(self.charset)
+
+
+def sse_event(data, event=None) -> str:
+    """Format one Server-Sent Events frame"""
+    frame = f"event: {event}\n" if event else ""
+    return frame + f"data: {json.dumps(data, default=str)}\n\n"
+
+
+async def _async_frames(events):
+    """Async iterator over a sync iterator of frames, one thread hop per frame"""
+    iterator = iter(events)
+    end = object()
+    next_frame = sync_to_async(lambda: next(iterator, end))
+    try:
+        while True:
+            frame = await next_frame()
+            if frame is end:
+                return
+            yield frame
+    finally:
+        # Runs the generator's own cleanup (e.g. saving the chat message) on disconnect too
+        close = getattr(iterator, 'close', None)
+        if close:
+            await sync_to_async(close)()
+
+
+def sse_response(events, request=None) -> StreamingHttpResponse:
+    """
+    Wrap an iterator of SSE frames in a streaming response that proxies won't buffer;
+    pass the request so that ASGI requests get frames as they are produced
+    """
+    if isinstance(getattr(request, '_request', request), ASGIRequest):
+        events = _async_frames(events)
+    response = StreamingHttpResponse(events, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
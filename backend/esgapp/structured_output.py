@@ -0,0 +1,64 @@
+"""
+Provider-native structured output (response_format) for JSON-returning prompts
+
+Opt-in with AI_STRUCTURED_OUTPUT: 'json_object' asks the provider for a JSON
+object, 'json_schema' sends the prompt type's schema from json_extraction.
+Prompts without a schema, providers outside AI_STRUCTURED_OUTPUT_PROVIDERS and
+models that reject response_format keep the prompt-only JSON instructions.
+"""
+import logging
+import threading
+
+from django.conf import settings
+
+from .json_extraction import SCHEMAS
+
+logger = logging.getLogger(__name__)
+
+MODES = ('off', 'json_object', 'json_schema')
+
+# (provider, model) pairs that answered a response_format request with a 400
+_unsupported = set()
+_lock = threading.Lock()
+
+
+def _schema_for(prompt_type: str):
+    """JSON schema to send; array prompts are wrapped, as response schemas must be objects"""
+    schema = SCHEMAS[prompt_type]
+    if schema.get('type') == 'array':
+        return {'type': 'object', 'properties': {'items': schema}, 'required': ['items']}
+    return schema
+
+
+def response_format(prompt_type: str, provider: str, model: str):
+    """response_format for this call, or None to rely on the prompt alone"""
+    mode = settings.AI_STRUCTURED_OUTPUT
+    if mode not in ('json_object', 'json_schema') or prompt_type not in SCHEMAS:
+        return None
+    if provider not in settings.AI_STRUCTURED_OUTPUT_PROVIDERS:
+        return None
+    with _lock:
+        if (provider, model) in _unsupported:
+            return None
+
+    if mode == 'json_object':
+        # A JSON object cannot hold a top-level array answer
+        if SCHEMAS[prompt_type].get('type') != 'object':
+            return None
+        return {'type': 'json_object'}
+    return {
+        'type': 'json_schema',
+        'json_schema': {'name': prompt_type, 'schema': _schema_for(prompt_type), 'strict': False},
+    }
+
+
+def is_response_format_error(error) -> bool:
+    """Whether a 400 from the provider is about response_format rather than the request itself"""
+    message = str(error).lower()
+    return 'response_format' in message or 'json_schema' in message or 'json mode' in message
+
+
+def mark_unsupported(provider: str, model: str, error):
+    with _lock:
+        _unsupported.add((provider, model))
+    logger.warning(f"Structured output not supported by {provider}/{model}, using prompt-only JSON: {str(error)[:200]}")
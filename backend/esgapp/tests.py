@@ -0,0 +1,555 @@
+"""
+Equivalence tests: the compiled and vectorized scoring paths against their
+field-by-field forms, over generated inputs; rescoring after a partial update
+"""
+import random
+
+from django.contrib.auth.models import User
+from django.db import models
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIClient
+
+from . import fallback_scoring
+from .ai_scoring_service import AIScoringService
+from .esg_engine import DEFAULT_THRESHOLDS, DEFAULT_WEIGHTS, ESGProcessor, sub_score
+from .models import BusinessProfile, ESGInput, ESGRecommendation, ESGRoadmap, ESGSnapshot
+from .scoring_engines import get_engine, profile_for
+
+# One industry per scoring profile in settings.SCORING_PROFILES (default first)
+INDUSTRIES = ('Other', 'Textile manufacturing', 'Hotel', 'Retail shop', 'Software services')
+# Numbers around the rule bounds (data present, bonus thresholds, caps) plus a random value
+EDGE_NUMBERS = (None, 0, 0.5, 1, 5, 10, 20, 29.9, 30, 50, 100)
+
+
+def generate_inputs(rng: random.Random, count: int, industry: str) -> list:
+    """Unsaved ESGInputs with every field drawn from None/zero/edge/random values"""
+    business_profile = BusinessProfile(business_name='Generated', industry=industry, employee_count=1)
+    esg_inputs = []
+    for pk in range(1, count + 1):
+        # How much is in place and provided varies from nothing to everything, to reach
+        # the no-data and minimum-score cases too
+        density = rng.choice((0, 0.05, 0.3, 0.7, 1))
+        missing = rng.choice((0, 0.5, 1))
+        esg_input = ESGInput(pk=pk, business_profile=business_profile, total_employees=rng.choice((0, 1, 10, 75)))
+        for field in ESGInput._meta.concrete_fields:
+            if isinstance(field, models.BooleanField):
+                value = rng.random() < density
+            elif isinstance(field, (models.FloatField, models.IntegerField)) and field.null:
+                value = None if rng.random() < missing else rng.choice(EDGE_NUMBERS + (rng.uniform(0, 5000),))
+                if isinstance(field, models.IntegerField) and value is not None:
+                    value = int(value)
+            elif field.choices:
+                value = rng.choice((None, '') + tuple(choice for choice, _ in field.choices))
+            elif isinstance(field, models.JSONField):
+                value = ['LED lighting', 'Pension'][:rng.randint(0, 2)]
+            else:
+                continue
+            setattr(esg_input, field.attname, value)
+        esg_inputs.append(esg_input)
+    return esg_inputs
+
+
+# AIScoringService._fallback_scoring as it was before the compiled table, kept verbatim
+# as the behavior fallback_scoring must reproduce (also used by compare_batch_scoring --fallback)
+def baseline_fallback_scoring(esg_input: ESGInput) -> dict:
+    """Fallback scoring if AI fails - calculates scores based on actual data provided"""
+    # Count how much data is provided
+    data_points = 0
+    max_data_points = 0
+    
+    # Environmental data
+    env_data = 0
+    env_max = 12
+    if esg_input.electricity_kwh is not None: env_data += 1
+    if esg_input.electricity_bill_amount is not None: env_data += 1
+    if esg_input.generator_usage_liters is not None: env_data += 1
+    if esg_input.generator_usage_hours is not None: env_data += 1
+    if esg_input.has_solar: env_data += 1
+    if esg_input.solar_capacity_kw is not None: env_data += 1
+    if esg_input.water_usage_liters is not None: env_data += 1
+    if esg_input.waste_recycling: env_data += 1
+    if esg_input.waste_segregation: env_data += 1
+    if esg_input.carbon_footprint_tracking: env_data += 1
+    if esg_input.renewable_energy_percentage is not None: env_data += 1
+    if esg_input.hazardous_waste_management: env_data += 1
+    
+    # Social data
+    social_data = 0
+    social_max = 10
+    if esg_input.safety_training_provided: social_data += 1
+    if esg_input.safety_training_frequency: social_data += 1
+    if esg_input.health_insurance: social_data += 1
+    if esg_input.diversity_policy: social_data += 1
+    if esg_input.female_employees_percentage is not None: social_data += 1
+    if esg_input.workplace_accidents_last_year is not None: social_data += 1
+    if esg_input.mental_health_support: social_data += 1
+    if esg_input.employee_training_hours is not None: social_data += 1
+    if esg_input.employee_satisfaction_survey: social_data += 1
+    if esg_input.flexible_work_arrangements: social_data += 1
+    
+    # Governance data
+    gov_data = 0
+    gov_max = 13
+    if esg_input.code_of_conduct: gov_data += 1
+    if esg_input.anti_corruption_policy: gov_data += 1
+    if esg_input.data_privacy_policy: gov_data += 1
+    if esg_input.whistleblower_policy: gov_data += 1
+    if esg_input.board_oversight: gov_data += 1
+    if esg_input.risk_management_policy: gov_data += 1
+    if esg_input.cybersecurity_measures: gov_data += 1
+    if esg_input.regulatory_compliance_tracking: gov_data += 1
+    if esg_input.sustainability_reporting: gov_data += 1
+    if esg_input.stakeholder_engagement: gov_data += 1
+    if esg_input.esg_goals_set: gov_data += 1
+    if esg_input.third_party_audits: gov_data += 1
+    if esg_input.public_esg_commitments: gov_data += 1
+    
+    # Calculate scores based on data completeness AND practices
+    # Reward both data provision and actual ESG practices
+    env_score = 0.0
+    
+    # Base score from data completeness (max 40 points)
+    if env_data > 0:
+        env_score = min((env_data / env_max) * 40, 40)
+    
+    # Additional points for positive practices (max 60 points)
+    positive_practices = sum([
+        esg_input.has_solar,
+        esg_input.waste_recycling,
+        esg_input.waste_segregation,
+        esg_input.carbon_footprint_tracking,
+        esg_input.hazardous_waste_management,
+        esg_input.paper_reduction_initiatives,
+        esg_input.business_travel_policy,
+        esg_input.remote_work_policy,
+        esg_input.sustainable_procurement
+    ])
+    env_score += min(positive_practices * 6.67, 60)  # Max 60 points for practices
+    
+    # Bonus for renewable energy percentage if provided
+    if esg_input.renewable_energy_percentage and esg_input.renewable_energy_percentage > 0:
+        env_score += min(esg_input.renewable_energy_percentage * 0.2, 10)  # Up to 10 bonus points
+    
+    # Ensure score doesn't exceed 100
+    env_score = min(env_score, 100)
+    
+    social_score = 0.0
+    
+    # Base score from data completeness (max 40 points)
+    if social_data > 0:
+        social_score = min((social_data / social_max) * 40, 40)
+    elif esg_input.total_employees and esg_input.total_employees > 0:
+        # Minimal score for just providing employee count
+        social_score = 5.0
+    
+    # Additional points for positive practices (max 60 points)
+    positive_practices = sum([
+        esg_input.safety_training_provided,
+        esg_input.health_insurance,
+        esg_input.diversity_policy,
+        esg_input.mental_health_support,
+        esg_input.employee_satisfaction_survey,
+        esg_input.flexible_work_arrangements,
+        esg_input.community_engagement,
+        esg_input.local_hiring_preference,
+        esg_input.charitable_contributions
+    ])
+    social_score += min(positive_practices * 6.67, 60)  # Max 60 points for practices
+    
+    # Bonus for training hours if provided
+    if esg_input.employee_training_hours and esg_input.employee_training_hours > 0:
+        social_score += min(esg_input.employee_training_hours * 0.5, 10)  # Up to 10 bonus points
+    
+    # Bonus for good female employee percentage (diversity)
+    if esg_input.female_employees_percentage and esg_input.female_employees_percentage >= 30:
+        social_score += 5  # Bonus for diversity
+    
+    # Ensure score doesn't exceed 100
+    social_score = min(social_score, 100)
+    
+    gov_score = 0.0
+    
+    # Base score from data completeness (max 30 points)
+    if gov_data > 0:
+        gov_score = min((gov_data / gov_max) * 30, 30)
+    
+    # Additional points for core policies (max 50 points)
+    core_policies = sum([
+        esg_input.code_of_conduct,
+        esg_input.anti_corruption_policy,
+        esg_input.data_privacy_policy,
+        esg_input.whistleblower_policy,
+        esg_input.board_oversight,
+        esg_input.risk_management_policy
+    ])
+    gov_score += min(core_policies * 8.33, 50)  # Max 50 points for core policies
+    
+    # Additional points for advanced governance (max 20 points)
+    advanced_governance = sum([
+        esg_input.cybersecurity_measures,
+        esg_input.regulatory_compliance_tracking,
+        esg_input.sustainability_reporting,
+        esg_input.stakeholder_engagement,
+        esg_input.esg_goals_set,
+        esg_input.third_party_audits,
+        esg_input.public_esg_commitments
+    ])
+    gov_score += min(advanced_governance * 2.86, 20)  # Max 20 points for advanced governance
+    
+    # Ensure score doesn't exceed 100
+    gov_score = min(gov_score, 100)
+    
+    # Calculate data completeness
+    total_data = env_data + social_data + gov_data
+    total_max = env_max + social_max + gov_max
+    data_completeness = (total_data / total_max * 100) if total_max > 0 else 0
+    
+    # Calculate overall score (weighted average, but ensure minimum if data provided)
+    if total_data == 0 and (not esg_input.total_employees or esg_input.total_employees == 0):
+        # No data at all - return 0 scores
+        overall_score = 0.0
+        env_score = 0.0
+        social_score = 0.0
+        gov_score = 0.0
+        data_completeness = 0.0
+    else:
+        # Calculate average, but ensure minimum scores if data is provided
+        overall_score = (env_score + social_score + gov_score) / 3
+        
+        # If data is provided but scores are still very low, boost them slightly
+        # This ensures that providing data gets recognized
+        if total_data > 0 and overall_score < 20:
+            # Minimum score boost for providing data
+            overall_score = max(overall_score, 15.0)
+            # Adjust individual scores proportionally
+            if env_score < 15 and env_data > 0:
+                env_score = max(env_score, 15.0)
+            if social_score < 15 and (social_data > 0 or esg_input.total_employees):
+                social_score = max(social_score, 15.0)
+            if gov_score < 15 and gov_data > 0:
+                gov_score = max(gov_score, 15.0)
+            # Recalculate overall
+            overall_score = (env_score + social_score + gov_score) / 3
+    
+    return {
+        "environmental_score": round(env_score, 2),
+        "social_score": round(social_score, 2),
+        "governance_score": round(gov_score, 2),
+        "overall_esg_score": round(overall_score, 2),
+        "confidence_level": "low" if data_completeness < 30 else "medium" if data_completeness < 70 else "high",
+        "data_completeness": round(data_completeness, 2),
+        "detailed_analysis": {
+            "environmental": {
+                "strengths": ["Waste segregation"] if esg_input.waste_segregation else [],
+                "weaknesses": ["Limited environmental data provided"] if env_data < 5 else [],
+                "key_metrics": {},
+                "industry_benchmark": "Insufficient data for comparison"
+            },
+            "social": {
+                "strengths": ["Employee benefits"] if esg_input.health_insurance else [],
+                "weaknesses": ["Limited social data provided"] if social_data < 5 else [],
+                "key_metrics": {},
+                "industry_benchmark": "Insufficient data for comparison"
+            },
+            "governance": {
+                "strengths": ["Governance policies"] if gov_data > 5 else [],
+                "weaknesses": ["Limited governance data provided"] if gov_data < 5 else [],
+                "key_metrics": {},
+                "industry_benchmark": "Insufficient data for comparison"
+            }
+        },
+        "risk_assessment": {
+            "high_risks": ["Insufficient data for comprehensive assessment"] if data_completeness < 20 else [],
+            "medium_risks": [],
+            "low_risks": []
+        },
+        "improvement_priorities": [],
+        "estimated_costs": {"low_cost": [], "medium_cost": [], "high_cost": []},
+        "insights": {},
+        "strengths": [],
+        "weaknesses": []
+    }
+
+
+class FallbackScoringTableTests(SimpleTestCase):
+    """The compiled fallback table against the baseline field-by-field fallback, and its profile weighting"""
+
+    def test_default_profile_matches_baseline(self):
+        rng = random.Random(2024)
+        esg_inputs = generate_inputs(rng, 500, 'Other')
+        service = AIScoringService()
+        batch = service._fallback_scoring_batch(esg_inputs)
+        for esg_input in esg_inputs:
+            expected = baseline_fallback_scoring(esg_input)
+            for result in (service._fallback_scoring(esg_input), batch[esg_input.pk]):
+                self.assertEqual({key: result[key] for key in expected}, expected, f"input {esg_input.pk}")
+
+    def test_weighted_profiles_weight_the_overall(self):
+        rng = random.Random(2025)
+        engine = get_engine('fallback')
+        for industry in INDUSTRIES[1:]:
+            weights = profile_for(industry).weights
+            with self.subTest(industry=industry, weights=weights):
+                esg_inputs = generate_inputs(rng, 200, industry)
+                unweighted = fallback_scoring.score_matrix(fallback_scoring.input_matrix(esg_inputs))
+                weighted = engine.score_batch(esg_inputs)
+                for row, esg_input in enumerate(esg_inputs):
+                    scores = engine.row(weighted, row)
+                    pillars = [scores[f'{pillar}_score'] for pillar in fallback_scoring.PILLARS]
+                    self.assertEqual(scores['data_completeness'], unweighted['data_completeness'][row].item())
+                    # Weights only decide the overall, and through it whether pillars with data are lifted
+                    for pillar, score in zip(fallback_scoring.PILLARS, pillars):
+                        plain = unweighted[f'{pillar}_score'][row].item()
+                        if score != plain:
+                            self.assertIn(fallback_scoring.MINIMUM_SCORE, (score, plain), f"input {esg_input.pk}")
+                    if unweighted['overall_esg_score'][row] == 0 and not esg_input.total_employees:
+                        self.assertEqual(scores['overall_esg_score'], 0.0)
+                    else:
+                        expected = pillars[0] * weights[0] + pillars[1] * weights[1] + pillars[2] * weights[2]
+                        self.assertEqual(scores['overall_esg_score'], expected, f"input {esg_input.pk}")
+
+
+def edge_inputs(rng: random.Random, count: int, business_profiles: list) -> list:
+    """
+    Saved ESGInputs whose rule fields sit on the benchmark bounds of their industry
+    profile (per employee where the rule divides), just below them, zero, None or blank
+    """
+    def per_employee(employees, bounds):
+        return rng.choice((None, 0) + tuple(employees * bound for bound in bounds) + tuple(
+            employees * bound - 0.5 for bound in bounds
+        ))
+
+    def choice_of(field_name):
+        field = ESGInput._meta.get_field(field_name)
+        blanks = (None, '') if field.null else ('',)
+        return rng.choice(blanks + tuple(choice for choice, _ in field.choices))
+
+    esg_inputs = []
+    for _ in range(count):
+        # Workforce points change at 10, 20 and 50 employees
+        employees = rng.choice((1, 9, 10, 19, 20, 49, 50, 51))
+        business_profile = rng.choice(business_profiles)
+        thresholds = profile_for(business_profile.industry).thresholds
+        kwh_bounds, liter_bounds = thresholds['kwh_per_employee'], thresholds['generator_liters_per_employee']
+        water_bounds, solar_bounds = thresholds['water_liters_per_employee'], thresholds['solar_kw']
+        flags = {field: rng.random() < 0.5 for field in (
+            'has_solar', 'waste_recycling', 'waste_segregation', 'safety_training_provided', 'health_insurance',
+            'diversity_policy', 'code_of_conduct', 'anti_corruption_policy', 'data_privacy_policy',
+            'whistleblower_policy', 'board_oversight', 'risk_management_policy',
+        )}
+        esg_inputs.append(ESGInput(
+            business_profile=business_profile,
+            total_employees=employees,
+            electricity_kwh=per_employee(employees, kwh_bounds),
+            # Bill only: the rule estimates kWh at 0.12 per kWh
+            electricity_bill_amount=rng.choice((None, 0, employees * kwh_bounds[0] * 0.12, 75.5)),
+            generator_usage_liters=per_employee(employees, liter_bounds),
+            generator_usage_hours=rng.choice((None, 0, 12)),
+            solar_capacity_kw=rng.choice((None, 0) + solar_bounds + tuple(bound - 0.5 for bound in solar_bounds)),
+            water_usage_liters=per_employee(employees, water_bounds),
+            water_source=choice_of('water_source'),
+            waste_recycling_frequency=choice_of('waste_recycling_frequency'),
+            safety_training_frequency=choice_of('safety_training_frequency'),
+            # Five points per benefit, capped at 25
+            employee_benefits=['Pension', 'Bonus', 'Leave', 'Meals', 'Transport', 'Gym'][:rng.randint(0, 6)],
+            **flags,
+        ))
+    return ESGInput.objects.bulk_create(esg_inputs)
+
+
+class BatchScoringTests(TestCase):
+    """ESGProcessor's batch API equals the scalar rules of process_esg_input on edge values"""
+
+    @classmethod
+    def setUpTestData(cls):
+        # Office area counts towards energy completeness when set and non-zero
+        business_profiles = [
+            BusinessProfile.objects.create(
+                user=User.objects.create_user(f'edge{index}'), business_name='Edge', industry=industry,
+                employee_count=1, office_area_sqm=office_area,
+            )
+            for index, (industry, office_area) in enumerate(
+                (industry, office_area) for industry in INDUSTRIES for office_area in (None, 0, 120.5)
+            )
+        ]
+        edge_inputs(random.Random(2027), 600, business_profiles)
+        cls.queryset = ESGInput.objects.select_related('business_profile').order_by('id')
+
+    @staticmethod
+    def scalar_scores(esg_input, thresholds=DEFAULT_THRESHOLDS, weights=DEFAULT_WEIGHTS) -> dict:
+        env_score, env_completeness = ESGProcessor.calculate_environmental_score(esg_input, thresholds)
+        social_score, social_completeness = ESGProcessor.calculate_social_score(esg_input)
+        gov_score, gov_completeness = ESGProcessor.calculate_governance_score(esg_input)
+        overall_score, confidence = ESGProcessor.calculate_overall_score(
+            env_score, social_score, gov_score, env_completeness, social_completeness, gov_completeness, weights
+        )
+        return {
+            'environmental_score': env_score,
+            'environmental_completeness': env_completeness,
+            'social_score': social_score,
+            'social_completeness': social_completeness,
+            'governance_score': gov_score,
+            'governance_completeness': gov_completeness,
+            'overall_score': overall_score,
+            'confidence_level': confidence,
+            'data_completeness': (env_completeness + social_completeness + gov_completeness) / 3,
+        }
+
+    def test_sub_scores_match_scalar(self):
+        for industry in INDUSTRIES:
+            thresholds = profile_for(industry).thresholds
+            queryset = self.queryset.filter(business_profile__industry=industry)
+            columns = ESGProcessor.load_input_columns(queryset)
+            batch = {
+                'energy': ESGProcessor._energy_score_batch(columns, thresholds),
+                'water': ESGProcessor._water_score_batch(columns, thresholds),
+                'waste': ESGProcessor._waste_score_batch(columns),
+                'renewable': ESGProcessor._renewable_score_batch(columns, thresholds),
+            }
+            for row, esg_input in enumerate(queryset):
+                for name, (score, completeness) in batch.items():
+                    expected = sub_score(name, esg_input, thresholds)
+                    self.assertEqual(
+                        (score[row].item(), completeness[row].item()), (expected['score'], expected['completeness']),
+                        f"{name} of input {esg_input.pk} ({industry})",
+                    )
+
+    def test_score_inputs_batch_matches_scalar(self):
+        batch = ESGProcessor.score_inputs_batch(self.queryset)
+        for row, esg_input in enumerate(self.queryset):
+            expected = self.scalar_scores(esg_input)
+            self.assertEqual(batch['id'][row], esg_input.pk)
+            self.assertEqual({field: batch[field][row] for field in expected}, expected, f"input {esg_input.pk}")
+
+    def test_rules_engine_matches_process_esg_input(self):
+        engine = get_engine('rules')
+        scores = engine.score_batch(self.queryset)
+        for row, esg_input in enumerate(self.queryset):
+            profile = profile_for(esg_input.business_profile.industry)
+            expected = self.scalar_scores(esg_input, profile.thresholds, profile.weights or DEFAULT_WEIGHTS)
+            expected['overall_esg_score'] = expected.pop('overall_score')
+            result = engine.row(scores, row)
+            self.assertEqual({field: result[field] for field in expected}, expected, f"input {esg_input.pk}")
+
+            snapshot = ESGProcessor.process_esg_input(esg_input)
+            self.assertEqual(
+                (snapshot.environmental_score, snapshot.overall_esg_score, snapshot.data_completeness,
+                 snapshot.confidence_level),
+                (round(result['environmental_score'], 2), round(result['overall_esg_score'], 2),
+                 round(result['data_completeness'], 2), result['confidence_level']),
+                f"snapshot of input {esg_input.pk}",
+            )
+
+    def assert_breakdown_adds_up(self, snapshot):
+        rows = list(snapshot.score_breakdown.all())
+        self.assertEqual({row.source for row in rows}, {snapshot.scoring_engine}, f"snapshot {snapshot.pk}")
+        for pillar in ('environmental', 'social', 'governance'):
+            self.assertAlmostEqual(
+                sum(row.score for row in rows if row.pillar == pillar), getattr(snapshot, f'{pillar}_score'),
+                places=6, msg=f"{pillar} of snapshot {snapshot.pk}",
+            )
+
+    def test_breakdown_adds_up_to_the_pillar_scores(self):
+        from .scoring_engines import save_breakdowns
+        from .views import _process_esg_inputs_with_engine
+
+        esg_inputs = list(self.queryset[:150])
+        for esg_input in esg_inputs:
+            self.assert_breakdown_adds_up(ESGProcessor.process_esg_input(esg_input))
+
+        _process_esg_inputs_with_engine(esg_inputs, 'fallback')
+        for esg_input in esg_inputs:
+            self.assert_breakdown_adds_up(ESGSnapshot.objects.get(esg_input=esg_input))
+
+        # The AI returns no parts: its snapshots keep no rule or fallback rows
+        snapshot = ESGSnapshot.objects.get(esg_input=esg_inputs[0])
+        snapshot.scoring_engine = 'ai'
+        save_breakdowns([(snapshot, esg_inputs[0])])
+        self.assertFalse(snapshot.score_breakdown.exists())
+
+
+class PartialUpdateRescoringTests(TestCase):
+    """A PATCH follows the engine that scored the snapshot, without calling the AI"""
+
+    def setUp(self):
+        user = User.objects.create_user('editor')
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+        business_profile = BusinessProfile.objects.create(
+            user=user, business_name='Mill', industry='Textile manufacturing', employee_count=30,
+        )
+        self.esg_input = ESGInput.objects.create(
+            business_profile=business_profile, total_employees=30, electricity_kwh=9000, water_usage_liters=60000,
+            waste_recycling=True, health_insurance=True, code_of_conduct=True, data_privacy_policy=True,
+        )
+
+    def patch(self, snapshot, stale='G', **fields):
+        for category in ('E', 'G'):
+            ESGRecommendation.objects.create(
+                snapshot=snapshot, title='Act', description='Act', category=category, priority='high',
+                cost_level='low', expected_impact='Better',
+            )
+            ESGRoadmap.objects.create(
+                snapshot=snapshot, phase=1, action_title='Act', description='Act', responsible_role='Owner',
+                effort_level='low', esg_category=category,
+            )
+        response = self.client.patch(f'/api/esg-inputs/{self.esg_input.pk}/', fields, format='json')
+        self.assertEqual(response.status_code, 200)
+        snapshot.refresh_from_db()
+        self.esg_input.refresh_from_db()
+        expected = {(category, category == stale) for category in ('E', 'G')}
+        self.assertEqual({(row.category, row.stale) for row in snapshot.recommendations.all()}, expected)
+        self.assertEqual({(row.esg_category, row.stale) for row in snapshot.roadmaps.all()}, expected)
+        self.assertEqual(snapshot.input_hash, '')
+        return response.data['rescoring']
+
+    def test_rules_snapshot_moves_by_the_profile_sub_scores(self):
+        snapshot = ESGProcessor.process_esg_input(self.esg_input)
+        rescoring = self.patch(snapshot, whistleblower_policy=True)
+
+        expected = get_engine('rules').score(self.esg_input)
+        self.assertEqual(snapshot.environmental_score, round(expected['environmental_score'], 2))
+        self.assertEqual(snapshot.governance_score, round(expected['governance_score'], 2))
+        self.assertAlmostEqual(snapshot.overall_esg_score, expected['overall_esg_score'], delta=0.02)
+        self.assertFalse(rescoring['scores_stale'])
+        policies = snapshot.score_breakdown.get(category='policies')
+        self.assertEqual((policies.pillar, policies.source), ('governance', 'rules'))
+        self.assertEqual(policies.score, sub_score('policies', self.esg_input)['score'])
+        self.assertEqual(rescoring['snapshot']['score_breakdown']['policies']['score'], policies.score)
+
+    def test_rules_snapshot_uses_the_industry_bounds(self):
+        snapshot = ESGProcessor.process_esg_input(self.esg_input)
+        # 500 kWh per employee: 20 energy points against the textile bounds, 5 against the default ones
+        self.patch(snapshot, stale='E', electricity_kwh=15000)
+
+        expected = get_engine('rules').score(self.esg_input)
+        self.assertEqual(snapshot.environmental_score, round(expected['environmental_score'], 2))
+        self.assertAlmostEqual(snapshot.overall_esg_score, expected['overall_esg_score'], delta=0.02)
+        self.assertEqual(snapshot.score_breakdown.get(category='energy').score, 20)
+
+    def test_fallback_snapshot_is_scored_again_with_the_fallback(self):
+        snapshot = ESGProcessor.process_esg_input(self.esg_input)
+        row = get_engine('fallback').score(self.esg_input)
+        ESGSnapshot.objects.filter(pk=snapshot.pk).update(scoring_engine='fallback', **{
+            field: round(row[field], 2) for field in ('governance_score', 'overall_esg_score')
+        })
+        snapshot.refresh_from_db()
+        rescoring = self.patch(snapshot, whistleblower_policy=True)
+
+        expected = get_engine('fallback').score(self.esg_input)
+        self.assertEqual(snapshot.governance_score, round(expected['governance_score'], 2))
+        self.assertEqual(snapshot.overall_esg_score, round(expected['overall_esg_score'], 2))
+        self.assertGreater(snapshot.governance_score, round(row['governance_score'], 2))
+        self.assertEqual({row.source for row in snapshot.score_breakdown.all()}, {'fallback'})
+        self.assertFalse(rescoring['scores_stale'])
+
+    def test_ai_snapshot_keeps_its_scores_and_reports_them_stale(self):
+        snapshot = ESGProcessor.process_esg_input(self.esg_input)
+        ESGSnapshot.objects.filter(pk=snapshot.pk).update(scoring_engine='ai', governance_score=61.5)
+        snapshot.refresh_from_db()
+        before = (snapshot.governance_score, snapshot.overall_esg_score)
+        rescoring = self.patch(snapshot, whistleblower_policy=True)
+
+        self.assertEqual((snapshot.governance_score, snapshot.overall_esg_score), before)
+        self.assertTrue(rescoring['scores_stale'])
+        self.assertEqual(rescoring['rescored'], {})
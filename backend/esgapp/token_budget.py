@@ -0,0 +1,120 @@
+"""
+Adaptive max_tokens from observed completion sizes
+
+Call sites hard-code a generous max_tokens per prompt type. Provider queues and
+rate limits count requested tokens, so the gateway records how long completions
+actually are and, once a prompt type has AI_MAX_TOKENS_MIN_SAMPLES of them,
+asks for a high percentile of those lengths plus headroom instead. The call
+site's value stays the ceiling. A completion cut off at the adaptive limit is
+recorded as needing the full ceiling, so the limit backs off after truncation.
+"""
+import math
+import threading
+from collections import deque
+
+from django.conf import settings
+
+from .prompt_context import estimate_tokens
+
+# Limits are rounded up to a multiple of this, so small shifts in the
+# percentile do not change every request
+ROUND_TO = 50
+
+
+class CompletionSizeTracker:
+    """Recent completion lengths (tokens) of one prompt type"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._samples = deque(maxlen=settings.AI_MAX_TOKENS_WINDOW)
+        self.ceiling = None
+        self.truncated = 0
+
+    def add(self, tokens: int, truncated: bool, sent_limit):
+        with self._lock:
+            if truncated:
+                self.truncated += 1
+                # The true length is unknown; assume the call needed all it could get
+                tokens = max(tokens, self.ceiling or 0, 2 * (sent_limit or 0))
+            self._samples.append(tokens)
+
+    def percentile(self, q: float):
+        with self._lock:
+            values = sorted(self._samples)
+        if len(values) < settings.AI_MAX_TOKENS_MIN_SAMPLES:
+            return None
+        return values[min(len(values) - 1, int(math.ceil(q * (len(values) - 1))))]
+
+    def stats(self) -> dict:
+        with self._lock:
+            values = sorted(self._samples)
+        return {
+            'samples': len(values),
+            'p50': values[len(values) // 2] if values else None,
+            'max': values[-1] if values else None,
+            'truncated': self.truncated,
+            'ceiling': self.ceiling,
+        }
+
+
+_trackers = {}
+_lock = threading.Lock()
+
+
+def _tracker(prompt_type: str) -> CompletionSizeTracker:
+    with _lock:
+        return _trackers.setdefault(prompt_type, CompletionSizeTracker())
+
+
+def _limit(tracker: CompletionSizeTracker, requested: int):
+    """Adaptive limit for a call site's requested max_tokens, None until there is enough data"""
+    observed = tracker.percentile(settings.AI_MAX_TOKENS_PERCENTILE)
+    if observed is None:
+        return None
+    limit = math.ceil(observed * (1 + settings.AI_MAX_TOKENS_HEADROOM) / ROUND_TO) * ROUND_TO
+    return min(requested, max(settings.AI_MAX_TOKENS_FLOOR, limit))
+
+
+def adapt_params(prompt_type: str, params: dict) -> dict:
+    """Completion params with max_tokens lowered to the adaptive limit when there is one"""
+    requested = params.get('max_tokens')
+    if not requested or not prompt_type:
+        return params
+    tracker = _tracker(prompt_type)
+    tracker.ceiling = requested
+    if not settings.AI_ADAPTIVE_MAX_TOKENS:
+        return params
+    limit = _limit(tracker, requested)
+    if limit is None or limit >= requested:
+        return params
+    return {**params, 'max_tokens': limit}
+
+
+def record_completion(prompt_type: str, params: dict, response):
+    """Record a non-streamed completion's length"""
+    if not prompt_type or not response.choices:
+        return
+    usage = getattr(response, 'usage', None)
+    tokens = getattr(usage, 'completion_tokens', None)
+    if tokens is None:
+        tokens = estimate_tokens(response.choices[0].message.content or '')
+    truncated = response.choices[0].finish_reason == 'length'
+    _tracker(prompt_type).add(tokens, truncated, params.get('max_tokens'))
+
+
+def record_stream(prompt_type: str, params: dict, text: str, finish_reason):
+    """Record a finished stream's length (estimated, streams carry no usage)"""
+    if prompt_type:
+        _tracker(prompt_type).add(estimate_tokens(text), finish_reason == 'length', params.get('max_tokens'))
+
+
+def stats() -> dict:
+    """Observed sizes and current limit per prompt type"""
+    with _lock:
+        trackers = dict(_trackers)
+    result = {}
+    for prompt_type, tracker in trackers.items():
+        tracker_stats = tracker.stats()
+        limit = _limit(tracker, tracker.ceiling) if tracker.ceiling and settings.AI_ADAPTIVE_MAX_TOKENS else None
+        result[prompt_type] = {**tracker_stats, 'max_tokens': limit or tracker.ceiling}
+    return result
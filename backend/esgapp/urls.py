@@ -2,6 +2,7 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from . import views
 from . import ai_views
+from . import async_views
 
 router = DefaultRouter()
 router.register(r'business-profiles', views.BusinessProfileViewSet, basename='businessprofile')
@@ -16,14 +17,27 @@ urlpatterns = [
     
     # Original endpoints
     path('chat/query/', views.chat_query, name='chat_query'),
+    path('chat/query/stream/', views.chat_query_stream, name='chat_query_stream'),
     path('esg/roadmap/', views.generate_roadmap, name='generate_roadmap'),
     path('esg/report/', views.generate_report, name='generate_report'),
     
     # New AI-powered endpoints
     path('ai/comprehensive-analysis/', ai_views.ai_comprehensive_analysis, name='ai_comprehensive_analysis'),
     path('ai/chatbot/', ai_views.ai_chatbot_query, name='ai_chatbot_query'),
+    path('ai/chatbot/stream/', ai_views.ai_chatbot_query_stream, name='ai_chatbot_query_stream'),
     path('ai/report/', ai_views.generate_ai_report, name='generate_ai_report'),
     path('ai/status/', ai_views.ai_service_status, name='ai_service_status'),
+    path('ai/metrics/', ai_views.ai_metrics, name='ai_metrics'),
+    path('jobs/<uuid:job_id>/', ai_views.job_status, name='job_status'),
+    
+    # Async variants of the LLM-bound endpoints (serve with an ASGI server)
+    path('async/esg-inputs/<int:pk>/process/', async_views.process_esg_input, name='async_process_esg_input'),
+    path('async/esg-snapshots/<int:pk>/top_opportunities/', async_views.top_opportunities, name='async_top_opportunities'),
+    path('async/esg-snapshots/<int:pk>/simulate_impact/', async_views.simulate_impact, name='async_simulate_impact'),
+    path('async/esg/roadmap/', async_views.generate_roadmap, name='async_generate_roadmap'),
+    path('async/chat/query/', async_views.chat_query, name='async_chat_query'),
+    path('async/ai/comprehensive-analysis/', async_views.ai_comprehensive_analysis, name='async_ai_comprehensive_analysis'),
+    path('async/ai/chatbot/', async_views.ai_chatbot_query, name='async_ai_chatbot_query'),
     
     path('', include(router.urls)),
 ]
@@ -1,6 +1,7 @@
 from rest_framework import viewsets, status
-from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.decorators import action, api_view, permission_classes, renderer_classes
 from rest_framework.response import Response
+from rest_framework.renderers import JSONRenderer
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.exceptions import ValidationError
 from rest_framework.authtoken.models import Token
@@ -12,7 +13,6 @@ import uuid
 import json
 import re
 import logging
-from openai import OpenAI
 from django.conf import settings
 
 logger = logging.getLogger(__name__)
@@ -29,6 +29,18 @@ from .serializers import (
 from .esg_engine import ESGProcessor
 from .ai_recommendation_service import AIRecommendationService
 from .ai_scoring_service import AIScoringService
+from .scoring_engines import ENGINES, get_engine, save_breakdowns
+from .incremental_scoring import rescore_partial_update
+from . import llm_metrics
+from .json_extraction import extract_json
+from .llm_clients import get_client
+from .llm_gateway import chat_completion, stream_chat_completion
+from .answer_cache import answer_cache, response_fields
+from .sse import EventStreamRenderer, sse_event, sse_response
+from .prompt_context import encode_profile, encode_scores, use_compact
+from .single_flight import flight_key, input_hash, single_flight
+from .ai_jobs import wants_async, enqueue_job, accepted_response
+from .assessment_pipeline import run_full_assessment, ROADMAP_MAX_PHASE
 
 
 @api_view(['POST'])
@@ -282,92 +294,42 @@ class ESGInputViewSet(viewsets.ModelViewSet):
         
         serializer.save(business_profile=business_profile)
     
+    def update(self, request, *args, **kwargs):
+        """Save the edit, then rescore the existing snapshot with the engine that scored it (no AI call)"""
+        self.rescoring = None
+        response = super().update(request, *args, **kwargs)
+        if self.rescoring:
+            response.data['rescoring'] = {
+                **{key: value for key, value in self.rescoring.items() if key != 'snapshot'},
+                'snapshot': ESGSnapshotSerializer(self.rescoring['snapshot']).data,
+            }
+        return response
+    
+    def perform_update(self, serializer):
+        previous_values = {field: getattr(serializer.instance, field) for field in serializer.validated_data}
+        esg_input = serializer.save()
+        self.rescoring = rescore_partial_update(esg_input, previous_values)
+    
     @action(detail=True, methods=['post'])
     def process(self, request, pk=None):
-        """Process ESG input and create snapshot using AI"""
+        """Process ESG input and create snapshot using AI, or a rule-based scoring engine by name (engine)"""
+        engine = _requested_engine(request)
+        if engine is None:
+            return Response(_unknown_engine_error(), status=status.HTTP_400_BAD_REQUEST)
         try:
             esg_input = self.get_object()
+            force = _wants_force(request)
             
-            # Check if snapshot already exists (OneToOneField constraint)
-            existing_snapshot = None
-            try:
-                existing_snapshot = ESGSnapshot.objects.get(esg_input=esg_input)
-            except ESGSnapshot.DoesNotExist:
-                pass
-            
-            # Use AI to calculate ESG scores
-            ai_scoring_service = AIScoringService()
-            
-            try:
-                scores_data = ai_scoring_service.calculate_esg_scores(esg_input)
-            except Exception as ai_error:
-                logger.error(f"AI scoring failed: {ai_error}")
-                import traceback
-                logger.error(traceback.format_exc())
-                # Use fallback scoring
-                scores_data = ai_scoring_service._fallback_scoring(esg_input)
-            
-            # Validate scores_data
-            if not scores_data or not isinstance(scores_data, dict):
-                raise ValueError("Invalid scores data from AI service")
-            
-            # Ensure all required fields are present with defaults
-            scores_data.setdefault('environmental_score', 0)
-            scores_data.setdefault('social_score', 0)
-            scores_data.setdefault('governance_score', 0)
-            scores_data.setdefault('overall_esg_score', 0)
-            scores_data.setdefault('confidence_level', 'low')
-            scores_data.setdefault('data_completeness', 0)
-            
-            # Validate score values are numeric
-            try:
-                env_score = round(float(scores_data['environmental_score']), 2)
-                social_score = round(float(scores_data['social_score']), 2)
-                gov_score = round(float(scores_data['governance_score']), 2)
-                overall_score = round(float(scores_data['overall_esg_score']), 2)
-                data_completeness = round(float(scores_data['data_completeness']), 2)
-                confidence_level = str(scores_data['confidence_level']) or 'low'
-            except (ValueError, TypeError) as ve:
-                raise ValueError(f"Invalid score values: {ve}")
-            
-            # Update existing snapshot or create new one
-            if existing_snapshot:
-                # Update existing snapshot
-                existing_snapshot.environmental_score = env_score
-                existing_snapshot.social_score = social_score
-                existing_snapshot.governance_score = gov_score
-                existing_snapshot.overall_esg_score = overall_score
-                existing_snapshot.confidence_level = confidence_level
-                existing_snapshot.data_completeness = data_completeness
-                existing_snapshot.save()
-                
-                # Delete old recommendations and create new ones
-                existing_snapshot.recommendations.all().delete()
-                
-                snapshot = existing_snapshot
-            else:
-                # Create new snapshot
-                snapshot = ESGSnapshot.objects.create(
-                    business_profile=esg_input.business_profile,
-                    esg_input=esg_input,
-                    environmental_score=env_score,
-                    social_score=social_score,
-                    governance_score=gov_score,
-                    overall_esg_score=overall_score,
-                    confidence_level=confidence_level,
-                    data_completeness=data_completeness
-                )
-            
-            # Generate basic recommendations
-            self._create_basic_recommendations(snapshot)
-            
-            # Prepare response
-            response_data = ESGSnapshotSerializer(snapshot).data
+            if wants_async(request):
+                job = enqueue_job(request.user, 'process', {
+                    'esg_input_id': esg_input.pk, 'force': force, 'engine': engine
+                })
+                return accepted_response(request, job)
             
-            return Response({
-                'snapshot': response_data,
-                'message': 'ESG assessment completed successfully'
-            }, status=status.HTTP_201_CREATED)
+            response_data = _process_esg_input(esg_input, force, engine)
+            if response_data.get('unchanged'):
+                return Response(response_data)
+            return Response(response_data, status=status.HTTP_201_CREATED)
         
         except Exception as e:
             import traceback
@@ -383,71 +345,381 @@ class ESGInputViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
     
-    def _create_basic_recommendations(self, snapshot):
-        """Create basic recommendations with enhanced opportunity data"""
-        from .models import ESGRecommendation
-        
-        basic_recs = []
+    @action(detail=False, methods=['post'])
+    def batch_process(self, request):
+        """
+        Score many inputs with batched AI prompts (body: optional ids, default all; force),
+        or with a rule-based scoring engine by name (engine, default 'ai')
+        """
+        ids = request.data.get('ids')
+        if ids is not None and not isinstance(ids, list):
+            return Response({'error': 'ids must be a list of ESG input ids'}, status=status.HTTP_400_BAD_REQUEST)
+        engine = _requested_engine(request)
+        if engine is None:
+            return Response(_unknown_engine_error(), status=status.HTTP_400_BAD_REQUEST)
         
-        if snapshot.environmental_score < 70:
-            # Calculate why it matters based on current score
-            score_gap = 70 - snapshot.environmental_score
-            why_matters = f"Your environmental score is {snapshot.environmental_score:.0f}/100, which is {score_gap:.0f} points below industry benchmark. This creates regulatory and investor risks."
+        try:
+            queryset = self.get_queryset().select_related('business_profile').order_by('pk')
+            if ids is not None:
+                queryset = queryset.filter(pk__in=ids)
+            force = _wants_force(request)
             
-            basic_recs.append({
-                'title': 'Energy Efficiency Improvement',
-                'description': 'Implement energy-saving measures to reduce electricity consumption and environmental impact.',
-                'category': 'E',
-                'priority': 'high',
-                'cost_level': 'medium',
-                'expected_impact': 'Reduce energy costs by 15-25% and lower carbon footprint',
-                'esg_impact_points': '+5 to +8 ESG points',
-                'business_benefit': 'Cost savings of $200-500/month, reduced regulatory risk, improved investor appeal',
-                'why_matters': why_matters,
-                'risk_reduction': 'high'
-            })
-        
-        if snapshot.social_score < 70:
-            score_gap = 70 - snapshot.social_score
-            why_matters = f"Your social score is {snapshot.social_score:.0f}/100. Improving employee welfare reduces turnover costs and enhances reputation."
+            if wants_async(request):
+                job = enqueue_job(request.user, 'batch_process', {
+                    'esg_input_ids': list(queryset.values_list('pk', flat=True)), 'force': force, 'engine': engine
+                })
+                return accepted_response(request, job)
             
-            basic_recs.append({
-                'title': 'Employee Welfare Program',
-                'description': 'Enhance employee benefits and safety measures to improve workplace satisfaction.',
-                'category': 'S', 
-                'priority': 'high',
-                'cost_level': 'medium',
-                'expected_impact': 'Improve employee retention and workplace safety standards',
-                'esg_impact_points': '+4 to +7 ESG points',
-                'business_benefit': 'Reduced turnover costs, improved productivity, better talent attraction',
-                'why_matters': why_matters,
-                'risk_reduction': 'medium'
-            })
+            return Response(_process_esg_inputs_batch(list(queryset), force, engine=engine))
+        
+        except Exception as e:
+            import traceback
+            error_detail = traceback.format_exc()
+            logger.error(f"Error batch processing ESG inputs: {e}")
+            logger.error(error_detail)
+            return Response(
+                {
+                    'error': str(e),
+                    'detail': 'Failed to batch process ESG inputs',
+                    'traceback': error_detail if settings.DEBUG else None
+                },
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+    
+    @action(detail=True, methods=['post'])
+    def full_assessment(self, request, pk=None):
+        """Score the input and generate recommendations, top opportunities, roadmap and insights at once"""
+        timeframe = request.data.get('timeframe', '90')
+        if timeframe not in ROADMAP_MAX_PHASE:
+            return Response({'error': 'timeframe must be 30, 60, or 90'}, status=status.HTTP_400_BAD_REQUEST)
         
-        if snapshot.governance_score < 70:
-            score_gap = 70 - snapshot.governance_score
-            why_matters = f"Your governance score is {snapshot.governance_score:.0f}/100. Strong governance is essential for compliance and stakeholder trust."
+        try:
+            esg_input = self.get_object()
             
-            basic_recs.append({
-                'title': 'Governance Framework',
-                'description': 'Establish formal policies and procedures to strengthen organizational governance.',
-                'category': 'G',
-                'priority': 'high', 
-                'cost_level': 'low',
-                'expected_impact': 'Improve compliance and risk management capabilities',
-                'esg_impact_points': '+6 to +10 ESG points',
-                'business_benefit': 'Reduced compliance risk, improved stakeholder confidence, better access to capital',
-                'why_matters': why_matters,
-                'risk_reduction': 'high'
-            })
+            if wants_async(request):
+                job = enqueue_job(request.user, 'full_assessment', {'esg_input_id': esg_input.pk, 'timeframe': timeframe})
+                return accepted_response(request, job)
+            
+            return Response(run_full_assessment(esg_input, timeframe), status=status.HTTP_201_CREATED)
         
-        for rec_data in basic_recs:
-            ESGRecommendation.objects.create(
-                snapshot=snapshot,
-                **rec_data
+        except Exception as e:
+            import traceback
+            error_detail = traceback.format_exc()
+            logger.error(f"Error running full assessment: {e}")
+            logger.error(error_detail)
+            return Response(
+                {
+                    'error': str(e),
+                    'detail': 'Failed to run full assessment',
+                    'traceback': error_detail if settings.DEBUG else None
+                },
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
 
+def _wants_force(request):
+    """True when the client asked to re-score an unchanged input (force=true)"""
+    force = request.data.get('force', request.query_params.get('force', ''))
+    return str(force).lower() in ('1', 'true', 'yes')
+
+
+def _requested_engine(request):
+    """Scoring engine named in the request (engine, default 'ai'); None when it is not registered"""
+    engine = request.data.get('engine') or 'ai'
+    return engine if engine == 'ai' or engine in ENGINES else None
+
+
+def _unknown_engine_error():
+    return {'error': f"engine must be one of: {', '.join(['ai'] + sorted(ENGINES))}"}
+
+
+def _scoring_hash(esg_input):
+    """Content hash of everything the scoring prompt is built from"""
+    return input_hash(esg_input, esg_input.business_profile)
+
+
+def _unchanged_snapshot(esg_input, digest):
+    """Snapshot the AI already scored from exactly this input, if any"""
+    return ESGSnapshot.objects.filter(esg_input=esg_input, input_hash=digest).first()
+
+
+def _unchanged_response(snapshot):
+    return {
+        'snapshot': ESGSnapshotSerializer(snapshot).data,
+        'message': 'ESG input unchanged since the last assessment; returning the stored snapshot',
+        'unchanged': True
+    }
+
+
+def _process_esg_input(esg_input, force=False, engine='ai'):
+    """
+    Score and save an input unless it is unchanged since its last AI scoring; return the response payload.
+    Any other engine scores it exactly as batch_process does with that engine.
+    """
+    if engine and engine != 'ai':
+        result = _process_esg_inputs_with_engine([esg_input], engine)['results'][0]
+        if 'error' in result:
+            raise ValueError(result['error'])
+        return {
+            'snapshot': result['snapshot'],
+            'engine': engine,
+            'profile': result['profile'],
+            'message': f"ESG input scored with the '{engine}' scoring engine"
+        }
+    
+    digest = _scoring_hash(esg_input)
+    if not force:
+        snapshot = _unchanged_snapshot(esg_input, digest)
+        if snapshot:
+            return _unchanged_response(snapshot)
+    
+    # Concurrent requests for the same unchanged input share one AI call and one snapshot write
+    key = flight_key('process', esg_input.pk, digest)
+    return {
+        'snapshot': single_flight.do(key, lambda: _score_and_save(esg_input, digest)),
+        'message': 'ESG assessment completed successfully'
+    }
+
+
+def _process_esg_inputs_batch(esg_inputs, force=False, progress=None, engine='ai'):
+    """
+    Score many inputs with batched AI prompts, skipping those unchanged since
+    their last AI scoring; progress(done, total) is called after each batch.
+    Any other engine is a rule-based scoring engine run over all the inputs at once.
+    """
+    if engine and engine != 'ai':
+        return _process_esg_inputs_with_engine(esg_inputs, engine, progress)
+    
+    results = {}
+    to_score = []
+    digests = {}
+    for esg_input in esg_inputs:
+        digest = _scoring_hash(esg_input)
+        snapshot = None if force else _unchanged_snapshot(esg_input, digest)
+        if snapshot:
+            results[esg_input.pk] = {'esg_input_id': esg_input.pk, 'unchanged': True,
+                                     'snapshot': ESGSnapshotSerializer(snapshot).data}
+        else:
+            digests[esg_input.pk] = digest
+            to_score.append(esg_input)
+    
+    ai_scoring_service = AIScoringService()
+    size = max(1, settings.AI_SCORING_BATCH_SIZE)
+    for start in range(0, len(to_score), size):
+        batch = to_score[start:start + size]
+        scores = ai_scoring_service.calculate_esg_scores_batch(batch)
+        saved = []
+        for esg_input in batch:
+            try:
+                saved.append((_save_scored_snapshot(
+                    esg_input, scores[esg_input.pk], digests[esg_input.pk], save_breakdown=False
+                ), esg_input))
+            except Exception as e:
+                logger.error(f"Error saving batch scores for ESG input {esg_input.pk}: {e}")
+                results[esg_input.pk] = {'esg_input_id': esg_input.pk, 'error': str(e)}
+        save_breakdowns(saved)
+        for snapshot, esg_input in saved:
+            results[esg_input.pk] = {'esg_input_id': esg_input.pk, 'snapshot': ESGSnapshotSerializer(snapshot).data}
+        if progress:
+            progress(start + len(batch), len(to_score))
+    
+    return {
+        'results': [results[esg_input.pk] for esg_input in esg_inputs],
+        'scored': len(to_score),
+        'unchanged': len(esg_inputs) - len(to_score),
+        'message': f'Scored {len(to_score)} ESG inputs in batches of {size}'
+    }
+
+
+def _process_esg_inputs_with_engine(esg_inputs, engine_name, progress=None):
+    """Score every input with a registered rule-based engine (no AI, no unchanged skip) and save the snapshots"""
+    engine = get_engine(engine_name)
+    scores = engine.score_batch(esg_inputs)
+    rows = {input_id: index for index, input_id in enumerate(scores['id'].tolist())}
+    
+    results = {}
+    saved = []
+    for esg_input in esg_inputs:
+        try:
+            row = engine.row(scores, rows[esg_input.pk])
+            saved.append((_save_scored_snapshot(esg_input, row, save_breakdown=False), esg_input))
+        except Exception as e:
+            logger.error(f"Error saving {engine_name} scores for ESG input {esg_input.pk}: {e}")
+            results[esg_input.pk] = {'esg_input_id': esg_input.pk, 'error': str(e)}
+    save_breakdowns(saved)
+    for snapshot, esg_input in saved:
+        results[esg_input.pk] = {'esg_input_id': esg_input.pk, 'profile': scores['profile'][rows[esg_input.pk]],
+                                 'snapshot': ESGSnapshotSerializer(snapshot).data}
+    if progress:
+        progress(len(esg_inputs), len(esg_inputs))
+    
+    return {
+        'results': [results[esg_input.pk] for esg_input in esg_inputs],
+        'scored': len(esg_inputs),
+        'unchanged': 0,
+        'engine': engine_name,
+        'message': f"Scored {len(esg_inputs)} ESG inputs with the '{engine_name}' scoring engine"
+    }
+
+
+def _score_and_save(esg_input, digest=''):
+    """Score an input with AI (rule-based fallback), save the snapshot and return it serialized"""
+    # Use AI to calculate ESG scores
+    ai_scoring_service = AIScoringService()
+    
+    try:
+        scores_data = ai_scoring_service.calculate_esg_scores(esg_input)
+    except Exception as ai_error:
+        logger.error(f"AI scoring failed: {ai_error}")
+        import traceback
+        logger.error(traceback.format_exc())
+        # Use fallback scoring
+        scores_data = ai_scoring_service._fallback_scoring(esg_input)
+    
+    snapshot = _save_scored_snapshot(esg_input, scores_data, digest)
+    return ESGSnapshotSerializer(snapshot).data
+
+
+def _save_scored_snapshot(esg_input, scores_data, digest='', save_breakdown=True):
+    """
+    Validate scores, create or update the input's snapshot, its basic recommendations
+    and its engine's score breakdown (batch callers pass save_breakdown=False and save
+    the breakdowns of the whole batch at once).
+    digest (see _scoring_hash) is only kept for AI scores, so a rule-based fallback is retried.
+    """
+    # Check if snapshot already exists (OneToOneField constraint)
+    existing_snapshot = ESGSnapshot.objects.filter(esg_input=esg_input).first()
+    
+    # Validate scores_data
+    if not scores_data or not isinstance(scores_data, dict):
+        raise ValueError("Invalid scores data from AI service")
+    
+    # Ensure all required fields are present with defaults
+    scores_data.setdefault('environmental_score', 0)
+    scores_data.setdefault('social_score', 0)
+    scores_data.setdefault('governance_score', 0)
+    scores_data.setdefault('overall_esg_score', 0)
+    scores_data.setdefault('confidence_level', 'low')
+    scores_data.setdefault('data_completeness', 0)
+    
+    # Validate score values are numeric
+    try:
+        env_score = round(float(scores_data['environmental_score']), 2)
+        social_score = round(float(scores_data['social_score']), 2)
+        gov_score = round(float(scores_data['governance_score']), 2)
+        overall_score = round(float(scores_data['overall_esg_score']), 2)
+        data_completeness = round(float(scores_data['data_completeness']), 2)
+        confidence_level = str(scores_data['confidence_level']) or 'low'
+    except (ValueError, TypeError) as ve:
+        raise ValueError(f"Invalid score values: {ve}")
+    
+    scored_hash = '' if scores_data.get('scoring_source') == 'rule_based' else digest
+    scoring_engine = scores_data.get('scoring_engine') or 'ai'
+    
+    # Update existing snapshot or create new one
+    if existing_snapshot:
+        # Update existing snapshot
+        existing_snapshot.environmental_score = env_score
+        existing_snapshot.social_score = social_score
+        existing_snapshot.governance_score = gov_score
+        existing_snapshot.overall_esg_score = overall_score
+        existing_snapshot.confidence_level = confidence_level
+        existing_snapshot.data_completeness = data_completeness
+        existing_snapshot.input_hash = scored_hash
+        existing_snapshot.scoring_engine = scoring_engine
+        existing_snapshot.save()
+        
+        # Delete old recommendations and create new ones
+        existing_snapshot.recommendations.all().delete()
+        
+        snapshot = existing_snapshot
+    else:
+        # Create new snapshot
+        snapshot = ESGSnapshot.objects.create(
+            business_profile=esg_input.business_profile,
+            esg_input=esg_input,
+            environmental_score=env_score,
+            social_score=social_score,
+            governance_score=gov_score,
+            overall_esg_score=overall_score,
+            confidence_level=confidence_level,
+            data_completeness=data_completeness,
+            input_hash=scored_hash,
+            scoring_engine=scoring_engine
+        )
+    
+    # Generate basic recommendations
+    _create_basic_recommendations(snapshot)
+    if save_breakdown:
+        save_breakdowns([(snapshot, esg_input)])
+    return snapshot
+
+
+def _create_basic_recommendations(snapshot):
+    """Create basic recommendations with enhanced opportunity data"""
+    from .models import ESGRecommendation
+    
+    basic_recs = []
+    
+    if snapshot.environmental_score < 70:
+        # Calculate why it matters based on current score
+        score_gap = 70 - snapshot.environmental_score
+        why_matters = f"Your environmental score is {snapshot.environmental_score:.0f}/100, which is {score_gap:.0f} points below industry benchmark. This creates regulatory and investor risks."
+        
+        basic_recs.append({
+            'title': 'Energy Efficiency Improvement',
+            'description': 'Implement energy-saving measures to reduce electricity consumption and environmental impact.',
+            'category': 'E',
+            'priority': 'high',
+            'cost_level': 'medium',
+            'expected_impact': 'Reduce energy costs by 15-25% and lower carbon footprint',
+            'esg_impact_points': '+5 to +8 ESG points',
+            'business_benefit': 'Cost savings of $200-500/month, reduced regulatory risk, improved investor appeal',
+            'why_matters': why_matters,
+            'risk_reduction': 'high'
+        })
+    
+    if snapshot.social_score < 70:
+        score_gap = 70 - snapshot.social_score
+        why_matters = f"Your social score is {snapshot.social_score:.0f}/100. Improving employee welfare reduces turnover costs and enhances reputation."
+        
+        basic_recs.append({
+            'title': 'Employee Welfare Program',
+            'description': 'Enhance employee benefits and safety measures to improve workplace satisfaction.',
+            'category': 'S', 
+            'priority': 'high',
+            'cost_level': 'medium',
+            'expected_impact': 'Improve employee retention and workplace safety standards',
+            'esg_impact_points': '+4 to +7 ESG points',
+            'business_benefit': 'Reduced turnover costs, improved productivity, better talent attraction',
+            'why_matters': why_matters,
+            'risk_reduction': 'medium'
+        })
+    
+    if snapshot.governance_score < 70:
+        score_gap = 70 - snapshot.governance_score
+        why_matters = f"Your governance score is {snapshot.governance_score:.0f}/100. Strong governance is essential for compliance and stakeholder trust."
+        
+        basic_recs.append({
+            'title': 'Governance Framework',
+            'description': 'Establish formal policies and procedures to strengthen organizational governance.',
+            'category': 'G',
+            'priority': 'high', 
+            'cost_level': 'low',
+            'expected_impact': 'Improve compliance and risk management capabilities',
+            'esg_impact_points': '+6 to +10 ESG points',
+            'business_benefit': 'Reduced compliance risk, improved stakeholder confidence, better access to capital',
+            'why_matters': why_matters,
+            'risk_reduction': 'high'
+        })
+    
+    for rec_data in basic_recs:
+        ESGRecommendation.objects.create(
+            snapshot=snapshot,
+            **rec_data
+        )
+
+
 class ESGSnapshotViewSet(viewsets.ReadOnlyModelViewSet):
     """ESG snapshot viewing"""
     serializer_class = ESGSnapshotSerializer
@@ -455,7 +727,9 @@ class ESGSnapshotViewSet(viewsets.ReadOnlyModelViewSet):
     
     def get_queryset(self):
         try:
-            return ESGSnapshot.objects.filter(business_profile__user=self.request.user)
+            return ESGSnapshot.objects.filter(business_profile__user=self.request.user).select_related(
+                'business_profile__user', 'esg_input'
+            ).prefetch_related('score_breakdown', 'recommendations', 'roadmaps')
         except Exception as e:
             logger.error(f"Error in get_queryset: {e}")
             import traceback
@@ -498,128 +772,7 @@ class ESGSnapshotViewSet(viewsets.ReadOnlyModelViewSet):
     def top_opportunities(self, request, pk=None):
         """Get AI-generated top 3 opportunities with cost estimates"""
         snapshot = self.get_object()
-        
-        # Use AI to generate dynamic opportunities
-        if settings.GROQ_API_KEY and len(settings.GROQ_API_KEY.strip()) > 10:
-            try:
-                client = OpenAI(
-                    api_key=settings.GROQ_API_KEY,
-                    base_url=settings.AI_BASE_URL
-                )
-                
-                prompt = f"""
-Generate exactly 3 top ESG opportunities for this SME business:
-
-Business: {snapshot.business_profile.business_name}
-Industry: {snapshot.business_profile.industry}
-Employees: {snapshot.business_profile.employee_count}
-
-Current ESG Scores:
-- Environmental: {snapshot.environmental_score:.0f}/100
-- Social: {snapshot.social_score:.0f}/100  
-- Governance: {snapshot.governance_score:.0f}/100
-- Overall: {snapshot.overall_esg_score:.0f}/100
-
-Return ONLY a JSON array with exactly 3 opportunities. Each must have:
-- title: Short action title
-- description: Brief description (max 100 chars)
-- category: E, S, or G
-- priority: high, medium, or low
-- cost_estimate: Dollar amount (e.g. "$500-1000")
-- time_estimate: Implementation time (e.g. "2-4 weeks")
-- esg_impact: Expected score improvement (e.g. "+5-8 points")
-- roi_estimate: Return on investment description
-
-Focus on the lowest scoring areas first. Make estimates realistic for SME size.
-"""
-                
-                response = client.chat.completions.create(
-                    model=settings.AI_MODEL,
-                    messages=[{"role": "user", "content": prompt}],
-                    temperature=0.3,
-                    max_tokens=800
-                )
-                
-                ai_response = response.choices[0].message.content.strip()
-                
-                # Parse JSON response
-                import json
-                import re
-                json_match = re.search(r'\[.*\]', ai_response, re.DOTALL)
-                if json_match:
-                    opportunities = json.loads(json_match.group())
-                    return Response(opportunities)
-                    
-            except Exception as e:
-                print(f"AI opportunities error: {e}")
-        
-        # Fallback to rule-based if AI fails
-        import random
-        
-        # Dynamic fallback based on business profile and scores
-        business_name = snapshot.business_profile.business_name
-        industry = snapshot.business_profile.industry
-        employee_count = snapshot.business_profile.employee_count
-        
-        # Determine focus area based on lowest score
-        scores = {
-            'E': snapshot.environmental_score,
-            'S': snapshot.social_score, 
-            'G': snapshot.governance_score
-        }
-        lowest_category = min(scores, key=scores.get)
-        
-        # Industry-specific opportunities
-        industry_opportunities = {
-            'Technology': [
-                {'title': 'Green IT Infrastructure', 'category': 'E', 'cost': '$300-800', 'impact': '+4-7 points'},
-                {'title': 'Remote Work Policy', 'category': 'S', 'cost': '$100-300', 'impact': '+3-6 points'},
-                {'title': 'Data Privacy Framework', 'category': 'G', 'cost': '$200-500', 'impact': '+5-8 points'}
-            ],
-            'Manufacturing': [
-                {'title': 'Waste Reduction Program', 'category': 'E', 'cost': '$500-1200', 'impact': '+6-9 points'},
-                {'title': 'Worker Safety Training', 'category': 'S', 'cost': '$200-600', 'impact': '+5-8 points'},
-                {'title': 'Supply Chain Audits', 'category': 'G', 'cost': '$400-900', 'impact': '+4-7 points'}
-            ],
-            'Retail': [
-                {'title': 'Sustainable Packaging', 'category': 'E', 'cost': '$200-600', 'impact': '+4-6 points'},
-                {'title': 'Customer Service Training', 'category': 'S', 'cost': '$150-400', 'impact': '+3-5 points'},
-                {'title': 'Vendor Code of Conduct', 'category': 'G', 'cost': '$100-300', 'impact': '+4-6 points'}
-            ]
-        }
-        
-        # Get industry-specific or default opportunities
-        base_opportunities = industry_opportunities.get(industry, [
-            {'title': 'Energy Efficiency Audit', 'category': 'E', 'cost': '$200-500', 'impact': '+3-5 points'},
-            {'title': 'Employee Safety Training', 'category': 'S', 'cost': '$100-300', 'impact': '+4-6 points'},
-            {'title': 'Code of Conduct Policy', 'category': 'G', 'cost': '$50-200', 'impact': '+5-8 points'}
-        ])
-        
-        # Prioritize based on lowest scoring category
-        prioritized_opportunities = []
-        for opp in base_opportunities:
-            if opp['category'] == lowest_category:
-                opp['priority'] = 'high'
-                prioritized_opportunities.insert(0, opp)
-            else:
-                opp['priority'] = 'medium'
-                prioritized_opportunities.append(opp)
-        
-        # Format final opportunities with dynamic descriptions
-        final_opportunities = []
-        for i, opp in enumerate(prioritized_opportunities[:3]):
-            final_opportunities.append({
-                "title": opp['title'],
-                "description": f"Tailored for {industry.lower()} with {employee_count} employees",
-                "category": opp['category'],
-                "priority": opp['priority'],
-                "cost_estimate": opp['cost'],
-                "time_estimate": f"{random.randint(1,4)}-{random.randint(5,8)} weeks",
-                "esg_impact": opp['impact'],
-                "roi_estimate": f"{random.randint(10,25)}% improvement in {opp['category']} metrics"
-            })
-        
-        return Response(final_opportunities)
+        return Response(_top_opportunities(snapshot))
 
     @action(detail=True, methods=['post'])
     def simulate_impact(self, request, pk=None):
@@ -633,81 +786,11 @@ Focus on the lowest scoring areas first. Make estimates realistic for SME size.
         if settings.GROQ_API_KEY and len(settings.GROQ_API_KEY.strip()) > 10:
             try:
                 print("[DEBUG] Calling AI for impact simulation...")
-                client = OpenAI(
-                    api_key=settings.GROQ_API_KEY,
-                    base_url=settings.AI_BASE_URL
-                )
-                
-                prompt = f"""
-You are an ESG consultant analyzing the impact of implementing a specific recommendation.
-
-Recommendation Details:
-- Title: {recommendation_data.get('title', 'ESG Action')}
-- Description: {recommendation_data.get('description', 'ESG improvement action')}
-- Category: {recommendation_data.get('category', 'G')}
-
-Company Profile:
-- Name: {snapshot.business_profile.business_name}
-- Industry: {snapshot.business_profile.industry}
-- Employees: {snapshot.business_profile.employee_count}
-- Environmental Score: {snapshot.environmental_score:.0f}/100
-- Social Score: {snapshot.social_score:.0f}/100
-- Governance Score: {snapshot.governance_score:.0f}/100
-
-Provide a realistic impact analysis in this EXACT JSON format:
-{{
-  "score_improvements": {{
-    "environmental": "+2 points",
-    "social": "+0 points",
-    "governance": "+5 points",
-    "overall": "+3 points"
-  }},
-  "timeline": "4-6 weeks",
-  "confidence": "high",
-  "business_benefits": [
-    "Specific benefit related to the recommendation",
-    "Another concrete business advantage",
-    "Third measurable improvement"
-  ],
-  "implementation_steps": [
-    "First specific action step",
-    "Second detailed implementation step",
-    "Third concrete milestone",
-    "Final verification step"
-  ],
-  "potential_challenges": [
-    "Main implementation challenge",
-    "Secondary obstacle to consider"
-  ],
-  "success_metrics": [
-    "Specific KPI to track",
-    "Measurable outcome indicator",
-    "Progress monitoring metric"
-  ]
-}}
-
-Make the content specific to the recommendation and company context. Avoid generic responses.
-"""
-                
-                response = client.chat.completions.create(
-                    model=settings.AI_MODEL,
-                    messages=[{"role": "user", "content": prompt}],
-                    temperature=0.2,
-                    max_tokens=800
-                )
-                
-                ai_response = response.choices[0].message.content.strip()
-                print(f"[DEBUG] AI Response: {ai_response[:200]}...")
-                
-                # Parse JSON response
-                json_match = re.search(r'\{.*\}', ai_response, re.DOTALL)
-                if json_match:
-                    try:
-                        impact_data = json.loads(json_match.group())
-                        print("[DEBUG] Successfully parsed AI response")
-                        return Response(impact_data)
-                    except json.JSONDecodeError as je:
-                        print(f"[DEBUG] JSON parse error: {je}")
+                client = get_client('groq')
+                response = chat_completion(client, **_simulate_impact_request(snapshot, recommendation_data))
+                impact_data = _parse_impact_simulation(response.choices[0].message.content)
+                if impact_data is not None:
+                    return Response(impact_data)
                         
             except Exception as e:
                 print(f"[ERROR] AI impact simulation error: {e}")
@@ -715,106 +798,7 @@ Make the content specific to the recommendation and company context. Avoid gener
                 print(f"[ERROR] Full traceback: {traceback.format_exc()}")
         
         print("[DEBUG] Using fallback simulation data")
-        # Dynamic fallback based on recommendation
-        rec_title = recommendation_data.get('title', '').lower()
-        rec_category = recommendation_data.get('category', 'G')
-        
-        if 'energy' in rec_title or 'led' in rec_title:
-            fallback_impact = {
-                "score_improvements": {
-                    "environmental": "+6 points",
-                    "social": "+1 points",
-                    "governance": "+2 points",
-                    "overall": "+4 points"
-                },
-                "timeline": "3-4 weeks",
-                "confidence": "high",
-                "business_benefits": [
-                    "Reduce electricity costs by 20-30%",
-                    "Lower carbon footprint and emissions",
-                    "Improved workplace lighting quality"
-                ],
-                "implementation_steps": [
-                    "Conduct energy audit of current lighting",
-                    "Source LED replacement bulbs and fixtures",
-                    "Schedule installation during off-hours",
-                    "Monitor energy usage for 30 days post-installation"
-                ],
-                "potential_challenges": [
-                    "Initial capital investment required",
-                    "Temporary disruption during installation"
-                ],
-                "success_metrics": [
-                    "Monthly kWh reduction percentage",
-                    "Cost savings on electricity bills",
-                    "Employee satisfaction with lighting quality"
-                ]
-            }
-        elif 'safety' in rec_title or 'training' in rec_title:
-            fallback_impact = {
-                "score_improvements": {
-                    "environmental": "+1 points",
-                    "social": "+7 points",
-                    "governance": "+3 points",
-                    "overall": "+5 points"
-                },
-                "timeline": "2-3 weeks",
-                "confidence": "medium",
-                "business_benefits": [
-                    "Reduced workplace accidents and injuries",
-                    "Lower insurance premiums",
-                    "Improved employee morale and retention"
-                ],
-                "implementation_steps": [
-                    "Develop safety training curriculum",
-                    "Schedule mandatory training sessions",
-                    "Implement safety protocols and procedures",
-                    "Conduct quarterly safety assessments"
-                ],
-                "potential_challenges": [
-                    "Employee resistance to new procedures",
-                    "Time investment for training sessions"
-                ],
-                "success_metrics": [
-                    "Number of workplace incidents per month",
-                    "Employee safety training completion rate",
-                    "Safety audit scores"
-                ]
-            }
-        else:
-            # Generic governance/policy fallback
-            fallback_impact = {
-                "score_improvements": {
-                    "environmental": "+1 points",
-                    "social": "+2 points",
-                    "governance": "+6 points",
-                    "overall": "+4 points"
-                },
-                "timeline": "1-2 weeks",
-                "confidence": "high",
-                "business_benefits": [
-                    "Enhanced regulatory compliance",
-                    "Reduced legal and operational risks",
-                    "Improved stakeholder trust"
-                ],
-                "implementation_steps": [
-                    "Draft policy document with legal review",
-                    "Conduct employee training on new policies",
-                    "Implement monitoring and reporting procedures",
-                    "Schedule annual policy review process"
-                ],
-                "potential_challenges": [
-                    "Ensuring consistent policy enforcement",
-                    "Employee adaptation to new procedures"
-                ],
-                "success_metrics": [
-                    "Policy compliance audit scores",
-                    "Employee policy training completion",
-                    "Stakeholder feedback ratings"
-                ]
-            }
-        
-        return Response(fallback_impact)
+        return Response(_fallback_impact_simulation(recommendation_data))
     
     @action(detail=True, methods=['post'])
     def add_to_roadmap(self, request, pk=None):
@@ -908,71 +892,394 @@ Make the content specific to the recommendation and company context. Avoid gener
             print(f"Full traceback: {traceback.format_exc()}")
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
-    @action(detail=True, methods=['get'])
-    def dashboard_insights(self, request, pk=None):
-        """Get prescriptive insights for dashboard"""
-        snapshot = self.get_object()
-        
-        # Determine lowest score area
-        scores = {
-            'environmental': snapshot.environmental_score,
-            'social': snapshot.social_score,
-            'governance': snapshot.governance_score
-        }
-        lowest_area = min(scores, key=scores.get)
-        lowest_score = scores[lowest_area]
-        
-        # Get recommendations for analysis
-        recommendations = snapshot.recommendations.all()
-        
-        # This month's focus (lowest scoring area)
-        focus_actions = {
-            'environmental': 'Implement energy efficiency measures',
-            'social': 'Enhance employee welfare programs', 
-            'governance': 'Strengthen governance policies'
-        }
-        
-        # Biggest risk (lowest score with high impact)
-        risk_descriptions = {
-            'environmental': 'Regulatory compliance and carbon footprint exposure',
-            'social': 'Employee retention and workplace safety risks',
-            'governance': 'Compliance gaps and stakeholder trust issues'
-        }
-        
-        # Fastest win (low effort, high impact)
-        quick_wins = {
-            'environmental': 'Switch to LED lighting',
-            'social': 'Implement safety training program',
-            'governance': 'Draft code of conduct policy'
+    @action(detail=True, methods=['get'])
+    def dashboard_insights(self, request, pk=None):
+        """Get prescriptive insights for dashboard"""
+        snapshot = self.get_object()
+        return Response(_dashboard_insights(snapshot))
+    
+    @action(detail=True, methods=['get'])
+    def roadmap(self, request, pk=None):
+        """Get roadmap for a snapshot"""
+        snapshot = self.get_object()
+        roadmaps = snapshot.roadmaps.all()
+        return Response(ESGRoadmapSerializer(roadmaps, many=True).data)
+
+
+def _top_opportunities(snapshot):
+    """Top 3 opportunities from AI, or the rule-based fallback"""
+    # Use AI to generate dynamic opportunities
+    if _chat_ai_configured():
+        try:
+            client = get_client('groq')
+            response = chat_completion(client, **_top_opportunities_request(snapshot))
+            opportunities = _parse_top_opportunities(response.choices[0].message.content)
+            if opportunities is not None:
+                return opportunities
+                
+        except Exception as e:
+            print(f"AI opportunities error: {e}")
+    
+    # Fallback to rule-based if AI fails
+    return _fallback_top_opportunities(snapshot)
+
+
+def _dashboard_insights(snapshot):
+    """Rule-based prescriptive insights for the dashboard"""
+    # Determine lowest score area
+    scores = {
+        'environmental': snapshot.environmental_score,
+        'social': snapshot.social_score,
+        'governance': snapshot.governance_score
+    }
+    lowest_area = min(scores, key=scores.get)
+    lowest_score = scores[lowest_area]
+    
+    # Get recommendations for analysis
+    recommendations = snapshot.recommendations.all()
+    
+    # This month's focus (lowest scoring area)
+    focus_actions = {
+        'environmental': 'Implement energy efficiency measures',
+        'social': 'Enhance employee welfare programs', 
+        'governance': 'Strengthen governance policies'
+    }
+    
+    # Biggest risk (lowest score with high impact)
+    risk_descriptions = {
+        'environmental': 'Regulatory compliance and carbon footprint exposure',
+        'social': 'Employee retention and workplace safety risks',
+        'governance': 'Compliance gaps and stakeholder trust issues'
+    }
+    
+    # Fastest win (low effort, high impact)
+    quick_wins = {
+        'environmental': 'Switch to LED lighting',
+        'social': 'Implement safety training program',
+        'governance': 'Draft code of conduct policy'
+    }
+    
+    insights = {
+        'monthly_focus': {
+            'action': focus_actions[lowest_area],
+            'reason': f'Your {lowest_area} score ({lowest_score:.0f}/100) needs immediate attention',
+            'category': lowest_area.upper()[0]
+        },
+        'biggest_risk': {
+            'description': risk_descriptions[lowest_area],
+            'impact': 'High',
+            'category': lowest_area.upper()[0]
+        },
+        'fastest_win': {
+            'action': quick_wins[lowest_area],
+            'effort': 'Low',
+            'timeline': '1-2 weeks',
+            'category': lowest_area.upper()[0]
+        }
+    }
+    
+    return insights
+
+
+def _top_opportunities_request(snapshot):
+    """Completion parameters for the top 3 opportunities of a snapshot"""
+    bp = snapshot.business_profile
+    if use_compact():
+        context = encode_profile(bp, bp.employee_count) + "\n" + encode_scores(snapshot)
+    else:
+        context = f"""Business: {bp.business_name}
+Industry: {bp.industry}
+Employees: {bp.employee_count}
+
+Current ESG Scores:
+- Environmental: {snapshot.environmental_score:.0f}/100
+- Social: {snapshot.social_score:.0f}/100  
+- Governance: {snapshot.governance_score:.0f}/100
+- Overall: {snapshot.overall_esg_score:.0f}/100"""
+    
+    prompt = f"""
+Generate exactly 3 top ESG opportunities for this SME business:
+
+{context}
+
+Return ONLY a JSON array with exactly 3 opportunities. Each must have:
+- title: Short action title
+- description: Brief description (max 100 chars)
+- category: E, S, or G
+- priority: high, medium, or low
+- cost_estimate: Dollar amount (e.g. "$500-1000")
+- time_estimate: Implementation time (e.g. "2-4 weeks")
+- esg_impact: Expected score improvement (e.g. "+5-8 points")
+- roi_estimate: Return on investment description
+
+Focus on the lowest scoring areas first. Make estimates realistic for SME size.
+"""
+    
+    return dict(
+        prompt_type='top_opportunities',
+        provider='groq',
+        model=settings.AI_MODEL,
+        messages=[{"role": "user", "content": prompt}],
+        temperature=0.3,
+        max_tokens=800
+    )
+
+
+def _parse_top_opportunities(ai_response):
+    """JSON array of opportunities from a completion, or None if there is none"""
+    return extract_json(ai_response, 'top_opportunities')
+
+
+def _fallback_top_opportunities(snapshot):
+    """Rule-based top opportunities used when AI is unavailable"""
+    llm_metrics.record_fallback('top_opportunities')
+    import random
+    
+    # Dynamic fallback based on business profile and scores
+    business_name = snapshot.business_profile.business_name
+    industry = snapshot.business_profile.industry
+    employee_count = snapshot.business_profile.employee_count
+    
+    # Determine focus area based on lowest score
+    scores = {
+        'E': snapshot.environmental_score,
+        'S': snapshot.social_score, 
+        'G': snapshot.governance_score
+    }
+    lowest_category = min(scores, key=scores.get)
+    
+    # Industry-specific opportunities
+    industry_opportunities = {
+        'Technology': [
+            {'title': 'Green IT Infrastructure', 'category': 'E', 'cost': '$300-800', 'impact': '+4-7 points'},
+            {'title': 'Remote Work Policy', 'category': 'S', 'cost': '$100-300', 'impact': '+3-6 points'},
+            {'title': 'Data Privacy Framework', 'category': 'G', 'cost': '$200-500', 'impact': '+5-8 points'}
+        ],
+        'Manufacturing': [
+            {'title': 'Waste Reduction Program', 'category': 'E', 'cost': '$500-1200', 'impact': '+6-9 points'},
+            {'title': 'Worker Safety Training', 'category': 'S', 'cost': '$200-600', 'impact': '+5-8 points'},
+            {'title': 'Supply Chain Audits', 'category': 'G', 'cost': '$400-900', 'impact': '+4-7 points'}
+        ],
+        'Retail': [
+            {'title': 'Sustainable Packaging', 'category': 'E', 'cost': '$200-600', 'impact': '+4-6 points'},
+            {'title': 'Customer Service Training', 'category': 'S', 'cost': '$150-400', 'impact': '+3-5 points'},
+            {'title': 'Vendor Code of Conduct', 'category': 'G', 'cost': '$100-300', 'impact': '+4-6 points'}
+        ]
+    }
+    
+    # Get industry-specific or default opportunities
+    base_opportunities = industry_opportunities.get(industry, [
+        {'title': 'Energy Efficiency Audit', 'category': 'E', 'cost': '$200-500', 'impact': '+3-5 points'},
+        {'title': 'Employee Safety Training', 'category': 'S', 'cost': '$100-300', 'impact': '+4-6 points'},
+        {'title': 'Code of Conduct Policy', 'category': 'G', 'cost': '$50-200', 'impact': '+5-8 points'}
+    ])
+    
+    # Prioritize based on lowest scoring category
+    prioritized_opportunities = []
+    for opp in base_opportunities:
+        if opp['category'] == lowest_category:
+            opp['priority'] = 'high'
+            prioritized_opportunities.insert(0, opp)
+        else:
+            opp['priority'] = 'medium'
+            prioritized_opportunities.append(opp)
+    
+    # Format final opportunities with dynamic descriptions
+    final_opportunities = []
+    for i, opp in enumerate(prioritized_opportunities[:3]):
+        final_opportunities.append({
+            "title": opp['title'],
+            "description": f"Tailored for {industry.lower()} with {employee_count} employees",
+            "category": opp['category'],
+            "priority": opp['priority'],
+            "cost_estimate": opp['cost'],
+            "time_estimate": f"{random.randint(1,4)}-{random.randint(5,8)} weeks",
+            "esg_impact": opp['impact'],
+            "roi_estimate": f"{random.randint(10,25)}% improvement in {opp['category']} metrics"
+        })
+    
+    return final_opportunities
+
+
+def _simulate_impact_request(snapshot, recommendation_data):
+    """Completion parameters for simulating one recommendation's impact"""
+    prompt = f"""
+You are an ESG consultant analyzing the impact of implementing a specific recommendation.
+
+Recommendation Details:
+- Title: {recommendation_data.get('title', 'ESG Action')}
+- Description: {recommendation_data.get('description', 'ESG improvement action')}
+- Category: {recommendation_data.get('category', 'G')}
+
+Company Profile:
+- Name: {snapshot.business_profile.business_name}
+- Industry: {snapshot.business_profile.industry}
+- Employees: {snapshot.business_profile.employee_count}
+- Environmental Score: {snapshot.environmental_score:.0f}/100
+- Social Score: {snapshot.social_score:.0f}/100
+- Governance Score: {snapshot.governance_score:.0f}/100
+
+Provide a realistic impact analysis in this EXACT JSON format:
+{{
+  "score_improvements": {{
+    "environmental": "+2 points",
+    "social": "+0 points",
+    "governance": "+5 points",
+    "overall": "+3 points"
+  }},
+  "timeline": "4-6 weeks",
+  "confidence": "high",
+  "business_benefits": [
+    "Specific benefit related to the recommendation",
+    "Another concrete business advantage",
+    "Third measurable improvement"
+  ],
+  "implementation_steps": [
+    "First specific action step",
+    "Second detailed implementation step",
+    "Third concrete milestone",
+    "Final verification step"
+  ],
+  "potential_challenges": [
+    "Main implementation challenge",
+    "Secondary obstacle to consider"
+  ],
+  "success_metrics": [
+    "Specific KPI to track",
+    "Measurable outcome indicator",
+    "Progress monitoring metric"
+  ]
+}}
+
+Make the content specific to the recommendation and company context. Avoid generic responses.
+"""
+    
+    return dict(
+        prompt_type='simulate_impact',
+        provider='groq',
+        model=settings.AI_MODEL,
+        messages=[{"role": "user", "content": prompt}],
+        temperature=0.2,
+        max_tokens=800
+    )
+
+
+def _parse_impact_simulation(ai_response):
+    """Impact JSON object from a completion, or None if it cannot be parsed"""
+    ai_response = ai_response.strip()
+    print(f"[DEBUG] AI Response: {ai_response[:200]}...")
+    
+    impact_data = extract_json(ai_response, 'simulate_impact')
+    if impact_data is not None:
+        print("[DEBUG] Successfully parsed AI response")
+    else:
+        print("[DEBUG] No valid impact JSON in AI response")
+    return impact_data
+
+
+def _fallback_impact_simulation(recommendation_data):
+    """Rule-based impact simulation keyed on the recommendation title"""
+    llm_metrics.record_fallback('simulate_impact')
+    # Dynamic fallback based on recommendation
+    rec_title = recommendation_data.get('title', '').lower()
+    rec_category = recommendation_data.get('category', 'G')
+    
+    if 'energy' in rec_title or 'led' in rec_title:
+        fallback_impact = {
+            "score_improvements": {
+                "environmental": "+6 points",
+                "social": "+1 points",
+                "governance": "+2 points",
+                "overall": "+4 points"
+            },
+            "timeline": "3-4 weeks",
+            "confidence": "high",
+            "business_benefits": [
+                "Reduce electricity costs by 20-30%",
+                "Lower carbon footprint and emissions",
+                "Improved workplace lighting quality"
+            ],
+            "implementation_steps": [
+                "Conduct energy audit of current lighting",
+                "Source LED replacement bulbs and fixtures",
+                "Schedule installation during off-hours",
+                "Monitor energy usage for 30 days post-installation"
+            ],
+            "potential_challenges": [
+                "Initial capital investment required",
+                "Temporary disruption during installation"
+            ],
+            "success_metrics": [
+                "Monthly kWh reduction percentage",
+                "Cost savings on electricity bills",
+                "Employee satisfaction with lighting quality"
+            ]
         }
-        
-        insights = {
-            'monthly_focus': {
-                'action': focus_actions[lowest_area],
-                'reason': f'Your {lowest_area} score ({lowest_score:.0f}/100) needs immediate attention',
-                'category': lowest_area.upper()[0]
+    elif 'safety' in rec_title or 'training' in rec_title:
+        fallback_impact = {
+            "score_improvements": {
+                "environmental": "+1 points",
+                "social": "+7 points",
+                "governance": "+3 points",
+                "overall": "+5 points"
             },
-            'biggest_risk': {
-                'description': risk_descriptions[lowest_area],
-                'impact': 'High',
-                'category': lowest_area.upper()[0]
+            "timeline": "2-3 weeks",
+            "confidence": "medium",
+            "business_benefits": [
+                "Reduced workplace accidents and injuries",
+                "Lower insurance premiums",
+                "Improved employee morale and retention"
+            ],
+            "implementation_steps": [
+                "Develop safety training curriculum",
+                "Schedule mandatory training sessions",
+                "Implement safety protocols and procedures",
+                "Conduct quarterly safety assessments"
+            ],
+            "potential_challenges": [
+                "Employee resistance to new procedures",
+                "Time investment for training sessions"
+            ],
+            "success_metrics": [
+                "Number of workplace incidents per month",
+                "Employee safety training completion rate",
+                "Safety audit scores"
+            ]
+        }
+    else:
+        # Generic governance/policy fallback
+        fallback_impact = {
+            "score_improvements": {
+                "environmental": "+1 points",
+                "social": "+2 points",
+                "governance": "+6 points",
+                "overall": "+4 points"
             },
-            'fastest_win': {
-                'action': quick_wins[lowest_area],
-                'effort': 'Low',
-                'timeline': '1-2 weeks',
-                'category': lowest_area.upper()[0]
-            }
+            "timeline": "1-2 weeks",
+            "confidence": "high",
+            "business_benefits": [
+                "Enhanced regulatory compliance",
+                "Reduced legal and operational risks",
+                "Improved stakeholder trust"
+            ],
+            "implementation_steps": [
+                "Draft policy document with legal review",
+                "Conduct employee training on new policies",
+                "Implement monitoring and reporting procedures",
+                "Schedule annual policy review process"
+            ],
+            "potential_challenges": [
+                "Ensuring consistent policy enforcement",
+                "Employee adaptation to new procedures"
+            ],
+            "success_metrics": [
+                "Policy compliance audit scores",
+                "Employee policy training completion",
+                "Stakeholder feedback ratings"
+            ]
         }
-        
-        return Response(insights)
     
-    @action(detail=True, methods=['get'])
-    def roadmap(self, request, pk=None):
-        """Get roadmap for a snapshot"""
-        snapshot = self.get_object()
-        roadmaps = snapshot.roadmaps.all()
-        return Response(ESGRoadmapSerializer(roadmaps, many=True).data)
+    return fallback_impact
 
 
 @api_view(['POST'])
@@ -995,55 +1302,11 @@ def generate_roadmap(request):
             business_profile__user=request.user
         )
         
-        # Clear existing roadmaps for this timeframe to generate fresh ones
-        max_phase = {'30': 1, '60': 2, '90': 3}[timeframe]
-        snapshot.roadmaps.filter(phase__lte=max_phase).delete()
-        
-        # Generate AI roadmap for selected timeframe
-        ai_service = AIScoringService()
-        roadmap_data = ai_service.generate_timeframe_roadmap(snapshot, int(timeframe))
-        
-        # Create roadmap objects
-        created_items = []
-        phase_mapping = {"30_day_plan": 1, "60_day_plan": 2, "90_day_plan": 3}
-        
-        for plan_key, phase_num in phase_mapping.items():
-            if plan_key in roadmap_data and phase_num <= max_phase:
-                plan_data = roadmap_data[plan_key]
-                for action in plan_data.get('actions', []):
-                    # Handle different possible formats for action data
-                    action_title = action.get('action') or action.get('title') or action.get('action_title') or 'Action'
-                    
-                    # Use AI-generated description if available, otherwise generate one
-                    description = action.get('description') or action.get('details') or ''
-                    if not description:
-                        category = action.get('category', 'E')
-                        if category == 'E':
-                            description = f"Implement {action_title} to reduce environmental impact and improve sustainability practices."
-                        elif category == 'S':
-                            description = f"Implement {action_title} to enhance employee welfare and social responsibility initiatives."
-                        else:
-                            description = f"Implement {action_title} to strengthen governance framework and compliance procedures."
-                    
-                    # Ensure description is not empty
-                    if not description or len(description.strip()) < 10:
-                        description = f"Implement {action_title} to improve ESG performance in {action.get('category', 'E')} category."
-                    
-                    roadmap = ESGRoadmap.objects.create(
-                        snapshot=snapshot,
-                        phase=phase_num,
-                        action_title=action_title,
-                        description=description.strip(),
-                        responsible_role=action.get('responsible') or action.get('responsible_role') or action.get('responsible_role') or 'Team Lead',
-                        effort_level=(action.get('impact', 'medium') or action.get('effort_level', 'medium')).lower(),
-                        esg_category=action.get('category', 'E')
-                    )
-                    created_items.append(roadmap)
+        if wants_async(request):
+            job = enqueue_job(request.user, 'roadmap', {'snapshot_id': snapshot.id, 'timeframe': timeframe})
+            return accepted_response(request, job)
         
-        return Response({
-            'message': f'{timeframe}-day roadmap generated successfully',
-            'roadmap': ESGRoadmapSerializer(created_items, many=True).data
-        }, status=status.HTTP_201_CREATED)
+        return Response(_regenerate_roadmap(snapshot, timeframe), status=status.HTTP_201_CREATED)
     
     except Exception as e:
         import traceback
@@ -1057,6 +1320,66 @@ def generate_roadmap(request):
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+def _regenerate_roadmap(snapshot, timeframe):
+    """Replace the snapshot's roadmap for a timeframe ('30', '60' or '90') and return the response payload"""
+    # Clear existing roadmaps for this timeframe to generate fresh ones
+    max_phase = {'30': 1, '60': 2, '90': 3}[timeframe]
+    snapshot.roadmaps.filter(phase__lte=max_phase).delete()
+    
+    # Generate AI roadmap for selected timeframe
+    ai_service = AIScoringService()
+    roadmap_data = ai_service.generate_timeframe_roadmap(snapshot, int(timeframe))
+    
+    created_items = _save_timeframe_roadmap(snapshot, roadmap_data, max_phase)
+    
+    return {
+        'message': f'{timeframe}-day roadmap generated successfully',
+        'roadmap': ESGRoadmapSerializer(created_items, many=True).data
+    }
+
+
+def _save_timeframe_roadmap(snapshot, roadmap_data, max_phase):
+    """Create ESGRoadmap rows for every generated plan up to max_phase"""
+    # Create roadmap objects
+    created_items = []
+    phase_mapping = {"30_day_plan": 1, "60_day_plan": 2, "90_day_plan": 3}
+    
+    for plan_key, phase_num in phase_mapping.items():
+        if plan_key in roadmap_data and phase_num <= max_phase:
+            plan_data = roadmap_data[plan_key]
+            for action in plan_data.get('actions', []):
+                # Handle different possible formats for action data
+                action_title = action.get('action') or action.get('title') or action.get('action_title') or 'Action'
+                
+                # Use AI-generated description if available, otherwise generate one
+                description = action.get('description') or action.get('details') or ''
+                if not description:
+                    category = action.get('category', 'E')
+                    if category == 'E':
+                        description = f"Implement {action_title} to reduce environmental impact and improve sustainability practices."
+                    elif category == 'S':
+                        description = f"Implement {action_title} to enhance employee welfare and social responsibility initiatives."
+                    else:
+                        description = f"Implement {action_title} to strengthen governance framework and compliance procedures."
+                
+                # Ensure description is not empty
+                if not description or len(description.strip()) < 10:
+                    description = f"Implement {action_title} to improve ESG performance in {action.get('category', 'E')} category."
+                
+                roadmap = ESGRoadmap.objects.create(
+                    snapshot=snapshot,
+                    phase=phase_num,
+                    action_title=action_title,
+                    description=description.strip(),
+                    responsible_role=action.get('responsible') or action.get('responsible_role') or action.get('responsible_role') or 'Team Lead',
+                    effort_level=(action.get('impact', 'medium') or action.get('effort_level', 'medium')).lower(),
+                    esg_category=action.get('category', 'E')
+                )
+                created_items.append(roadmap)
+    
+    return created_items
+
+
 def _generate_rule_based_roadmap(snapshot, recommendations):
     """Fallback rule-based roadmap generation"""
     import random
@@ -1146,106 +1469,73 @@ def _parse_ai_roadmap(ai_content, snapshot):
     return _generate_rule_based_roadmap(snapshot, snapshot.recommendations.all())
 
 
-@api_view(['POST'])
-@permission_classes([IsAuthenticated])
-def chat_query(request):
-    """ESG chatbot endpoint"""
-    try:
-        snapshot_id = request.data.get('snapshot_id')
-        query = request.data.get('query')
-        session_id = request.data.get('session_id')
-        
-        if not query:
-            return Response({'error': 'Query is required'}, status=status.HTTP_400_BAD_REQUEST)
-        
-        if not snapshot_id:
-            return Response({'error': 'snapshot_id is required'}, status=status.HTTP_400_BAD_REQUEST)
-        
-        snapshot = get_object_or_404(
-            ESGSnapshot,
-            id=snapshot_id,
-            business_profile__user=request.user
-        )
-        
-        # Get or create chat session
-        if session_id:
-            chat_session = ChatSession.objects.filter(session_id=session_id, snapshot=snapshot).first()
-            if not chat_session:
-                # Session ID provided but doesn't exist, create a new one
-                session_id = str(uuid.uuid4())
-                chat_session = ChatSession.objects.create(
-                    snapshot=snapshot,
-                    session_id=session_id
-                )
-        else:
+def _get_chat_session(snapshot, session_id):
+    """Return (chat_session, session_id), creating a new session when needed"""
+    if session_id:
+        chat_session = ChatSession.objects.filter(session_id=session_id, snapshot=snapshot).first()
+        if not chat_session:
+            # Session ID provided but doesn't exist, create a new one
             session_id = str(uuid.uuid4())
             chat_session = ChatSession.objects.create(
                 snapshot=snapshot,
                 session_id=session_id
             )
-        
-        # Save user message
-        ChatMessage.objects.create(
-            session=chat_session,
-            role='user',
-            content=query
+    else:
+        session_id = str(uuid.uuid4())
+        chat_session = ChatSession.objects.create(
+            snapshot=snapshot,
+            session_id=session_id
         )
-        
-        # Get recent conversation history
-        recent_messages = ChatMessage.objects.filter(
-            session=chat_session
-        ).order_by('-created_at')[:6]  # Last 6 messages
-        
-        conversation_history = ""
-        for msg in reversed(recent_messages):
-            if msg.content != query:  # Don't include the current query
-                conversation_history += f"{msg.role}: {msg.content}\n"
-        
-        # Prepare dynamic context
-        recommendations = snapshot.recommendations.all()
-        rec_text = "\n".join([f"- {r.title}: {r.description}" for r in recommendations[:3]])
-        
-        # Get specific insights based on scores
-        score_insights = []
-        if snapshot.environmental_score < 50:
-            score_insights.append("Environmental practices need significant improvement")
-        elif snapshot.environmental_score < 70:
-            score_insights.append("Environmental practices show room for enhancement")
-        else:
-            score_insights.append("Strong environmental performance")
-        
-        if snapshot.social_score < 50:
-            score_insights.append("Social responsibility initiatives need development")
-        elif snapshot.social_score < 70:
-            score_insights.append("Social practices can be strengthened")
-        else:
-            score_insights.append("Good social responsibility practices")
-        
-        if snapshot.governance_score < 50:
-            score_insights.append("Governance structures need strengthening")
-        elif snapshot.governance_score < 70:
-            score_insights.append("Governance practices can be improved")
-        else:
-            score_insights.append("Solid governance framework")
-        
-        # Enhanced context-aware system prompt
-        query_lower = query.lower()
-        
-        # Detect action commands
-        action_command = None
-        if any(phrase in query_lower for phrase in ['add this to my roadmap', 'add to roadmap', 'add to my plan', 'add this to plan']):
-            action_command = 'add_to_roadmap'
-        elif any(phrase in query_lower for phrase in ['mark as completed', 'mark completed', 'completed this', 'finished this']):
-            action_command = 'mark_completed'
-        elif any(phrase in query_lower for phrase in ['what should i focus on this month', 'focus this month', 'monthly focus', 'what to focus on']):
-            action_command = 'monthly_focus'
-        
-        # Get roadmap actions for context
-        roadmap_actions = snapshot.roadmaps.all()
-        roadmap_text = "\n".join([f"- {r.action_title}: {r.description} (Phase {r.phase})" for r in roadmap_actions[:3]])
-        
-        # Enhanced system prompt for ESG Implementation Assistant
-        system_prompt = f"""
+    return chat_session, session_id
+
+
+def _detect_chat_action(query_lower):
+    """Detect action commands such as "add to roadmap" in a chat query"""
+    action_command = None
+    if any(phrase in query_lower for phrase in ['add this to my roadmap', 'add to roadmap', 'add to my plan', 'add this to plan']):
+        action_command = 'add_to_roadmap'
+    elif any(phrase in query_lower for phrase in ['mark as completed', 'mark completed', 'completed this', 'finished this']):
+        action_command = 'mark_completed'
+    elif any(phrase in query_lower for phrase in ['what should i focus on this month', 'focus this month', 'monthly focus', 'what to focus on']):
+        action_command = 'monthly_focus'
+    
+    return action_command
+
+
+def _build_chat_messages(snapshot, query, action_command, roadmap_actions):
+    """System prompt and business context messages for chat_query"""
+    # Prepare dynamic context
+    recommendations = snapshot.recommendations.all()
+    rec_text = "\n".join([f"- {r.title}: {r.description}" for r in recommendations[:3]])
+    
+    # Get specific insights based on scores
+    score_insights = []
+    if snapshot.environmental_score < 50:
+        score_insights.append("Environmental practices need significant improvement")
+    elif snapshot.environmental_score < 70:
+        score_insights.append("Environmental practices show room for enhancement")
+    else:
+        score_insights.append("Strong environmental performance")
+    
+    if snapshot.social_score < 50:
+        score_insights.append("Social responsibility initiatives need development")
+    elif snapshot.social_score < 70:
+        score_insights.append("Social practices can be strengthened")
+    else:
+        score_insights.append("Good social responsibility practices")
+    
+    if snapshot.governance_score < 50:
+        score_insights.append("Governance structures need strengthening")
+    elif snapshot.governance_score < 70:
+        score_insights.append("Governance practices can be improved")
+    else:
+        score_insights.append("Solid governance framework")
+    
+    # Roadmap actions for context
+    roadmap_text = "\n".join([f"- {r.action_title}: {r.description} (Phase {r.phase})" for r in roadmap_actions[:3]])
+    
+    # Enhanced system prompt for ESG Implementation Assistant
+    system_prompt = f"""
 You are an ESG Implementation Assistant for SMEs. You are context-aware and operational, not just conversational.
 
 Your role:
@@ -1273,9 +1563,9 @@ IMPORTANT DISCLAIMERS:
 
 Be practical, actionable, and SME-focused. Use simple language and provide specific next steps.
 """
-        
-        # Enhanced context with full state awareness
-        context = f"""
+    
+    # Enhanced context with full state awareness
+    context = f"""
 BUSINESS CONTEXT:
 Company: {snapshot.business_profile.business_name}
 Industry: {snapshot.business_profile.industry}
@@ -1305,134 +1595,111 @@ Provide a comprehensive response that:
 
 Remember: This is indicative guidance for SME ESG improvement, not certified advice or compliance guidance.
 """
+    
+    messages = [{"role": "system", "content": system_prompt}]
+    messages.append({"role": "user", "content": context})
+    return messages
+
+
+def _handle_chat_action(action_command, snapshot, query, recent_messages, roadmap_actions):
+    """Run an action command detected in a chat query and return the reply text"""
+    query_lower = query.lower()
+    
+    if action_command == 'add_to_roadmap':
+        # Extract recommendation from recent conversation or user query
+        action_title = None
+        description = None
+        category = 'G'  # Default to Governance
+        
+        # Try to extract action from user query
+        if 'implement' in query_lower or 'add' in query_lower:
+            # Extract the action from the query
+            query_words = query.split()
+            if 'implement' in query_lower:
+                impl_index = next(i for i, word in enumerate(query_words) if 'implement' in word.lower())
+                action_title = ' '.join(query_words[impl_index+1:impl_index+6])  # Take next 5 words
+            elif 'add' in query_lower and ('roadmap' in query_lower or 'plan' in query_lower):
+                # Look for the action before "to roadmap" or "to plan"
+                roadmap_index = next((i for i, word in enumerate(query_words) if 'roadmap' in word.lower() or 'plan' in word.lower()), len(query_words))
+                add_index = next((i for i, word in enumerate(query_words) if 'add' in word.lower()), 0)
+                action_title = ' '.join(query_words[add_index+1:roadmap_index-1])
+        
+        # Check recent messages for context
+        if not action_title:
+            for msg in recent_messages:
+                if msg.role == 'assistant' and ('implement' in msg.content.lower() or 'sop' in msg.content.lower()):
+                    # Extract title from SOP or recommendation
+                    lines = msg.content.split('\n')
+                    for line in lines:
+                        if 'OBJECTIVE:' in line or 'SOP]' in line:
+                            action_title = line.split('-')[0].replace('[SOP]', '').strip()
+                            break
+                    if action_title:
+                        break
+        
+        # Fallback to query content
+        if not action_title:
+            action_title = f"Action from chat: {query[:50]}..."
+            description = f"Implementation discussed: {query}"
+        else:
+            description = f"Implement {action_title} as discussed in chat session"
         
-        # Call AI API - Force use of DeepSeek
-        print(f"DeepSeek API Key exists: {bool(settings.GROQ_API_KEY)}")
-        print(f"API Key length: {len(settings.GROQ_API_KEY) if settings.GROQ_API_KEY else 0}")
-        print(f"AI Model: {settings.AI_MODEL}")
-        print(f"AI Base URL: {settings.AI_BASE_URL}")
+        # Determine category based on content
+        if any(word in query_lower for word in ['energy', 'environment', 'carbon', 'waste', 'water']):
+            category = 'E'
+        elif any(word in query_lower for word in ['employee', 'safety', 'training', 'welfare', 'social']):
+            category = 'S'
+        else:
+            category = 'G'
+        
+        # Create roadmap item
+        from .models import ESGRoadmap
+        roadmap_item = ESGRoadmap.objects.create(
+            snapshot=snapshot,
+            phase=1,  # Default to phase 1 for chat-generated items
+            action_title=action_title,
+            description=description,
+            responsible_role='Team Lead',
+            effort_level='medium',
+            esg_category=category
+        )
+        response_text = f"[SUCCESS] Added to your roadmap: '{roadmap_item.action_title}'. You can view it in your Execution Plan. What would you like to implement next?"
+        print(f"[DEBUG] Created roadmap item: {roadmap_item.id} - {roadmap_item.action_title}")
+    elif action_command == 'mark_completed':
+        # Find recent roadmap item to mark complete
+        recent_roadmap = roadmap_actions.first()
+        if recent_roadmap:
+            # Note: You'd need to add a 'completed' field to ESGRoadmap model
+            response_text = f"[SUCCESS] Great job! I've noted that '{recent_roadmap.action_title}' is completed. This should improve your ESG scores. What's your next priority?"
+        else:
+            response_text = "I don't see any recent roadmap actions to mark as completed. You can add actions first, then mark them complete as you finish them."
+    
+    elif action_command == 'monthly_focus':
+        # Prioritize based on current scores and roadmap
+        lowest_score = min(snapshot.environmental_score, snapshot.social_score, snapshot.governance_score)
+        if lowest_score == snapshot.environmental_score:
+            focus_area = "Environmental"
+            focus_actions = "energy efficiency, waste management, or carbon tracking"
+        elif lowest_score == snapshot.social_score:
+            focus_area = "Social"
+            focus_actions = "employee safety training, health benefits, or diversity programs"
+        else:
+            focus_area = "Governance"
+            focus_actions = "policy development, risk management, or compliance tracking"
         
-        # Always try to use AI if key exists
-        if settings.GROQ_API_KEY and len(settings.GROQ_API_KEY.strip()) > 10:
-            try:
-                print("Calling DeepSeek API...")
-                
-                client = OpenAI(
-                    api_key=settings.GROQ_API_KEY,
-                    base_url=settings.AI_BASE_URL
-                )
-                
-                messages = [{"role": "system", "content": system_prompt}]
-                messages.append({"role": "user", "content": context})
-                
-                # Handle action commands before AI call
-                if action_command == 'add_to_roadmap':
-                    # Extract recommendation from recent conversation or user query
-                    action_title = None
-                    description = None
-                    category = 'G'  # Default to Governance
-                    
-                    # Try to extract action from user query
-                    if 'implement' in query_lower or 'add' in query_lower:
-                        # Extract the action from the query
-                        query_words = query.split()
-                        if 'implement' in query_lower:
-                            impl_index = next(i for i, word in enumerate(query_words) if 'implement' in word.lower())
-                            action_title = ' '.join(query_words[impl_index+1:impl_index+6])  # Take next 5 words
-                        elif 'add' in query_lower and ('roadmap' in query_lower or 'plan' in query_lower):
-                            # Look for the action before "to roadmap" or "to plan"
-                            roadmap_index = next((i for i, word in enumerate(query_words) if 'roadmap' in word.lower() or 'plan' in word.lower()), len(query_words))
-                            add_index = next((i for i, word in enumerate(query_words) if 'add' in word.lower()), 0)
-                            action_title = ' '.join(query_words[add_index+1:roadmap_index-1])
-                    
-                    # Check recent messages for context
-                    if not action_title:
-                        for msg in recent_messages:
-                            if msg.role == 'assistant' and ('implement' in msg.content.lower() or 'sop' in msg.content.lower()):
-                                # Extract title from SOP or recommendation
-                                lines = msg.content.split('\n')
-                                for line in lines:
-                                    if 'OBJECTIVE:' in line or 'SOP]' in line:
-                                        action_title = line.split('-')[0].replace('[SOP]', '').strip()
-                                        break
-                                if action_title:
-                                    break
-                    
-                    # Fallback to query content
-                    if not action_title:
-                        action_title = f"Action from chat: {query[:50]}..."
-                        description = f"Implementation discussed: {query}"
-                    else:
-                        description = f"Implement {action_title} as discussed in chat session"
-                    
-                    # Determine category based on content
-                    if any(word in query_lower for word in ['energy', 'environment', 'carbon', 'waste', 'water']):
-                        category = 'E'
-                    elif any(word in query_lower for word in ['employee', 'safety', 'training', 'welfare', 'social']):
-                        category = 'S'
-                    else:
-                        category = 'G'
-                    
-                    # Create roadmap item
-                    from .models import ESGRoadmap
-                    roadmap_item = ESGRoadmap.objects.create(
-                        snapshot=snapshot,
-                        phase=1,  # Default to phase 1 for chat-generated items
-                        action_title=action_title,
-                        description=description,
-                        responsible_role='Team Lead',
-                        effort_level='medium',
-                        esg_category=category
-                    )
-                    response_text = f"[SUCCESS] Added to your roadmap: '{roadmap_item.action_title}'. You can view it in your Execution Plan. What would you like to implement next?"
-                    print(f"[DEBUG] Created roadmap item: {roadmap_item.id} - {roadmap_item.action_title}")
-                elif action_command == 'mark_completed':
-                    # Find recent roadmap item to mark complete
-                    recent_roadmap = roadmap_actions.first()
-                    if recent_roadmap:
-                        # Note: You'd need to add a 'completed' field to ESGRoadmap model
-                        response_text = f"[SUCCESS] Great job! I've noted that '{recent_roadmap.action_title}' is completed. This should improve your ESG scores. What's your next priority?"
-                    else:
-                        response_text = "I don't see any recent roadmap actions to mark as completed. You can add actions first, then mark them complete as you finish them."
-                
-                elif action_command == 'monthly_focus':
-                    # Prioritize based on current scores and roadmap
-                    lowest_score = min(snapshot.environmental_score, snapshot.social_score, snapshot.governance_score)
-                    if lowest_score == snapshot.environmental_score:
-                        focus_area = "Environmental"
-                        focus_actions = "energy efficiency, waste management, or carbon tracking"
-                    elif lowest_score == snapshot.social_score:
-                        focus_area = "Social"
-                        focus_actions = "employee safety training, health benefits, or diversity programs"
-                    else:
-                        focus_area = "Governance"
-                        focus_actions = "policy development, risk management, or compliance tracking"
-                    
-                    response_text = f"[MONTHLY FOCUS] This month, focus on {focus_area} (your lowest score: {lowest_score:.0f}/100). Priority actions: {focus_actions}. Start with the lowest-cost, highest-impact items from your recommendations."
-                
-                else:
-                    # Regular AI response for non-command queries
-                    print(f"Sending request to DeepSeek with {len(messages)} messages")
-                    
-                    response = client.chat.completions.create(
-                        model=settings.AI_MODEL,
-                        messages=messages,
-                        temperature=0.7,
-                        max_tokens=1500,
-                        timeout=60.0
-                    )
-                    response_text = response.choices[0].message.content
-                    response_text = response_text.replace('**', '').replace('*', '')
-                    print(f"[SUCCESS] DeepSeek API response received: {response_text[:100]}...")
-            except Exception as ai_error:
-                print(f"[ERROR] DeepSeek API error: {ai_error}")
-                import traceback
-                print(f"Full traceback: {traceback.format_exc()}")
-                
-                # Enhanced fallback with SOP generation
-                if 'implement' in query_lower or 'sop' in query_lower or 'how to' in query_lower:
-                    if 'employee welfare' in query_lower or 'safety' in query_lower:
-                        response_text = """
+        response_text = f"[MONTHLY FOCUS] This month, focus on {focus_area} (your lowest score: {lowest_score:.0f}/100). Priority actions: {focus_actions}. Start with the lowest-cost, highest-impact items from your recommendations."
+    
+    return response_text
+
+
+def _fallback_chat_response(snapshot, query):
+    """SOP-style fallback reply used when the AI call fails"""
+    llm_metrics.record_fallback('chat_query')
+    query_lower = query.lower()
+    
+    if 'implement' in query_lower or 'sop' in query_lower or 'how to' in query_lower:
+        if 'employee welfare' in query_lower or 'safety' in query_lower:
+            response_text = """
 [SOP] EMPLOYEE WELFARE PROGRAM - Implementation SOP
 
 OBJECTIVE: Improve employee satisfaction and safety to boost Social ESG score
@@ -1454,8 +1721,8 @@ NEXT STEPS: Start with employee survey this week. Would you like me to add this
 
 Note: This is indicative guidance for ESG improvement, not certified compliance advice.
 """
-                    elif 'governance' in query_lower or 'policy' in query_lower:
-                        response_text = """
+        elif 'governance' in query_lower or 'policy' in query_lower:
+            response_text = """
 [SOP] GOVERNANCE FRAMEWORK - Implementation SOP
 
 OBJECTIVE: Establish formal policies to strengthen Governance ESG score and reduce compliance risks
@@ -1477,8 +1744,8 @@ NEXT STEPS: Start with Code of Conduct draft. Need help with policy templates?
 
 Note: This is indicative guidance for ESG improvement, not legal or regulatory compliance advice.
 """
-                    else:
-                        response_text = f"""
+        else:
+            response_text = f"""
 For implementing '{query}': 
 
 Based on your ESG assessment (Overall: {snapshot.overall_esg_score:.0f}/100), I recommend:
@@ -1493,22 +1760,143 @@ Would you like a detailed SOP for any specific recommendation? I can help you br
 
 Note: This is indicative guidance for ESG improvement, not certified advice.
 """
+    else:
+        response_text = f"Based on your ESG assessment, I recommend focusing on your lowest scoring area first. Your current scores: Environmental {snapshot.environmental_score:.0f}, Social {snapshot.social_score:.0f}, Governance {snapshot.governance_score:.0f}. What specific area would you like help implementing?"
+    
+    return response_text
+
+
+def _prepare_chat_query(request):
+    """Validate a chat_query request, save the user message and gather chat state"""
+    snapshot_id = request.data.get('snapshot_id')
+    query = request.data.get('query')
+    session_id = request.data.get('session_id')
+    
+    if not query:
+        return None, Response({'error': 'Query is required'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    if not snapshot_id:
+        return None, Response({'error': 'snapshot_id is required'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    snapshot = get_object_or_404(
+        ESGSnapshot,
+        id=snapshot_id,
+        business_profile__user=request.user
+    )
+    
+    chat_session, session_id = _get_chat_session(snapshot, session_id)
+    
+    # Save user message
+    ChatMessage.objects.create(
+        session=chat_session,
+        role='user',
+        content=query
+    )
+    
+    # Get recent conversation history
+    recent_messages = ChatMessage.objects.filter(
+        session=chat_session
+    ).order_by('-created_at')[:6]  # Last 6 messages
+    
+    roadmap_actions = snapshot.roadmaps.all()
+    action_command = _detect_chat_action(query.lower())
+    
+    from .ai_views import _chatbot_context
+    turn = {
+        'snapshot': snapshot,
+        'query': query,
+        'session_id': session_id,
+        'chat_session': chat_session,
+        'recent_messages': recent_messages,
+        'roadmap_actions': roadmap_actions,
+        'action_command': action_command,
+        'messages': _build_chat_messages(snapshot, query, action_command, roadmap_actions),
+        # The prompt carries this business's recommendations and roadmap: cache its answers for it alone
+        'context': {**_chatbot_context(snapshot), 'business_profile_id': snapshot.business_profile_id},
+    }
+    return turn, None
+
+
+def _chat_ai_configured():
+    return bool(settings.GROQ_API_KEY and len(settings.GROQ_API_KEY.strip()) > 10)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def chat_query(request):
+    """ESG chatbot endpoint"""
+    try:
+        turn, error_response = _prepare_chat_query(request)
+        if error_response:
+            return error_response
+        snapshot = turn['snapshot']
+        query = turn['query']
+        session_id = turn['session_id']
+        action_command = turn['action_command']
+        messages = turn['messages']
+        
+        # Call AI API - Force use of DeepSeek
+        print(f"DeepSeek API Key exists: {bool(settings.GROQ_API_KEY)}")
+        print(f"API Key length: {len(settings.GROQ_API_KEY) if settings.GROQ_API_KEY else 0}")
+        print(f"AI Model: {settings.AI_MODEL}")
+        print(f"AI Base URL: {settings.AI_BASE_URL}")
+        
+        # The prompt carries no history, so any non-command question may reuse a cached answer
+        cached = None if action_command else answer_cache.lookup('chat_query', query, turn['context'])
+        if cached:
+            response_text = cached[0]
+        # Always try to use AI if key exists
+        elif _chat_ai_configured():
+            try:
+                print("Calling DeepSeek API...")
+                
+                client = get_client('groq')
+                
+                # Handle action commands before AI call
+                if action_command:
+                    response_text = _handle_chat_action(
+                        action_command, snapshot, query, turn['recent_messages'], turn['roadmap_actions']
+                    )
                 else:
-                    response_text = f"Based on your ESG assessment, I recommend focusing on your lowest scoring area first. Your current scores: Environmental {snapshot.environmental_score:.0f}, Social {snapshot.social_score:.0f}, Governance {snapshot.governance_score:.0f}. What specific area would you like help implementing?"
+                    # Regular AI response for non-command queries
+                    print(f"Sending request to DeepSeek with {len(messages)} messages")
+                    
+                    response = chat_completion(
+                        client,
+                        prompt_type='chat_query',
+                        provider='groq',
+                        model=settings.AI_MODEL,
+                        messages=messages,
+                        temperature=0.7,
+                        max_tokens=1500,
+                        timeout=60.0
+                    )
+                    response_text = response.choices[0].message.content
+                    response_text = response_text.replace('**', '').replace('*', '')
+                    print(f"[SUCCESS] DeepSeek API response received: {response_text[:100]}...")
+                    answer_cache.store('chat_query', query, turn['context'], response_text)
+            except Exception as ai_error:
+                print(f"[ERROR] DeepSeek API error: {ai_error}")
+                import traceback
+                print(f"Full traceback: {traceback.format_exc()}")
+                
+                # Enhanced fallback with SOP generation
+                response_text = _fallback_chat_response(snapshot, query)
         else:
             print("[ERROR] No valid DeepSeek API key found")
             response_text = f"DeepSeek API key not configured properly. Please check your .env file. Key length: {len(settings.GROQ_API_KEY) if settings.GROQ_API_KEY else 0}"
         
         # Save assistant response
         ChatMessage.objects.create(
-            session=chat_session,
+            session=turn['chat_session'],
             role='assistant',
             content=response_text
         )
         
         return Response({
             'response': response_text,
-            'session_id': session_id
+            'session_id': session_id,
+            **response_fields(cached)
         })
     except Exception as e:
         import traceback
@@ -1524,6 +1912,75 @@ Note: This is indicative guidance for ESG improvement, not certified advice.
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@renderer_classes([JSONRenderer, EventStreamRenderer])
+def chat_query_stream(request):
+    """Streaming variant of chat_query that forwards tokens as Server-Sent Events"""
+    turn, error_response = _prepare_chat_query(request)
+    if error_response:
+        return error_response
+    snapshot = turn['snapshot']
+    query = turn['query']
+    session_id = turn['session_id']
+    
+    def events():
+        parts = []
+        cached = None if turn['action_command'] else answer_cache.lookup('chat_query', query, turn['context'])
+        try:
+            yield sse_event({'session_id': session_id}, event='start')
+            if cached:
+                parts.append(cached[0])
+                yield sse_event({'delta': parts[-1]})
+            elif not _chat_ai_configured():
+                parts.append("DeepSeek API key not configured properly. Please check your .env file.")
+                yield sse_event({'delta': parts[-1]})
+            elif turn['action_command']:
+                parts.append(_handle_chat_action(
+                    turn['action_command'], snapshot, query, turn['recent_messages'], turn['roadmap_actions']
+                ))
+                yield sse_event({'delta': parts[-1]})
+            else:
+                try:
+                    for delta in stream_chat_completion(
+                        get_client('groq'),
+                        prompt_type='chat_query',
+                        provider='groq',
+                        model=settings.AI_MODEL,
+                        messages=turn['messages'],
+                        temperature=0.7,
+                        max_tokens=1500,
+                        timeout=60.0
+                    ):
+                        delta = delta.replace('*', '')
+                        if delta:
+                            parts.append(delta)
+                            yield sse_event({'delta': delta})
+                    answer_cache.store('chat_query', query, turn['context'], ''.join(parts))
+                except Exception as ai_error:
+                    print(f"[ERROR] Chat stream error: {ai_error}")
+                    # Only fall back if nothing reached the client yet
+                    if parts:
+                        raise
+                    parts.append(_fallback_chat_response(snapshot, query))
+                    yield sse_event({'delta': parts[-1]})
+            yield sse_event({'response': ''.join(parts), 'session_id': session_id, **response_fields(cached)}, event='done')
+        except Exception as e:
+            print(f"Chat stream error: {e}")
+            yield sse_event({'error': 'Error generating response', 'session_id': session_id}, event='error')
+        finally:
+            # Persist the assistant message once the stream finishes or the client disconnects
+            if parts:
+                ChatMessage.objects.create(
+                    session=turn['chat_session'],
+                    role='assistant',
+                    content=''.join(parts)
+                )
+    
+    return sse_response(events(), request)
+
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def generate_report(request):
@@ -4,6 +4,7 @@ Django settings for esgplatform project.
 
 from pathlib import Path
 import os
+import tempfile
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -204,6 +205,184 @@ GROQ_API_KEY = os.getenv('GROQ_API_KEY', '')
 AI_MODEL = os.getenv('AI_MODEL', 'llama-3.1-8b-instant')
 AI_BASE_URL = os.getenv('AI_BASE_URL', 'https://api.groq.com/openai/v1')
 
+# Backup provider - OpenRouter
+OPENROUTER_API_KEY = os.getenv('OPENROUTER_API_KEY', '')
+OPENROUTER_BASE_URL = os.getenv('OPENROUTER_BASE_URL', 'https://openrouter.ai/api/v1')
+OPENROUTER_MODEL = os.getenv('OPENROUTER_MODEL', 'meta-llama/llama-3.1-8b-instruct:free')
+
+# Pooled LLM HTTP clients (one per provider per worker process)
+AI_HTTP_MAX_CONNECTIONS = int(os.getenv('AI_HTTP_MAX_CONNECTIONS', '20'))
+AI_HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv('AI_HTTP_MAX_KEEPALIVE_CONNECTIONS', '10'))
+AI_HTTP_KEEPALIVE_EXPIRY = float(os.getenv('AI_HTTP_KEEPALIVE_EXPIRY', '60'))
+AI_HTTP_TIMEOUT = float(os.getenv('AI_HTTP_TIMEOUT', '60'))
+AI_HTTP_CONNECT_TIMEOUT = float(os.getenv('AI_HTTP_CONNECT_TIMEOUT', '5'))
+AI_HTTP_MAX_RETRIES = int(os.getenv('AI_HTTP_MAX_RETRIES', '2'))
+# Async clients (ASGI views) keep many more requests in flight per worker
+AI_ASYNC_MAX_CONNECTIONS = int(os.getenv('AI_ASYNC_MAX_CONNECTIONS', '200'))
+AI_ASYNC_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv('AI_ASYNC_MAX_KEEPALIVE_CONNECTIONS', '50'))
+
+# Provider health tracking (learned from real calls, occasional background probe)
+AI_HEALTH_FAILURE_THRESHOLD = int(os.getenv('AI_HEALTH_FAILURE_THRESHOLD', '2'))
+AI_HEALTH_PROBE_INTERVAL = float(os.getenv('AI_HEALTH_PROBE_INTERVAL', '60'))
+AI_HEALTH_PROBE_TIMEOUT = float(os.getenv('AI_HEALTH_PROBE_TIMEOUT', '5'))
+
+# Provider routing: per-provider circuit breaker, calls go to the lowest rolling p95 latency
+AI_ROUTER_ENABLED = os.getenv('AI_ROUTER_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+AI_ROUTER_FAILURE_THRESHOLD = int(os.getenv('AI_ROUTER_FAILURE_THRESHOLD', '3'))
+AI_ROUTER_OPEN_SECONDS = float(os.getenv('AI_ROUTER_OPEN_SECONDS', '30'))
+AI_ROUTER_LATENCY_WINDOW = float(os.getenv('AI_ROUTER_LATENCY_WINDOW', '300'))
+AI_ROUTER_MIN_SAMPLES = int(os.getenv('AI_ROUTER_MIN_SAMPLES', '5'))
+
+# Latency budgets (seconds) per prompt type: past the budget the endpoint answers with its rule-based fallback
+AI_LATENCY_BUDGETS = {
+    'esg_scores': 25,
+    'top_opportunities': 12,
+    'simulate_impact': 12,
+    'chat_query': 20,
+    'chatbot': 12,
+}
+# A call slower than this percentile of its provider's recent latency is hedged on the next provider
+AI_HEDGE_PERCENTILE = float(os.getenv('AI_HEDGE_PERCENTILE', '0.95'))
+AI_HEDGE_DEFAULT_DELAY = float(os.getenv('AI_HEDGE_DEFAULT_DELAY', '5'))
+AI_HEDGE_MAX_WORKERS = int(os.getenv('AI_HEDGE_MAX_WORKERS', '16'))
+
+# Structured output for JSON prompts: 'off' (prompt-only JSON), 'json_object' or 'json_schema' (response_format)
+AI_STRUCTURED_OUTPUT = os.getenv('AI_STRUCTURED_OUTPUT', 'off')
+AI_STRUCTURED_OUTPUT_PROVIDERS = [p.strip() for p in os.getenv('AI_STRUCTURED_OUTPUT_PROVIDERS', 'groq,openrouter').split(',') if p.strip()]
+
+# Adaptive max_tokens: once a prompt type has enough samples, request this percentile of its
+# observed completion lengths plus headroom (never more than the call site's own max_tokens)
+AI_ADAPTIVE_MAX_TOKENS = os.getenv('AI_ADAPTIVE_MAX_TOKENS', 'true').lower() in ('1', 'true', 'yes')
+AI_MAX_TOKENS_PERCENTILE = float(os.getenv('AI_MAX_TOKENS_PERCENTILE', '0.99'))
+AI_MAX_TOKENS_HEADROOM = float(os.getenv('AI_MAX_TOKENS_HEADROOM', '0.25'))
+AI_MAX_TOKENS_MIN_SAMPLES = int(os.getenv('AI_MAX_TOKENS_MIN_SAMPLES', '20'))
+AI_MAX_TOKENS_WINDOW = int(os.getenv('AI_MAX_TOKENS_WINDOW', '200'))
+AI_MAX_TOKENS_FLOOR = int(os.getenv('AI_MAX_TOKENS_FLOOR', '100'))
+
+# Client-side rate limits per provider (0 = unlimited), shared by the workers on a host through
+# state files in AI_RATE_LIMIT_DIR. Defaults match Groq's and OpenRouter's free tiers.
+AI_RATE_LIMIT_ENABLED = os.getenv('AI_RATE_LIMIT_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+AI_RATE_LIMITS = {
+    'groq': {
+        'requests_per_second': float(os.getenv('GROQ_RATE_LIMIT_RPS', '0.5')),
+        'tokens_per_minute': int(os.getenv('GROQ_RATE_LIMIT_TPM', '6000')),
+    },
+    'openrouter': {
+        'requests_per_second': float(os.getenv('OPENROUTER_RATE_LIMIT_RPS', '0.33')),
+        'tokens_per_minute': int(os.getenv('OPENROUTER_RATE_LIMIT_TPM', '0')),
+    },
+}
+AI_RATE_LIMIT_DIR = os.getenv('AI_RATE_LIMIT_DIR', os.path.join(tempfile.gettempdir(), 'esgresolve-rate-limit'))
+# Seconds of request rate that may be spent in one burst
+AI_RATE_LIMIT_BURST_SECONDS = float(os.getenv('AI_RATE_LIMIT_BURST_SECONDS', '10'))
+# Interactive calls queue ahead of bulk ones; bulk calls leave this share of each bucket to them
+AI_RATE_LIMIT_LANES = {
+    'chat_query': 'interactive',
+    'chatbot': 'interactive',
+    'simulate_impact': 'interactive',
+    'top_opportunities': 'interactive',
+    'esg_scores': 'bulk',
+    'esg_scores_batch': 'bulk',
+    'recommendations': 'bulk',
+    'roadmap': 'bulk',
+    'comprehensive_analysis': 'bulk',
+    'report': 'bulk',
+}
+AI_RATE_LIMIT_INTERACTIVE_RESERVE = float(os.getenv('AI_RATE_LIMIT_INTERACTIVE_RESERVE', '0.2'))
+# Longest wait (seconds) for capacity before the call gives up
+AI_RATE_LIMIT_MAX_WAIT = {
+    'interactive': float(os.getenv('AI_RATE_LIMIT_MAX_WAIT_INTERACTIVE', '5')),
+    'bulk': float(os.getenv('AI_RATE_LIMIT_MAX_WAIT_BULK', '60')),
+}
+
+# Batched scoring (batch_process): businesses per scoring prompt, and completion tokens allowed per business
+AI_SCORING_BATCH_SIZE = int(os.getenv('AI_SCORING_BATCH_SIZE', '10'))
+AI_SCORING_BATCH_ITEM_TOKENS = int(os.getenv('AI_SCORING_BATCH_ITEM_TOKENS', '400'))
+
+# Semantic answer cache for chat_query and the AI chatbot: per worker, partitioned by industry and
+# score band (AI_ANSWER_CACHE_BAND_WIDTH points per pillar), matched by TF-IDF cosine similarity
+AI_ANSWER_CACHE_ENABLED = os.getenv('AI_ANSWER_CACHE_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+AI_ANSWER_CACHE_MIN_SIMILARITY = float(os.getenv('AI_ANSWER_CACHE_MIN_SIMILARITY', '0.8'))
+AI_ANSWER_CACHE_BAND_WIDTH = float(os.getenv('AI_ANSWER_CACHE_BAND_WIDTH', '20'))
+AI_ANSWER_CACHE_TTL = int(os.getenv('AI_ANSWER_CACHE_TTL', str(24 * 3600)))
+AI_ANSWER_CACHE_MAX_ENTRIES = int(os.getenv('AI_ANSWER_CACHE_MAX_ENTRIES', '2000'))
+
+# Rule-based scoring profiles (esgapp/scoring_engines.py), matched by keyword against the start of a
+# word in BusinessProfile.industry. 'weights' set the E/S/G share of the overall score (the 'default'
+# profile keeps each engine's own); 'thresholds' replace the 'rules' engine's benchmark bounds
+# (kWh, generator liters and water liters per employee per month, solar kW).
+SCORING_PROFILES = {
+    'default': {},
+    'manufacturing': {
+        'match': ['manufactur', 'factory', 'industrial', 'production', 'textile', 'fabricat', 'assembly'],
+        'weights': {'environmental': 0.5, 'social': 0.3, 'governance': 0.2},
+        'thresholds': {
+            'kwh_per_employee': [400, 700, 1200],
+            'generator_liters_per_employee': [20, 60],
+            'water_liters_per_employee': [10000, 25000],
+        },
+    },
+    'hospitality': {
+        'match': ['hotel', 'restaurant', 'food', 'hospitality', 'catering', 'cafe', 'bakery'],
+        'weights': {'environmental': 0.45, 'social': 0.35, 'governance': 0.2},
+        'thresholds': {
+            'kwh_per_employee': [300, 450, 700],
+            'water_liters_per_employee': [8000, 15000],
+        },
+    },
+    'retail': {
+        'match': ['retail', 'shop', 'store', 'ecommerce', 'wholesale', 'supermarket'],
+        'weights': {'environmental': 0.35, 'social': 0.35, 'governance': 0.3},
+    },
+    'services': {
+        'match': ['service', 'consult', 'software', 'tech', 'agency', 'financ', 'legal', 'education'],
+        'weights': {'environmental': 0.25, 'social': 0.4, 'governance': 0.35},
+        'thresholds': {'kwh_per_employee': [150, 250, 400]},
+    },
+}
+
+# Rolling window (seconds) for the percentiles and counts in /api/ai/metrics/
+AI_METRICS_WINDOW = float(os.getenv('AI_METRICS_WINDOW', '600'))
+
+# Fixture file for the local mock LLM server (record_llm_fixtures / run_mock_llm)
+AI_MOCK_FIXTURES = os.getenv('AI_MOCK_FIXTURES', str(BASE_DIR / 'llm_fixtures.json'))
+
+# LLM response cache: 'locmem' (per process LRU), 'django' (cache alias), 'sqlite' (shared file) or 'none'
+AI_CACHE_BACKEND = os.getenv('AI_CACHE_BACKEND', 'locmem')
+AI_CACHE_ALIAS = os.getenv('AI_CACHE_ALIAS', 'default')
+AI_CACHE_SQLITE_PATH = os.getenv('AI_CACHE_SQLITE_PATH', str(BASE_DIR / 'llm_cache.sqlite3'))
+AI_CACHE_MAX_ENTRIES = int(os.getenv('AI_CACHE_MAX_ENTRIES', '1000'))
+AI_CACHE_MAX_TEMPERATURE = float(os.getenv('AI_CACHE_MAX_TEMPERATURE', '0.5'))
+AI_CACHE_DEFAULT_TTL = int(os.getenv('AI_CACHE_DEFAULT_TTL', '0'))
+AI_CACHE_TTLS = {
+    'esg_scores': 24 * 3600,
+    'comprehensive_analysis': 24 * 3600,
+    'top_opportunities': 3600,
+    'simulate_impact': 3600,
+    'report': 3600,
+    'roadmap': 900,
+}
+
+# Single-flight: identical concurrent AI computations share one call (file locks shared by workers on a host)
+AI_SINGLE_FLIGHT_DIR = os.getenv('AI_SINGLE_FLIGHT_DIR', os.path.join(tempfile.gettempdir(), 'esgresolve-single-flight'))
+AI_SINGLE_FLIGHT_TIMEOUT = float(os.getenv('AI_SINGLE_FLIGHT_TIMEOUT', '180'))
+
+# Full assessment pipeline: concurrent downstream LLM calls per worker process
+AI_PIPELINE_MAX_WORKERS = int(os.getenv('AI_PIPELINE_MAX_WORKERS', '8'))
+
+# Background AI jobs (?async=1), run by `python manage.py run_ai_worker`
+AI_JOB_WORKER_CONCURRENCY = int(os.getenv('AI_JOB_WORKER_CONCURRENCY', '4'))
+AI_JOB_POLL_INTERVAL = float(os.getenv('AI_JOB_POLL_INTERVAL', '1'))
+# A running job is refreshed every AI_JOB_HEARTBEAT_INTERVAL seconds and requeued
+# once its worker has been silent for AI_JOB_STALE_AFTER seconds
+AI_JOB_HEARTBEAT_INTERVAL = float(os.getenv('AI_JOB_HEARTBEAT_INTERVAL', '30'))
+AI_JOB_STALE_AFTER = int(os.getenv('AI_JOB_STALE_AFTER', '900'))
+AI_JOB_MAX_ATTEMPTS = int(os.getenv('AI_JOB_MAX_ATTEMPTS', '2'))
+AI_JOB_RETENTION_DAYS = int(os.getenv('AI_JOB_RETENTION_DAYS', '7'))
+
+# Business context in prompts: 'compact' (provided values and practices in place only) or 'verbose'
+AI_PROMPT_CONTEXT = os.getenv('AI_PROMPT_CONTEXT', 'compact')
+
 # Google OAuth Configuration
 GOOGLE_CLIENT_ID = os.getenv('GOOGLE_CLIENT_ID', '')
 GOOGLE_CLIENT_SECRET = os.getenv('GOOGLE_CLIENT_SECRET', '')
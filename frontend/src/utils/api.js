@@ -64,6 +64,7 @@ api.getRecommendations = (snapshotId) => api.get(`/esg-snapshots/${snapshotId}/r
 api.getRoadmap = (snapshotId) => api.get(`/esg-snapshots/${snapshotId}/roadmap/`)
 
 api.createESGInput = (data) => api.post('/esg-inputs/', data)
+api.updateESGInput = (id, data) => api.patch(`/esg-inputs/${id}/`, data)
 api.processESGInput = (id) => api.post(`/esg-inputs/${id}/process/`)
 
 api.generateRoadmap = (data) => api.post('/esg/roadmap/', data)